@@ -0,0 +1,104 @@
+"""
+Measure the memory and build time of CoffeePy ASTs.
+
+Parses every script under ``examples/`` and reports, per script, the number
+of AST nodes, the bytes each node object takes (``sys.getsizeof`` of the
+node plus its ``__dict__``, if it has one), the bytes the whole parsed tree
+holds per node (traced with ``tracemalloc``, so lists, strings and source
+locations are included) and the best time to parse it.
+
+Usage:
+    python benchmarks/bench_ast.py
+    python benchmarks/bench_ast.py --repeat 10
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from coffeepy.ast_nodes import iter_child_nodes  # noqa: E402
+from coffeepy.lexer import Lexer  # noqa: E402
+from coffeepy.parser import Parser  # noqa: E402
+
+
+def parse(source: str):
+    return Parser(Lexer(source).token_buffer()).parse()
+
+
+def node_sizes(program) -> tuple[int, int]:
+    """Number of nodes under ``program`` and the bytes of the node objects."""
+    count = size = 0
+    stack = [statement for statement in program.statements]
+    while stack:
+        node = stack.pop()
+        count += 1
+        size += sys.getsizeof(node)
+        if hasattr(node, "__dict__"):
+            size += sys.getsizeof(node.__dict__)
+        stack.extend(iter_child_nodes(node))
+    return count, size
+
+
+def tree_size(source: str) -> int:
+    """Bytes still allocated by parsing ``source`` once the tokens are gone."""
+    tracemalloc.start()
+    program = parse(source)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del program
+    return size
+
+
+def best_time(source: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parse(source)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=5, help="Parses per script (best is reported)")
+    args = parser.parse_args()
+
+    header = f"{'script':<52}{'nodes':>8}{'B/node':>9}{'tree B/node':>13}{'parse':>12}"
+    print(header)
+    print("-" * len(header))
+
+    nodes = node_bytes = tree_bytes = 0
+    elapsed = 0.0
+    for path in sorted((ROOT / "examples").rglob("*.coffee")):
+        source = path.read_text(encoding="utf-8")
+        try:
+            program = parse(source)
+        except Exception as exc:  # scripts that do not parse are skipped
+            print(f"  {path.relative_to(ROOT)}: {exc}", file=sys.stderr)
+            continue
+        count, size = node_sizes(program)
+        tree = tree_size(source)
+        seconds = best_time(source, args.repeat)
+        nodes += count
+        node_bytes += size
+        tree_bytes += tree
+        elapsed += seconds
+        print(
+            f"{str(path.relative_to(ROOT)):<52}{count:>8}{size / count:>9.1f}{tree / count:>13.1f}"
+            f"{seconds * 1000:>10.2f}ms"
+        )
+
+    print("-" * len(header))
+    print(f"{'total':<52}{nodes:>8}{node_bytes / nodes:>9.1f}{tree_bytes / nodes:>13.1f}{elapsed * 1000:>10.2f}ms")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,127 @@
+"""
+Benchmark the CoffeePy execution engines.
+
+Runs every script under ``examples/`` plus a few CPU-bound workloads on each
+engine and reports the best wall-clock time per engine. Lexing and parsing
+happen once per script, outside the timed region, so only execution
+(including compilation for the compiling engines) is measured.
+``examples/test-all-examples.coffee`` is skipped: it sleeps between
+subprocess runs of the other examples.
+
+Usage:
+    python benchmarks/bench_engines.py
+    python benchmarks/bench_engines.py --repeat 10 --backends tree closure
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from coffeepy.interpreter import BACKENDS, Interpreter  # noqa: E402
+from coffeepy.lexer import Lexer  # noqa: E402
+from coffeepy.parser import Parser  # noqa: E402
+
+SKIPPED = {"test-all-examples.coffee"}
+
+WORKLOADS = {
+    "fib": """
+fib = (n) ->
+  if n < 2 then n else fib(n - 1) + fib(n - 2)
+fib 20
+""",
+    "loops": """
+total = 0
+for i in [1..20000]
+  if i % 3 == 0
+    total += i
+  else
+    total -= 1
+total
+""",
+    "objects": """
+class Point
+  constructor: (@x, @y) ->
+  add: (other) -> new Point(@x + other.x, @y + other.y)
+p = new Point(0, 0)
+for i in [1..3000]
+  p = p.add(new Point(1, 2))
+p.x + p.y
+""",
+}
+
+
+def run_once(program, source: str, backend: str) -> float:
+    stdout = io.StringIO()
+    interpreter = Interpreter(stdout=stdout, source=source, backend=backend)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(stdout):
+        if backend == "closure":
+            interpreter.execute_closures(program)
+        elif backend == "python":
+            interpreter.execute_compiled(program)
+        elif backend == "vm":
+            interpreter.execute_bytecode(program)
+        else:
+            interpreter.execute_program(program)
+    return time.perf_counter() - start
+
+
+def best_time(source: str, backend: str, repeat: int) -> float:
+    program = Parser(Lexer(source).token_buffer()).parse()
+    return min(run_once(program, source, backend) for _ in range(repeat))
+
+
+def collect_scripts() -> dict[str, str]:
+    scripts = {}
+    for path in sorted((ROOT / "examples").rglob("*.coffee")):
+        if path.name in SKIPPED:
+            continue
+        scripts[str(path.relative_to(ROOT))] = path.read_text(encoding="utf-8")
+    for name, source in WORKLOADS.items():
+        scripts[f"workload:{name}"] = source
+    return scripts
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per script and engine (best is reported)")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=["tree", "closure", "python", "vm"])
+    args = parser.parse_args()
+
+    baseline = args.backends[0]
+    header = f"{'script':<52}" + "".join(f"{name:>12}" for name in args.backends)
+    print(header)
+    print("-" * len(header))
+
+    totals = dict.fromkeys(args.backends, 0.0)
+    for name, source in collect_scripts().items():
+        row = f"{name:<52}"
+        for backend in args.backends:
+            try:
+                elapsed = best_time(source, backend, args.repeat)
+            except Exception as exc:  # keep benchmarking the remaining scripts
+                row += f"{'error':>12}"
+                print(f"  {name} [{backend}]: {exc}", file=sys.stderr)
+                continue
+            totals[backend] += elapsed
+            row += f"{elapsed * 1000:>10.2f}ms"
+        print(row)
+
+    print("-" * len(header))
+    print(f"{'total':<52}" + "".join(f"{totals[name] * 1000:>10.2f}ms" for name in args.backends))
+    for backend in args.backends[1:]:
+        if totals[backend]:
+            print(f"{backend}: {totals[baseline] / totals[backend]:.2f}x vs {baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
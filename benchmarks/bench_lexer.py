@@ -0,0 +1,88 @@
+"""
+Benchmark the CoffeePy lexer.
+
+Lexes every script under ``examples/``, and a large source made of all of
+them repeated, into a ``TokenBuffer`` once with the master-pattern tokenizer
+and once character by character (``Lexer.token_buffer(master_pattern=False)``).
+It checks that both produce the same tokens and reports the best time and
+throughput of each.
+
+Usage:
+    python benchmarks/bench_lexer.py
+    python benchmarks/bench_lexer.py --repeat 10 --size 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from coffeepy.lexer import Lexer  # noqa: E402
+
+MODES = {"master": True, "characters": False}
+
+
+def best_time(source: str, master_pattern: bool, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        Lexer(source).token_buffer(master_pattern=master_pattern)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def collect_scripts(size_mb: float) -> dict[str, str]:
+    scripts = {}
+    for path in sorted((ROOT / "examples").rglob("*.coffee")):
+        scripts[str(path.relative_to(ROOT))] = path.read_text(encoding="utf-8")
+    corpus = "\n".join(scripts.values()) + "\n"
+    copies = max(1, int(size_mb * 1_000_000 / len(corpus)))
+    scripts[f"generated:{len(corpus) * copies / 1_000_000:.1f}MB"] = corpus * copies
+    return scripts
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per script and mode (best is reported)")
+    parser.add_argument("--size", type=float, default=2.0, help="Size of the generated source in MB")
+    args = parser.parse_args()
+
+    header = f"{'script':<52}{'tokens':>10}" + "".join(f"{name:>14}" for name in MODES)
+    print(header)
+    print("-" * len(header))
+
+    totals = dict.fromkeys(MODES, 0.0)
+    characters = tokens = 0
+    for name, source in collect_scripts(args.size).items():
+        try:
+            expected = Lexer(source).tokenize(master_pattern=False)
+        except Exception as exc:  # scripts that do not lex are skipped
+            print(f"  {name}: {exc}", file=sys.stderr)
+            continue
+        if Lexer(source).tokenize() != expected:
+            print(f"  {name}: token streams differ", file=sys.stderr)
+            return 1
+        characters += len(source)
+        tokens += len(expected)
+        row = f"{name:<52}{len(expected):>10}"
+        for mode, master_pattern in MODES.items():
+            elapsed = best_time(source, master_pattern, args.repeat)
+            totals[mode] += elapsed
+            row += f"{elapsed * 1000:>12.2f}ms"
+        print(row)
+
+    print("-" * len(header))
+    print(f"{'total':<52}{tokens:>10}" + "".join(f"{totals[mode] * 1000:>12.2f}ms" for mode in MODES))
+    for mode in MODES:
+        print(f"{mode}: {characters / totals[mode] / 1_000_000:.2f} MB/s, {tokens / totals[mode]:,.0f} tokens/s")
+    print(f"master: {totals['characters'] / totals['master']:.2f}x vs characters")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -9,6 +9,9 @@ Usage:
     python -m coffeepy script.coffee      # Run a file
     python -m coffeepy -i                  # Start REPL
     python -m coffeepy -e "print 1 + 2"    # Evaluate code
+    python -m coffeepy --backend python script.coffee  # Compile to Python bytecode
+    python -m coffeepy --backend vm script.coffee      # Run on the register VM
+    python -m coffeepy -O script.coffee    # Fold constants and drop dead code first
 
 Commands in REPL:
     .exit   - Exit the REPL
@@ -27,12 +30,16 @@ import sys
 from pathlib import Path
 
 from .errors import CoffeeError
-from .interpreter import Interpreter
+from .interpreter import BACKENDS, Interpreter
 
 
-def repl() -> int:
+def repl(backend: str = "closure", optimize: bool = False) -> int:
     """Start an interactive REPL session.
     
+    Args:
+        backend: Execution backend passed to the interpreter
+        optimize: Whether the interpreter runs the AST optimizer
+    
     Returns:
         Exit code (0 for success)
     """
@@ -40,7 +47,7 @@ def repl() -> int:
     print("Type .exit to quit, .help for help")
     print()
     
-    interpreter = Interpreter()
+    interpreter = Interpreter(backend=backend, optimize=optimize)
     buffer = []
     continuation = False
     
@@ -133,11 +140,13 @@ def main() -> int:
     )
     parser.add_argument("-e", "--eval", dest="eval_code", help="Evaluate Coffee source from a string")
     parser.add_argument("-i", "--interactive", action="store_true", help="Start REPL")
+    parser.add_argument("--backend", choices=BACKENDS, default="closure", help="Execution backend (default: closure)")
+    parser.add_argument("-O", "--optimize", action="store_true", help="Optimize the program (constant folding, dead code) before running it")
     parser.add_argument("file", nargs="?", help="Path to a .coffee file")
     args = parser.parse_args()
 
     if args.interactive or (args.eval_code is None and args.file is None):
-        return repl()
+        return repl(args.backend, args.optimize)
 
     if args.eval_code is not None:
         source = args.eval_code.replace("\\n", "\n")
@@ -154,7 +163,7 @@ def main() -> int:
 
         source = path.read_text(encoding="utf-8")
 
-    interpreter = Interpreter()
+    interpreter = Interpreter(backend=args.backend, optimize=args.optimize)
     try:
         result = interpreter.interpret(source)
     except CoffeeError as exc:
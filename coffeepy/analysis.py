@@ -0,0 +1,129 @@
+"""
+CoffeePy - Function Analysis
+============================
+
+Static facts about functions that the engines would otherwise rediscover
+each time a function literal is evaluated. ``analyze`` runs once over a
+program and annotates every ``FunctionLiteral`` with a ``FunctionInfo`` in
+its ``info`` field:
+
+* ``is_generator``: the body contains a ``yield``. As in ``contains_yield``,
+  a ``yield`` in a nested function counts too.
+* ``uses_this`` and ``uses_super``: the function or a function nested in it
+  reads ``this`` (``@name`` parameters included) or ``super``.
+* ``free_variables``: names it or a nested function reads or assigns that
+  it does not define. Such names belong to an enclosing function or to the
+  global scope (see ``coffeepy.scopes``).
+* ``local_count``: the number of names it defines, parameters included.
+* ``is_leaf``: its own body makes no calls, ``new`` or ``do`` included.
+* ``defaults``: the default value expressions, keyed by parameter name.
+
+The ``this``, ``super`` and ``yield`` facts come from the ``Scope`` of the
+function and of the functions nested in it, which ``analyze_scopes`` has
+already gathered; the walk here only collects names and calls.
+
+``function_info`` returns the annotation and analyzes a function on its own
+when it was built outside ``analyze``. Its facts do not depend on the code
+around it.
+"""
+
+from __future__ import annotations
+
+from .ast_nodes import (
+    Call,
+    DoExpr,
+    ExprStmt,
+    FunctionLiteral,
+    Identifier,
+    NewExpr,
+    Program,
+    SuperExpr,
+    iter_child_nodes,
+)
+from .scopes import ScopeTable, analyze_scopes
+
+
+class FunctionInfo:
+    """Static facts about one ``FunctionLiteral``."""
+
+    __slots__ = ("is_generator", "uses_this", "uses_super", "free_variables", "local_count", "is_leaf", "defaults")
+
+    def __init__(self, is_generator: bool, uses_this: bool, uses_super: bool, free_variables: frozenset[str],
+                 local_count: int, is_leaf: bool, defaults: dict):
+        self.is_generator = is_generator
+        self.uses_this = uses_this
+        self.uses_super = uses_super
+        self.free_variables = free_variables
+        self.local_count = local_count
+        self.is_leaf = is_leaf
+        self.defaults = defaults
+
+    def __repr__(self) -> str:
+        parts = [f"locals={self.local_count}", f"free=[{', '.join(sorted(self.free_variables))}]"]
+        parts.extend(name for name in ("is_generator", "uses_this", "uses_super", "is_leaf") if getattr(self, name))
+        return f"<FunctionInfo {' '.join(parts)}>"
+
+
+def analyze(program: Program) -> None:
+    """Annotate every function of ``program`` in place."""
+    _Analyzer(analyze_scopes(program)).visit_all(program.statements, _Facts())
+
+
+def function_info(node: FunctionLiteral) -> FunctionInfo:
+    info = node.info
+    if info is None:
+        analyze(Program([ExprStmt(node)]))
+        info = node.info
+    return info
+
+
+class _Facts:
+    """What the body of one function reads and calls, gathered while
+    visiting it."""
+
+    __slots__ = ("names", "calls")
+
+    def __init__(self):
+        self.names: set[str] = set()
+        self.calls = False
+
+
+class _Analyzer:
+    def __init__(self, table: ScopeTable):
+        self.table = table
+
+    def visit_all(self, nodes, facts: _Facts) -> None:
+        for node in nodes:
+            self.visit(node, facts)
+
+    def visit(self, node, facts: _Facts) -> None:
+        if isinstance(node, FunctionLiteral):
+            facts.names.update(self._function(node).free_variables)
+            return
+
+        if isinstance(node, Identifier):
+            facts.names.add(node.name)
+        elif isinstance(node, (Call, NewExpr, DoExpr, SuperExpr)):
+            facts.calls = True
+
+        self.visit_all(iter_child_nodes(node), facts)
+
+    def _function(self, node: FunctionLiteral) -> FunctionInfo:
+        facts = _Facts()
+        self.visit_all(iter_child_nodes(node), facts)
+        scope = self.table.scope_for(node)
+        # Nested functions were annotated by the walk above.
+        nested = [child.node.info for child in scope.children]
+        uses_super = scope.uses_super or any(child.uses_super for child in nested)
+        defined = set(node.params) | scope.declared
+        info = FunctionInfo(
+            is_generator=scope.has_yield or any(child.is_generator for child in nested),
+            uses_this=scope.uses_this or uses_super or bool(node.this_params) or any(child.uses_this for child in nested),
+            uses_super=uses_super,
+            free_variables=frozenset(facts.names - defined),
+            local_count=len(defined),
+            is_leaf=not facts.calls,
+            defaults=dict(node.defaults) if node.defaults else {},
+        )
+        object.__setattr__(node, "info", info)
+        return info
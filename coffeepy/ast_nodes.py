@@ -1,9 +1,46 @@
 from __future__ import annotations
 
-from dataclasses import dataclass, field
-
-
-@dataclass(frozen=True)
+from dataclasses import MISSING, dataclass, field, fields
+
+
+def _node(cls):
+    """``@dataclass(frozen=True, slots=True)``, with an ``__init__`` that
+    stores each field through its slot descriptor instead of calling
+    ``object.__setattr__`` for it.
+
+    Slots leave out the per-instance ``__dict__``; nodes stay immutable, and
+    the cache fields (``init=False, compare=False``) start at their default
+    and are filled in later with ``object.__setattr__``. Being outside the
+    constructor, they are not copied by ``dataclasses.replace``.
+    """
+    cls = dataclass(frozen=True, slots=True)(cls)
+    namespace = {}
+    params = []
+    body = []
+    for node_field in fields(cls):
+        name = node_field.name
+        namespace[f"_set_{name}"] = cls.__dict__[name].__set__
+        if not node_field.init:
+            namespace[f"_default_{name}"] = node_field.default
+            body.append(f"    _set_{name}(self, _default_{name})\n")
+            continue
+        if node_field.default is MISSING:
+            params.append(name)
+        else:
+            namespace[f"_default_{name}"] = node_field.default
+            params.append(f"{name}=_default_{name}")
+        body.append(f"    _set_{name}(self, {name})\n")
+    if hasattr(cls, "__post_init__"):
+        body.append("    self.__post_init__()\n")
+    signature = ", ".join(["self", *params])
+    exec(f"def __init__({signature}):\n" + ("".join(body) or "    pass\n"), namespace)
+    init = namespace["__init__"]
+    init.__qualname__ = f"{cls.__qualname__}.__init__"
+    cls.__init__ = init
+    return cls
+
+
+@_node
 class SourceLocation:
     line: int
     column: int
@@ -13,82 +50,84 @@ class SourceLocation:
 
 
 class Statement:
-    pass
+    __slots__ = ()
 
 
 class Expression:
-    pass
+    __slots__ = ()
 
 
-@dataclass(frozen=True)
+@_node
 class Program:
     statements: list[Statement]
 
 
-@dataclass(frozen=True)
+@_node
 class ImportItem:
     module: str
     alias: str | None
 
 
-@dataclass(frozen=True)
+@_node
 class ImportName:
     name: str
     alias: str | None
 
 
-@dataclass(frozen=True)
+@_node
 class ImportStmt(Statement):
     items: list[ImportItem]
 
 
-@dataclass(frozen=True)
+@_node
 class FromImportStmt(Statement):
     module: str
     names: list[ImportName]
 
 
-@dataclass(frozen=True)
+@_node
 class AssignStmt(Statement):
     target: Expression
     value: Expression
 
 
-@dataclass(frozen=True)
+@_node
 class MultiAssignStmt(Statement):
     targets: list[Expression]
     value: Expression
 
 
-@dataclass(frozen=True)
+@_node
 class ReturnStmt(Statement):
     value: Expression | None
 
 
-@dataclass(frozen=True)
+@_node
 class WhileStmt(Statement):
     condition: Expression
     body: Expression
 
 
-@dataclass(frozen=True)
+@_node
 class BreakStmt(Statement):
     pass
 
 
-@dataclass(frozen=True)
+@_node
 class ContinueStmt(Statement):
     pass
 
 
-@dataclass(frozen=True)
+@_node
 class ForInStmt(Statement):
     var_name: str
     iterable: Expression
     body: Expression
+    # ``(depth, slot)`` of the loop variable; filled in by ``coffeepy.resolver``.
+    var_coordinate: tuple | None = field(default=None, init=False, compare=False, repr=False)
 
 
-@dataclass(frozen=True)
+@_node
 class ForOfStmt(Statement):
     key_var: str
     value_var: str | None
@@ -96,7 +135,7 @@ class ForOfStmt(Statement):
     body: Expression
 
 
-@dataclass(frozen=True)
+@_node
 class RangeLiteral(Expression):
     start: Expression
     end: Expression
@@ -104,133 +143,147 @@ class RangeLiteral(Expression):
     step: Expression | None = None
 
 
-@dataclass(frozen=True)
+@_node
 class DoExpr(Expression):
     body: Expression
 
 
-@dataclass(frozen=True)
+@_node
 class YieldExpr(Expression):
     value: Expression | None
 
 
-@dataclass(frozen=True)
+@_node
 class ChainedComparison(Expression):
     operands: list[Expression]
     operators: list[str]
 
 
-@dataclass(frozen=True)
+@_node
 class ImportAllStmt(Statement):
     module: str
     alias: str | None
 
 
-@dataclass(frozen=True)
+@_node
 class GetterDecl(Statement):
     name: str
     body: Expression
 
 
-@dataclass(frozen=True)
+@_node
 class SetterDecl(Statement):
     name: str
     param: str
     body: Expression
 
 
-@dataclass(frozen=True)
+@_node
 class LogicalAssignStmt(Statement):
     target: Expression
     operator: str
     value: Expression
 
 
-@dataclass(frozen=True)
+@_node
 class ProtoAccessExpr(Expression):
     target: Expression | None
     name: str
 
 
-@dataclass(frozen=True)
+@_node
 class AugAssignStmt(Statement):
     target: Expression
     operator: str
     value: Expression
 
 
-@dataclass(frozen=True)
+@_node
 class ExistentialAssignStmt(Statement):
     target: Expression
     value: Expression
 
 
-@dataclass(frozen=True)
+@_node
 class UpdateStmt(Statement):
     target: Expression
     operator: str
     prefix: bool
 
 
-@dataclass(frozen=True)
+@_node
 class ExprStmt(Statement):
     expression: Expression
 
 
-@dataclass(frozen=True)
+@_node
 class BlockExpr(Expression):
     statements: list[Statement]
 
 
-@dataclass(frozen=True)
+@_node
 class Literal(Expression):
     value: object
 
 
-@dataclass(frozen=True)
+@_node
+class RegexLiteral(Expression):
+    pattern: str
+    flags: str
+
+
+@_node
 class Identifier(Expression):
     name: str
     location: SourceLocation | None = None
+    # ``(depth, slot)`` of the variable; filled in by ``coffeepy.resolver``.
+    coordinate: tuple | None = field(default=None, init=False, compare=False, repr=False)
 
 
-@dataclass(frozen=True)
+@_node
 class Unary(Expression):
     operator: str
     right: Expression
 
 
-@dataclass(frozen=True)
+@_node
 class Binary(Expression):
     left: Expression
     operator: str
     right: Expression
     location: SourceLocation | None = None
+    # ``coffeepy.quicken.BinarySite`` of the tree walker.
+    site: object = field(default=None, init=False, compare=False, repr=False)
 
 
-@dataclass(frozen=True)
+@_node
 class IfExpr(Expression):
     condition: Expression
     then_branch: Expression
     else_branch: Expression
 
 
-@dataclass(frozen=True)
+@_node
 class GetAttr(Expression):
     target: Expression
     name: str
     location: SourceLocation | None = None
+    # ``coffeepy.inline_cache.AttributeCache`` of the tree walker.
+    cache: object = field(default=None, init=False, compare=False, repr=False)
 
 
-@dataclass(frozen=True)
+@_node
 class Call(Expression):
     callee: Expression
     args: list[Expression]
     kwargs: list[tuple[str, Expression]]
     implicit: bool = False
     location: SourceLocation | None = None
+    # ``coffeepy.quicken.CallSite`` of the tree walker.
+    site: object = field(default=None, init=False, compare=False, repr=False)
 
 
-@dataclass(frozen=True)
+@_node
 class FunctionLiteral(Expression):
     params: list[str]
     body: Expression
@@ -238,29 +291,36 @@ class FunctionLiteral(Expression):
     defaults: dict = None
     this_params: tuple = ()
     bound: bool = False
-    
+    # Slot names of the call frame; filled in by ``coffeepy.resolver``.
+    frame_layout: tuple | None = field(default=None, init=False, compare=False, repr=False)
+    # Cached ``coffeepy.bytecode.CodeObject``; filled in by the bytecode compiler.
+    bytecode: object = field(default=None, init=False, compare=False, repr=False)
+    # ``coffeepy.analysis.FunctionInfo``; filled in by ``coffeepy.analysis``.
+    info: object = field(default=None, init=False, compare=False, repr=False)
+
     def __post_init__(self):
         if self.defaults is None:
             object.__setattr__(self, 'defaults', {})
 
 
-@dataclass(frozen=True)
+@_node
 class ArrayLiteral(Expression):
     items: list[Expression]
 
 
-@dataclass(frozen=True)
+@_node
 class ObjectLiteral(Expression):
     items: list[tuple[str, Expression]]
 
 
-@dataclass(frozen=True)
+@_node
 class IndexExpr(Expression):
     target: Expression
     index: Expression
+    location: SourceLocation | None = None
 
 
-@dataclass(frozen=True)
+@_node
 class SliceExpr(Expression):
     target: Expression
     start: Expression | None
@@ -268,42 +328,42 @@ class SliceExpr(Expression):
     exclusive: bool = False
 
 
-@dataclass(frozen=True)
+@_node
 class ArrayDestructuring(Expression):
     elements: list[Expression]
     splat_index: int = -1  # -1 means no splat
 
 
-@dataclass(frozen=True)
+@_node
 class ObjectDestructuring(Expression):
     properties: list[tuple[str, Expression | None, Expression | None]]  # (key, alias, default)
 
 
-@dataclass(frozen=True)
+@_node
 class ClassDecl(Statement):
     name: str
     parent: Expression | None
     body: list[tuple[str, Expression]]
 
 
-@dataclass(frozen=True)
+@_node
 class ThisExpr(Expression):
     pass
 
 
-@dataclass(frozen=True)
+@_node
 class SuperExpr(Expression):
     pass
 
 
-@dataclass(frozen=True)
+@_node
 class NewExpr(Expression):
     class_expr: Expression
     args: list[Expression]
     kwargs: list[tuple[str, Expression]]
 
 
-@dataclass(frozen=True)
+@_node
 class TryStmt(Statement):
     try_block: Expression
     catch_var: str | None
@@ -311,61 +371,65 @@ class TryStmt(Statement):
     finally_block: Expression | None
 
 
-@dataclass(frozen=True)
+@_node
 class ThrowStmt(Statement):
     value: Expression
 
 
-@dataclass(frozen=True)
+@_node
 class SwitchExpr(Expression):
     value: Expression | None
     cases: list[tuple[list[Expression], Expression]]
     default: Expression | None
 
 
-@dataclass(frozen=True)
+@_node
 class ExistentialExpr(Expression):
     left: Expression
     right: Expression
 
 
-@dataclass(frozen=True)
+@_node
 class SafeAccessExpr(Expression):
     target: Expression
     name: str
 
 
-@dataclass(frozen=True)
+@_node
 class SplatExpr(Expression):
     value: Expression
 
 
-@dataclass(frozen=True)
+@_node
 class InterpolatedString(Expression):
     parts: list[Expression]
 
 
-@dataclass(frozen=True)
+@_node
 class InExpr(Expression):
     value: Expression
     container: Expression
 
 
-@dataclass(frozen=True)
+@_node
 class OfExpr(Expression):
     key: Expression
     container: Expression
 
 
-@dataclass(frozen=True)
+@_node
 class ComprehensionExpr(Expression):
     var_name: str
     iterable: Expression
     body: Expression
     filter_condition: Expression | None = None
+    # ``(body for x in items)``: a generator instead of a list.
+    lazy: bool = False
+    # ``coffeepy.vectorize.VectorPlan``, or ``False`` when it has none.
+    vector: object = field(default=None, init=False, compare=False, repr=False)
 
 
-@dataclass(frozen=True)
+@_node
 class ObjectComprehensionExpr(Expression):
     key_expr: Expression
     value_expr: Expression
@@ -375,6 +439,27 @@ class ObjectComprehensionExpr(Expression):
     filter_condition: Expression | None = None
 
 
-@dataclass(frozen=True)
+@_node
 class SpreadExpr(Expression):
     value: Expression
+
+
+def iter_child_nodes(node):
+    """Yield the direct AST children of ``node``.
+
+    Children may be stored directly on a field or nested inside the lists and
+    tuples used by nodes such as ``ObjectLiteral`` or ``SwitchExpr``.
+    """
+    for node_field in fields(node):
+        yield from _iter_nodes_in(getattr(node, node_field.name))
+
+
+def _iter_nodes_in(value):
+    if isinstance(value, (Expression, Statement)):
+        yield value
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            yield from _iter_nodes_in(item)
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from _iter_nodes_in(item)
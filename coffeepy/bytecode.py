@@ -0,0 +1,1281 @@
+"""
+CoffeePy - Register Bytecode Compiler
+=====================================
+
+Compiles a CoffeePy ``Program`` into ``CodeObject`` instances executed by
+``coffeepy.vm``. Every instruction is four integers wide -- an opcode and up
+to three operands -- and the instructions of a code object live in a single
+``array('i')``. Operands refer to
+
+* registers: per-call scratch slots holding intermediate values,
+* the constant pool: ``CodeObject.constants`` (numbers, strings, nested
+  code objects, operand tuples),
+* the name table: ``CodeObject.names`` (global and attribute names),
+* attribute sites: ``CodeObject.attribute_caches``, one
+  ``coffeepy.inline_cache.AttributeCache`` per ``LOAD_ATTR`` or
+  ``LOAD_METHOD``,
+* instruction offsets, for jumps.
+
+Variables are resolved ahead of time by ``coffeepy.resolver``: locals of a
+function live at fixed slots of its frame list and are reached with
+``LOAD_LOCAL``/``LOAD_DEREF``; only globals are looked up by name, in the
+interpreter's global ``Environment``. A function literal is compiled once
+and its code object is cached on the ``FunctionLiteral`` node, so creating
+or re-entering the function never walks the AST again.
+
+``try`` blocks are described by an exception table instead of setup
+instructions: each entry maps a range of instructions to a handler. Code in
+``finally`` blocks is duplicated on the normal, ``break``/``continue`` and
+``return`` exits, and runs once more from a handler on the exceptional path.
+"""
+
+from __future__ import annotations
+
+from array import array
+
+from .ast_nodes import (
+    ArrayDestructuring,
+    ArrayLiteral,
+    AssignStmt,
+    AugAssignStmt,
+    Binary,
+    BlockExpr,
+    BreakStmt,
+    Call,
+    ChainedComparison,
+    ClassDecl,
+    ComprehensionExpr,
+    ContinueStmt,
+    DoExpr,
+    ExistentialAssignStmt,
+    ExistentialExpr,
+    ExprStmt,
+    ForInStmt,
+    ForOfStmt,
+    FromImportStmt,
+    FunctionLiteral,
+    GetAttr,
+    Identifier,
+    IfExpr,
+    ImportStmt,
+    InExpr,
+    IndexExpr,
+    InterpolatedString,
+    Literal,
+    LogicalAssignStmt,
+    MultiAssignStmt,
+    NewExpr,
+    ObjectComprehensionExpr,
+    ObjectDestructuring,
+    ObjectLiteral,
+    OfExpr,
+    Program,
+    ProtoAccessExpr,
+    RangeLiteral,
+    RegexLiteral,
+    ReturnStmt,
+    SafeAccessExpr,
+    SliceExpr,
+    SplatExpr,
+    SpreadExpr,
+    Statement,
+    SuperExpr,
+    SwitchExpr,
+    ThisExpr,
+    ThrowStmt,
+    TryStmt,
+    Unary,
+    UpdateStmt,
+    WhileStmt,
+    YieldExpr,
+)
+from .analysis import function_info
+from .errors import CoffeeCompileError
+from .flat_ast import FlatAST, as_program
+from .inline_cache import AttributeCache
+from .interpreter import comprehension_stages
+from .resolver import lookup, resolve, slot_map
+from .tokens import (
+    AND,
+    ANDAND,
+    EQEQ,
+    GT,
+    GTE,
+    LT,
+    LTE,
+    MINUS,
+    MINUSMINUS,
+    MINUS_EQ,
+    NEQ,
+    NOT,
+    OR,
+    OROR,
+    PERCENT,
+    PERCENT_EQ,
+    PLUS,
+    PLUSPLUS,
+    PLUS_EQ,
+    SLASH,
+    SLASH_EQ,
+    STAR,
+    STARSTAR,
+    STAR_EQ,
+)
+
+# ============ Opcodes ============
+# Operand conventions: R[x] is register x, K[x] constant x, N[x] name x.
+
+LOAD_CONST = 0          # R[a] = K[b]
+LOAD_NONE = 1           # R[a] = None
+MOVE = 2                # R[a] = R[b]
+LOAD_GLOBAL = 3         # R[a] = global N[b], falling back to builtins
+STORE_GLOBAL = 4        # global N[a] = R[b]
+LOAD_LOCAL = 5          # R[a] = frame[b]
+STORE_LOCAL = 6         # frame[a] = R[b]
+LOAD_DEREF = 7          # R[a] = slot c of the frame b levels out
+STORE_DEREF = 8         # slot b of the frame a levels out = R[c]
+LOAD_CHECKED = 9        # R[a] = variable K[b] = (depth, slot, name), no builtins
+LOAD_THIS = 10          # R[a] = this
+LOAD_SUPER = 11         # R[a] = super
+LOAD_ATTR = 12          # R[a] = R[b].name through attribute cache c
+STORE_ATTR = 13         # R[a].N[b] = R[c]
+SAFE_ATTR = 14          # R[a] = R[b]?.N[c]
+PROTO_ATTR = 15         # R[a] = R[b]::N[c]
+LOAD_INDEX = 16         # R[a] = R[b][R[c]]
+STORE_INDEX = 17        # R[a][R[b]] = R[c]
+READ_INDEX = 18         # R[a] = R[b][R[c]] (compound assignment read)
+ADD = 19                # R[a] = R[b] + R[c]
+SUB = 20
+MUL = 21
+DIV = 22
+MOD = 23
+POW = 24
+EQUAL = 25              # R[a] = R[b] == R[c]
+NOT_EQUAL = 26
+LESS = 27
+LESS_EQUAL = 28
+GREATER = 29
+GREATER_EQUAL = 30
+INPLACE = 31            # R[a] = R[a] <K[c]> R[b] (augmented assignment)
+NEGATE = 32             # R[a] = -R[b]
+POSITIVE = 33           # R[a] = +R[b]
+UNARY_NOT = 34          # R[a] = not R[b]
+CONTAINS = 35           # R[a] = R[b] in R[c]
+JUMP = 36               # pc = a
+JUMP_IF_FALSE = 37      # if not R[a]: pc = b
+JUMP_IF_TRUE = 38       # if R[a]: pc = b
+JUMP_IF_NOT_NONE = 39   # if R[a] is not None: pc = b
+JUMP_IF_ARG = 40        # if frame[a] was passed to this call: pc = b
+BUILD_LIST = 41         # R[a] = [R[b] .. R[b + c - 1]]
+BUILD_DICT = 42         # R[a] = dict(zip(K[c], R[b] ..))
+BUILD_RANGE = 43        # R[a] = list of range R[b]..R[b + 1] step R[b + 2]; c = exclusive
+BUILD_SLICE = 44        # R[a] = R[b][R[b + 1]:R[b + 2]]; c = exclusive
+BUILD_STRING = 45       # R[a] = "".join(str parts R[b] .. R[b + c - 1])
+LIST_APPEND = 46        # R[a].append(R[b])
+DICT_SET = 47           # R[a][R[b]] = R[c]
+CALL = 48               # R[a] = R[b](R[b + 1] .. R[b + c])
+CALL_EX = 49            # R[a] = R[b](...) with spreads and keywords described by K[c]
+NEW = 50                # R[a] = new R[b](...) with arguments described by K[c]
+DO = 51                 # R[a] = R[b]()
+MAKE_FUNCTION = 52      # R[a] = function from code object K[b]
+MAKE_CLASS = 53         # R[a] = class K[c] extends R[b] with methods R[b + 1]
+GET_ITER = 54           # R[a] = iter(R[b])
+FOR_ITER = 55           # R[b] = next(R[a]) or pc = c when exhausted
+OF_ITEMS = 56           # R[a] = key/value pairs of R[b]
+INDEXED_ITEMS = 57      # R[a] = (index or key, value) pairs of R[b]
+UNPACK_PAIR = 58        # R[a], R[a + 1] = R[b]
+UNPACK_ARRAY = 59       # R[a] .. = array pattern K[c] applied to R[b]
+CHECK_OBJECT = 60       # raise unless R[a] is a dict
+OBJECT_GET = 61         # R[a] = R[b][K[c]] or MISSING
+JUMP_IF_FOUND = 62      # if R[a] is not MISSING: pc = b
+MISSING_KEY = 63        # raise "Property K[a] not found"
+IMPORT = 64             # R[a] = import K[b]; c = 1 binds the root package
+FROM_IMPORT = 65        # R[a] = from K[b] import K[c]
+REGEX = 66              # R[a] = compiled regex from K[b]
+SET_THIS_PARAMS = 67    # this.<name> = frame[slot] for (name, slot) in K[a]
+THROW = 68              # throw R[a]
+RERAISE = 69            # re-raise the exception object held in R[a]
+SIGNAL = 70             # raise break (a = 0) or continue (a = 1) to the caller
+ERROR = 71              # raise CoffeeRuntimeError(K[a])
+YIELD = 72              # R[a] = yield R[b]
+RETURN = 73             # return R[a]
+STORE_PROTO = 74        # R[a]::N[b] = R[c]
+LOAD_METHOD = 75        # R[a + 1] = R[b].name through cache c; R[a] = R[b] for a class method, else null
+CALL_METHOD = 76        # R[a] = R[b + 1](R[b + 2] .. R[b + 1 + c]), run on receiver R[b] unless null
+RANGE_ITER = 77         # R[a] = iterator over range R[b]..R[b + 1] step R[b + 2]; c = exclusive
+LAZY_RANGE = 78         # R[a] = CoffeeRange of range R[b]..R[b + 1] step R[b + 2]; c = exclusive
+MAKE_GENERATOR = 79     # R[a] = generator running code object K[b] on this frame, iterating R[c]
+
+OPCODES = {
+    value: name
+    for name, value in list(globals().items())
+    if name.isupper() and isinstance(value, int)
+}
+
+_ARITHMETIC = {
+    PLUS: ADD,
+    MINUS: SUB,
+    STAR: MUL,
+    SLASH: DIV,
+    PERCENT: MOD,
+    STARSTAR: POW,
+}
+
+_COMPARISON = {
+    EQEQ: EQUAL,
+    NEQ: NOT_EQUAL,
+    LT: LESS,
+    LTE: LESS_EQUAL,
+    GT: GREATER,
+    GTE: GREATER_EQUAL,
+}
+
+AUGMENTED_OPERATORS = (PLUS_EQ, MINUS_EQ, STAR_EQ, SLASH_EQ, PERCENT_EQ, PLUSPLUS, MINUSMINUS)
+
+_UNARY = {
+    MINUS: NEGATE,
+    PLUS: POSITIVE,
+    NOT: UNARY_NOT,
+}
+
+_UNRESOLVED = object()
+
+# Name of the generator code objects built for lazy comprehensions.
+LAZY_COMPREHENSION = "<lazy comprehension>"
+
+# Exception table entry kinds: ``catch`` handlers take thrown values,
+# ``finally`` handlers take any exception and RUNTIME_ERROR handlers take
+# ``CoffeeRuntimeError`` (used by ``x ?= value`` on undefined names).
+CATCH = 0
+FINALLY = 1
+RUNTIME_ERROR = 2
+
+
+class CodeObject:
+    """Compiled form of a program or function body."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.instructions = array("i")
+        self.constants: list = []
+        self.names: list[str] = []
+        self.attribute_caches: list[AttributeCache] = []
+        self.register_count = 0
+        self.exception_table: list[tuple[int, int, int, int, int]] = []
+        self.locations: dict[int, object] = {}
+        self.params: tuple[str, ...] = ()
+        self.param_slots: tuple[int, ...] = ()
+        self.slot_names: tuple[str, ...] = ()
+        self.local_count = 0
+        self.splat_param = False
+        self.defaults: tuple[str, ...] = ()
+        self.this_params: tuple[str, ...] = ()
+        self.bound = False
+        self.is_generator = False
+        self._constant_index: dict = {}
+        self._name_index: dict[str, int] = {}
+
+    def __repr__(self) -> str:
+        return f"<CodeObject {self.name} ({len(self.instructions) // 4} instructions)>"
+
+
+class _Label:
+    def __init__(self):
+        self.offset: int | None = None
+        self.patches: list[int] = []
+
+
+class _Block:
+    """Loop or ``finally`` context consulted by break, continue and return."""
+
+    def __init__(self, kind: str, break_label: _Label | None = None, continue_label: _Label | None = None,
+                 finally_node=None):
+        self.kind = kind
+        self.break_label = break_label
+        self.continue_label = continue_label
+        self.finally_node = finally_node
+
+
+class BytecodeCompiler:
+    """Compile a ``Program`` into a tree of ``CodeObject`` instances."""
+
+    def __init__(self):
+        self._code: CodeObject | None = None
+        self._blocks: list[_Block] = []
+        self._top = 0
+        # Slot maps of the enclosing functions, innermost last.
+        self._layouts: list[dict[str, int]] = []
+
+    def compile_program(self, program: Program | FlatAST) -> CodeObject:
+        program = as_program(program)
+        resolve(program)
+        code = CodeObject("<program>")
+        self._compile_body(code, program.statements, [])
+        return code
+
+    def compile_function(self, node: FunctionLiteral) -> CodeObject:
+        cached = node.bytecode
+        if cached is not None:
+            return cached
+
+        layout = slot_map(node.frame_layout)
+        code = CodeObject("<function>")
+        code.params = tuple(node.params)
+        code.param_slots = tuple(layout[name] for name in node.params)
+        code.slot_names = node.frame_layout
+        code.splat_param = node.splat_param
+        info = function_info(node)
+        code.local_count = info.local_count
+        defaults = info.defaults
+        code.defaults = tuple(defaults)
+        code.this_params = tuple((name, layout[name]) for name in node.this_params)
+        code.bound = node.bound
+        code.is_generator = info.is_generator
+
+        statements = node.body.statements if isinstance(node.body, BlockExpr) else [ExprStmt(node.body)]
+        self._compile_body(code, statements, self._layouts + [layout], defaults)
+
+        object.__setattr__(node, "bytecode", code)
+        return code
+
+    # ============ Code object helpers ============
+
+    def _compile_body(self, code: CodeObject, statements, layouts: list[dict[str, int]], defaults=None) -> None:
+        saved = (self._code, self._blocks, self._top, self._layouts)
+        self._code = code
+        self._blocks = []
+        self._top = 0
+        self._layouts = layouts
+        try:
+            for name, default in (defaults or {}).items():
+                skip = _Label()
+                slot = layouts[-1][name]
+                self._emit(JUMP_IF_ARG, slot, 0)
+                self._patch_later(skip, operand=2)
+                register = self._alloc()
+                self._expr(default, register)
+                self._emit(STORE_LOCAL, slot, register)
+                self._free(register)
+                self._bind(skip)
+            if code.this_params:
+                self._emit(SET_THIS_PARAMS, self._const(code.this_params))
+            self._finish_body(statements)
+        finally:
+            self._code, self._blocks, self._top, self._layouts = saved
+
+    def _finish_body(self, statements) -> None:
+        result = self._alloc()
+        self._block(statements, result)
+        self._emit(RETURN, result)
+
+    def _emit(self, op: int, a: int = 0, b: int = 0, c: int = 0, location=None) -> int:
+        offset = len(self._code.instructions)
+        self._code.instructions.extend((op, a, b, c))
+        if location is not None:
+            self._code.locations[offset] = location
+        return offset
+
+    def _here(self) -> int:
+        return len(self._code.instructions)
+
+    def _patch_later(self, label: _Label, operand: int) -> None:
+        """Point ``operand`` of the last instruction at ``label``."""
+        position = self._here() - 4 + operand
+        if label.offset is not None:
+            self._code.instructions[position] = label.offset
+        else:
+            label.patches.append(position)
+
+    def _jump(self, op: int, label: _Label, a: int = 0) -> None:
+        if op == JUMP:
+            self._emit(op)
+            self._patch_later(label, operand=1)
+        else:
+            self._emit(op, a)
+            self._patch_later(label, operand=2)
+
+    def _bind(self, label: _Label) -> None:
+        label.offset = self._here()
+        for position in label.patches:
+            self._code.instructions[position] = label.offset
+        label.patches.clear()
+
+    def _const(self, value) -> int:
+        key = (type(value), value) if _hashable(value) else ("id", id(value))
+        if type(value) is float:
+            # Keep 0.0 and -0.0 apart; they compare equal.
+            key = (float, repr(value))
+        index = self._code._constant_index.get(key)
+        if index is None:
+            index = len(self._code.constants)
+            self._code.constants.append(value)
+            self._code._constant_index[key] = index
+        return index
+
+    def _attribute_cache(self, name: str) -> int:
+        self._code.attribute_caches.append(AttributeCache(name))
+        return len(self._code.attribute_caches) - 1
+
+    def _name(self, name: str) -> int:
+        index = self._code._name_index.get(name)
+        if index is None:
+            index = len(self._code.names)
+            self._code.names.append(name)
+            self._code._name_index[name] = index
+        return index
+
+    def _load_variable(self, name: str, coordinate, dst: int, location=None) -> None:
+        if coordinate is None:
+            self._emit(LOAD_GLOBAL, dst, self._name(name), location=location)
+        elif coordinate[0] == 0:
+            self._emit(LOAD_LOCAL, dst, coordinate[1], location=location)
+        else:
+            self._emit(LOAD_DEREF, dst, coordinate[0], coordinate[1], location=location)
+
+    def _store_variable(self, name: str, src: int, coordinate=_UNRESOLVED) -> None:
+        if coordinate is _UNRESOLVED:
+            coordinate = lookup(self._layouts, name)
+        if coordinate is None:
+            self._emit(STORE_GLOBAL, self._name(name), src)
+        elif coordinate[0] == 0:
+            self._emit(STORE_LOCAL, coordinate[1], src)
+        else:
+            self._emit(STORE_DEREF, coordinate[0], coordinate[1], src)
+
+    def _alloc(self, count: int = 1) -> int:
+        register = self._top
+        self._top += count
+        if self._top > self._code.register_count:
+            self._code.register_count = self._top
+        return register
+
+    def _free(self, register: int) -> None:
+        """Release ``register`` and every register allocated after it."""
+        self._top = register
+
+    # ============ Statements ============
+
+    def _block(self, statements, dst: int) -> None:
+        if not statements:
+            self._emit(LOAD_NONE, dst)
+            return
+        for statement in statements[:-1]:
+            self._stmt(statement, None)
+        self._stmt(statements[-1], dst)
+
+    def _discard_target(self, dst: int | None) -> tuple[int, bool]:
+        if dst is not None:
+            return dst, False
+        return self._alloc(), True
+
+    def _stmt(self, node, dst: int | None) -> None:
+        if isinstance(node, ExprStmt):
+            target, temporary = self._discard_target(dst)
+            self._expr(node.expression, target)
+            if temporary:
+                self._free(target)
+            return
+
+        if isinstance(node, AssignStmt):
+            target, temporary = self._discard_target(dst)
+            self._expr(node.value, target)
+            self._assign(node.target, target)
+            if temporary:
+                self._free(target)
+            return
+
+        if isinstance(node, MultiAssignStmt):
+            target, temporary = self._discard_target(dst)
+            self._expr(node.value, target)
+            for assignment_target in node.targets:
+                self._assign(assignment_target, target)
+            if temporary:
+                self._free(target)
+            return
+
+        if isinstance(node, (AugAssignStmt, UpdateStmt)):
+            self._compound_assign(node, dst)
+            return
+
+        if isinstance(node, ExistentialAssignStmt):
+            self._conditional_assign(node, dst, "existential")
+            return
+
+        if isinstance(node, LogicalAssignStmt):
+            if node.operator not in (OROR, ANDAND):
+                raise CoffeeCompileError(f"Unknown logical assignment operator: {node.operator}")
+            self._conditional_assign(node, dst, "or" if node.operator == OROR else "and")
+            return
+
+        if isinstance(node, WhileStmt):
+            self._while(node, dst)
+            return
+
+        if isinstance(node, (ForInStmt, ForOfStmt)):
+            self._for(node, dst)
+            return
+
+        if isinstance(node, BreakStmt):
+            self._loop_exit("break")
+            return
+
+        if isinstance(node, ContinueStmt):
+            self._loop_exit("continue")
+            return
+
+        if isinstance(node, ReturnStmt):
+            value = self._alloc()
+            if node.value is None:
+                self._emit(LOAD_NONE, value)
+            else:
+                self._expr(node.value, value)
+            if not self._layouts:
+                self._emit(ERROR, self._const("'return' used outside function."))
+            else:
+                self._run_finally_blocks(stop_at_loop=False)
+                self._emit(RETURN, value)
+            self._free(value)
+            return
+
+        if isinstance(node, ThrowStmt):
+            value = self._alloc()
+            self._expr(node.value, value)
+            self._emit(THROW, value)
+            self._free(value)
+            return
+
+        if isinstance(node, TryStmt):
+            self._try(node, dst)
+            return
+
+        if isinstance(node, ClassDecl):
+            self._class(node, dst)
+            return
+
+        if isinstance(node, ImportStmt):
+            value = self._alloc()
+            for item in node.items:
+                if item.alias is not None:
+                    self._emit(IMPORT, value, self._const(item.module), 0)
+                    self._store_variable(item.alias, value)
+                elif "." in item.module:
+                    self._emit(IMPORT, value, self._const(item.module), 1)
+                    self._store_variable(item.module.split(".", 1)[0], value)
+                else:
+                    self._emit(IMPORT, value, self._const(item.module), 0)
+                    self._store_variable(item.module, value)
+            self._free(value)
+            if dst is not None:
+                self._emit(LOAD_NONE, dst)
+            return
+
+        if isinstance(node, FromImportStmt):
+            value = self._alloc()
+            module = self._const(node.module)
+            for imported in node.names:
+                if imported.name == "*":
+                    alias = imported.alias if imported.alias is not None else node.module.split(".")[-1]
+                    self._emit(IMPORT, value, module, 0)
+                    self._store_variable(alias, value)
+                    continue
+                bind_name = imported.alias if imported.alias is not None else imported.name
+                self._emit(FROM_IMPORT, value, module, self._const(imported.name))
+                self._store_variable(bind_name, value)
+            self._free(value)
+            if dst is not None:
+                self._emit(LOAD_NONE, dst)
+            return
+
+        raise CoffeeCompileError(f"Unsupported statement '{type(node).__name__}'.")
+
+    def _loop_exit(self, keyword: str) -> None:
+        for block in reversed(self._blocks):
+            if block.kind == "loop":
+                break
+        else:
+            if self._layouts:
+                self._emit(SIGNAL, 0 if keyword == "break" else 1)
+            else:
+                self._emit(ERROR, self._const(f"'{keyword}' used outside loop."))
+            return
+        loop = self._run_finally_blocks(stop_at_loop=True)
+        self._jump(JUMP, loop.break_label if keyword == "break" else loop.continue_label)
+
+    def _run_finally_blocks(self, stop_at_loop: bool):
+        """Inline enclosing ``finally`` bodies before leaving them early."""
+        saved_blocks = self._blocks
+        for index in range(len(saved_blocks) - 1, -1, -1):
+            block = saved_blocks[index]
+            if block.kind == "loop":
+                if stop_at_loop:
+                    return block
+                continue
+            self._blocks = saved_blocks[:index]
+            try:
+                self._stmt(ExprStmt(block.finally_node), None)
+            finally:
+                self._blocks = saved_blocks
+        return None
+
+    def _while(self, node: WhileStmt, dst: int | None) -> None:
+        target, temporary = self._discard_target(dst)
+        self._emit(LOAD_NONE, target)
+        top, end = _Label(), _Label()
+        self._bind(top)
+        condition = self._alloc()
+        self._expr(node.condition, condition)
+        self._jump(JUMP_IF_FALSE, end, condition)
+        self._free(condition)
+        self._loop_body(node.body, target, end, top)
+        self._jump(JUMP, top)
+        self._bind(end)
+        if temporary:
+            self._free(target)
+
+    def _for(self, node, dst: int | None) -> None:
+        target, temporary = self._discard_target(dst)
+        self._emit(LOAD_NONE, target)
+        iterator = self._alloc()
+        if isinstance(node, ForOfStmt):
+            self._expr(node.iterable, iterator)
+            self._emit(OF_ITEMS, iterator, iterator)
+            self._emit(GET_ITER, iterator, iterator)
+        else:
+            self._iterator(node.iterable, iterator)
+        item = self._alloc(2)
+        top, end = _Label(), _Label()
+        self._bind(top)
+        self._emit(FOR_ITER, iterator, item, 0)
+        self._patch_later(end, operand=3)
+        if isinstance(node, ForInStmt):
+            self._store_variable(node.var_name, item, node.var_coordinate)
+        else:
+            self._emit(UNPACK_PAIR, item, item)
+            self._store_variable(node.key_var, item)
+            if node.value_var:
+                self._store_variable(node.value_var, item + 1)
+        self._loop_body(node.body, target, end, top)
+        self._jump(JUMP, top)
+        self._bind(end)
+        self._free(iterator)
+        if temporary:
+            self._free(target)
+
+    def _loop_body(self, body, target: int, end: _Label, top: _Label) -> None:
+        self._blocks.append(_Block("loop", end, top))
+        try:
+            self._expr(body, target)
+        finally:
+            self._blocks.pop()
+
+    def _try(self, node: TryStmt, dst: int | None) -> None:
+        target, temporary = self._discard_target(dst)
+        self._emit(LOAD_NONE, target)
+        end = _Label()
+        has_finally = node.finally_block is not None
+        if has_finally:
+            self._blocks.append(_Block("finally", finally_node=node.finally_block))
+
+        try_start = self._here()
+        self._expr(node.try_block, target)
+        try_end = self._here()
+        if has_finally:
+            self._inline_finally(node)
+        self._jump(JUMP, end)
+
+        if node.catch_block is not None:
+            caught = self._alloc()
+            handler = self._here()
+            if node.catch_var:
+                self._store_variable(node.catch_var, caught)
+            self._expr(node.catch_block, target)
+            if has_finally:
+                self._inline_finally(node)
+            self._jump(JUMP, end)
+            self._free(caught)
+            self._code.exception_table.append((try_start, try_end, handler, CATCH, caught))
+
+        if has_finally:
+            protected_end = self._here()
+            self._blocks.pop()
+            pending = self._alloc()
+            handler = self._here()
+            self._stmt(ExprStmt(node.finally_block), None)
+            self._emit(RERAISE, pending)
+            self._free(pending)
+            self._code.exception_table.append((try_start, protected_end, handler, FINALLY, pending))
+
+        self._bind(end)
+        if temporary:
+            self._free(target)
+
+    def _inline_finally(self, node: TryStmt) -> None:
+        block = self._blocks.pop()
+        try:
+            self._stmt(ExprStmt(node.finally_block), None)
+        finally:
+            self._blocks.append(block)
+
+    def _class(self, node: ClassDecl, dst: int | None) -> None:
+        target, temporary = self._discard_target(dst)
+        base = self._alloc(2)
+        if node.parent:
+            self._expr(node.parent, base)
+        else:
+            self._emit(LOAD_NONE, base)
+        members = self._alloc(len(node.body))
+        keys = []
+        for index, (method_name, member) in enumerate(node.body):
+            keys.append(method_name)
+            self._expr(member, members + index)
+        self._emit(BUILD_DICT, base + 1, members, self._const(tuple(keys)))
+        self._emit(MAKE_CLASS, target, base, self._const(node.name))
+        self._store_variable(node.name, target)
+        self._free(base)
+        if temporary:
+            self._free(target)
+
+    # ============ Assignment ============
+
+    def _assign(self, target, value: int) -> None:
+        if isinstance(target, Identifier):
+            self._store_variable(target.name, value, target.coordinate)
+            return
+
+        if isinstance(target, GetAttr):
+            container = self._alloc()
+            self._expr(target.target, container)
+            self._emit(STORE_ATTR, container, self._name(target.name), value)
+            self._free(container)
+            return
+
+        if isinstance(target, ProtoAccessExpr):
+            container = self._alloc()
+            self._expr(target.target, container)
+            self._emit(STORE_PROTO, container, self._name(target.name), value)
+            self._free(container)
+            return
+
+        if isinstance(target, IndexExpr):
+            container = self._alloc(2)
+            self._expr(target.target, container)
+            self._expr(target.index, container + 1)
+            self._emit(STORE_INDEX, container, container + 1, value)
+            self._free(container)
+            return
+
+        if isinstance(target, ArrayDestructuring):
+            count = len(target.elements)
+            values = self._alloc(count)
+            self._emit(UNPACK_ARRAY, values, value, self._const((count, target.splat_index)))
+            for index, element in enumerate(target.elements):
+                self._assign(element, values + index)
+            self._free(values)
+            return
+
+        if isinstance(target, ObjectDestructuring):
+            self._emit(CHECK_OBJECT, value)
+            item = self._alloc()
+            for key, alias, default in target.properties:
+                found = _Label()
+                self._emit(OBJECT_GET, item, value, self._const(key))
+                self._jump(JUMP_IF_FOUND, found, item)
+                if default is not None:
+                    self._expr(default, item)
+                else:
+                    self._emit(MISSING_KEY, self._const(key))
+                self._bind(found)
+                if alias is not None:
+                    self._assign(alias, item)
+                else:
+                    self._store_variable(key, item)
+            self._free(item)
+            return
+
+        raise CoffeeCompileError("Invalid assignment target.")
+
+    def _read_target(self, target, dst: int) -> None:
+        """Load the current value of an assignment target into ``dst``."""
+        if isinstance(target, Identifier):
+            variable = (*(target.coordinate or (-1, 0)), target.name)
+            self._emit(LOAD_CHECKED, dst, self._const(variable), location=target.location)
+            return
+        if isinstance(target, GetAttr):
+            self._expr(target, dst)
+            return
+        if isinstance(target, IndexExpr):
+            container = self._alloc(2)
+            self._expr(target.target, container)
+            self._expr(target.index, container + 1)
+            self._emit(READ_INDEX, dst, container, container + 1)
+            self._free(container)
+            return
+        raise CoffeeCompileError("Invalid assignment target.")
+
+    def _compound_assign(self, node, dst: int | None) -> None:
+        operator_name = node.operator
+        if operator_name not in AUGMENTED_OPERATORS:
+            raise CoffeeCompileError("Unsupported augmented assignment operator.")
+        target, temporary = self._discard_target(dst)
+        current = self._alloc(2)
+        self._read_target(node.target, current)
+        if isinstance(node, UpdateStmt):
+            self._emit(LOAD_CONST, current + 1, self._const(1))
+            if not node.prefix:
+                self._emit(MOVE, target, current)
+        else:
+            self._expr(node.value, current + 1)
+        self._emit(INPLACE, current, current + 1, self._const(operator_name))
+        self._assign(node.target, current)
+        if not isinstance(node, UpdateStmt) or node.prefix:
+            self._emit(MOVE, target, current)
+        self._free(current)
+        if temporary:
+            self._free(target)
+
+    def _conditional_assign(self, node, dst: int | None, kind: str) -> None:
+        target, temporary = self._discard_target(dst)
+        done = _Label()
+        if kind == "existential":
+            start = self._here()
+            self._read_target(node.target, target)
+            end = self._here()
+            after_read = _Label()
+            self._jump(JUMP, after_read)
+            caught = self._alloc()
+            handler = self._here()
+            self._emit(LOAD_NONE, target)
+            self._free(caught)
+            self._code.exception_table.append((start, end, handler, RUNTIME_ERROR, caught))
+            self._bind(after_read)
+            self._jump(JUMP_IF_NOT_NONE, done, target)
+        else:
+            self._read_target(node.target, target)
+            self._jump(JUMP_IF_TRUE if kind == "or" else JUMP_IF_FALSE, done, target)
+        self._expr(node.value, target)
+        self._assign(node.target, target)
+        self._bind(done)
+        if temporary:
+            self._free(target)
+
+    # ============ Expressions ============
+
+    def _expr(self, node, dst: int) -> None:
+        if isinstance(node, Literal):
+            if node.value is None:
+                self._emit(LOAD_NONE, dst)
+            else:
+                self._emit(LOAD_CONST, dst, self._const(node.value))
+            return
+
+        if isinstance(node, RegexLiteral):
+            self._emit(REGEX, dst, self._const((node.pattern, node.flags)))
+            return
+
+        if isinstance(node, Identifier):
+            self._load_variable(node.name, node.coordinate, dst, node.location)
+            return
+
+        if isinstance(node, BlockExpr):
+            self._block(node.statements, dst)
+            return
+
+        if isinstance(node, Statement):
+            self._stmt(node, dst)
+            return
+
+        if isinstance(node, Binary):
+            self._binary(node, dst)
+            return
+
+        if isinstance(node, Unary):
+            if node.operator not in (MINUS, PLUS, NOT):
+                raise CoffeeCompileError("Unsupported unary operator.")
+            self._expr(node.right, dst)
+            self._emit(_UNARY[node.operator], dst, dst)
+            return
+
+        if isinstance(node, ChainedComparison):
+            done = _Label()
+            left = self._alloc(2)
+            self._expr(node.operands[0], left)
+            for index, operator_name in enumerate(node.operators):
+                self._expr(node.operands[index + 1], left + 1)
+                self._emit(_COMPARISON[operator_name], dst, left, left + 1)
+                if index < len(node.operators) - 1:
+                    self._jump(JUMP_IF_FALSE, done, dst)
+                    self._emit(MOVE, left, left + 1)
+            self._bind(done)
+            self._free(left)
+            return
+
+        if isinstance(node, IfExpr):
+            otherwise, done = _Label(), _Label()
+            self._expr(node.condition, dst)
+            self._jump(JUMP_IF_FALSE, otherwise, dst)
+            self._expr(node.then_branch, dst)
+            self._jump(JUMP, done)
+            self._bind(otherwise)
+            self._expr(node.else_branch, dst)
+            self._bind(done)
+            return
+
+        if isinstance(node, FunctionLiteral):
+            code = self.compile_function(node)
+            self._emit(MAKE_FUNCTION, dst, self._const(code))
+            return
+
+        if isinstance(node, Call):
+            self._call(node, dst)
+            return
+
+        if isinstance(node, NewExpr):
+            base = self._alloc(1 + len(node.args) + len(node.kwargs))
+            self._expr(node.class_expr, base)
+            for index, arg in enumerate(node.args):
+                self._expr(arg, base + 1 + index)
+            for index, (_name, value) in enumerate(node.kwargs):
+                self._expr(value, base + 1 + len(node.args) + index)
+            spec = (len(node.args), (), tuple(name for name, _value in node.kwargs))
+            self._emit(NEW, dst, base, self._const(spec))
+            self._free(base)
+            return
+
+        if isinstance(node, GetAttr):
+            self._operand(node.target, dst)
+            self._emit(LOAD_ATTR, dst, dst, self._attribute_cache(node.name), location=node.location)
+            return
+
+        if isinstance(node, SafeAccessExpr):
+            self._operand(node.target, dst)
+            self._emit(SAFE_ATTR, dst, dst, self._name(node.name))
+            return
+
+        if isinstance(node, ProtoAccessExpr):
+            if node.target is None:
+                self._emit(ERROR, self._const("Prototype access '::' requires a target (e.g., Array::map)."))
+                return
+            self._expr(node.target, dst)
+            self._emit(PROTO_ATTR, dst, dst, self._name(node.name))
+            return
+
+        if isinstance(node, IndexExpr):
+            index = self._alloc()
+            self._operand(node.target, dst)
+            self._expr(node.index, index)
+            self._emit(LOAD_INDEX, dst, dst, index)
+            self._free(index)
+            return
+
+        if isinstance(node, SliceExpr):
+            base = self._alloc(3)
+            self._operand(node.target, base)
+            for offset, part in ((1, node.start), (2, node.end)):
+                if part is not None:
+                    self._expr(part, base + offset)
+                else:
+                    self._emit(LOAD_NONE, base + offset)
+            self._emit(BUILD_SLICE, dst, base, int(node.exclusive))
+            self._free(base)
+            return
+
+        if isinstance(node, ArrayLiteral):
+            items = self._alloc(len(node.items))
+            for index, item in enumerate(node.items):
+                self._expr(item, items + index)
+            self._emit(BUILD_LIST, dst, items, len(node.items))
+            self._free(items)
+            return
+
+        if isinstance(node, ObjectLiteral):
+            values = self._alloc(len(node.items))
+            for index, (_key, value) in enumerate(node.items):
+                self._expr(value, values + index)
+            self._emit(BUILD_DICT, dst, values, self._const(tuple(key for key, _value in node.items)))
+            self._free(values)
+            return
+
+        if isinstance(node, RangeLiteral):
+            self._range(node, dst, BUILD_RANGE)
+            return
+
+        if isinstance(node, InterpolatedString):
+            parts = self._alloc(len(node.parts))
+            for index, part in enumerate(node.parts):
+                self._expr(part, parts + index)
+            self._emit(BUILD_STRING, dst, parts, len(node.parts))
+            self._free(parts)
+            return
+
+        if isinstance(node, (InExpr, OfExpr)):
+            operands = self._alloc(2)
+            self._expr(node.value if isinstance(node, InExpr) else node.key, operands)
+            if isinstance(node, InExpr):
+                self._operand(node.container, operands + 1)
+            else:
+                self._expr(node.container, operands + 1)
+            self._emit(CONTAINS, dst, operands, operands + 1)
+            self._free(operands)
+            return
+
+        if isinstance(node, ExistentialExpr):
+            done = _Label()
+            self._expr(node.left, dst)
+            self._jump(JUMP_IF_NOT_NONE, done, dst)
+            self._expr(node.right, dst)
+            self._bind(done)
+            return
+
+        if isinstance(node, SwitchExpr):
+            self._switch(node, dst)
+            return
+
+        if isinstance(node, ComprehensionExpr):
+            self._comprehension(node, dst)
+            return
+
+        if isinstance(node, ObjectComprehensionExpr):
+            self._object_comprehension(node, dst)
+            return
+
+        if isinstance(node, (SplatExpr, SpreadExpr)):
+            self._expr(node.value, dst)
+            return
+
+        if isinstance(node, ThisExpr):
+            self._emit(LOAD_THIS, dst)
+            return
+
+        if isinstance(node, SuperExpr):
+            self._emit(LOAD_SUPER, dst)
+            return
+
+        if isinstance(node, DoExpr):
+            self._expr(node.body, dst)
+            self._emit(DO, dst, dst)
+            return
+
+        if isinstance(node, YieldExpr):
+            if self._code.name == LAZY_COMPREHENSION:
+                raise CoffeeCompileError("'yield' inside a lazy comprehension is not supported by the bytecode compiler.")
+            if not (self._layouts and self._code.is_generator):
+                self._emit(ERROR, self._const("'yield' used outside generator function."))
+                return
+            if node.value is not None:
+                self._expr(node.value, dst)
+            else:
+                self._emit(LOAD_NONE, dst)
+            self._emit(YIELD, dst, dst)
+            return
+
+        raise CoffeeCompileError(f"Unsupported expression '{type(node).__name__}'.")
+
+    def _binary(self, node: Binary, dst: int) -> None:
+        if node.operator in (AND, OR):
+            done = _Label()
+            self._expr(node.left, dst)
+            self._jump(JUMP_IF_FALSE if node.operator == AND else JUMP_IF_TRUE, done, dst)
+            self._expr(node.right, dst)
+            self._bind(done)
+            return
+
+        op = _ARITHMETIC.get(node.operator, _COMPARISON.get(node.operator))
+        if op is None:
+            raise CoffeeCompileError("Unsupported binary operator.")
+        right = self._alloc()
+        self._expr(node.left, dst)
+        self._expr(node.right, right)
+        self._emit(op, dst, dst, right)
+        self._free(right)
+
+    def _call(self, node: Call, dst: int) -> None:
+        argc = len(node.args)
+        if isinstance(node.callee, GetAttr) and not node.kwargs and not any(isinstance(arg, SpreadExpr) for arg in node.args):
+            self._method_call(node, dst)
+            return
+        base = self._alloc(1 + argc + len(node.kwargs))
+        self._expr(node.callee, base)
+        spreads = []
+        for index, arg in enumerate(node.args):
+            if isinstance(arg, SpreadExpr):
+                spreads.append(index)
+                arg = arg.value
+            self._expr(arg, base + 1 + index)
+        for index, (_name, value) in enumerate(node.kwargs):
+            self._expr(value, base + 1 + argc + index)
+        if spreads or node.kwargs:
+            spec = (argc, tuple(spreads), tuple(name for name, _value in node.kwargs))
+            self._emit(CALL_EX, dst, base, self._const(spec), location=node.location)
+        else:
+            self._emit(CALL, dst, base, argc, location=node.location)
+        self._free(base)
+
+    def _method_call(self, node: Call, dst: int) -> None:
+        # ``obj.name(args)`` keeps the receiver next to the method, so a
+        # class method runs without a ``BoundMethod`` being allocated.
+        callee = node.callee
+        base = self._alloc(2 + len(node.args))
+        self._operand(callee.target, base)
+        self._emit(LOAD_METHOD, base, base, self._attribute_cache(callee.name), location=callee.location)
+        for index, arg in enumerate(node.args):
+            self._expr(arg, base + 2 + index)
+        self._emit(CALL_METHOD, dst, base, len(node.args), location=node.location)
+        self._free(base)
+
+    def _switch(self, node: SwitchExpr, dst: int) -> None:
+        done = _Label()
+        subject = self._alloc(2)
+        if node.value is not None:
+            self._expr(node.value, subject)
+        for conditions, body in node.cases:
+            matched, next_case = _Label(), _Label()
+            for condition in conditions:
+                self._expr(condition, subject + 1)
+                if node.value is not None:
+                    self._emit(EQUAL, subject + 1, subject, subject + 1)
+                self._jump(JUMP_IF_TRUE, matched, subject + 1)
+            self._jump(JUMP, next_case)
+            self._bind(matched)
+            self._expr(body, dst)
+            self._jump(JUMP, done)
+            self._bind(next_case)
+        if node.default is not None:
+            self._expr(node.default, dst)
+        else:
+            self._emit(LOAD_NONE, dst)
+        self._bind(done)
+        self._free(subject)
+
+    def _range(self, node: RangeLiteral, dst: int, op: int) -> None:
+        base = self._alloc(3)
+        self._expr(node.start, base)
+        self._expr(node.end, base + 1)
+        if node.step is not None:
+            self._expr(node.step, base + 2)
+        else:
+            self._emit(LOAD_NONE, base + 2)
+        self._emit(op, dst, base, int(node.exclusive))
+        self._free(base)
+
+    def _iterator(self, node, dst: int) -> None:
+        """Put an iterator over ``node`` in ``dst``; a range literal counts
+        through its numbers without building the range value."""
+        if isinstance(node, RangeLiteral):
+            self._range(node, dst, RANGE_ITER)
+            return
+        self._expr(node, dst)
+        self._emit(GET_ITER, dst, dst)
+
+    def _operand(self, node, dst: int) -> None:
+        """Compile an operand that is read in place (see ``CoffeeRange``); a
+        range literal there stays lazy."""
+        if isinstance(node, RangeLiteral):
+            self._range(node, dst, LAZY_RANGE)
+            return
+        self._expr(node, dst)
+
+    def _comprehension(self, node: ComprehensionExpr, dst: int) -> None:
+        if node.lazy:
+            self._lazy_comprehension(node, dst)
+            return
+        source, stages = comprehension_stages(node)
+        result = self._alloc(3)
+        self._emit(BUILD_LIST, result, 0, 0)
+        self._iterator(source, result + 1)
+        top, end = _Label(), _Label()
+        self._bind(top)
+        self._emit(FOR_ITER, result + 1, result + 2, 0)
+        self._patch_later(end, operand=3)
+        for stage in stages:
+            self._store_variable(stage.var_name, result + 2)
+            if stage.filter_condition is not None:
+                self._expr(stage.filter_condition, result + 2)
+                self._jump(JUMP_IF_FALSE, top, result + 2)
+            self._expr(stage.body, result + 2)
+        self._emit(LIST_APPEND, result, result + 2)
+        self._jump(JUMP, top)
+        self._bind(end)
+        self._emit(MOVE, dst, result)
+        self._free(result)
+
+    def _lazy_comprehension(self, node: ComprehensionExpr, dst: int) -> None:
+        """Compile a lazy comprehension into a generator code object.
+
+        The generator runs on the frame that creates it, so its loop
+        variables are the enclosing scope's slots, as in the tree walker;
+        register 0 holds the iterator over the source.
+        """
+        source, stages = comprehension_stages(node)
+        code = CodeObject(LAZY_COMPREHENSION)
+        code.is_generator = True
+        saved = (self._code, self._blocks, self._top)
+        self._code, self._blocks, self._top = code, [], 0
+        try:
+            item = self._alloc(2) + 1
+            top, end = _Label(), _Label()
+            self._bind(top)
+            self._emit(FOR_ITER, 0, item, 0)
+            self._patch_later(end, operand=3)
+            for stage in stages:
+                self._store_variable(stage.var_name, item)
+                if stage.filter_condition is not None:
+                    self._expr(stage.filter_condition, item)
+                    self._jump(JUMP_IF_FALSE, top, item)
+                self._expr(stage.body, item)
+            self._emit(YIELD, item, item)
+            self._jump(JUMP, top)
+            self._bind(end)
+            self._emit(LOAD_NONE, item)
+            self._emit(RETURN, item)
+        finally:
+            self._code, self._blocks, self._top = saved
+        self._iterator(source, dst)
+        self._emit(MAKE_GENERATOR, dst, self._const(code), dst)
+
+    def _object_comprehension(self, node: ObjectComprehensionExpr, dst: int) -> None:
+        result = self._alloc(4)
+        self._emit(BUILD_DICT, result, 0, self._const(()))
+        self._expr(node.iterable, result + 1)
+        self._emit(INDEXED_ITEMS, result + 1, result + 1)
+        self._emit(GET_ITER, result + 1, result + 1)
+        top, end = _Label(), _Label()
+        self._bind(top)
+        self._emit(FOR_ITER, result + 1, result + 2, 0)
+        self._patch_later(end, operand=3)
+        self._emit(UNPACK_PAIR, result + 2, result + 2)
+        self._store_variable(node.key_var, result + 2)
+        if node.value_var:
+            self._store_variable(node.value_var, result + 3)
+        if node.filter_condition is not None:
+            self._expr(node.filter_condition, result + 2)
+            self._jump(JUMP_IF_FALSE, top, result + 2)
+        self._expr(node.key_expr, result + 2)
+        self._expr(node.value_expr, result + 3)
+        self._emit(DICT_SET, result, result + 2, result + 3)
+        self._jump(JUMP, top)
+        self._bind(end)
+        self._emit(MOVE, dst, result)
+        self._free(result)
+
+
+def _hashable(value) -> bool:
+    try:
+        hash(value)
+    except TypeError:
+        return False
+    return not isinstance(value, CodeObject)
+
+
+def disassemble(code: CodeObject) -> str:
+    """Return a human readable listing of ``code`` and its nested functions."""
+    lines = [f"{code.name}: {code.register_count} registers"]
+    instructions = code.instructions
+    for offset in range(0, len(instructions), 4):
+        op, a, b, c = instructions[offset:offset + 4]
+        lines.append(f"  {offset:>5} {OPCODES[op]:<17} {a:>4} {b:>4} {c:>4}")
+    for entry in code.exception_table:
+        lines.append(f"  handler {entry[2]} for {entry[0]}..{entry[1]} kind={entry[3]} reg={entry[4]}")
+    for constant in code.constants:
+        if isinstance(constant, CodeObject):
+            lines.append(disassemble(constant))
+    return "\n".join(lines)
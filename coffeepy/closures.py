@@ -0,0 +1,2009 @@
+"""
+CoffeePy - Closure Compilation Engine
+=====================================
+
+The tree walker re-dispatches on the node type every time a node is
+evaluated: ``Interpreter._evaluate`` walks an ``isinstance`` ladder of about
+forty entries before it reaches the handler. This engine does that work once.
+``ClosureCompiler`` turns every node into a specialised Python closure that
+takes the current ``Environment`` and returns the node's value, so running a
+program is just a chain of closure calls.
+
+A ``Binary`` ``+`` node, for example, becomes::
+
+    def run(env):
+        return add(left(env), right(env))
+
+Environments, classes, instances and control-flow signals are shared with
+the tree walker, so both engines agree on scoping and on the values they
+produce. Generator bodies are compiled into Python generator functions that
+``yield from`` their children.
+
+Statements in *flow position* -- a function body, a loop body, and the
+blocks, ``if`` branches and ``try`` blocks nested in them -- are compiled so
+that ``break``, ``continue`` and ``return`` make their closure return a
+``_Completion`` record instead of raising a signal. Blocks pass a record
+on, loops consume ``break`` and ``continue``, and a function call unwraps a
+``return``. Only statements that can complete that way check for a
+record. Anywhere else, such as a ``return`` inside an operand, the signal
+exceptions are still raised, and loops and calls still catch them.
+
+A call in tail position -- the value of a function body, of a ``switch``
+branch there, or of a ``return`` outside ``try`` -- that turns out to call
+the function it is in completes with a record holding the callee and its
+arguments. This covers a method calling itself on an instance, as in
+``@walk(n - 1)``. ``CompiledFunction`` then runs the call by rebinding the
+parameters in a loop, so self-recursive functions do not grow the Python
+stack. ``stats()`` counts these calls.
+"""
+
+from __future__ import annotations
+
+import builtins as py_builtins
+import operator
+
+from . import runtime
+from .ast_nodes import (
+    ArrayDestructuring,
+    ArrayLiteral,
+    AssignStmt,
+    AugAssignStmt,
+    Binary,
+    BlockExpr,
+    BreakStmt,
+    Call,
+    ChainedComparison,
+    ClassDecl,
+    ComprehensionExpr,
+    ContinueStmt,
+    DoExpr,
+    ExistentialAssignStmt,
+    ExistentialExpr,
+    ExprStmt,
+    ForInStmt,
+    ForOfStmt,
+    FromImportStmt,
+    FunctionLiteral,
+    GetAttr,
+    Identifier,
+    IfExpr,
+    ImportStmt,
+    InExpr,
+    IndexExpr,
+    InterpolatedString,
+    Literal,
+    LogicalAssignStmt,
+    MultiAssignStmt,
+    NewExpr,
+    ObjectComprehensionExpr,
+    ObjectDestructuring,
+    ObjectLiteral,
+    OfExpr,
+    Program,
+    ProtoAccessExpr,
+    RangeLiteral,
+    RegexLiteral,
+    ReturnStmt,
+    SafeAccessExpr,
+    SliceExpr,
+    SplatExpr,
+    SpreadExpr,
+    Statement,
+    SuperExpr,
+    SwitchExpr,
+    ThisExpr,
+    ThrowStmt,
+    TryStmt,
+    Unary,
+    UpdateStmt,
+    WhileStmt,
+    YieldExpr,
+    iter_child_nodes,
+)
+from .analysis import function_info
+from .environment import Environment
+from .errors import CoffeeAttributeError, CoffeeCompileError, CoffeeRuntimeError
+from .flat_ast import FlatAST, as_program
+from .inline_cache import AttributeCache
+from .interpreter import (
+    CoffeeClass,
+    CoffeeFunction,
+    CoffeeGeneratorFunction,
+    CoffeeInstance,
+    _BreakSignal,
+    _ContinueSignal,
+    _ReturnSignal,
+    _ThrowSignal,
+    call_method,
+    comprehension_stages,
+    contains_yield,
+    range_numbers,
+)
+from .resolver import resolve
+from .tokens import (
+    AND,
+    ANDAND,
+    EQEQ,
+    GT,
+    GTE,
+    LT,
+    LTE,
+    MINUS,
+    MINUSMINUS,
+    MINUS_EQ,
+    NEQ,
+    NOT,
+    OR,
+    OROR,
+    PERCENT,
+    PERCENT_EQ,
+    PLUS,
+    PLUSPLUS,
+    PLUS_EQ,
+    SLASH,
+    SLASH_EQ,
+    STAR,
+    STARSTAR,
+    STAR_EQ,
+)
+from .vectorize import vector_plan
+
+_ARITHMETIC_OPS = {
+    PLUS: operator.add,
+    MINUS: operator.sub,
+    STAR: operator.mul,
+    SLASH: operator.truediv,
+    PERCENT: operator.mod,
+    STARSTAR: operator.pow,
+}
+
+_COMPARISON_OPS = {
+    EQEQ: operator.eq,
+    NEQ: operator.ne,
+    LT: operator.lt,
+    LTE: operator.le,
+    GT: operator.gt,
+    GTE: operator.ge,
+}
+
+_AUGMENTED_OPS = {
+    PLUS_EQ: operator.add,
+    MINUS_EQ: operator.sub,
+    STAR_EQ: operator.mul,
+    SLASH_EQ: operator.truediv,
+    PERCENT_EQ: operator.mod,
+}
+
+
+def has_direct_yield(node) -> bool:
+    """True if ``node`` yields itself, not counting nested functions."""
+    if isinstance(node, YieldExpr):
+        return True
+    if isinstance(node, FunctionLiteral):
+        return False
+    return any(has_direct_yield(child) for child in iter_child_nodes(node))
+
+
+def _bind_arguments(function, call_env: Environment, args: tuple, kwargs: dict) -> None:
+    """Bind call arguments the way ``CoffeeFunction.__call__`` does."""
+    params = function.params
+    defaults = function.default_code
+    if function.splat_param and params:
+        named = params[:-1]
+    else:
+        named = params
+
+    values = call_env.values
+    for index, name in enumerate(named):
+        if index < len(args):
+            value = args[index]
+        elif name in kwargs:
+            value = kwargs.pop(name)
+        elif name in defaults:
+            value = defaults[name](call_env)
+        else:
+            value = None
+        values[name] = value
+
+    if function.splat_param and params:
+        values[params[-1]] = list(args[len(named):])
+
+    if kwargs:
+        values.update(kwargs)
+
+
+def _assign_this_params(function, call_env: Environment) -> None:
+    """Apply ``@param`` shorthand for a plain (non-method) call."""
+    try:
+        this_value = call_env.get("this")
+    except CoffeeRuntimeError:
+        return
+    if isinstance(this_value, CoffeeInstance):
+        for param_name in function.this_params:
+            this_value.set(param_name, call_env.values[param_name])
+
+
+_stats = {"tail_calls": 0}
+
+
+def stats() -> dict[str, int]:
+    """Return the number of tail calls run without nesting a Python call."""
+    return dict(_stats)
+
+
+def reset_stats() -> None:
+    _stats["tail_calls"] = 0
+
+
+class _Completion:
+    """A ``break``, ``continue`` or ``return`` ending a statement in flow position.
+
+    ``call`` is set for a self-recursive tail call: the function, the
+    instance it is called on as a method (``None`` for a plain call), its
+    arguments and its keyword arguments.
+    """
+
+    __slots__ = ("value", "call")
+
+    def __init__(self, value=None, call=None):
+        self.value = value
+        self.call = call
+
+
+_BREAK = _Completion()
+_CONTINUE = _Completion()
+_NO_COMPLETIONS: frozenset = frozenset()
+
+
+def _completions(node) -> frozenset:
+    """The statement types that can complete ``node`` run in flow position."""
+    if isinstance(node, (ReturnStmt, BreakStmt, ContinueStmt)):
+        return frozenset((type(node),))
+    if isinstance(node, ExprStmt):
+        return _completions(node.expression)
+    if isinstance(node, BlockExpr):
+        return _NO_COMPLETIONS.union(*map(_completions, node.statements))
+    if isinstance(node, IfExpr):
+        return _completions(node.then_branch) | _completions(node.else_branch)
+    if isinstance(node, SwitchExpr):
+        branches = [body for _conditions, body in node.cases]
+        if node.default is not None:
+            branches.append(node.default)
+        return _NO_COMPLETIONS.union(*map(_completions, branches))
+    if isinstance(node, TryStmt):
+        blocks = (node.try_block, node.catch_block)
+        return _NO_COMPLETIONS.union(*(_completions(block) for block in blocks if block is not None))
+    if isinstance(node, (WhileStmt, ForInStmt, ForOfStmt)):
+        return _completions(node.body) & {ReturnStmt}
+    return _NO_COMPLETIONS
+
+
+def _binary_function(operator_name: str):
+    """The function applying a non-short-circuit binary operator to its operands."""
+    compare = _COMPARISON_OPS.get(operator_name)
+    if compare is not None:
+        return compare
+    op = _ARITHMETIC_OPS.get(operator_name)
+
+    def apply(left, right):
+        if op is None:
+            raise CoffeeRuntimeError("Unsupported binary operator.")
+        try:
+            return op(left, right)
+        except Exception as exc:
+            raise CoffeeRuntimeError(f"Binary operation failed: {exc}") from exc
+
+    return apply
+
+
+def _complete_call(completion: _Completion):
+    """Finish a function body that ended with ``completion``."""
+    if completion is _BREAK:
+        raise _BreakSignal()
+    if completion is _CONTINUE:
+        raise _ContinueSignal()
+    if completion.call is not None:
+        function, this, args, kwargs = completion.call
+        if this is not None:
+            return function.call_with_this(this, args, kwargs)
+        return function(*args, **kwargs)
+    return completion.value
+
+
+class CompiledFunction(CoffeeFunction):
+    """A ``CoffeeFunction`` whose body has been compiled to a closure."""
+
+    def __init__(self, node: FunctionLiteral, code, default_code: dict, closure: Environment, interpreter):
+        super().__init__(
+            node.params, node.body, closure, interpreter, node.splat_param,
+            function_info(node).defaults, node.this_params, node.bound,
+        )
+        self.code = code
+        self.default_code = default_code
+
+    def __call__(self, *args, **kwargs):
+        function = self
+        while True:
+            call_env = Environment(parent=function.closure)
+            if function.bound and function.bound_this is not None:
+                call_env.values["this"] = function.bound_this
+            _bind_arguments(function, call_env, args, kwargs)
+            if function.this_params:
+                _assign_this_params(function, call_env)
+            try:
+                result = function.code(call_env)
+            except _ReturnSignal as signal:
+                return signal.value
+            if type(result) is not _Completion:
+                return result
+            if result.call is None or result.call[1] is not None:
+                return _complete_call(result)
+            # A tail call to this function: run it in place of a nested call.
+            _stats["tail_calls"] += 1
+            function, _this, args, kwargs = result.call
+
+    def call_with_this(self, instance, args: tuple, kwargs: dict):
+        function = self
+        kwargs = dict(kwargs)
+        while True:
+            call_env = Environment(parent=function.closure)
+            call_env.values["this"] = instance
+            _bind_arguments(function, call_env, args, kwargs)
+            for param_name in function.this_params:
+                instance.set(param_name, call_env.values[param_name])
+            try:
+                result = function.code(call_env)
+            except _ReturnSignal as signal:
+                return signal.value
+            if type(result) is not _Completion:
+                return result
+            if result.call is None or result.call[1] is None:
+                return _complete_call(result)
+            # A method calling itself: run it in place of a nested call.
+            _stats["tail_calls"] += 1
+            function, instance, args, kwargs = result.call
+
+
+class CompiledGeneratorFunction(CoffeeGeneratorFunction):
+    """A generator function whose body runs as a native Python generator."""
+
+    def __init__(self, node: FunctionLiteral, code, default_code: dict, closure: Environment, interpreter):
+        super().__init__(
+            node.params, node.body, closure, interpreter, node.splat_param,
+            function_info(node).defaults, node.this_params, node.bound,
+        )
+        self.code = code
+        self.default_code = default_code
+
+    def __call__(self, *args, **kwargs):
+        call_env = Environment(parent=self.closure)
+        if self.bound and self.bound_this is not None:
+            call_env.values["this"] = self.bound_this
+        _bind_arguments(self, call_env, args, kwargs)
+        if self.this_params:
+            _assign_this_params(self, call_env)
+        return self._run(call_env)
+
+    def call_with_this(self, instance, args: tuple, kwargs: dict):
+        call_env = Environment(parent=self.closure)
+        call_env.values["this"] = instance
+        _bind_arguments(self, call_env, args, dict(kwargs))
+        for param_name in self.this_params:
+            instance.set(param_name, call_env.values[param_name])
+        return self._run(call_env)
+
+    def _run(self, call_env: Environment):
+        try:
+            yield from self.code(call_env)
+        except _ReturnSignal:
+            return
+
+
+class ClosureCompiler:
+    """Compile CoffeePy AST nodes into closures taking an ``Environment``."""
+
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+        self._in_generator = False
+        # Body of the (non-generator) function being compiled, for tail calls.
+        self._function_body = None
+
+    def compile_program(self, program: Program | FlatAST):
+        program = as_program(program)
+        resolve(program)
+        return self._sequence([self.statement(statement) for statement in program.statements])
+
+    def _error(self, message: str, node=None) -> CoffeeRuntimeError:
+        return self.interpreter._error(message, node)
+
+    @staticmethod
+    def _sequence(steps: list):
+        if not steps:
+            return lambda env: None
+        if len(steps) == 1:
+            return steps[0]
+        head = steps[:-1]
+        last = steps[-1]
+
+        def run(env):
+            for step in head:
+                step(env)
+            return last(env)
+
+        return run
+
+    # ============ Statements ============
+
+    def statement(self, node):
+        if isinstance(node, ExprStmt):
+            return self.expression(node.expression)
+
+        if isinstance(node, AssignStmt):
+            value_fn = self.expression(node.value)
+            if isinstance(node.target, Identifier):
+                store = self._name_store(node.target)
+
+                def run_assign_name(env):
+                    value = value_fn(env)
+                    store(env, value)
+                    return value
+
+                return run_assign_name
+
+            assign = self._assigner(node.target)
+
+            def run_assign(env):
+                value = value_fn(env)
+                assign(env, value)
+                return value
+
+            return run_assign
+
+        if isinstance(node, MultiAssignStmt):
+            value_fn = self.expression(node.value)
+            assigners = [self._assigner(target) for target in node.targets]
+
+            def run_multi_assign(env):
+                value = value_fn(env)
+                for assign in assigners:
+                    assign(env, value)
+                return value
+
+            return run_multi_assign
+
+        if isinstance(node, AugAssignStmt):
+            read = self._reader(node.target)
+            assign = self._assigner(node.target)
+            value_fn = self.expression(node.value)
+            op = _AUGMENTED_OPS.get(node.operator)
+
+            def run_aug_assign(env):
+                current = read(env)
+                right = value_fn(env)
+                if op is None:
+                    raise CoffeeRuntimeError("Unsupported augmented assignment operator.")
+                try:
+                    new_value = op(current, right)
+                except Exception as exc:
+                    raise CoffeeRuntimeError(f"Augmented assignment failed: {exc}") from exc
+                assign(env, new_value)
+                return new_value
+
+            return run_aug_assign
+
+        if isinstance(node, UpdateStmt):
+            read = self._reader(node.target)
+            assign = self._assigner(node.target)
+            if node.operator not in (PLUSPLUS, MINUSMINUS):
+                raise CoffeeCompileError("Unsupported update operator.")
+            delta = 1 if node.operator == PLUSPLUS else -1
+            prefix = node.prefix
+
+            def run_update(env):
+                current = read(env)
+                try:
+                    new_value = current + delta
+                except Exception as exc:
+                    raise CoffeeRuntimeError(f"Update operator failed: {exc}") from exc
+                assign(env, new_value)
+                return new_value if prefix else current
+
+            return run_update
+
+        if isinstance(node, ExistentialAssignStmt):
+            read = self._reader(node.target)
+            assign = self._assigner(node.target)
+            value_fn = self.expression(node.value)
+
+            def run_existential_assign(env):
+                try:
+                    current = read(env)
+                except CoffeeRuntimeError:
+                    current = None
+                if current is None:
+                    value = value_fn(env)
+                    assign(env, value)
+                    return value
+                return current
+
+            return run_existential_assign
+
+        if isinstance(node, LogicalAssignStmt):
+            read = self._reader(node.target)
+            assign = self._assigner(node.target)
+            value_fn = self.expression(node.value)
+            if node.operator not in (OROR, ANDAND):
+                raise CoffeeCompileError(f"Unknown logical assignment operator: {node.operator}")
+            assign_when_truthy = node.operator == ANDAND
+
+            def run_logical_assign(env):
+                current = read(env)
+                if bool(current) == assign_when_truthy:
+                    value = value_fn(env)
+                    assign(env, value)
+                    return value
+                return current
+
+            return run_logical_assign
+
+        if isinstance(node, (WhileStmt, ForInStmt, ForOfStmt)):
+            return self._loop(node, flow=False)
+
+        if isinstance(node, BreakStmt):
+            def run_break(env):
+                raise _BreakSignal()
+
+            return run_break
+
+        if isinstance(node, ContinueStmt):
+            def run_continue(env):
+                raise _ContinueSignal()
+
+            return run_continue
+
+        if isinstance(node, ReturnStmt):
+            if node.value is None:
+                def run_return_none(env):
+                    raise _ReturnSignal(None)
+
+                return run_return_none
+
+            value_fn = self.expression(node.value)
+
+            def run_return(env):
+                raise _ReturnSignal(value_fn(env))
+
+            return run_return
+
+        if isinstance(node, ThrowStmt):
+            value_fn = self.expression(node.value)
+
+            def run_throw(env):
+                raise _ThrowSignal(value_fn(env))
+
+            return run_throw
+
+        if isinstance(node, TryStmt):
+            return self._try_statement(node)
+
+        if isinstance(node, ClassDecl):
+            return self._class_declaration(node)
+
+        if isinstance(node, ImportStmt):
+            items = [(item.module, item.alias) for item in node.items]
+
+            def run_import(env):
+                for module, alias in items:
+                    if alias is not None:
+                        env.define(alias, runtime.import_module_as(module))
+                    elif "." in module:
+                        env.define(module.split(".", 1)[0], runtime.import_module(module))
+                    else:
+                        env.define(module, runtime.import_module_as(module))
+                return None
+
+            return run_import
+
+        if isinstance(node, FromImportStmt):
+            module = node.module
+            names = [(imported.name, imported.alias) for imported in node.names]
+
+            def run_from_import(env):
+                module_obj = runtime.import_module_as(module)
+                for name, alias in names:
+                    if name == "*":
+                        env.define(alias if alias is not None else module.split(".")[-1], module_obj)
+                        continue
+                    if not hasattr(module_obj, name):
+                        raise CoffeeRuntimeError(f"Module '{module}' has no attribute '{name}'.")
+                    env.define(alias if alias is not None else name, getattr(module_obj, name))
+                return None
+
+            return run_from_import
+
+        def run_unsupported(env):
+            raise CoffeeRuntimeError("Unsupported statement.")
+
+        return run_unsupported
+
+    # ============ Flow position ============
+
+    def _flow(self, node, tail: bool = False, tail_returns: bool = False):
+        """Compile ``node`` in flow position (see the module docstring).
+
+        ``tail`` marks the node's value as the function's result, and
+        ``tail_returns`` does the same for the values of its ``return``
+        statements; calls there may become tail calls.
+        """
+        if not _completions(node) and not (tail and self._has_tail_call(node)):
+            return self.statement(node) if isinstance(node, Statement) else self.expression(node)
+
+        if isinstance(node, ExprStmt):
+            return self._flow(node.expression, tail, tail_returns)
+
+        if isinstance(node, Call) and self._is_tail_call(node):
+            return self._tail_call(node)
+
+        if isinstance(node, BreakStmt):
+            return lambda env: _BREAK
+
+        if isinstance(node, ContinueStmt):
+            return lambda env: _CONTINUE
+
+        if isinstance(node, ReturnStmt):
+            if node.value is None:
+                return lambda env: _Completion()
+            if tail_returns and self._is_tail_call(node.value):
+                call_fn = self._tail_call(node.value)
+
+                def run_tail_return(env):
+                    result = call_fn(env)
+                    if type(result) is _Completion:
+                        return result
+                    return _Completion(result)
+
+                return run_tail_return
+            value_fn = self.expression(node.value)
+
+            def run_return(env):
+                return _Completion(value_fn(env))
+
+            return run_return
+
+        if isinstance(node, BlockExpr):
+            steps = [(self._flow(statement, False, tail_returns), bool(_completions(statement))) for statement in node.statements[:-1]]
+            last = self._flow(node.statements[-1], tail, tail_returns)
+
+            def run_block(env):
+                for step, completes in steps:
+                    if completes:
+                        result = step(env)
+                        if type(result) is _Completion:
+                            return result
+                    else:
+                        step(env)
+                return last(env)
+
+            return run_block
+
+        if isinstance(node, IfExpr):
+            condition = self.expression(node.condition)
+            then_branch = self._flow(node.then_branch, tail, tail_returns)
+            else_branch = self._flow(node.else_branch, tail, tail_returns)
+
+            def run_if(env):
+                if condition(env):
+                    return then_branch(env)
+                return else_branch(env)
+
+            return run_if
+
+        if isinstance(node, SwitchExpr):
+            return self._switch(node, lambda body: self._flow(body, tail, tail_returns))
+
+        if isinstance(node, TryStmt):
+            return self._try_statement(node, flow=True)
+
+        return self._loop(node, flow=True, tail_returns=tail_returns)
+
+    def _has_tail_call(self, node) -> bool:
+        if isinstance(node, ExprStmt):
+            return self._has_tail_call(node.expression)
+        if isinstance(node, BlockExpr):
+            return bool(node.statements) and self._has_tail_call(node.statements[-1])
+        if isinstance(node, IfExpr):
+            return self._has_tail_call(node.then_branch) or self._has_tail_call(node.else_branch)
+        if isinstance(node, SwitchExpr):
+            branches = [body for _conditions, body in node.cases] + [node.default]
+            return any(self._has_tail_call(body) for body in branches if body is not None)
+        return self._is_tail_call(node)
+
+    def _is_tail_call(self, node) -> bool:
+        return (
+            isinstance(node, Call)
+            and self._function_body is not None
+            and not any(isinstance(arg, SpreadExpr) for arg in node.args)
+        )
+
+    def _tail_call(self, node: Call):
+        """A call that completes the function with a tail call record when
+        it calls the function it is in, and is an ordinary call otherwise."""
+        arg_fns = [self.expression(arg) for arg in node.args]
+        kwarg_fns = [(name, self.expression(value)) for name, value in node.kwargs]
+        body = self._function_body
+        if isinstance(node.callee, GetAttr):
+            return self._method_call(node.callee, False, None, arg_fns, kwarg_fns, tail_body=body)
+        callee_fn = self.expression(node.callee)
+
+        def run_tail_call(env):
+            callee = callee_fn(env)
+            args = [arg_fn(env) for arg_fn in arg_fns]
+            kwargs = {name: value_fn(env) for name, value_fn in kwarg_fns} if kwarg_fns else {}
+            if type(callee) is CompiledFunction and callee.body is body:
+                return _Completion(call=(callee, None, args, kwargs))
+
+            if not callable(callee):
+                raise CoffeeRuntimeError("Target is not callable.")
+
+            try:
+                return callee(*args, **kwargs)
+            except (CoffeeRuntimeError, _ThrowSignal, _BreakSignal, _ContinueSignal):
+                raise
+            except Exception as exc:
+                raise CoffeeRuntimeError(f"Call failed: {exc}") from exc
+
+        return run_tail_call
+
+    def _loop(self, node, flow: bool, tail_returns: bool = False):
+        """Compile a loop whose body runs in flow position.
+
+        A ``return`` completing the body is passed on when the loop itself
+        is in flow position, and raised as a signal otherwise.
+        """
+        body = self._flow(node.body, False, flow and tail_returns)
+
+        def finish(completion: _Completion):
+            if flow:
+                return completion
+            raise _ReturnSignal(completion.value)
+
+        if isinstance(node, WhileStmt):
+            condition = self.expression(node.condition)
+
+            def run_while(env):
+                loop_result = None
+                try:
+                    while condition(env):
+                        try:
+                            result = body(env)
+                        except _ContinueSignal:
+                            continue
+                        if type(result) is _Completion:
+                            if result is _CONTINUE:
+                                continue
+                            if result is _BREAK:
+                                break
+                            return finish(result)
+                        loop_result = result
+                except _BreakSignal:
+                    pass
+                return loop_result
+
+            return run_while
+
+        if isinstance(node, ForInStmt):
+            iterable_fn = self._iterable(node.iterable)
+            var_name = node.var_name
+
+            def run_for_in(env):
+                iterable = iterable_fn(env)
+                values = env.values
+                loop_result = None
+                try:
+                    for item in iterable:
+                        values[var_name] = item
+                        try:
+                            result = body(env)
+                        except _ContinueSignal:
+                            continue
+                        if type(result) is _Completion:
+                            if result is _CONTINUE:
+                                continue
+                            if result is _BREAK:
+                                break
+                            return finish(result)
+                        loop_result = result
+                except _BreakSignal:
+                    pass
+                return loop_result
+
+            return run_for_in
+
+        iterable_fn = self.expression(node.iterable)
+        key_var = node.key_var
+        value_var = node.value_var
+
+        def run_for_of(env):
+            iterable = iterable_fn(env)
+            values = env.values
+            loop_result = None
+            try:
+                for key, value in runtime.of_items(iterable):
+                    values[key_var] = key
+                    if value_var:
+                        values[value_var] = value
+                    try:
+                        result = body(env)
+                    except _ContinueSignal:
+                        continue
+                    if type(result) is _Completion:
+                        if result is _CONTINUE:
+                            continue
+                        if result is _BREAK:
+                            break
+                        return finish(result)
+                    loop_result = result
+            except _BreakSignal:
+                pass
+            return loop_result
+
+        return run_for_of
+
+    def _try_statement(self, node: TryStmt, flow: bool = False):
+        block = self._flow if flow else self.expression
+        try_block = block(node.try_block)
+        catch_block = block(node.catch_block) if node.catch_block else None
+        finally_block = self.expression(node.finally_block) if node.finally_block else None
+        catch_var = node.catch_var
+
+        def run_try(env):
+            result = None
+            try:
+                result = try_block(env)
+            except _ThrowSignal as signal:
+                if catch_block is None:
+                    raise
+                if catch_var:
+                    env.define(catch_var, signal.value)
+                result = catch_block(env)
+            finally:
+                if finally_block is not None:
+                    finally_block(env)
+            return result
+
+        return run_try
+
+    def _class_declaration(self, node: ClassDecl):
+        parent_fn = self.expression(node.parent) if node.parent else None
+        members = []
+        for method_name, member in node.body:
+            if isinstance(member, FunctionLiteral):
+                members.append((method_name, self._function_factory(member)))
+            else:
+                members.append((method_name, self.expression(member)))
+        name = node.name
+        interpreter = self.interpreter
+
+        def run_class(env):
+            parent_class = parent_fn(env) if parent_fn is not None else None
+            methods = {}
+            for method_name, make in members:
+                methods[method_name] = make(env)
+            klass = CoffeeClass(name, parent_class, methods, interpreter)
+            env.define(name, klass)
+            return klass
+
+        return run_class
+
+    # ============ Assignment targets ============
+
+    def _assigner(self, target):
+        """Return ``assign(env, value)`` for an assignment target."""
+        if isinstance(target, Identifier):
+            return self._name_store(target)
+
+        if isinstance(target, GetAttr):
+            container_fn = self.expression(target.target)
+            name = target.name
+
+            def assign_attr(env, value):
+                runtime.set_attr(container_fn(env), name, value)
+
+            return assign_attr
+
+        if isinstance(target, ProtoAccessExpr):
+            class_fn = self.expression(target.target)
+            name = target.name
+
+            def assign_proto(env, value):
+                runtime.set_proto(class_fn(env), name, value)
+
+            return assign_proto
+
+        if isinstance(target, IndexExpr):
+            container_fn = self.expression(target.target)
+            index_fn = self.expression(target.index)
+
+            def assign_index(env, value):
+                container = container_fn(env)
+                index = index_fn(env)
+                if not hasattr(container, "__setitem__"):
+                    raise CoffeeRuntimeError("Target does not support index assignment.")
+                try:
+                    container[index] = value
+                except Exception as exc:
+                    raise CoffeeRuntimeError(f"Index assignment failed: {exc}") from exc
+
+            return assign_index
+
+        if isinstance(target, ArrayDestructuring):
+            element_assigners = [self._assigner(element) for element in target.elements]
+            count = len(target.elements)
+            splat_index = target.splat_index
+
+            def assign_array(env, value):
+                values = runtime.unpack_array(value, count, splat_index)
+                for assign, element_value in zip(element_assigners, values):
+                    assign(env, element_value)
+
+            return assign_array
+
+        if isinstance(target, ObjectDestructuring):
+            properties = []
+            for key, alias, default in target.properties:
+                default_fn = self.expression(default) if default is not None else None
+                alias_assign = self._assigner(alias) if alias is not None else None
+                properties.append((key, alias_assign, default_fn))
+
+            def assign_object(env, value):
+                if not isinstance(value, dict):
+                    raise CoffeeRuntimeError("Cannot object-destructure non-object value.")
+                for key, alias_assign, default_fn in properties:
+                    if key in value:
+                        prop_value = value[key]
+                    elif default_fn is not None:
+                        prop_value = default_fn(env)
+                    else:
+                        raise CoffeeRuntimeError(f"Property '{key}' not found in object.")
+                    if alias_assign is not None:
+                        alias_assign(env, prop_value)
+                    else:
+                        env.assign(key, prop_value)
+
+            return assign_object
+
+        def assign_invalid(env, value):
+            raise CoffeeRuntimeError("Invalid assignment target.")
+
+        return assign_invalid
+
+    def _reader(self, target):
+        """Return ``read(env)`` for the current value of an assignment target."""
+        if isinstance(target, Identifier):
+            return self._name_load(target, lambda env: env.get(target.name))
+
+        if isinstance(target, GetAttr):
+            return self.expression(target)
+
+        if isinstance(target, IndexExpr):
+            container_fn = self.expression(target.target)
+            index_fn = self.expression(target.index)
+
+            def read_index(env):
+                container = container_fn(env)
+                index = index_fn(env)
+                try:
+                    return container[index]
+                except Exception as exc:
+                    raise CoffeeRuntimeError(f"Index read failed: {exc}") from exc
+
+            return read_index
+
+        def read_invalid(env):
+            raise CoffeeRuntimeError("Invalid assignment target.")
+
+        return read_invalid
+
+    # ============ Expressions ============
+
+    def expression(self, node):
+        if isinstance(node, Literal):
+            value = node.value
+            return lambda env: value
+
+        if isinstance(node, RegexLiteral):
+            pattern, flags = node.pattern, node.flags
+            return lambda env: runtime.regex(pattern, flags)
+
+        if isinstance(node, Identifier):
+            return self._identifier(node)
+
+        if isinstance(node, BlockExpr):
+            return self._sequence([self.statement(statement) for statement in node.statements])
+
+        if isinstance(node, Binary):
+            return self._binary(node)
+
+        if isinstance(node, Unary):
+            return self._unary(node)
+
+        if isinstance(node, IfExpr):
+            condition = self.expression(node.condition)
+            then_branch = self.expression(node.then_branch)
+            else_branch = self.expression(node.else_branch)
+
+            def run_if(env):
+                if condition(env):
+                    return then_branch(env)
+                return else_branch(env)
+
+            return run_if
+
+        if isinstance(node, FunctionLiteral):
+            return self._function_factory(node)
+
+        if isinstance(node, Call):
+            return self._call(node)
+
+        if isinstance(node, GetAttr):
+            target_fn = self._operand(node.target)
+            name = node.name
+
+            load = AttributeCache(name).load
+
+            def run_get_attr(env):
+                container = target_fn(env)
+                try:
+                    return load(container)
+                except CoffeeAttributeError:
+                    raise self._error(f"Attribute '{name}' not found.", node) from None
+
+            return run_get_attr
+
+        if isinstance(node, IndexExpr):
+            target_fn = self._operand(node.target)
+            index_fn = self.expression(node.index)
+
+            def run_index(env):
+                target = target_fn(env)
+                index = index_fn(env)
+                try:
+                    return target[index]
+                except Exception as exc:
+                    raise CoffeeRuntimeError(f"Index operation failed: {exc}") from exc
+
+            return run_index
+
+        if isinstance(node, ArrayLiteral):
+            items = [self.expression(item) for item in node.items]
+            return lambda env: [item(env) for item in items]
+
+        if isinstance(node, ObjectLiteral):
+            items = [(key, self.expression(value)) for key, value in node.items]
+
+            def run_object(env):
+                object_value = {}
+                for key, value_fn in items:
+                    object_value[key] = value_fn(env)
+                return object_value
+
+            return run_object
+
+        if isinstance(node, RangeLiteral):
+            return self._range(node, runtime.make_range)
+
+        if isinstance(node, SliceExpr):
+            target_fn = self._operand(node.target)
+            start_fn = self.expression(node.start) if node.start else None
+            end_fn = self.expression(node.end) if node.end else None
+            exclusive = node.exclusive
+
+            def run_slice(env):
+                target = target_fn(env)
+                start = start_fn(env) if start_fn is not None else None
+                end = end_fn(env) if end_fn is not None else None
+                return runtime.make_slice(target, start, end, exclusive)
+
+            return run_slice
+
+        if isinstance(node, ThisExpr):
+            return self._scoped_name("this", "'this' used outside of class method.")
+
+        if isinstance(node, SuperExpr):
+            return self._scoped_name("super", "'super' used outside of class method.")
+
+        if isinstance(node, NewExpr):
+            class_fn = self.expression(node.class_expr)
+            arg_fns = [self.expression(arg) for arg in node.args]
+            kwarg_fns = [(name, self.expression(value)) for name, value in node.kwargs]
+
+            def run_new(env):
+                klass = class_fn(env)
+                args = [arg(env) for arg in arg_fns]
+                kwargs = {name: value_fn(env) for name, value_fn in kwarg_fns}
+                if not isinstance(klass, CoffeeClass):
+                    raise CoffeeRuntimeError("Can only instantiate classes.")
+                return klass(*args, **kwargs)
+
+            return run_new
+
+        if isinstance(node, SwitchExpr):
+            return self._switch(node)
+
+        if isinstance(node, ExistentialExpr):
+            left_fn = self.expression(node.left)
+            right_fn = self.expression(node.right)
+
+            def run_existential(env):
+                left = left_fn(env)
+                if left is not None:
+                    return left
+                return right_fn(env)
+
+            return run_existential
+
+        if isinstance(node, SafeAccessExpr):
+            target_fn = self._operand(node.target)
+            name = node.name
+
+            def run_safe_access(env):
+                return runtime.safe_attr(target_fn(env), name)
+
+            return run_safe_access
+
+        if isinstance(node, ProtoAccessExpr):
+            if node.target is None:
+                error = self._error("Prototype access '::' requires a target (e.g., Array::map).", node)
+
+                def run_proto_error(env):
+                    raise error
+
+                return run_proto_error
+
+            target_fn = self.expression(node.target)
+            name = node.name
+            return lambda env: runtime.proto(target_fn(env), name)
+
+        if isinstance(node, (SplatExpr, SpreadExpr)):
+            return self.expression(node.value)
+
+        if isinstance(node, InterpolatedString):
+            # The text parts sit in a template list; each run copies it, fills
+            # in the interpolated values and joins the result in one step.
+            template: list[str] = []
+            slots = []
+            for part in node.parts:
+                if isinstance(part, Literal) and isinstance(part.value, str):
+                    template.append(part.value)
+                else:
+                    slots.append((len(template), self.expression(part)))
+                    template.append("")
+
+            def run_interpolation(env):
+                pieces = template.copy()
+                for index, fn in slots:
+                    value = fn(env)
+                    if value is not None:
+                        pieces[index] = str(value)
+                return "".join(pieces)
+
+            return run_interpolation
+
+        if isinstance(node, InExpr):
+            value_fn = self.expression(node.value)
+            container_fn = self._operand(node.container)
+            return lambda env: runtime.contains(value_fn(env), container_fn(env))
+
+        if isinstance(node, OfExpr):
+            key_fn = self.expression(node.key)
+            container_fn = self.expression(node.container)
+            return lambda env: runtime.contains(key_fn(env), container_fn(env))
+
+        if isinstance(node, ComprehensionExpr):
+            return self._comprehension(node)
+
+        if isinstance(node, ObjectComprehensionExpr):
+            return self._object_comprehension(node)
+
+        if isinstance(node, DoExpr):
+            body_fn = self.expression(node.body)
+            return lambda env: runtime.do(body_fn(env))
+
+        if isinstance(node, YieldExpr):
+            if self._in_generator:
+                raise CoffeeCompileError("'yield' is not supported in this position.")
+
+            def run_yield_outside(env):
+                raise CoffeeRuntimeError("'yield' used outside generator function.")
+
+            return run_yield_outside
+
+        if isinstance(node, ChainedComparison):
+            operands = [self.expression(operand) for operand in node.operands]
+            comparisons = [_COMPARISON_OPS[op] for op in node.operators]
+
+            def run_chained_comparison(env):
+                left = operands[0](env)
+                for compare, operand in zip(comparisons, operands[1:]):
+                    right = operand(env)
+                    if not compare(left, right):
+                        return False
+                    left = right
+                return True
+
+            return run_chained_comparison
+
+        def run_unsupported(env):
+            raise CoffeeRuntimeError("Unsupported expression.")
+
+        return run_unsupported
+
+    def _identifier(self, node: Identifier):
+        name = node.name
+
+        def run_identifier(env):
+            scope = env
+            while scope is not None:
+                values = scope.values
+                if name in values:
+                    return values[name]
+                scope = scope.parent
+            if hasattr(py_builtins, name):
+                return getattr(py_builtins, name)
+            raise self._error(f"Undefined identifier '{name}'.", node)
+
+        return self._name_load(node, run_identifier)
+
+    def _name_load(self, node: Identifier, lookup):
+        """Read ``node`` from the frame its coordinate names (see
+        ``coffeepy.resolver``); ``lookup(env)`` searches the environment chain
+        when that frame does not hold the name yet."""
+        name = node.name
+        coordinate = node.coordinate
+
+        if coordinate is None:
+
+            def load_global(env):
+                scope = env
+                while scope.parent is not None:
+                    scope = scope.parent
+                values = scope.values
+                if name in values:
+                    return values[name]
+                return lookup(env)
+
+            return load_global
+
+        depth = coordinate[0]
+        if depth == 0:
+
+            def load_local(env):
+                values = env.values
+                if name in values:
+                    return values[name]
+                return lookup(env)
+
+            return load_local
+
+        def load_outer(env):
+            scope = env
+            for _ in range(depth):
+                scope = scope.parent
+            values = scope.values
+            if name in values:
+                return values[name]
+            return lookup(env)
+
+        return load_outer
+
+    def _name_store(self, node: Identifier):
+        """Return ``store(env, value)`` writing ``node`` in the frame its
+        coordinate names; a frame that does not hold the name yet leaves the
+        choice to ``Environment.assign``."""
+        name = node.name
+        coordinate = node.coordinate
+
+        if coordinate is None:
+
+            def store_global(env, value):
+                scope = env
+                while scope.parent is not None:
+                    scope = scope.parent
+                values = scope.values
+                if name in values:
+                    values[name] = value
+                else:
+                    env.assign(name, value)
+
+            return store_global
+
+        depth = coordinate[0]
+
+        def store_resolved(env, value):
+            scope = env
+            for _ in range(depth):
+                scope = scope.parent
+            values = scope.values
+            if name in values:
+                values[name] = value
+            else:
+                env.assign(name, value)
+
+        return store_resolved
+
+    @staticmethod
+    def _scoped_name(name: str, message: str):
+        def run_scoped_name(env):
+            try:
+                return env.get(name)
+            except CoffeeRuntimeError:
+                raise CoffeeRuntimeError(message) from None
+
+        return run_scoped_name
+
+    def _unary(self, node: Unary):
+        right_fn = self.expression(node.right)
+
+        if node.operator == NOT:
+            return lambda env: not right_fn(env)
+
+        if node.operator in (MINUS, PLUS):
+            negate = node.operator == MINUS
+            message = f"Unary '{'-' if negate else '+'}' not supported for None."
+
+            def run_sign(env):
+                right = right_fn(env)
+                if right is None:
+                    raise CoffeeRuntimeError(message)
+                return -right if negate else +right
+
+            return run_sign
+
+        def run_unsupported(env):
+            right_fn(env)
+            raise CoffeeRuntimeError("Unsupported unary operator.")
+
+        return run_unsupported
+
+    def _binary(self, node: Binary):
+        left_fn = self.expression(node.left)
+        right_fn = self.expression(node.right)
+
+        if node.operator == OR:
+            return lambda env: left_fn(env) or right_fn(env)
+
+        if node.operator == AND:
+            return lambda env: left_fn(env) and right_fn(env)
+
+        compare = _COMPARISON_OPS.get(node.operator)
+        if compare is not None:
+            return lambda env: compare(left_fn(env), right_fn(env))
+
+        op = _ARITHMETIC_OPS.get(node.operator)
+        if op is None:
+            def run_unsupported(env):
+                left_fn(env)
+                right_fn(env)
+                raise CoffeeRuntimeError("Unsupported binary operator.")
+
+            return run_unsupported
+
+        def run_binary(env):
+            left = left_fn(env)
+            right = right_fn(env)
+            try:
+                return op(left, right)
+            except Exception as exc:
+                raise CoffeeRuntimeError(f"Binary operation failed: {exc}") from exc
+
+        return run_binary
+
+    def _call(self, node: Call):
+        has_spread = any(isinstance(arg, SpreadExpr) for arg in node.args)
+        arg_fns = [
+            (isinstance(arg, SpreadExpr), self.expression(arg.value if isinstance(arg, SpreadExpr) else arg))
+            for arg in node.args
+        ]
+        kwarg_fns = [(name, self.expression(value)) for name, value in node.kwargs]
+        plain_arg_fns = [arg_fn for _spread, arg_fn in arg_fns]
+
+        def arguments(env):
+            args = []
+            for is_spread, arg_fn in arg_fns:
+                if is_spread:
+                    args.extend(runtime.spread(arg_fn(env)))
+                else:
+                    args.append(arg_fn(env))
+            return args
+
+        if isinstance(node.callee, GetAttr):
+            return self._method_call(node.callee, has_spread, arguments, plain_arg_fns, kwarg_fns)
+
+        callee_fn = self.expression(node.callee)
+
+        def run_call(env):
+            callee = callee_fn(env)
+            if has_spread:
+                args = arguments(env)
+            else:
+                args = [arg_fn(env) for arg_fn in plain_arg_fns]
+            kwargs = {name: value_fn(env) for name, value_fn in kwarg_fns} if kwarg_fns else {}
+
+            if not callable(callee):
+                raise CoffeeRuntimeError("Target is not callable.")
+
+            try:
+                return callee(*args, **kwargs)
+            except (CoffeeRuntimeError, _ThrowSignal, _BreakSignal, _ContinueSignal):
+                raise
+            except Exception as exc:
+                raise CoffeeRuntimeError(f"Call failed: {exc}") from exc
+
+        return run_call
+
+    def _method_call(self, callee_node: GetAttr, has_spread: bool, arguments, plain_arg_fns: list, kwarg_fns: list, tail_body=None):
+        """``obj.name(args)``: run a class method on ``obj`` without binding it.
+
+        ``tail_body`` is the body of the function the call is a tail call
+        in; a method with that body completes it with a tail call record.
+        """
+        target_fn = self._operand(callee_node.target)
+        attribute = callee_node.name
+        cache = AttributeCache(attribute)
+        find_method = cache.find_method
+        load = cache.load
+
+        def run_method_call(env):
+            receiver = target_fn(env)
+            method = find_method(receiver) if type(receiver) is CoffeeInstance else None
+            if method is None:
+                try:
+                    callee = load(receiver)
+                except CoffeeAttributeError:
+                    raise self._error(f"Attribute '{attribute}' not found.", callee_node) from None
+            args = arguments(env) if has_spread else [arg_fn(env) for arg_fn in plain_arg_fns]
+            kwargs = {name: value_fn(env) for name, value_fn in kwarg_fns} if kwarg_fns else {}
+
+            if tail_body is not None and type(method) is CompiledFunction and method.body is tail_body:
+                return _Completion(call=(method, receiver, args, kwargs))
+
+            try:
+                if method is not None:
+                    return call_method(receiver, method, args, kwargs)
+                if not callable(callee):
+                    raise CoffeeRuntimeError("Target is not callable.")
+                return callee(*args, **kwargs)
+            except (CoffeeRuntimeError, _ThrowSignal, _BreakSignal, _ContinueSignal):
+                raise
+            except Exception as exc:
+                raise CoffeeRuntimeError(f"Call failed: {exc}") from exc
+
+        return run_method_call
+
+    def _switch(self, node: SwitchExpr, branch=None):
+        """Compile a ``switch``; ``branch`` compiles its bodies (default ``expression``)."""
+        branch = branch or self.expression
+        subject_fn = self.expression(node.value) if node.value is not None else None
+        cases = [
+            ([self.expression(condition) for condition in conditions], branch(body))
+            for conditions, body in node.cases
+        ]
+        default_fn = branch(node.default) if node.default else None
+
+        def run_switch(env):
+            if subject_fn is not None:
+                subject = subject_fn(env)
+                for conditions, body in cases:
+                    for condition in conditions:
+                        if subject == condition(env):
+                            return body(env)
+            else:
+                for conditions, body in cases:
+                    for condition in conditions:
+                        if condition(env):
+                            return body(env)
+            if default_fn is not None:
+                return default_fn(env)
+            return None
+
+        return run_switch
+
+    def _range(self, node: RangeLiteral, make):
+        start_fn = self.expression(node.start)
+        end_fn = self.expression(node.end)
+        step_fn = self.expression(node.step) if node.step else None
+        exclusive = node.exclusive
+
+        def run_range(env):
+            start = start_fn(env)
+            end = end_fn(env)
+            step = step_fn(env) if step_fn is not None else None
+            return make(start, end, exclusive, step)
+
+        return run_range
+
+    def _iterable(self, node):
+        """Compile what a loop iterates over; a range literal gives its numbers."""
+        if isinstance(node, RangeLiteral):
+            return self._range(node, range_numbers)
+        return self.expression(node)
+
+    def _operand(self, node):
+        """Compile an operand that is read in place (see ``CoffeeRange``); a
+        range literal there stays lazy."""
+        if isinstance(node, RangeLiteral):
+            return self._range(node, runtime.make_lazy_range)
+        return self.expression(node)
+
+    def _comprehension(self, node: ComprehensionExpr):
+        source, stages = comprehension_stages(node)
+        if node.lazy or len(stages) > 1:
+            return self._comprehension_pipeline(source, stages, node.lazy)
+        iterable_fn = self._iterable(node.iterable)
+        body_fn = self.expression(node.body)
+        filter_fn = self.expression(node.filter_condition) if node.filter_condition else None
+        var_name = node.var_name
+        plan = vector_plan(node)
+        if plan is not None:
+            operand_fns = [self.expression(operand) for operand in plan.operands]
+            arrays = self.interpreter.numpy_arrays
+
+        def run_comprehension(env):
+            iterable = iterable_fn(env)
+            values = env.values
+            if plan is not None:
+                result = plan.run(iterable, lambda: [fn(env) for fn in operand_fns], arrays)
+                if result is not None:
+                    values[var_name] = iterable[-1]
+                    return result
+            result = []
+            for item in iterable:
+                values[var_name] = item
+                if filter_fn is not None and not filter_fn(env):
+                    continue
+                result.append(body_fn(env))
+            return result
+
+        return run_comprehension
+
+    def _comprehension_pipeline(self, source, stages: list, lazy: bool):
+        """Compile comprehension ``stages`` into one loop over ``source``."""
+        iterable_fn = self._iterable(source)
+        steps = [
+            (
+                stage.var_name,
+                self.expression(stage.filter_condition) if stage.filter_condition else None,
+                self.expression(stage.body),
+            )
+            for stage in stages
+        ]
+
+        def results(env, iterable):
+            values = env.values
+            for item in iterable:
+                for var_name, filter_fn, body_fn in steps:
+                    values[var_name] = item
+                    if filter_fn is not None and not filter_fn(env):
+                        break
+                    item = body_fn(env)
+                else:
+                    yield item
+
+        if lazy:
+
+            def run_lazy_comprehension(env):
+                return results(env, iterable_fn(env))
+
+            return run_lazy_comprehension
+
+        def run_fused_comprehension(env):
+            return list(results(env, iterable_fn(env)))
+
+        return run_fused_comprehension
+
+    def _object_comprehension(self, node: ObjectComprehensionExpr):
+        iterable_fn = self.expression(node.iterable)
+        key_fn = self.expression(node.key_expr)
+        value_fn = self.expression(node.value_expr)
+        filter_fn = self.expression(node.filter_condition) if node.filter_condition else None
+        key_var = node.key_var
+        value_var = node.value_var
+
+        def run_object_comprehension(env):
+            iterable = iterable_fn(env)
+            values = env.values
+            result = {}
+            for key, value in runtime.indexed_items(iterable):
+                values[key_var] = key
+                if value_var:
+                    values[value_var] = value
+                if filter_fn is not None and not filter_fn(env):
+                    continue
+                result_key = key_fn(env)
+                result[result_key] = value_fn(env)
+            return result
+
+        return run_object_comprehension
+
+    # ============ Functions ============
+
+    def _function_factory(self, node: FunctionLiteral):
+        """Compile a function literal once; return a closure creating it."""
+        is_generator = function_info(node).is_generator
+        saved = self._in_generator, self._function_body
+        self._in_generator = is_generator
+        self._function_body = None if is_generator else node.body
+        try:
+            if is_generator:
+                code = self._generator(node.body)
+            else:
+                code = self._flow(node.body, tail=True, tail_returns=True)
+            self._function_body = None
+            default_code = {name: self.expression(value) for name, value in function_info(node).defaults.items()}
+        finally:
+            self._in_generator, self._function_body = saved
+
+        interpreter = self.interpreter
+        function_class = CompiledGeneratorFunction if is_generator else CompiledFunction
+
+        def run_function(env):
+            return function_class(node, code, default_code, env, interpreter)
+
+        return run_function
+
+    # ============ Generators ============
+
+    def _generator(self, node):
+        """Compile ``node`` into a generator function ``gen(env)``.
+
+        The generator yields the values produced by ``yield`` inside the node
+        and returns the node's value.
+        """
+        if isinstance(node, DoExpr) and contains_yield(node):
+            body_fn = self.expression(node.body)
+
+            def gen_do(env):
+                result = runtime.do(body_fn(env))
+                if hasattr(result, "__iter__") and not isinstance(result, (str, bytes, dict)):
+                    yield from result
+                return None
+
+            return gen_do
+
+        if not has_direct_yield(node):
+            if isinstance(node, Statement):
+                plain = self.statement(node)
+            else:
+                plain = self.expression(node)
+
+            def gen_plain(env):
+                return plain(env)
+                yield  # pragma: no cover - marks this function as a generator
+
+            return gen_plain
+
+        if isinstance(node, ExprStmt):
+            return self._generator(node.expression)
+
+        if isinstance(node, BlockExpr):
+            steps = [self._generator(statement) for statement in node.statements]
+
+            def gen_block(env):
+                result = None
+                for step in steps:
+                    result = yield from step(env)
+                return result
+
+            return gen_block
+
+        if isinstance(node, YieldExpr):
+            value_gen = self._generator(node.value) if node.value is not None else None
+
+            def gen_yield(env):
+                value = (yield from value_gen(env)) if value_gen is not None else None
+                sent = yield value
+                return sent
+
+            return gen_yield
+
+        if isinstance(node, AssignStmt):
+            value_gen = self._generator(node.value)
+            assign = self._assigner(node.target)
+
+            def gen_assign(env):
+                value = yield from value_gen(env)
+                assign(env, value)
+                return value
+
+            return gen_assign
+
+        if isinstance(node, AugAssignStmt):
+            read = self._reader(node.target)
+            assign = self._assigner(node.target)
+            value_gen = self._generator(node.value)
+            op = _AUGMENTED_OPS.get(node.operator)
+            if op is None:
+                raise CoffeeCompileError("Unsupported augmented assignment operator.")
+
+            def gen_aug_assign(env):
+                current = read(env)
+                right = yield from value_gen(env)
+                try:
+                    new_value = op(current, right)
+                except Exception as exc:
+                    raise CoffeeRuntimeError(f"Augmented assignment failed: {exc}") from exc
+                assign(env, new_value)
+                return new_value
+
+            return gen_aug_assign
+
+        if isinstance(node, ReturnStmt):
+            value_gen = self._generator(node.value)
+
+            def gen_return(env):
+                value = yield from value_gen(env)
+                raise _ReturnSignal(value)
+
+            return gen_return
+
+        if isinstance(node, IfExpr):
+            condition = self._generator(node.condition)
+            then_branch = self._generator(node.then_branch)
+            else_branch = self._generator(node.else_branch)
+
+            def gen_if(env):
+                if (yield from condition(env)):
+                    return (yield from then_branch(env))
+                return (yield from else_branch(env))
+
+            return gen_if
+
+        if isinstance(node, WhileStmt):
+            condition = self._generator(node.condition)
+            body = self._generator(node.body)
+
+            def gen_while(env):
+                loop_result = None
+                try:
+                    while (yield from condition(env)):
+                        try:
+                            loop_result = yield from body(env)
+                        except _ContinueSignal:
+                            continue
+                except _BreakSignal:
+                    pass
+                return loop_result
+
+            return gen_while
+
+        if isinstance(node, ForInStmt):
+            iterable_gen = self._generator(node.iterable)
+            body = self._generator(node.body)
+            var_name = node.var_name
+
+            def gen_for_in(env):
+                iterable = yield from iterable_gen(env)
+                loop_result = None
+                try:
+                    for item in iterable:
+                        env.values[var_name] = item
+                        try:
+                            loop_result = yield from body(env)
+                        except _ContinueSignal:
+                            continue
+                except _BreakSignal:
+                    pass
+                return loop_result
+
+            return gen_for_in
+
+        if isinstance(node, ForOfStmt):
+            iterable_gen = self._generator(node.iterable)
+            body = self._generator(node.body)
+            key_var = node.key_var
+            value_var = node.value_var
+
+            def gen_for_of(env):
+                iterable = yield from iterable_gen(env)
+                loop_result = None
+                try:
+                    for key, value in list(runtime.of_items(iterable)):
+                        env.values[key_var] = key
+                        if value_var:
+                            env.values[value_var] = value
+                        try:
+                            loop_result = yield from body(env)
+                        except _ContinueSignal:
+                            continue
+                except _BreakSignal:
+                    pass
+                return loop_result
+
+            return gen_for_of
+
+        if isinstance(node, TryStmt):
+            try_block = self._generator(node.try_block)
+            catch_block = self._generator(node.catch_block) if node.catch_block else None
+            finally_block = self._generator(node.finally_block) if node.finally_block else None
+            catch_var = node.catch_var
+
+            def gen_try(env):
+                result = None
+                try:
+                    result = yield from try_block(env)
+                except _ThrowSignal as signal:
+                    if catch_block is None:
+                        raise
+                    if catch_var:
+                        env.define(catch_var, signal.value)
+                    result = yield from catch_block(env)
+                finally:
+                    if finally_block is not None:
+                        yield from finally_block(env)
+                return result
+
+            return gen_try
+
+        if isinstance(node, SwitchExpr):
+            subject_gen = self._generator(node.value) if node.value is not None else None
+            cases = [
+                ([self._generator(condition) for condition in conditions], self._generator(body))
+                for conditions, body in node.cases
+            ]
+            default_gen = self._generator(node.default) if node.default else None
+
+            def gen_switch(env):
+                subject = (yield from subject_gen(env)) if subject_gen is not None else None
+                for conditions, body in cases:
+                    for condition in conditions:
+                        value = yield from condition(env)
+                        matched = subject == value if subject_gen is not None else value
+                        if matched:
+                            return (yield from body(env))
+                if default_gen is not None:
+                    return (yield from default_gen(env))
+                return None
+
+            return gen_switch
+
+        if isinstance(node, ComprehensionExpr) and not node.lazy:
+            iterable_gen = self._generator(node.iterable)
+            body = self._generator(node.body)
+            filter_gen = self._generator(node.filter_condition) if node.filter_condition else None
+            var_name = node.var_name
+
+            def gen_comprehension(env):
+                iterable = yield from iterable_gen(env)
+                result = []
+                for item in iterable:
+                    env.values[var_name] = item
+                    if filter_gen is not None and not (yield from filter_gen(env)):
+                        continue
+                    result.append((yield from body(env)))
+                return result
+
+            return gen_comprehension
+
+        if isinstance(node, ObjectComprehensionExpr):
+            iterable_gen = self._generator(node.iterable)
+            key_gen = self._generator(node.key_expr)
+            value_gen = self._generator(node.value_expr)
+            filter_gen = self._generator(node.filter_condition) if node.filter_condition else None
+            key_var = node.key_var
+            value_var = node.value_var
+
+            def gen_object_comprehension(env):
+                iterable = yield from iterable_gen(env)
+                result = {}
+                for key, value in runtime.indexed_items(iterable):
+                    env.values[key_var] = key
+                    if value_var:
+                        env.values[value_var] = value
+                    if filter_gen is not None and not (yield from filter_gen(env)):
+                        continue
+                    result_key = yield from key_gen(env)
+                    result[result_key] = yield from value_gen(env)
+                return result
+
+            return gen_object_comprehension
+
+        if isinstance(node, Binary):
+            left_gen = self._generator(node.left)
+            right_gen = self._generator(node.right)
+            operator_name = node.operator
+            apply = _binary_function(operator_name)
+
+            def gen_binary(env):
+                left = yield from left_gen(env)
+                if operator_name == OR:
+                    return left if left else (yield from right_gen(env))
+                if operator_name == AND:
+                    return (yield from right_gen(env)) if left else left
+                right = yield from right_gen(env)
+                return apply(left, right)
+
+            return gen_binary
+
+        if isinstance(node, ExistentialExpr):
+            left_gen = self._generator(node.left)
+            right_gen = self._generator(node.right)
+
+            def gen_existential(env):
+                left = yield from left_gen(env)
+                if left is not None:
+                    return left
+                return (yield from right_gen(env))
+
+            return gen_existential
+
+        if isinstance(node, SafeAccessExpr):
+            target_gen = self._generator(node.target)
+            name = node.name
+
+            def gen_safe_access(env):
+                return runtime.safe_attr((yield from target_gen(env)), name)
+
+            return gen_safe_access
+
+        if isinstance(node, ArrayLiteral):
+            item_gens = [self._generator(item) for item in node.items]
+
+            def gen_array(env):
+                items = []
+                for item_gen in item_gens:
+                    items.append((yield from item_gen(env)))
+                return items
+
+            return gen_array
+
+        if isinstance(node, Call):
+            return self._generator_call(node)
+
+        raise CoffeeCompileError(f"'yield' inside '{type(node).__name__}' is not supported.")
+
+    def _generator_call(self, node: Call):
+        """A call with a ``yield`` in its callee or arguments, evaluated in order."""
+        arg_gens = [
+            (isinstance(arg, SpreadExpr), self._generator(arg.value if isinstance(arg, SpreadExpr) else arg))
+            for arg in node.args
+        ]
+        kwarg_gens = [(name, self._generator(value)) for name, value in node.kwargs]
+        callee_node = node.callee
+        attribute_call = isinstance(callee_node, GetAttr)
+        if attribute_call:
+            target_gen = self._generator(callee_node.target)
+            load = AttributeCache(callee_node.name).load
+        else:
+            callee_gen = self._generator(callee_node)
+
+        def gen_call(env):
+            if attribute_call:
+                container = yield from target_gen(env)
+                try:
+                    callee = load(container)
+                except CoffeeAttributeError:
+                    raise self._error(f"Attribute '{callee_node.name}' not found.", callee_node) from None
+            else:
+                callee = yield from callee_gen(env)
+            args = []
+            for is_spread, arg_gen in arg_gens:
+                value = yield from arg_gen(env)
+                if is_spread:
+                    args.extend(runtime.spread(value))
+                else:
+                    args.append(value)
+            kwargs = {}
+            for name, value_gen in kwarg_gens:
+                kwargs[name] = yield from value_gen(env)
+
+            if not callable(callee):
+                raise CoffeeRuntimeError("Target is not callable.")
+
+            try:
+                return callee(*args, **kwargs)
+            except (CoffeeRuntimeError, _ThrowSignal, _BreakSignal, _ContinueSignal):
+                raise
+            except Exception as exc:
+                raise CoffeeRuntimeError(f"Call failed: {exc}") from exc
+
+        return gen_call
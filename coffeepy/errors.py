@@ -43,3 +43,11 @@ class CoffeeRuntimeError(CoffeeError):
                 result += f"\n    {pointer}"
         
         return result
+
+
+class CoffeeCompileError(CoffeeError):
+    """Raised when a compiling backend cannot lower a construct."""
+
+
+class CoffeeAttributeError(CoffeeRuntimeError):
+    """Raised when an attribute is found neither as a key nor on the object."""
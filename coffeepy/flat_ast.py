@@ -0,0 +1,275 @@
+"""
+CoffeePy - Flat AST
+===================
+
+An encoding of a ``Program`` in a few parallel arrays instead of one Python
+object per node, for very large programs and for keeping parsed programs
+around: a ``FlatAST`` is cheap to hold, gives the garbage collector almost
+nothing to traverse and pickles as a handful of byte strings.
+
+Entry ``i`` of a FlatAST is a node, or a list, tuple or dict held by one:
+
+* ``kinds[i]`` is its type, an index into ``NODE_TYPES``, or ``LIST``,
+  ``TUPLE`` or ``DICT``;
+* ``operands[offsets[i]:offsets[i + 1]]`` holds one reference per field, in
+  field order -- per item for a list or tuple, key then value for a dict. A
+  reference ``r >= 0`` is entry ``r``; ``r < 0`` is ``constants[-r - 1]``;
+* ``lines[i]`` and ``columns[i]`` are its ``location``, 0 when it has none.
+
+Entries are stored children first, so the root is the last one and
+``to_nodes`` rebuilds the tree in a single loop, without recursion. A node
+reached twice is stored once. The fields the resolver and the engines fill
+in later (``compare=False``) are not stored.
+
+``flatten`` converts ``ast_nodes`` to a FlatAST and ``FlatAST.to_nodes``
+back; ``FlatAST.view`` reads it without building nodes. ``Interpreter.run``
+and the compilers accept either form.
+"""
+
+from __future__ import annotations
+
+from array import array
+from dataclasses import fields, is_dataclass
+from typing import Iterator
+
+from . import ast_nodes
+from .ast_nodes import Program, SourceLocation
+
+NODE_TYPES = tuple(
+    value
+    for value in vars(ast_nodes).values()
+    if isinstance(value, type) and is_dataclass(value) and value is not SourceLocation
+)
+LIST, TUPLE, DICT = range(len(NODE_TYPES), len(NODE_TYPES) + 3)
+
+_KIND_OF = {node_type: kind for kind, node_type in enumerate(NODE_TYPES)}
+_KIND_OF.update({list: LIST, tuple: TUPLE, dict: DICT})
+
+
+def _layout(node_type: type) -> tuple[tuple[str, ...], int]:
+    """The stored fields of ``node_type``, other than ``location``, and the
+    position of ``location`` among its constructor arguments (-1 if none)."""
+    stored = []
+    location_at = -1
+    for position, node_field in enumerate(fields(node_type)):
+        if not node_field.compare:
+            continue
+        if len(stored) + (location_at >= 0) != position:
+            raise TypeError(f"{node_type.__name__}: fields after a compare=False field cannot be stored")
+        if node_field.name == "location":
+            location_at = position
+        else:
+            stored.append(node_field.name)
+    return tuple(stored), location_at
+
+
+_FIELDS, _LOCATION_AT = zip(*(_layout(node_type) for node_type in NODE_TYPES))
+_FIELD_POSITIONS = tuple({name: position for position, name in enumerate(names)} for names in _FIELDS)
+
+
+class FlatAST:
+    """A program, or any other node, stored as parallel arrays."""
+
+    __slots__ = ("kinds", "offsets", "operands", "lines", "columns", "constants")
+
+    def __init__(self) -> None:
+        self.kinds = array("B")
+        self.offsets = array("I", [0])
+        self.operands = array("i")
+        self.lines = array("I")
+        self.columns = array("I")
+        self.constants: list[object] = []
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def __getstate__(self):
+        return (self.kinds, self.offsets, self.operands, self.lines, self.columns, self.constants)
+
+    def __setstate__(self, state) -> None:
+        self.kinds, self.offsets, self.operands, self.lines, self.columns, self.constants = state
+
+    @property
+    def root(self) -> int:
+        return len(self.kinds) - 1
+
+    def view(self, index: int | None = None) -> NodeView:
+        """A view of entry ``index``, by default the root."""
+        return NodeView(self, self.root if index is None else index)
+
+    def to_nodes(self, index: int | None = None):
+        """Build the ``ast_nodes`` tree rooted at entry ``index``, by default
+        the root."""
+        if index is None:
+            index = self.root
+        kinds, offsets, operands = self.kinds, self.offsets, self.operands
+        lines, columns, constants = self.lines, self.columns, self.constants
+
+        # Only the entries reachable from ``index`` are built.
+        needed = bytearray(index + 1)
+        needed[index] = 1
+        for entry in range(index, -1, -1):
+            if needed[entry]:
+                for ref in operands[offsets[entry] : offsets[entry + 1]]:
+                    if ref >= 0:
+                        needed[ref] = 1
+
+        built: list[object] = [None] * (index + 1)
+        for entry in range(index + 1):
+            if not needed[entry]:
+                continue
+            values = [
+                built[ref] if ref >= 0 else constants[-ref - 1]
+                for ref in operands[offsets[entry] : offsets[entry + 1]]
+            ]
+            kind = kinds[entry]
+            if kind < LIST:
+                location_at = _LOCATION_AT[kind]
+                if location_at >= 0:
+                    line = lines[entry]
+                    values.insert(location_at, SourceLocation(line, columns[entry]) if line else None)
+                built[entry] = NODE_TYPES[kind](*values)
+            elif kind == LIST:
+                built[entry] = values
+            elif kind == TUPLE:
+                built[entry] = tuple(values)
+            else:
+                built[entry] = dict(zip(values[::2], values[1::2]))
+        return built[index]
+
+    def value(self, ref: int):
+        """The value a reference stands for, with nodes as NodeViews."""
+        if ref < 0:
+            return self.constants[-ref - 1]
+        kind = self.kinds[ref]
+        if kind < LIST:
+            return NodeView(self, ref)
+        values = [self.value(item) for item in self.operands[self.offsets[ref] : self.offsets[ref + 1]]]
+        if kind == LIST:
+            return values
+        if kind == TUPLE:
+            return tuple(values)
+        return dict(zip(values[::2], values[1::2]))
+
+
+class NodeView:
+    """Read access to one node of a FlatAST.
+
+    Fields read like the node's attributes: child nodes come back as
+    NodeViews, lists, tuples and dicts of them as new containers and other
+    values as they are."""
+
+    __slots__ = ("ast", "index")
+
+    def __init__(self, ast: FlatAST, index: int):
+        self.ast = ast
+        self.index = index
+
+    @property
+    def type(self) -> type:
+        return NODE_TYPES[self.ast.kinds[self.index]]
+
+    def __getattr__(self, name: str):
+        kind = self.ast.kinds[self.index]
+        position = _FIELD_POSITIONS[kind].get(name)
+        if position is not None:
+            return self.ast.value(self.ast.operands[self.ast.offsets[self.index] + position])
+        if name == "location" and _LOCATION_AT[kind] >= 0:
+            line = self.ast.lines[self.index]
+            return SourceLocation(line, self.ast.columns[self.index]) if line else None
+        raise AttributeError(f"{NODE_TYPES[kind].__name__} has no field {name!r}")
+
+    def children(self) -> Iterator[NodeView]:
+        """The direct child nodes, as ``iter_child_nodes`` gives them."""
+        ast = self.ast
+        stack = list(reversed(ast.operands[ast.offsets[self.index] : ast.offsets[self.index + 1]]))
+        while stack:
+            ref = stack.pop()
+            if ref < 0:
+                continue
+            if ast.kinds[ref] < LIST:
+                yield NodeView(ast, ref)
+            else:
+                stack.extend(reversed(ast.operands[ast.offsets[ref] : ast.offsets[ref + 1]]))
+
+    def to_node(self):
+        return self.ast.to_nodes(self.index)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, NodeView) and other.ast is self.ast and other.index == self.index
+
+    def __hash__(self) -> int:
+        return hash((id(self.ast), self.index))
+
+    def __repr__(self) -> str:
+        return f"<{self.type.__name__} view #{self.index}>"
+
+
+def flatten(node) -> FlatAST:
+    """Encode ``node`` -- usually a ``Program`` -- and everything under it."""
+    flat = FlatAST()
+    kinds, offsets, operands = flat.kinds, flat.offsets, flat.operands
+    lines, columns, constants = flat.lines, flat.columns, flat.constants
+    constant_refs: dict[object, int] = {}
+    stored: dict[int, int] = {}
+    refs: list[int] = []
+    # ``(value, -1)`` is a value to encode; ``(value, count)`` stores it once
+    # the references of its ``count`` items are on ``refs``.
+    stack: list[tuple[object, int]] = [(node, -1)]
+    while stack:
+        value, count = stack.pop()
+        kind = _KIND_OF.get(type(value))
+        if count < 0:
+            if kind is None:
+                key = _constant_key(value)
+                ref = constant_refs.get(key) if key is not None else None
+                if ref is None:
+                    constants.append(value)
+                    ref = -len(constants)
+                    if key is not None:
+                        constant_refs[key] = ref
+                refs.append(ref)
+                continue
+            ref = stored.get(id(value))
+            if ref is not None:
+                refs.append(ref)
+                continue
+            if kind < LIST:
+                items = [getattr(value, name) for name in _FIELDS[kind]]
+            elif kind == DICT:
+                items = [item for pair in value.items() for item in pair]
+            else:
+                items = value
+            stack.append((value, len(items)))
+            stack.extend((item, -1) for item in reversed(items))
+            continue
+
+        if count:
+            operands.extend(refs[-count:])
+            del refs[-count:]
+        kinds.append(kind)
+        offsets.append(len(operands))
+        location = value.location if kind < LIST and _LOCATION_AT[kind] >= 0 else None
+        lines.append(location.line if location is not None else 0)
+        columns.append(location.column if location is not None else 0)
+        stored[id(value)] = len(kinds) - 1
+        refs.append(len(kinds) - 1)
+    return flat
+
+
+def _constant_key(value) -> object:
+    """A key under which equal constants are stored once, or None for values
+    that are always stored separately."""
+    if isinstance(value, float):
+        # ``hex`` tells 0.0 from -0.0 and matches NaN with NaN.
+        return float, value.hex()
+    if value is None or type(value) in (str, int, bool):
+        return type(value), value
+    return None
+
+
+def as_program(program: Program | FlatAST) -> Program:
+    """``program`` as ``ast_nodes``, converting it if it is a FlatAST."""
+    if isinstance(program, FlatAST):
+        return program.to_nodes()
+    return program
@@ -0,0 +1,203 @@
+"""
+CoffeePy - Attribute Inline Caches
+==================================
+
+Every ``obj.name`` site owns an ``AttributeCache``. Reading an attribute the
+generic way means testing whether the receiver is a ``CoffeeInstance``, then
+whether it is a dictionary holding the key, and finally asking Python for
+the attribute. A site usually sees the same kind of receiver over and over,
+so the first access with a new kind picks the matching *reader* and the site
+remembers it:
+
+* instances are keyed on their ``Shape``, which also determines their
+  class: a field becomes a read of a fixed slot, anything else a lookup in
+  the class's flattened method table (``CoffeeClass.vtable``); instances
+  in dictionary mode look in their field dict first,
+* dictionaries are keyed on their type and read the key first,
+* any other object is keyed on its type and takes a single ``getattr``.
+
+Call sites of the form ``obj.name(args)`` ask ``find_method`` first: when it
+finds a class method they call it with ``call_method`` and no ``BoundMethod``
+is allocated. It keeps its own entries, mapping a shape to the method table
+to search, or to ``None`` when a field of that name shadows the methods.
+
+A site remembers up to ``POLYMORPHIC_LIMIT`` receiver kinds. Past that it is
+megamorphic and falls back to the generic reader. Sites count their hits and
+misses; ``stats()`` adds them up over every site, including the ones of
+programs that have finished running.
+"""
+
+from __future__ import annotations
+
+import weakref
+
+from .errors import CoffeeAttributeError, CoffeeRuntimeError
+from .interpreter import BoundMethod, CoffeeInstance
+
+POLYMORPHIC_LIMIT = 4
+
+_UNCACHED = object()
+
+_sites: "weakref.WeakSet[AttributeCache]" = weakref.WeakSet()
+# Counters of sites that have been garbage collected.
+_retired = {"hits": 0, "misses": 0}
+
+
+def stats() -> dict[str, int]:
+    """Return the number of live sites and the hits and misses of all sites."""
+    sites = list(_sites)
+    return {
+        "sites": len(sites),
+        "hits": _retired["hits"] + sum(site.hits for site in sites),
+        "misses": _retired["misses"] + sum(site.misses for site in sites),
+    }
+
+
+def reset_stats() -> None:
+    _retired["hits"] = _retired["misses"] = 0
+    for site in list(_sites):
+        site.hits = 0
+        site.misses = 0
+
+
+class AttributeCache:
+    """Polymorphic inline cache for one attribute access site."""
+
+    __slots__ = ("name", "entries", "methods", "hits", "misses", "_generic", "__weakref__")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.entries: dict = {}
+        self.methods: dict = {}
+        self.hits = 0
+        self.misses = 0
+        self._generic = None
+        _sites.add(self)
+
+    def __del__(self):
+        _retired["hits"] += self.hits
+        _retired["misses"] += self.misses
+
+    def load(self, container):
+        """Return ``container.name``; raise ``CoffeeAttributeError`` if absent."""
+        if type(container) is CoffeeInstance:
+            key = container.shape
+        else:
+            key = type(container)
+        reader = self.entries.get(key)
+        if reader is None:
+            self.misses += 1
+            reader = self._specialize(container, key)
+        else:
+            self.hits += 1
+        return reader(container)
+
+    def find_method(self, receiver):
+        """Return the class method ``receiver.name`` would bind, or ``None``.
+
+        Only plain instances whose fields do not shadow the name qualify, so
+        a call site can run the method on ``receiver`` without allocating a
+        ``BoundMethod``.
+        """
+        if type(receiver) is not CoffeeInstance:
+            return None
+        shape = receiver.shape
+        vtable = self.methods.get(shape, _UNCACHED)
+        if vtable is _UNCACHED:
+            self.misses += 1
+            shadowed = shape.is_dictionary or shape.index(self.name) is not None
+            vtable = None if shadowed else shape.klass.vtable
+            if len(self.methods) < POLYMORPHIC_LIMIT:
+                self.methods[shape] = vtable
+        else:
+            self.hits += 1
+        if vtable is None:
+            return None
+        method = vtable.get(self.name)
+        if method is None or not callable(method):
+            return None
+        return method
+
+    @property
+    def is_megamorphic(self) -> bool:
+        return len(self.entries) >= POLYMORPHIC_LIMIT
+
+    def _specialize(self, container, key):
+        if self.is_megamorphic or (isinstance(container, CoffeeInstance) and type(container) is not CoffeeInstance):
+            if self._generic is None:
+                self._generic = _generic_reader(self.name)
+            return self._generic
+        if type(container) is CoffeeInstance:
+            reader = _instance_reader(container.shape, self.name)
+        elif isinstance(container, dict):
+            reader = _dict_reader(self.name)
+        else:
+            reader = _attribute_reader(self.name)
+        self.entries[key] = reader
+        return reader
+
+
+def _instance_reader(shape, name: str):
+    index = shape.index(name)
+    if index is not None:
+
+        def read_field(instance):
+            return instance.values[index]
+
+        return read_field
+
+    vtable = shape.klass.vtable
+    message = f"Undefined property '{name}'."
+
+    def read_method(instance):
+        method = vtable.get(name)
+        if method:
+            return BoundMethod(instance, method)
+        raise CoffeeRuntimeError(message)
+
+    if not shape.is_dictionary:
+        return read_method
+
+    def read_entry(instance):
+        values = instance.values
+        if name in values:
+            return values[name]
+        return read_method(instance)
+
+    return read_entry
+
+
+def _dict_reader(name: str):
+    attribute = _attribute_reader(name)
+
+    def read_key(mapping):
+        if name in mapping:
+            return mapping[name]
+        return attribute(mapping)
+
+    return read_key
+
+
+def _attribute_reader(name: str):
+    message = f"Attribute '{name}' not found."
+
+    def read_attribute(value):
+        try:
+            return getattr(value, name)
+        except AttributeError:
+            raise CoffeeAttributeError(message) from None
+
+    return read_attribute
+
+
+def _generic_reader(name: str):
+    attribute = _attribute_reader(name)
+
+    def read(container):
+        if isinstance(container, CoffeeInstance):
+            return container.get(name)
+        if isinstance(container, dict) and name in container:
+            return container[name]
+        return attribute(container)
+
+    return read
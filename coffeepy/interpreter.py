@@ -1,10 +1,12 @@
 from __future__ import annotations
 
 import builtins as py_builtins
+import functools
 import importlib
-import operator
+import itertools
+import re
 import sys
-from types import BuiltinFunctionType
+import weakref
 from typing import Any, cast
 
 from .ast_nodes import (
@@ -24,7 +26,6 @@ from .ast_nodes import (
     ExistentialAssignStmt,
     ExistentialExpr,
     ExprStmt,
-    Expression,
     ForInStmt,
     ForOfStmt,
     FromImportStmt,
@@ -47,6 +48,7 @@ from .ast_nodes import (
     Program,
     ProtoAccessExpr,
     RangeLiteral,
+    RegexLiteral,
     ReturnStmt,
     SafeAccessExpr,
     SliceExpr,
@@ -62,15 +64,17 @@ from .ast_nodes import (
     UpdateStmt,
     WhileStmt,
     YieldExpr,
+    iter_child_nodes,
 )
+from .analysis import analyze, function_info
 from .environment import Environment
-from .errors import CoffeeRuntimeError
+from .errors import CoffeeAttributeError, CoffeeCompileError, CoffeeRuntimeError
+from .flat_ast import FlatAST, as_program
 from .lexer import Lexer
 from .parser import Parser
 from .tokens import (
     AND,
     ANDAND,
-    EQEQ,
     GT,
     GTE,
     LT,
@@ -78,21 +82,17 @@ from .tokens import (
     MINUS,
     MINUSMINUS,
     MINUS_EQ,
-    NEQ,
     NOT,
     OR,
     OROR,
-    PERCENT,
     PERCENT_EQ,
     PLUS,
     PLUSPLUS,
     PLUS_EQ,
-    SLASH,
     SLASH_EQ,
-    STAR,
-    STARSTAR,
     STAR_EQ,
 )
+from .vectorize import vector_plan
 
 
 class _ReturnSignal(Exception):
@@ -115,67 +115,228 @@ class _ThrowSignal(Exception):
         self.value = value
 
 
-class _YieldSignal(Exception):
-    def __init__(self, value):
-        super().__init__("yield")
-        self.value = value
-
-
 def contains_yield(node) -> bool:
     if node is None:
         return False
     if isinstance(node, YieldExpr):
         return True
-    for attr_name in dir(node):
-        if attr_name.startswith('_'):
-            continue
-        attr = getattr(node, attr_name)
-        if isinstance(attr, (Expression, Statement)):
-            if contains_yield(attr):
-                return True
-        elif isinstance(attr, (list, tuple)):
-            for item in attr:
-                if isinstance(item, (Expression, Statement)) and contains_yield(item):
-                    return True
-    return False
+    if isinstance(node, FunctionLiteral):
+        return function_info(node).is_generator
+    return any(contains_yield(child) for child in iter_child_nodes(node))
+
+
+def comprehension_stages(node: ComprehensionExpr) -> tuple[Any, list[ComprehensionExpr]]:
+    """Split a comprehension into its source and its stages, innermost first.
+
+    A comprehension over a lazy comprehension literal, as in
+    ``[f(y) for y in (g(x) for x in items)]``, fuses with it: one loop over
+    ``items`` runs every stage on each item in turn.
+    """
+    stages = [node]
+    while isinstance(stages[-1].iterable, ComprehensionExpr) and stages[-1].iterable.lazy:
+        stages.append(stages[-1].iterable)
+    stages.reverse()
+    return stages[0].iterable, stages
+
+
+def yield_sites(body) -> dict[int, tuple]:
+    """Map the id of every node in ``body`` that holds a ``yield`` to the
+    outermost ``yield`` expressions inside it, in evaluation order.
+
+    ``yield`` expressions in nested functions belong to those functions and
+    are not counted.
+    """
+    sites: dict[int, tuple] = {}
+
+    def visit(node) -> tuple:
+        if isinstance(node, FunctionLiteral):
+            return ()
+        found = [child_yield for child in iter_child_nodes(node) for child_yield in visit(child)]
+        if isinstance(node, YieldExpr):
+            found = [node]
+        if found:
+            sites[id(node)] = tuple(found)
+        return tuple(found)
+
+    visit(body)
+    return sites
+
+
+class MethodTable(dict):
+    """The methods a class declares; changing them updates the class vtables."""
+
+    def __init__(self, owner: "CoffeeClass", methods: dict):
+        super().__init__(methods)
+        self.owner = owner
+
+    def __setitem__(self, name: str, method) -> None:
+        super().__setitem__(name, method)
+        self.owner._invalidate()
+
+    def __delitem__(self, name: str) -> None:
+        super().__delitem__(name)
+        self.owner._invalidate()
+
+    def update(self, *args, **kwargs) -> None:
+        super().update(*args, **kwargs)
+        self.owner._invalidate()
+
+    def pop(self, *args):
+        result = super().pop(*args)
+        self.owner._invalidate()
+        return result
+
+    def setdefault(self, name: str, default=None):
+        result = super().setdefault(name, default)
+        self.owner._invalidate()
+        return result
+
+    def clear(self) -> None:
+        super().clear()
+        self.owner._invalidate()
 
 
 class CoffeeClass:
     def __init__(self, name: str, parent, methods: dict, interpreter: "Interpreter"):
         self.name = name
         self.parent = parent
-        self.methods = methods
+        self.methods = MethodTable(self, methods)
         self.interpreter = interpreter
+        # Every method the class responds to, inherited ones included, so a
+        # lookup is a single dict hit. The dict is rebuilt in place when the
+        # methods of this class or of an ancestor change, which keeps it
+        # valid for the inline caches holding on to it.
+        self.vtable: dict = {}
+        self._subclasses: weakref.WeakSet[CoffeeClass] = weakref.WeakSet()
+        self.shape = Shape(self)
+        self.dictionary_shape = Shape(self, is_dictionary=True)
+        if isinstance(parent, CoffeeClass):
+            parent._subclasses.add(self)
+        self._build_vtable()
 
     def __call__(self, *args, **kwargs):
         instance = CoffeeInstance(self)
 
-        constructor = self._find_method("constructor")
+        constructor = self.vtable.get("constructor")
         if constructor:
-            bound_constructor = BoundMethod(instance, constructor)
-            bound_constructor(*args, **kwargs)
+            call_method(instance, constructor, args, kwargs)
 
         return instance
 
     def _find_method(self, name: str):
-        if name in self.methods:
-            return self.methods[name]
-        if self.parent and hasattr(self.parent, "_find_method"):
-            return self.parent._find_method(name)
-        return None
+        return self.vtable.get(name)
+
+    def _build_vtable(self) -> None:
+        self.vtable.clear()
+        if isinstance(self.parent, CoffeeClass):
+            self.vtable.update(self.parent.vtable)
+        self.vtable.update(self.methods)
+
+    def _invalidate(self) -> None:
+        self._build_vtable()
+        for subclass in list(self._subclasses):
+            subclass._invalidate()
 
     def __repr__(self) -> str:
         return f"<class {self.name}>"
 
 
+MAX_SHAPE_FIELDS = 64
+
+
+class Shape:
+    """The field layout shared by instances: field names mapped to slots.
+
+    Every class has an empty root shape. Setting a field an instance does
+    not have yet moves it to the shape that adds that name; the transition
+    is created once, so instances whose fields were set in the same order
+    share a single shape and only keep a list of values.
+
+    A shape records its parent and its ``size``, the number of fields it
+    has. The name-to-slot ``table`` is shared along a chain of transitions:
+    the first shape added below a parent appends its name to the parent's
+    table, and a shape only trusts the entries below its own size. A
+    second transition from the same parent copies the shared prefix.
+
+    A shape with ``MAX_SHAPE_FIELDS`` fields has no transitions: an
+    instance adding one more moves to its class's dictionary shape and
+    keeps its fields in a dict from then on.
+    """
+
+    __slots__ = ("klass", "parent", "name", "size", "table", "transitions", "is_dictionary", "__weakref__")
+
+    def __init__(self, klass: "CoffeeClass", parent: "Shape | None" = None, name: str | None = None, is_dictionary: bool = False):
+        self.klass = klass
+        self.parent = parent
+        self.name = name
+        self.transitions: dict[str, Shape] = {}
+        self.is_dictionary = is_dictionary
+        if parent is None:
+            self.size = 0
+            self.table: dict[str, int] = {}
+            return
+        table = parent.table
+        if len(table) != parent.size:
+            table = dict(itertools.islice(table.items(), parent.size))
+        table[name] = parent.size
+        self.size = parent.size + 1
+        self.table = table
+
+    @property
+    def slots(self) -> dict[str, int]:
+        """The fields of this shape mapped to their slots."""
+        return dict(itertools.islice(self.table.items(), self.size))
+
+    def index(self, name: str) -> int | None:
+        index = self.table.get(name)
+        if index is not None and index < self.size:
+            return index
+        return None
+
+    def with_field(self, name: str) -> "Shape":
+        shape = self.transitions.get(name)
+        if shape is None:
+            if self.size >= MAX_SHAPE_FIELDS:
+                return self.klass.dictionary_shape
+            shape = Shape(self.klass, self, name)
+            self.transitions[name] = shape
+        return shape
+
+    def __repr__(self) -> str:
+        if self.is_dictionary:
+            return f"<Shape {self.klass.name}(dictionary)>"
+        return f"<Shape {self.klass.name}({', '.join(self.slots)})>"
+
+
 class CoffeeInstance:
+    """An instance of a ``CoffeeClass``.
+
+    ``values`` holds the fields in the slots of ``shape``, or, once the
+    instance has moved to the dictionary shape, a dict of them by name.
+    """
+
+    __slots__ = ("klass", "shape", "values", "__weakref__")
+
     def __init__(self, klass: CoffeeClass):
-        self.klass = klass
-        self.fields: dict[str, object] = {}
+        # The slots are written through their descriptors, past __setattr__.
+        _set_klass(self, klass)
+        _set_shape(self, klass.shape)
+        _set_values(self, [])
+
+    @property
+    def fields(self) -> dict[str, object]:
+        """A snapshot of the instance's fields by name."""
+        if self.shape.is_dictionary:
+            return dict(self.values)
+        return dict(zip(self.shape.table, self.values))
 
     def get(self, name: str):
-        if name in self.fields:
-            return self.fields[name]
+        shape = self.shape
+        index = shape.table.get(name)
+        if index is not None and index < shape.size:
+            return self.values[index]
+        if shape.is_dictionary and name in self.values:
+            return self.values[name]
 
         method = self.klass._find_method(name)
         if method:
@@ -184,48 +345,132 @@ class CoffeeInstance:
         raise CoffeeRuntimeError(f"Undefined property '{name}'.")
 
     def set(self, name: str, value: object) -> None:
-        self.fields[name] = value
+        shape = self.shape
+        index = shape.table.get(name)
+        if index is not None and index < shape.size:
+            self.values[index] = value
+        elif shape.is_dictionary:
+            self.values[name] = value
+        else:
+            next_shape = shape.with_field(name)
+            if next_shape.is_dictionary:
+                values = self.fields
+                values[name] = value
+                _set_values(self, values)
+            else:
+                self.values.append(value)
+            _set_shape(self, next_shape)
+
+    def __getattr__(self, name: str):
+        # Python code reading a field, e.g. ``getattr(instance, "x")``.
+        if name.startswith("__") or name in CoffeeInstance.__slots__:
+            raise AttributeError(name)
+        try:
+            return self.get(name)
+        except CoffeeRuntimeError:
+            raise AttributeError(f"'{self.klass.name}' instance has no attribute '{name}'") from None
+
+    def __setattr__(self, name: str, value: object) -> None:
+        # Python code setting a field, e.g. ``setattr(instance, "x", 1)``.
+        if name in CoffeeInstance.__slots__:
+            object.__setattr__(self, name, value)
+        else:
+            self.set(name, value)
 
     def __repr__(self) -> str:
         return f"<{self.klass.name} instance>"
 
 
+_set_klass = CoffeeInstance.klass.__set__
+_set_shape = CoffeeInstance.shape.__set__
+_set_values = CoffeeInstance.values.__set__
+
+
+def bind_arguments(function, call_env: Environment, args, kwargs: dict, reserved: tuple = ()) -> None:
+    """Define the parameters of ``function`` in ``call_env`` from a call's
+    arguments. A parameter without an argument takes its default, else
+    ``None``; a splat parameter collects the remaining positional arguments.
+    Parameters named in ``reserved`` keep their position but are not bound.
+    Defaults are evaluated in ``call_env``, so they see earlier parameters.
+    """
+    params = function.params
+    named = len(params) - 1 if function.splat_param and params else len(params)
+    for index in range(named):
+        name = params[index]
+        if name in reserved:
+            continue
+        if index < len(args):
+            value = args[index]
+        elif name in kwargs:
+            value = kwargs.pop(name)
+        elif name in function.defaults:
+            value = _evaluate_default(function, call_env, function.defaults[name])
+        else:
+            value = None
+        call_env.define(name, value)
+    if named < len(params):
+        call_env.define(params[-1], list(args[named:]))
+
+    for name, value in kwargs.items():
+        call_env.define(name, value)
+
+
+def _evaluate_default(function, call_env: Environment, expression):
+    interpreter = function.interpreter
+    previous = interpreter.environment
+    interpreter.environment = call_env
+    try:
+        return interpreter._evaluate(expression)
+    finally:
+        interpreter.environment = previous
+
+
 class BoundMethod:
     def __init__(self, instance: CoffeeInstance, method: "CoffeeFunction"):
         self.instance = instance
         self.method = method
 
     def __call__(self, *args, **kwargs):
-        call_env = Environment(parent=self.method.closure)
-        call_env.define("this", self.instance)
+        return call_method(self.instance, self.method, args, kwargs)
+
+
+def call_method(instance: CoffeeInstance, method, args, kwargs: dict):
+    """Run ``method`` with ``this`` bound to ``instance``.
+
+    ``obj.name(args)`` call sites use this directly, so a ``BoundMethod`` is
+    only allocated when a method is read as a value.
+    """
+    call_with_this = getattr(method, "call_with_this", None)
+    if call_with_this is not None:
+        return call_with_this(instance, args, kwargs)
+    if not isinstance(method, (CoffeeFunction, CoffeeGeneratorFunction)):
+        # A plain callable installed with ``Class::name = ...``.
+        return method(*args, **kwargs)
 
-        if self.method.params and self.method.params[0] == "super":
-            if self.instance.klass.parent:
-                call_env.define("super", self.instance.klass.parent)
+    call_env = Environment(parent=method.closure)
+    call_env.define("this", instance)
 
-        for index, name in enumerate(self.method.params):
-            if name not in ("this", "super"):
-                value = args[index] if index < len(args) else None
-                call_env.define(name, value)
+    if method.params and method.params[0] == "super":
+        if instance.klass.parent:
+            call_env.define("super", instance.klass.parent)
 
-        for name, value in kwargs.items():
-            call_env.define(name, value)
+    bind_arguments(method, call_env, args, dict(kwargs), reserved=("this", "super"))
 
-        # Handle @param shorthand - auto-assign this.param = param
-        if self.method.this_params:
-            for param_name in self.method.this_params:
-                param_value = call_env.get(param_name)
-                self.instance.set(param_name, param_value)
+    # Handle @param shorthand - auto-assign this.param = param
+    if method.this_params:
+        for param_name in method.this_params:
+            param_value = call_env.get(param_name)
+            instance.set(param_name, param_value)
 
-        previous = self.method.interpreter.environment
-        self.method.interpreter.environment = call_env
+    previous = method.interpreter.environment
+    method.interpreter.environment = call_env
+    try:
         try:
-            try:
-                return self.method.interpreter._evaluate(self.method.body)
-            except _ReturnSignal as signal:
-                return signal.value
-        finally:
-            self.method.interpreter.environment = previous
+            return method.interpreter._evaluate(method.body)
+        except _ReturnSignal as signal:
+            return signal.value
+    finally:
+        method.interpreter.environment = previous
 
 
 class CoffeeFunction:
@@ -251,35 +496,7 @@ class CoffeeFunction:
         if self.bound and self.bound_this is not None:
             call_env.define("this", self.bound_this)
 
-        if self.splat_param and self.params:
-            splat_index = len(self.params) - 1
-            for index, name in enumerate(self.params[:-1]):
-                if index < len(args):
-                    value = args[index]
-                elif name in kwargs:
-                    value = kwargs.pop(name)
-                elif name in self.defaults:
-                    value = self.interpreter._evaluate(self.defaults[name])
-                else:
-                    value = None
-                call_env.define(name, value)
-            splat_name = self.params[-1]
-            rest_args = list(args[splat_index:]) if len(args) > splat_index else []
-            call_env.define(splat_name, rest_args)
-        else:
-            for index, name in enumerate(self.params):
-                if index < len(args):
-                    value = args[index]
-                elif name in kwargs:
-                    value = kwargs.pop(name)
-                elif name in self.defaults:
-                    value = self.interpreter._evaluate(self.defaults[name])
-                else:
-                    value = None
-                call_env.define(name, value)
-
-        for name, value in kwargs.items():
-            call_env.define(name, value)
+        bind_arguments(self, call_env, args, kwargs)
 
         if self.this_params:
             try:
@@ -301,21 +518,47 @@ class CoffeeFunction:
         finally:
             self.interpreter.environment = previous
 
+    def call_exact(self, args) -> Any:
+        """Call with exactly one positional argument per parameter.
+
+        A function without a splat or ``@`` parameters needs no argument
+        matching then; ``coffeepy.quicken.CallSite`` checks that it applies.
+        """
+        call_env = Environment(parent=self.closure)
+        if self.bound and self.bound_this is not None:
+            call_env.values["this"] = self.bound_this
+        call_env.values.update(zip(self.params, args))
+        previous = self.interpreter.environment
+        self.interpreter.environment = call_env
+        try:
+            try:
+                return self.interpreter._evaluate(self.body)
+            except _ReturnSignal as signal:
+                return signal.value
+        finally:
+            self.interpreter.environment = previous
+
     def __repr__(self) -> str:
         params = ", ".join(self.params)
         return f"<CoffeeFunction ({params})>"
 
 
 class CoffeeGenerator:
+    """A call of a tree-walker generator function.
+
+    The body runs as a native Python generator (``Interpreter._generate``)
+    in the call's own environment, so each step costs only the nodes it
+    evaluates, and the value passed to ``send`` is the value of the
+    ``yield`` that resumes.
+    """
+
     def __init__(self, gen_func: "CoffeeGeneratorFunction", args: tuple, kwargs: dict):
         self.gen_func = gen_func
         self.args = args
         self.kwargs = kwargs
-        self._generator = None
-        self._started = False
-        self._closed = False
-        self._send_value = None
-        self._throw_value = None
+        # Values received by ``yield`` expressions that are evaluated later.
+        self.received: dict[int, Any] = {}
+        self._generator = self._run_generator()
 
     def __iter__(self):
         return self
@@ -324,42 +567,26 @@ class CoffeeGenerator:
         return self.send(None)
 
     def send(self, value):
-        if self._closed:
-            raise StopIteration
-        self._send_value = value
-        if not self._started:
-            self._started = True
-            self._generator = self._run_generator()
-        try:
-            return next(self._generator)
-        except StopIteration:
-            self._closed = True
-            raise
+        return self._resume(self._generator.send, value)
 
     def throw(self, exc_type=None, exc_val=None, exc_tb=None):
-        if self._closed:
-            raise StopIteration
         if exc_type is None:
             exc_type = GeneratorExit
         if isinstance(exc_type, type):
-            self._throw_value = exc_type(exc_val) if exc_val else exc_type()
-        else:
-            self._throw_value = exc_type
-        try:
-            return next(self._generator)
-        except StopIteration:
-            self._closed = True
-            raise
+            exc_type = exc_type(exc_val) if exc_val else exc_type()
+        return self._resume(self._generator.throw, exc_type)
 
     def close(self):
-        if self._closed:
-            return
-        self._closed = True
-        if self._generator is not None:
-            try:
-                self._generator.throw(GeneratorExit)
-            except (GeneratorExit, StopIteration):
-                pass
+        self._resume(lambda _value: self._generator.close(), None)
+
+    def _resume(self, step, value):
+        interpreter = self.gen_func.interpreter
+        previous = interpreter.environment, interpreter._current_generator
+        interpreter._current_generator = self
+        try:
+            return step(value)
+        finally:
+            interpreter.environment, interpreter._current_generator = previous
 
     def _run_generator(self):
         call_env = Environment(parent=self.gen_func.closure)
@@ -367,35 +594,7 @@ class CoffeeGenerator:
         if self.gen_func.bound and self.gen_func.bound_this is not None:
             call_env.define("this", self.gen_func.bound_this)
 
-        if self.gen_func.splat_param and self.gen_func.params:
-            splat_index = len(self.gen_func.params) - 1
-            for index, name in enumerate(self.gen_func.params[:-1]):
-                if index < len(self.args):
-                    value = self.args[index]
-                elif name in self.kwargs:
-                    value = self.kwargs.pop(name)
-                elif name in self.gen_func.defaults:
-                    value = self.gen_func.interpreter._evaluate(self.gen_func.defaults[name])
-                else:
-                    value = None
-                call_env.define(name, value)
-            splat_name = self.gen_func.params[-1]
-            rest_args = list(self.args[splat_index:]) if len(self.args) > splat_index else []
-            call_env.define(splat_name, rest_args)
-        else:
-            for index, name in enumerate(self.gen_func.params):
-                if index < len(self.args):
-                    value = self.args[index]
-                elif name in self.kwargs:
-                    value = self.kwargs.pop(name)
-                elif name in self.gen_func.defaults:
-                    value = self.gen_func.interpreter._evaluate(self.gen_func.defaults[name])
-                else:
-                    value = None
-                call_env.define(name, value)
-
-        for name, value in self.kwargs.items():
-            call_env.define(name, value)
+        bind_arguments(self.gen_func, call_env, self.args, self.kwargs)
 
         if self.gen_func.this_params:
             try:
@@ -407,16 +606,12 @@ class CoffeeGenerator:
             except CoffeeRuntimeError:
                 pass
 
-        previous = self.gen_func.interpreter.environment
-        self.gen_func.interpreter.environment = call_env
-        self.gen_func.interpreter._current_generator = self
-
+        interpreter = self.gen_func.interpreter
+        interpreter.environment = call_env
         try:
-            for yielded_value in self.gen_func.interpreter._evaluate_as_generator(self.gen_func.body):
-                yield yielded_value
-        finally:
-            self.gen_func.interpreter.environment = previous
-            self.gen_func.interpreter._current_generator = None
+            yield from interpreter._generate(self.gen_func.body, interpreter._yield_sites(self.gen_func.body))
+        except _ReturnSignal:
+            return
 
     def __repr__(self) -> str:
         params = ", ".join(self.gen_func.params)
@@ -448,25 +643,211 @@ class CoffeeGeneratorFunction:
         return f"<CoffeeGeneratorFunction ({params})>"
 
 
+REGEX_CACHE_SIZE = 256
+
+
+@functools.lru_cache(maxsize=REGEX_CACHE_SIZE)
+def compile_regex(pattern: str, flags: str) -> re.Pattern:
+    """Compile a regex literal. Every engine and interpreter shares the
+    cache, so a literal evaluated in a loop is compiled once."""
+    value = 0
+    if "i" in flags:
+        value |= re.IGNORECASE
+    if "m" in flags:
+        value |= re.MULTILINE
+    if "s" in flags:
+        value |= re.DOTALL
+    return re.compile(pattern, value)
+
+
+def range_numbers(start, end, exclusive: bool, step=None) -> range:
+    """Return the numbers of the range literal ``[start..end]`` (``...`` when
+    ``exclusive``) as a Python ``range``."""
+    if not isinstance(start, (int, float)) or not isinstance(end, (int, float)):
+        raise CoffeeRuntimeError("Range bounds must be numbers.")
+
+    start_int = int(start)
+    end_int = int(end)
+
+    if step is not None:
+        step_int = int(step)
+    elif start_int > end_int:
+        step_int = -1
+    else:
+        step_int = 1
+
+    if step_int > 0:
+        stop = end_int if exclusive else end_int + 1
+    else:
+        stop = end_int - 1
+    return range(start_int, stop, step_int)
+
+
+class CoffeeRange:
+    """The value of a range literal that is read in place: the container of
+    an ``in`` test or the target of an index, slice, attribute or method
+    call, as in ``x in [1..10]`` or ``[1..10][i]``.
+
+    It reads like the list of its numbers (indexing, ``len``, slicing,
+    ``in`` and equality) but only holds a Python ``range``; its repr shows
+    the bounds, as an exclusive range literal, rather than the numbers. The
+    list is built the first time the program changes the range or calls a
+    list method that ``range`` has no counterpart for. Range literals
+    anywhere else evaluate to lists, so a CoffeeRange never reaches Python
+    code.
+    """
+
+    __slots__ = ("items",)
+
+    def __init__(self, numbers: range):
+        # A ``range`` until the numbers are needed as a list, then that list.
+        self.items: range | list = numbers
+
+    def as_list(self) -> list:
+        if type(self.items) is range:
+            self.items = list(self.items)
+        return self.items
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __reversed__(self):
+        return reversed(self.items)
+
+    def __contains__(self, value) -> bool:
+        return value in self.items
+
+    def __getitem__(self, index):
+        items = self.items
+        if type(items) is list:
+            return items[index]
+        if isinstance(index, slice):
+            return list(items[index])
+        # Fail as the list would.
+        try:
+            return items[index]
+        except IndexError:
+            raise IndexError("list index out of range") from None
+        except TypeError:
+            raise TypeError(f"list indices must be integers or slices, not {type(index).__name__}") from None
+
+    def __setitem__(self, index, value) -> None:
+        self.as_list()[index] = value
+
+    def __delitem__(self, index) -> None:
+        del self.as_list()[index]
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, CoffeeRange):
+            other = other.items
+        elif not isinstance(other, list):
+            return NotImplemented
+        if len(self.items) != len(other):
+            return False
+        return all(mine == theirs for mine, theirs in zip(self.items, other))
+
+    __hash__ = None
+
+    def __add__(self, other):
+        if isinstance(other, (list, CoffeeRange)):
+            return list(self.items) + list(other)
+        return NotImplemented
+
+    def __radd__(self, other):
+        if isinstance(other, list):
+            return other + list(self.items)
+        return NotImplemented
+
+    def __mul__(self, count):
+        return list(self.items) * count
+
+    __rmul__ = __mul__
+
+    def index(self, value, *bounds) -> int:
+        try:
+            return self.items.index(value, *bounds)
+        except ValueError:
+            raise ValueError(f"{value!r} is not in list") from None
+
+    def count(self, value) -> int:
+        return self.items.count(value)
+
+    def copy(self) -> list:
+        return list(self.items)
+
+    def __getattr__(self, name: str):
+        # ``append``, ``sort`` and the other list methods.
+        if name.startswith("__") or not hasattr(list, name):
+            raise AttributeError(f"'list' object has no attribute '{name}'")
+        return getattr(self.as_list(), name)
+
+    def __repr__(self) -> str:
+        items = self.items
+        if type(items) is list:
+            return repr(items)
+        if items.step == 1:
+            return f"[{items.start}...{items.stop}]"
+        return f"[{items.start}...{items.stop} by {items.step}]"
+
+
+BACKENDS = ("closure", "tree", "python", "vm")
+
+
 class Interpreter:
-    def __init__(self, stdout=None, source: str | None = None):
+    def __init__(
+        self,
+        stdout=None,
+        source: str | None = None,
+        backend: str = "closure",
+        optimize: bool = False,
+        numpy_arrays: bool = False,
+    ):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend '{backend}'. Expected one of: {', '.join(BACKENDS)}.")
         self.stdout = stdout if stdout is not None else sys.stdout
         self.source = source
+        self.backend = backend
+        self.optimize = optimize
+        # Vectorized comprehensions give NumPy arrays instead of lists.
+        self.numpy_arrays = numpy_arrays
         self._current_generator = None
+        # ``yield_sites`` of each generator body, with the body kept alive.
+        self._generator_bodies: dict[int, tuple] = {}
         self.environment = Environment()
         self._install_builtins()
 
     def interpret(self, source: str):
         self.source = source
-        tokens = Lexer(source).tokenize()
-        program = Parser(tokens).parse()
+        program = Parser(Lexer(source).batches()).parse()
+        return self.run(program)
+
+    def run(self, program: Program | FlatAST):
+        """Run a parsed program, given as ``ast_nodes`` or as a ``FlatAST``,
+        on the interpreter's backend. ``self.source`` is only used to quote
+        the source in error messages."""
+        program = as_program(program)
+        if self.optimize:
+            from .optimizer import optimize
+
+            program = optimize(program)
+        analyze(program)
+        if self.backend == "closure":
+            return self.execute_closures(program)
+        if self.backend == "python":
+            return self.execute_compiled(program)
+        if self.backend == "vm":
+            return self.execute_bytecode(program)
         return self.execute_program(program)
 
     def _error(self, message: str, node=None) -> CoffeeRuntimeError:
         location = getattr(node, 'location', None) if node else None
         return CoffeeRuntimeError(message, location, self.source)
 
-    def execute_program(self, program: Program):
+    def execute_program(self, program: Program | FlatAST):
+        program = as_program(program)
         result = None
         try:
             for statement in program.statements:
@@ -479,6 +860,69 @@ class Interpreter:
             raise self._error("'continue' used outside loop.") from None
         return result
 
+    def execute_closures(self, program: Program | FlatAST):
+        """Run ``program`` through the closure compilation engine.
+
+        Every node is compiled once into a Python closure; programs using a
+        construct the engine cannot compile run on the tree walker instead.
+        """
+        from .closures import ClosureCompiler
+
+        program = as_program(program)
+
+        try:
+            code = ClosureCompiler(self).compile_program(program)
+        except CoffeeCompileError:
+            return self.execute_program(program)
+
+        try:
+            return code(self.environment)
+        except _ReturnSignal as signal:
+            raise self._error("'return' used outside function.") from signal
+        except _BreakSignal:
+            raise self._error("'break' used outside loop.") from None
+        except _ContinueSignal:
+            raise self._error("'continue' used outside loop.") from None
+
+    def execute_compiled(self, program: Program | FlatAST):
+        """Run ``program`` through the Python AST backend.
+
+        Programs using constructs the backend cannot lower run on the tree
+        walker instead.
+        """
+        from .pycompiler import PythonCompiler, run_compiled
+
+        program = as_program(program)
+
+        try:
+            code = PythonCompiler().compile(program)
+        except CoffeeCompileError:
+            return self.execute_program(program)
+        return run_compiled(code, self)
+
+    def execute_bytecode(self, program: Program | FlatAST):
+        """Run ``program`` on the register virtual machine.
+
+        Programs using constructs the bytecode compiler cannot handle run on
+        the tree walker instead.
+        """
+        from .bytecode import BytecodeCompiler
+        from .vm import VirtualMachine
+
+        program = as_program(program)
+
+        try:
+            code = BytecodeCompiler().compile_program(program)
+        except CoffeeCompileError:
+            return self.execute_program(program)
+
+        try:
+            return VirtualMachine(self).run(code, None)
+        except _BreakSignal:
+            raise self._error("'break' used outside loop.") from None
+        except _ContinueSignal:
+            raise self._error("'continue' used outside loop.") from None
+
     def _install_builtins(self) -> None:
         self.environment.define("print", self._builtin_print)
 
@@ -562,7 +1006,7 @@ class Interpreter:
             return loop_result
 
         if isinstance(statement, ForInStmt):
-            iterable = self._evaluate(statement.iterable)
+            iterable = self._iterable(statement.iterable)
             loop_result = None
             try:
                 for item in iterable:
@@ -612,7 +1056,7 @@ class Interpreter:
                     methods[method_name] = CoffeeFunction(
                         method_expr.params, method_expr.body, self.environment, self,
                         method_expr.splat_param,
-                        dict(method_expr.defaults) if method_expr.defaults else {},
+                        function_info(method_expr).defaults,
                         method_expr.this_params,
                         method_expr.bound
                     )
@@ -695,6 +1139,13 @@ class Interpreter:
             self._set_attr(container, target.name, value)
             return
 
+        if isinstance(target, ProtoAccessExpr):
+            klass = self._evaluate(target.target)
+            if not isinstance(klass, CoffeeClass):
+                raise self._error("Prototype assignment '::' requires a class.", target)
+            klass.methods[target.name] = value
+            return
+
         if isinstance(target, IndexExpr):
             container = self._evaluate(target.target)
             index = self._evaluate(target.index)
@@ -804,9 +1255,27 @@ class Interpreter:
             return container.get(name)
         if isinstance(container, dict) and name in container:
             return container[name]
-        if hasattr(container, name):
+        try:
             return getattr(container, name)
-        raise self._error(f"Attribute '{name}' not found.", node)
+        except AttributeError:
+            raise self._error(f"Attribute '{name}' not found.", node) from None
+
+    def _load_attr(self, node: GetAttr, container):
+        cache = node.cache
+        if cache is None:
+            cache = self._attribute_cache(node)
+        try:
+            return cache.load(container)
+        except CoffeeAttributeError:
+            raise self._error(f"Attribute '{node.name}' not found.", node) from None
+
+    @staticmethod
+    def _attribute_cache(node: GetAttr):
+        from .inline_cache import AttributeCache
+
+        cache = AttributeCache(node.name)
+        object.__setattr__(node, "cache", cache)
+        return cache
 
     def _apply_augmented_operator(self, operator_name: str, left, right):
         try:
@@ -836,207 +1305,231 @@ class Interpreter:
 
         raise CoffeeRuntimeError("Unsupported update operator.")
 
-    def _evaluate_as_generator(self, expression):
-        if isinstance(expression, Literal):
-            return
+    def _generate(self, node, sites: dict):
+        """Evaluate ``node`` inside a generator body.
+
+        This is a native Python generator: it yields the values of the
+        ``yield`` expressions it reaches, receives the values passed to
+        ``send`` in return and finally returns the value of ``node``.
+        ``sites`` comes from ``yield_sites``; nodes missing from it hold no
+        ``yield`` and are evaluated directly.
+        """
+        yields = sites.get(id(node))
+        if yields is None:
+            if isinstance(node, Statement):
+                return self._execute(node)
+            return self._evaluate(node)
+
+        if isinstance(node, ExprStmt):
+            return (yield from self._generate(node.expression, sites))
+
+        if isinstance(node, BlockExpr):
+            result = None
+            for statement in node.statements:
+                result = yield from self._generate(statement, sites)
+            return result
 
-        if isinstance(expression, BlockExpr):
-            for statement in expression.statements:
-                if isinstance(statement, ExprStmt):
-                    if contains_yield(statement.expression):
-                        for val in self._evaluate_as_generator(statement.expression):
-                            yield val
-                    else:
-                        self._execute(statement)
-                elif isinstance(statement, ForInStmt):
-                    for val in self._evaluate_as_generator(statement):
-                        yield val
-                elif isinstance(statement, ForOfStmt):
-                    for val in self._evaluate_as_generator(statement):
-                        yield val
-                elif isinstance(statement, WhileStmt):
-                    for val in self._evaluate_as_generator(statement):
-                        yield val
-                elif isinstance(statement, IfExpr):
-                    for val in self._evaluate_as_generator(statement):
-                        yield val
-                elif isinstance(statement, TryStmt):
-                    for val in self._evaluate_as_generator(statement):
-                        yield val
-                elif hasattr(statement, 'body') and contains_yield(statement.body):
-                    for val in self._evaluate_as_generator(statement.body):
-                        yield val
-                else:
-                    self._execute(statement)
-            return
+        if isinstance(node, YieldExpr):
+            value = None
+            if node.value is not None:
+                value = yield from self._generate(node.value, sites)
+            return (yield from self._yield(value))
 
-        if isinstance(expression, IfExpr):
-            condition = self._evaluate(expression.condition)
-            if condition:
-                if contains_yield(expression.then_branch):
-                    for val in self._evaluate_as_generator(expression.then_branch):
-                        yield val
-                else:
-                    self._evaluate(expression.then_branch)
-            else:
-                if contains_yield(expression.else_branch):
-                    for val in self._evaluate_as_generator(expression.else_branch):
-                        yield val
-                else:
-                    self._evaluate(expression.else_branch)
-            return
+        if isinstance(node, AssignStmt):
+            value = yield from self._generate(node.value, sites)
+            self._assign_target(node.target, value)
+            return value
 
-        if isinstance(expression, ForInStmt):
-            iterable = self._evaluate(expression.iterable)
-            for item in iterable:
-                self.environment.define(expression.var_name, item)
-                if contains_yield(expression.body):
-                    for val in self._evaluate_as_generator(expression.body):
-                        yield val
-                else:
+        if isinstance(node, ReturnStmt):
+            raise _ReturnSignal((yield from self._generate(node.value, sites)))
+
+        if isinstance(node, IfExpr):
+            if (yield from self._generate(node.condition, sites)):
+                return (yield from self._generate(node.then_branch, sites))
+            return (yield from self._generate(node.else_branch, sites))
+
+        if isinstance(node, WhileStmt):
+            loop_result = None
+            try:
+                while (yield from self._generate(node.condition, sites)):
                     try:
-                        self._evaluate(expression.body)
+                        loop_result = yield from self._generate(node.body, sites)
                     except _ContinueSignal:
                         continue
-                    except _BreakSignal:
-                        break
-            return
+            except _BreakSignal:
+                pass
+            return loop_result
 
-        if isinstance(expression, ForOfStmt):
-            iterable = self._evaluate(expression.iterable)
-            if isinstance(iterable, dict):
-                items = list(iterable.items())
-            else:
-                items = iterable
-            for key, value in items:
-                self.environment.define(expression.key_var, key)
-                if expression.value_var:
-                    self.environment.define(expression.value_var, value)
-                if contains_yield(expression.body):
-                    for val in self._evaluate_as_generator(expression.body):
-                        yield val
-                else:
+        if isinstance(node, ForInStmt):
+            iterable = yield from self._generate(node.iterable, sites)
+            loop_result = None
+            try:
+                for item in iterable:
+                    self.environment.define(node.var_name, item)
                     try:
-                        self._evaluate(expression.body)
+                        loop_result = yield from self._generate(node.body, sites)
                     except _ContinueSignal:
                         continue
-                    except _BreakSignal:
-                        break
-            return
+            except _BreakSignal:
+                pass
+            return loop_result
 
-        if isinstance(expression, WhileStmt):
-            while self._evaluate(expression.condition):
-                if contains_yield(expression.body):
-                    for val in self._evaluate_as_generator(expression.body):
-                        yield val
-                else:
+        if isinstance(node, ForOfStmt):
+            iterable = yield from self._generate(node.iterable, sites)
+            loop_result = None
+            try:
+                items = iterable.items() if isinstance(iterable, dict) else iterable
+                for key, value in items:
+                    self.environment.define(node.key_var, key)
+                    if node.value_var:
+                        self.environment.define(node.value_var, value)
                     try:
-                        self._evaluate(expression.body)
+                        loop_result = yield from self._generate(node.body, sites)
                     except _ContinueSignal:
                         continue
-                    except _BreakSignal:
-                        break
-            return
-
-        if isinstance(expression, YieldExpr):
-            value = None
-            if expression.value is not None:
-                value = self._evaluate(expression.value)
-            yield value
-            return
-
-        if isinstance(expression, DoExpr):
-            func = self._evaluate(expression.body)
-            if not callable(func):
-                raise CoffeeRuntimeError("'do' requires a callable expression.")
-            result = func()
-            if hasattr(result, '__iter__') and not isinstance(result, (str, bytes, dict)):
-                for val in result:
-                    yield val
-            return
-
-        if isinstance(expression, SwitchExpr):
-            if expression.value is not None:
-                switch_value = self._evaluate(expression.value)
-                for conditions, body in expression.cases:
-                    for condition in conditions:
-                        cond_value = self._evaluate(condition)
-                        if switch_value == cond_value:
-                            if contains_yield(body):
-                                for val in self._evaluate_as_generator(body):
-                                    yield val
-                            return
-                if expression.default:
-                    if contains_yield(expression.default):
-                        for val in self._evaluate_as_generator(expression.default):
-                            yield val
-            else:
-                for conditions, body in expression.cases:
-                    for condition in conditions:
-                        cond_value = self._evaluate(condition)
-                        if cond_value:
-                            if contains_yield(body):
-                                for val in self._evaluate_as_generator(body):
-                                    yield val
-                            return
-                if expression.default:
-                    if contains_yield(expression.default):
-                        for val in self._evaluate_as_generator(expression.default):
-                            yield val
-            return
+            except _BreakSignal:
+                pass
+            return loop_result
 
-        if isinstance(expression, TryStmt):
+        if isinstance(node, TryStmt):
+            result = None
             try:
-                if contains_yield(expression.try_block):
-                    for val in self._evaluate_as_generator(expression.try_block):
-                        yield val
-                else:
-                    self._evaluate(expression.try_block)
+                result = yield from self._generate(node.try_block, sites)
             except _ThrowSignal as signal:
-                if expression.catch_block:
-                    if expression.catch_var:
-                        self.environment.define(expression.catch_var, signal.value)
-                    if contains_yield(expression.catch_block):
-                        for val in self._evaluate_as_generator(expression.catch_block):
-                            yield val
-                    else:
-                        self._evaluate(expression.catch_block)
-                else:
+                if not node.catch_block:
                     raise
+                if node.catch_var:
+                    self.environment.define(node.catch_var, signal.value)
+                result = yield from self._generate(node.catch_block, sites)
             finally:
-                if expression.finally_block:
-                    self._evaluate(expression.finally_block)
-            return
+                if node.finally_block:
+                    yield from self._generate(node.finally_block, sites)
+            return result
 
-        if isinstance(expression, ComprehensionExpr):
-            iterable = self._evaluate(expression.iterable)
+        if isinstance(node, SwitchExpr):
+            switch_value = None
+            if node.value is not None:
+                switch_value = yield from self._generate(node.value, sites)
+            for conditions, body in node.cases:
+                for condition in conditions:
+                    cond_value = yield from self._generate(condition, sites)
+                    if (switch_value == cond_value) if node.value is not None else cond_value:
+                        return (yield from self._generate(body, sites))
+            if node.default:
+                return (yield from self._generate(node.default, sites))
+            return None
+
+        if isinstance(node, ComprehensionExpr):
+            iterable = yield from self._generate(node.iterable, sites)
+            result = []
             for item in iterable:
-                self.environment.define(expression.var_name, item)
-                if expression.filter_condition:
-                    if not self._evaluate(expression.filter_condition):
-                        continue
-                if contains_yield(expression.body):
-                    for val in self._evaluate_as_generator(expression.body):
-                        yield val
-            return
+                self.environment.define(node.var_name, item)
+                if node.filter_condition and not (yield from self._generate(node.filter_condition, sites)):
+                    continue
+                result.append((yield from self._generate(node.body, sites)))
+            return result
+
+        if isinstance(node, ObjectComprehensionExpr):
+            iterable = yield from self._generate(node.iterable, sites)
+            items = iterable.items() if isinstance(iterable, dict) else enumerate(iterable)
+            result = {}
+            for key, value in items:
+                self.environment.define(node.key_var, key)
+                if node.value_var:
+                    self.environment.define(node.value_var, value)
+                if node.filter_condition and not (yield from self._generate(node.filter_condition, sites)):
+                    continue
+                result_key = yield from self._generate(node.key_expr, sites)
+                result[result_key] = yield from self._generate(node.value_expr, sites)
+            return result
 
-        self._evaluate(expression)
+        if isinstance(node, Binary):
+            left = yield from self._generate(node.left, sites)
+            if node.operator == OR:
+                return left if left else (yield from self._generate(node.right, sites))
+            if node.operator == AND:
+                return (yield from self._generate(node.right, sites)) if left else left
+            right = yield from self._generate(node.right, sites)
+            site = node.site
+            if site is None:
+                site = self._binary_site(node)
+            return site.evaluate(left, right)
+
+        if isinstance(node, ExistentialExpr):
+            left = yield from self._generate(node.left, sites)
+            if left is not None:
+                return left
+            return (yield from self._generate(node.right, sites))
+
+        if isinstance(node, SafeAccessExpr):
+            target = yield from self._generate(node.target, sites)
+            if target is None:
+                return None
+            try:
+                return self._get_attr_value(target, node.name, node)
+            except CoffeeRuntimeError:
+                return None
+
+        if isinstance(node, ArrayLiteral):
+            items = []
+            for item in node.items:
+                items.append((yield from self._generate(item, sites)))
+            return items
+
+        if isinstance(node, Call):
+            if isinstance(node.callee, GetAttr):
+                callee = self._load_attr(node.callee, (yield from self._generate(node.callee.target, sites)))
+            else:
+                callee = yield from self._generate(node.callee, sites)
+            args = []
+            for arg in node.args:
+                if isinstance(arg, SpreadExpr):
+                    self._spread_into(args, (yield from self._generate(arg.value, sites)))
+                else:
+                    args.append((yield from self._generate(arg, sites)))
+            kwargs = {}
+            for name, value_expr in node.kwargs:
+                kwargs[name] = yield from self._generate(value_expr, sites)
+            if not callable(callee):
+                raise CoffeeRuntimeError("Target is not callable.")
+            try:
+                return callee(*args, **kwargs)
+            except (CoffeeRuntimeError, _ThrowSignal, _BreakSignal, _ContinueSignal):
+                raise
+            except Exception as exc:
+                raise CoffeeRuntimeError(f"Call failed: {exc}") from exc
+
+        # Any other node runs the yields in it first, in order, and is then
+        # evaluated with each of them standing for the value it received.
+        received = self._current_generator.received
+        for site in yields:
+            value = None
+            if site.value is not None:
+                value = yield from self._generate(site.value, sites)
+            received[id(site)] = yield from self._yield(value)
+        if isinstance(node, Statement):
+            return self._execute(node)
+        return self._evaluate(node)
+
+    def _yield_sites(self, body) -> dict[int, tuple]:
+        entry = self._generator_bodies.get(id(body))
+        if entry is None:
+            entry = self._generator_bodies[id(body)] = (body, yield_sites(body))
+        return entry[1]
+
+    def _yield(self, value):
+        """Suspend the running generator on ``value``; return what it receives."""
+        environment = self.environment
+        received = yield value
+        self.environment = environment
+        return received
 
     def _evaluate(self, expression):
         if isinstance(expression, Literal):
-            value = expression.value
-            if isinstance(value, tuple) and len(value) == 3 and value[0] == "regex":
-                import re
-                pattern, flags_str = value[1], value[2]
-                flags = 0
-                if "i" in flags_str:
-                    flags |= re.IGNORECASE
-                if "m" in flags_str:
-                    flags |= re.MULTILINE
-                if "s" in flags_str:
-                    flags |= re.DOTALL
-                return re.compile(pattern, flags)
-            return value
+            return expression.value
+
+        if isinstance(expression, RegexLiteral):
+            return compile_regex(expression.pattern, expression.flags)
 
         if isinstance(expression, BlockExpr):
             block_result = None
@@ -1071,9 +1564,11 @@ class Interpreter:
             return self._evaluate(expression.else_branch)
 
         if isinstance(expression, FunctionLiteral):
-            if contains_yield(expression.body):
-                return CoffeeGeneratorFunction(expression.params, expression.body, self.environment, self, expression.splat_param, dict(expression.defaults) if expression.defaults else {}, expression.this_params, expression.bound)
-            return CoffeeFunction(expression.params, expression.body, self.environment, self, expression.splat_param, dict(expression.defaults) if expression.defaults else {}, expression.this_params, expression.bound)
+            info = function_info(expression)
+            # A bound function that never reads ``this`` has nothing to capture.
+            bound = expression.bound and info.uses_this
+            function_class = CoffeeGeneratorFunction if info.is_generator else CoffeeFunction
+            return function_class(expression.params, expression.body, self.environment, self, expression.splat_param, info.defaults, expression.this_params, bound)
 
         if isinstance(expression, ArrayLiteral):
             return [self._evaluate(item) for item in expression.items]
@@ -1085,40 +1580,13 @@ class Interpreter:
             return object_value
 
         if isinstance(expression, RangeLiteral):
-            start = self._evaluate(expression.start)
-            end = self._evaluate(expression.end)
-            step = self._evaluate(expression.step) if expression.step else None
-            
-            if not isinstance(start, (int, float)) or not isinstance(end, (int, float)):
-                raise CoffeeRuntimeError("Range bounds must be numbers.")
-            
-            start_int = int(start)
-            end_int = int(end)
-            
-            if step is not None:
-                step_int = int(step)
-            elif start_int > end_int:
-                step_int = -1
-            else:
-                step_int = 1
-            
-            if expression.exclusive:
-                if step_int > 0:
-                    return list(range(start_int, end_int, step_int))
-                else:
-                    return list(range(start_int, end_int - 1, step_int))
-            else:
-                if step_int > 0:
-                    return list(range(start_int, end_int + 1, step_int))
-                else:
-                    return list(range(start_int, end_int - 1, step_int))
+            return list(self._range_numbers(expression))
 
         if isinstance(expression, GetAttr):
-            target = self._evaluate(expression.target)
-            return self._get_attr_value(target, expression.name, expression)
+            return self._load_attr(expression, self._operand(expression.target))
 
         if isinstance(expression, IndexExpr):
-            target = self._evaluate(expression.target)
+            target = self._operand(expression.target)
             index = self._evaluate(expression.index)
             try:
                 return target[index]
@@ -1126,7 +1594,7 @@ class Interpreter:
                 raise CoffeeRuntimeError(f"Index operation failed: {exc}") from exc
 
         if isinstance(expression, SliceExpr):
-            target = self._evaluate(expression.target)
+            target = self._operand(expression.target)
             start = self._evaluate(expression.start) if expression.start else None
             end = self._evaluate(expression.end) if expression.end else None
             
@@ -1144,28 +1612,51 @@ class Interpreter:
                 raise CoffeeRuntimeError(f"Slice operation failed: {exc}") from exc
 
         if isinstance(expression, Call):
-            callee = self._evaluate(expression.callee)
+            receiver = method = None
+            if isinstance(expression.callee, GetAttr):
+                # ``obj.name(args)``: run a class method on ``obj`` without
+                # binding it first.
+                receiver = self._operand(expression.callee.target)
+                cache = expression.callee.cache
+                if cache is None:
+                    cache = self._attribute_cache(expression.callee)
+                method = cache.find_method(receiver)
+                if method is None:
+                    callee = self._load_attr(expression.callee, receiver)
+            else:
+                callee = self._evaluate(expression.callee)
             
             expanded_args = []
             for arg in expression.args:
                 if isinstance(arg, SpreadExpr):
-                    spread_value = self._evaluate(arg.value)
-                    if spread_value is not None:
-                        try:
-                            expanded_args.extend(spread_value)
-                        except Exception:
-                            expanded_args.append(spread_value)
+                    self._spread_into(expanded_args, self._evaluate(arg.value))
                 else:
                     expanded_args.append(self._evaluate(arg))
             
             kwargs = {name: self._evaluate(value_expr) for name, value_expr in expression.kwargs}
 
+            if method is not None:
+                try:
+                    return call_method(receiver, method, expanded_args, kwargs)
+                except (CoffeeRuntimeError, _ThrowSignal, _BreakSignal, _ContinueSignal):
+                    raise
+                except Exception as exc:
+                    raise CoffeeRuntimeError(f"Call failed: {exc}") from exc
+
             if not callable(callee):
                 raise CoffeeRuntimeError("Target is not callable.")
 
             try:
-                return callee(*expanded_args, **kwargs)
-            except CoffeeRuntimeError:
+                if kwargs:
+                    return callee(*expanded_args, **kwargs)
+                site = expression.site
+                if site is None:
+                    site = self._call_site(expression)
+                elif type(callee) is CoffeeFunction and callee.body is site.body and len(expanded_args) == site.arity:
+                    site.hits += 1
+                    return callee.call_exact(expanded_args)
+                return site.call(callee, expanded_args)
+            except (CoffeeRuntimeError, _ThrowSignal, _BreakSignal, _ContinueSignal):
                 raise
             except Exception as exc:
                 raise CoffeeRuntimeError(f"Call failed: {exc}") from exc
@@ -1225,7 +1716,7 @@ class Interpreter:
             return self._evaluate(expression.right)
 
         if isinstance(expression, SafeAccessExpr):
-            target = self._evaluate(expression.target)
+            target = self._operand(expression.target)
             if target is None:
                 return None
             try:
@@ -1251,15 +1742,12 @@ class Interpreter:
             return self._evaluate(expression.value)
 
         if isinstance(expression, InterpolatedString):
-            result = ""
-            for part in expression.parts:
-                value = self._evaluate(part)
-                result += str(value) if value is not None else ""
-            return result
+            values = [self._evaluate(part) for part in expression.parts]
+            return "".join(["" if value is None else str(value) for value in values])
 
         if isinstance(expression, InExpr):
             value = self._evaluate(expression.value)
-            container = self._evaluate(expression.container)
+            container = self._operand(expression.container)
             try:
                 return value in container
             except Exception:
@@ -1276,7 +1764,16 @@ class Interpreter:
                 return False
 
         if isinstance(expression, ComprehensionExpr):
-            iterable = self._evaluate(expression.iterable)
+            source, stages = comprehension_stages(expression)
+            if expression.lazy or len(stages) > 1:
+                return self._comprehension_pipeline(source, stages, expression.lazy)
+            iterable = self._iterable(expression.iterable)
+            plan = vector_plan(expression)
+            if plan is not None:
+                result = plan.run(iterable, lambda: [self._evaluate(node) for node in plan.operands], self.numpy_arrays)
+                if result is not None:
+                    self.environment.define(expression.var_name, iterable[-1])
+                    return result
             result = []
             for item in iterable:
                 self.environment.define(expression.var_name, item)
@@ -1291,9 +1788,9 @@ class Interpreter:
             result = {}
             
             if isinstance(iterable, dict):
-                items = list(iterable.items())
+                items = iterable.items()
             else:
-                items = [(i, item) for i, item in enumerate(iterable)]
+                items = enumerate(iterable)
             
             for key, value in items:
                 self.environment.define(expression.key_var, key)
@@ -1320,12 +1817,10 @@ class Interpreter:
             return func()
 
         if isinstance(expression, YieldExpr):
+            # Generators run their yields in ``_generate`` before reaching here.
             if self._current_generator is None:
                 raise CoffeeRuntimeError("'yield' used outside generator function.")
-            value = None
-            if expression.value is not None:
-                value = self._evaluate(expression.value)
-            raise _YieldSignal(value)
+            return self._current_generator.received.pop(id(expression), None)
 
         if isinstance(expression, ChainedComparison):
             for i in range(len(expression.operators)):
@@ -1345,18 +1840,61 @@ class Interpreter:
 
         raise CoffeeRuntimeError("Unsupported expression.")
 
+    def _comprehension_pipeline(self, source, stages: list[ComprehensionExpr], lazy: bool):
+        """Run comprehension ``stages`` (see ``comprehension_stages``) as one
+        loop over ``source``; a generator when ``lazy``, else a list."""
+        iterable = self._iterable(source)
+        environment = self.environment
+
+        def results():
+            for item in iterable:
+                previous = self.environment
+                self.environment = environment
+                kept = True
+                try:
+                    for stage in stages:
+                        environment.define(stage.var_name, item)
+                        if stage.filter_condition and not self._evaluate(stage.filter_condition):
+                            kept = False
+                            break
+                        item = self._evaluate(stage.body)
+                finally:
+                    self.environment = previous
+                if kept:
+                    yield item
+
+        return results() if lazy else list(results())
+
+    def _range_numbers(self, expression: RangeLiteral) -> range:
+        start = self._evaluate(expression.start)
+        end = self._evaluate(expression.end)
+        step = self._evaluate(expression.step) if expression.step else None
+        return range_numbers(start, end, expression.exclusive, step)
+
+    def _iterable(self, expression):
+        """Evaluate what a loop iterates over; a range literal gives its numbers."""
+        if isinstance(expression, RangeLiteral):
+            return self._range_numbers(expression)
+        return self._evaluate(expression)
+
+    def _operand(self, expression):
+        """Evaluate an operand that is read in place (see ``CoffeeRange``); a
+        range literal there stays lazy."""
+        if isinstance(expression, RangeLiteral):
+            return CoffeeRange(self._range_numbers(expression))
+        return self._evaluate(expression)
+
     def _lookup_identifier(self, node: Identifier):
         name = node.name
-        try:
-            return self.environment.get(name)
-        except CoffeeRuntimeError:
-            pass
+        scope = self.environment
+        while scope is not None:
+            values = scope.values
+            if name in values:
+                return values[name]
+            scope = scope.parent
 
         if hasattr(py_builtins, name):
-            value = getattr(py_builtins, name)
-            if isinstance(value, (BuiltinFunctionType, type)) or callable(value):
-                return value
-            return value
+            return getattr(py_builtins, name)
 
         raise self._error(f"Undefined identifier '{name}'.", node)
 
@@ -1375,34 +1913,38 @@ class Interpreter:
 
         left = self._evaluate(expression.left)
         right = self._evaluate(expression.right)
+        site = expression.site
+        if site is None:
+            site = self._binary_site(expression)
+        elif type(left) is site.left_type and type(right) is site.right_type:
+            site.hits += 1
+            return site.fast(left, right)
+        return site.evaluate(left, right)
 
-        if expression.operator == EQEQ:
-            return left == right
-        if expression.operator == NEQ:
-            return left != right
-        if expression.operator == LT:
-            return left < right
-        if expression.operator == LTE:
-            return left <= right
-        if expression.operator == GT:
-            return left > right
-        if expression.operator == GTE:
-            return left >= right
-
-        binary_ops = {
-            PLUS: operator.add,
-            MINUS: operator.sub,
-            STAR: operator.mul,
-            SLASH: operator.truediv,
-            PERCENT: operator.mod,
-            STARSTAR: operator.pow,
-        }
-
-        fn = binary_ops.get(expression.operator)
-        if fn is None:
+    @staticmethod
+    def _binary_site(node: Binary):
+        from .quicken import BINARY_OPERATORS, BinarySite
+
+        if node.operator not in BINARY_OPERATORS:
             raise CoffeeRuntimeError("Unsupported binary operator.")
+        site = BinarySite(node.operator)
+        object.__setattr__(node, "site", site)
+        return site
 
+    @staticmethod
+    def _spread_into(args: list, value) -> None:
+        """Append the items of a spread argument ``...value`` to ``args``."""
+        if value is None:
+            return
         try:
-            return fn(left, right)
-        except Exception as exc:
-            raise CoffeeRuntimeError(f"Binary operation failed: {exc}") from exc
+            args.extend(value)
+        except Exception:
+            args.append(value)
+
+    @staticmethod
+    def _call_site(node: Call):
+        from .quicken import CallSite
+
+        site = CallSite()
+        object.__setattr__(node, "site", site)
+        return site
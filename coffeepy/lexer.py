@@ -1,5 +1,10 @@
 from __future__ import annotations
 
+import mmap
+import re
+import sys
+from typing import BinaryIO, Iterable, Iterator, TextIO
+
 from .errors import CoffeeLexerError
 from .tokens import (
     AND,
@@ -38,8 +43,11 @@ from .tokens import (
     IMPORT,
     IN,
     INDENT,
+    INTERPOLATION_END,
+    INTERPOLATION_START,
     IS,
     ISNT,
+    KIND_CODES,
     LBRACE,
     LBRACKET,
     LPAREN,
@@ -80,6 +88,8 @@ from .tokens import (
     STARSTAR,
     STAR_EQ,
     STRING,
+    STRING_END,
+    STRING_START,
     SUPER,
     SWITCH,
     THEN,
@@ -88,6 +98,7 @@ from .tokens import (
     TRUE,
     TRY,
     Token,
+    TokenBuffer,
     UNDEFINED,
     UNTIL,
     UNLESS,
@@ -142,11 +153,152 @@ KEYWORDS = {
     "yield": YIELD,
 }
 
+# Tokens that always mean the same thing, longest first so that the master
+# pattern prefers "..." over ".." over ".".
+OPERATORS = {
+    "(": LPAREN,
+    ")": RPAREN,
+    "[": LBRACKET,
+    "]": RBRACKET,
+    "{": LBRACE,
+    "}": RBRACE,
+    "::": PROTO,
+    ":": COLON,
+    ",": COMMA,
+    "...": DOTDOTDOT,
+    "..": DOTDOT,
+    ".": DOT,
+    ";": SEMICOLON,
+    "@": AT,
+    "?.": QUESTIONDOT,
+    "?=": QUESTIONEQ,
+    "?": QUESTION,
+    "&&=": ANDAND_EQ,
+    "&&": ANDAND,
+    "||=": OROR_EQ,
+    "||": OROR,
+    "!=": NEQ,
+    "<=": LTE,
+    "<": LT,
+    ">=": GTE,
+    ">": GT,
+    "++": PLUSPLUS,
+    "+=": PLUS_EQ,
+    "+": PLUS,
+    "->": ARROW,
+    "--": MINUSMINUS,
+    "-=": MINUS_EQ,
+    "-": MINUS,
+    "=>": FAT_ARROW,
+    "==": EQEQ,
+    "=": EQ,
+    "**": STARSTAR,
+    "*=": STAR_EQ,
+    "*": STAR,
+    "%=": PERCENT_EQ,
+    "%": PERCENT,
+    "/=": SLASH_EQ,
+}
+
+# Spaces and tabs, then one alternative per kind of token the master pattern
+# handles in a single match. Anything else -- strings with escapes or interpolations, block
+# strings, regexes, non-ASCII identifiers and errors -- is left to
+# ``Lexer._scan_token``. So are numbers followed by non-ASCII text, since
+# ``str.isdigit`` accepts more than [0-9]; the lookahead also stops a number
+# from matching only part of its digits.
+MASTER_PATTERN = re.compile(
+    r"""
+    [ \t]*
+    (?:
+    (?P<newline>\n)
+    | (?P<comment>\#[^\n]*)
+    | (?P<name>[A-Za-z_$][\w$]*)
+    | (?P<number>[0-9]+(?:\.[0-9]+)?)(?!\.?(?:[0-9]|[^\x00-\x7f]))
+    | (?P<string>"(?!"")[^"\\\n\#]*"|'(?!'')[^'\\\n]*')
+    | (?P<operator>"""
+    + "|".join(re.escape(op) for op in sorted(OPERATORS, key=len, reverse=True))
+    + r""")
+    | (?P<slash>/(?=[ \t\n\0]|\Z))
+    )?
+    """,
+    re.VERBOSE,
+)
+
+# KEYWORDS and OPERATORS with the kinds as ``KIND_CODES``, for the master
+# loop to store directly.
+_KEYWORD_CODES = {text: KIND_CODES[kind] for text, kind in KEYWORDS.items()}
+_OPERATOR_CODES = {text: KIND_CODES[kind] for text, kind in OPERATORS.items()}
+
+_LINE_PREFIX = re.compile(r"([ \t]*)(\#[^\n]*)?")
+
+# Runs of string text that need no escape or interpolation handling.
+_STRING_TEXT = {'"': re.compile(r'[^"\\\n#]+'), "'": re.compile(r"[^'\\\n]+")}
+
+
+CHUNK_SIZE = 1 << 16
+
+
+def read_chunks(
+    source: str | TextIO | BinaryIO | mmap.mmap | Iterable[str | bytes], size: int = CHUNK_SIZE
+) -> Iterator[str]:
+    """Yield the text of ``source`` in pieces that end at a line end.
+
+    ``source`` is a string, a text or binary file, an ``mmap`` -- read
+    about ``size`` characters or bytes at a time, completed to the end of
+    the line -- or any other iterable of lines. Every line end becomes
+    "\\n" and bytes are decoded as UTF-8."""
+    if isinstance(source, str):
+        chunks = _split_text(source, size)
+    elif hasattr(source, "read") and hasattr(source, "readline"):
+        chunks = _read_file(source, size)
+    else:
+        chunks = source
+    for chunk in chunks:
+        if not isinstance(chunk, str):
+            chunk = str(chunk, "utf-8")
+        if "\r" in chunk:
+            chunk = chunk.replace("\r\n", "\n").replace("\r", "\n")
+        yield chunk
+
+
+def _split_text(source: str, size: int) -> Iterator[str]:
+    start = 0
+    while start < len(source):
+        end = source.find("\n", start + size - 1) + 1 or len(source)
+        yield source[start:end]
+        start = end
+
+
+def _read_file(file, size: int) -> Iterator[str | bytes]:
+    while True:
+        chunk = file.read(size)
+        if not chunk:
+            return
+        if chunk[-1:] not in ("\n", b"\n"):
+            chunk += file.readline()
+        yield chunk
+
 
 class Lexer:
-    def __init__(self, source: str):
-        self.source = source.replace("\r\n", "\n").replace("\r", "\n")
-        self.tokens: list[Token] = []
+    """Turns CoffeePy source into tokens.
+
+    Tokens are written to a ``TokenBuffer`` rather than built as Token
+    objects. ``token_buffer()`` returns the buffer of the whole source,
+    which is what the parser reads; ``tokenize()`` returns its tokens as a
+    list of Tokens.
+
+    The source is read in chunks of whole lines (``read_chunks``);
+    ``self.source`` holds only the chunk being tokenized, plus the following
+    ones while a block string or heregex runs into them. ``stream()`` yields
+    the tokens of each chunk as soon as it has been read, and ``batches()``
+    the buffer of each chunk, so neither the whole source nor all of its
+    tokens have to be in memory at once.
+    """
+
+    def __init__(self, source: str | TextIO | BinaryIO | mmap.mmap | Iterable[str | bytes]):
+        self._chunks = read_chunks(source)
+        self.source = ""
+        self.buffer = TokenBuffer()
         self.start = 0
         self.current = 0
         self.line = 1
@@ -155,9 +307,75 @@ class Lexer:
         self.start_column = 1
         self.at_line_start = True
         self.indents = [0]
+        self.master_pattern = True
+        # Number of ``#{...}`` expressions being read.
+        self.interpolating = 0
+
+    def token_buffer(self, master_pattern: bool = True) -> TokenBuffer:
+        """Return the tokens of the whole source. By default most tokens are
+        matched whole by ``MASTER_PATTERN``; with ``master_pattern=False``
+        every token is scanned character by character, which gives the same
+        tokens more slowly."""
+        text = "".join(self._chunks)
+        self._chunks = iter([text] if text else [])
+        (buffer,) = self._batches(master_pattern)
+        return buffer
+
+    def tokenize(self, master_pattern: bool = True) -> list[Token]:
+        """Return the tokens of the source as Token objects."""
+        return list(self.token_buffer(master_pattern))
+
+    def stream(self, master_pattern: bool = True) -> Iterator[Token]:
+        """Yield the tokens of the source, reading it a chunk at a time."""
+        for buffer in self._batches(master_pattern):
+            yield from buffer
+
+    def batches(self, master_pattern: bool = True) -> Iterator[TokenBuffer]:
+        """Yield the ``TokenBuffer`` of each chunk of the source as soon as
+        it has been read. This is the stream the parser reads fastest."""
+        return self._batches(master_pattern)
+
+    def _batches(self, master_pattern: bool) -> Iterator[TokenBuffer]:
+        """Tokenize the source a chunk at a time, yielding the buffer of each
+        chunk; the last one ends with the closing outdents and EOF."""
+        self.master_pattern = master_pattern
+        scan = self._tokenize_master if master_pattern else self._tokenize_characters
+        more = self._refill()
+        while True:
+            buffer = self.buffer = TokenBuffer(first_line=self.line)
+            if more:
+                scan()
+            buffer.text = self.source
+            more = self._next_chunk()
+            if not more:
+                break
+            yield buffer
 
-    def tokenize(self) -> list[Token]:
-        while not self._is_at_end():
+        end = len(buffer.text)
+        while len(self.indents) > 1:
+            self.indents.pop()
+            buffer.append(OUTDENT, end - self.column + 1, end - self.column + 1)
+        buffer.append(EOF, end, end)
+        yield buffer
+
+    def _next_chunk(self) -> bool:
+        """Drop the text tokenized so far and read the next chunk."""
+        self.source = self.source[self.current :]
+        self.start -= self.current
+        self.current = 0
+        return self._refill()
+
+    def _refill(self) -> bool:
+        """Append the next chunk to ``self.source``; False at the end of the
+        input."""
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            return False
+        self.source += chunk
+        return True
+
+    def _tokenize_characters(self) -> None:
+        while self.current < len(self.source):
             if self.at_line_start and self._consume_line_prefix():
                 continue
 
@@ -169,12 +387,140 @@ class Lexer:
             self.start_column = self.column
             self._scan_token()
 
-        while len(self.indents) > 1:
-            self.indents.pop()
-            self.tokens.append(Token(OUTDENT, "", None, self.line, 1))
+    def _tokenize_master(self, interpolation: bool = False) -> bool:
+        """Tokenize with ``MASTER_PATTERN``, handing what it does not match to
+        ``_scan_token``. With ``interpolation``, stop after the ``}`` that
+        ends the interpolation being read and return True, or return False
+        at the end of the line."""
+        source = self.source
+        end = len(source)
+        buffer = self.buffer
+        add_kind = buffer.kinds.append
+        add_start = buffer.starts.append
+        add_end = buffer.ends.append
+        add_value = buffer.values.append
+        match = MASTER_PATTERN.match
+        intern = sys.intern
+        keywords = _KEYWORD_CODES
+        operators = _OPERATOR_CODES
+        codes = KIND_CODES
+        ident, number, string, slash = codes[IDENT], codes[NUMBER], codes[STRING], codes[SLASH]
+        depth = 0
+        # The position lives in locals and is written back to ``self`` around
+        # the calls that need it.
+        current, line, column = self.current, self.line, self.column
+
+        while current < end:
+            if self.at_line_start:
+                self.current, self.line, self.column = current, line, column
+                consumed = self._consume_line_prefix_master()
+                current, line, column = self.current, self.line, self.column
+                source, end = self.source, len(self.source)
+                if consumed:
+                    continue
+                if current >= end:
+                    break
+
+            found = match(source, current)
+            group = found.lastgroup
+            stop = found.end()
+            if group is None:
+                if stop > current:
+                    # Only spaces; the next match deals with what follows.
+                    column += stop - current
+                    current = stop
+                    continue
+                self.current = self.start = current
+                self.line = self.start_line = line
+                self.column = self.start_column = column
+                self._scan_token()
+                # A block string or heregex may have read more lines.
+                current, line, column = self.current, self.line, self.column
+                source, end = self.source, len(self.source)
+                continue
+
+            start = found.start(group)
+            column += start - current
+            if group == "name":
+                text = found.group(group)
+                code = keywords.get(text)
+                if code is None:
+                    add_kind(ident)
+                    add_value(intern(text))
+                else:
+                    add_kind(code)
+                    add_value(None)
+            elif group == "operator":
+                text = found.group(group)
+                if interpolation and (text == "{" or text == "}"):
+                    if text == "{":
+                        depth += 1
+                    elif depth:
+                        depth -= 1
+                    else:
+                        buffer.append(INTERPOLATION_END, start, stop)
+                        self.current, self.line, self.column = stop, line, column + 1
+                        return True
+                add_kind(operators[text])
+                add_value(None)
+            elif group == "newline":
+                if interpolation:
+                    break
+                buffer.append(NEWLINE, start, stop)
+                # Indentation errors on the next line report this position, as
+                # they do after ``_scan_token`` read the newline.
+                self.start, self.start_line, self.start_column = start, line, column
+                self.at_line_start = True
+                current = stop
+                line += 1
+                column = 1
+                continue
+            elif group == "number":
+                text = found.group(group)
+                add_kind(number)
+                add_value(float(text) if "." in text else int(text))
+            elif group == "string":
+                add_kind(string)
+                add_value(source[start + 1 : stop - 1])
+            elif group == "slash":
+                add_kind(slash)
+                add_value(None)
+            else:
+                # A comment.
+                column += stop - start
+                current = stop
+                continue
+            add_start(start)
+            add_end(stop)
+            column += stop - start
+            current = stop
+
+        self.current, self.line, self.column = current, line, column
+        return False
 
-        self.tokens.append(Token(EOF, "", None, self.line, self.column))
-        return self.tokens
+    def _consume_line_prefix_master(self) -> bool:
+        """``_consume_line_prefix`` with the indentation and a comment-only
+        line matched by one regex."""
+        whitespace, comment = _LINE_PREFIX.match(self.source, self.current).groups()
+        self.current += len(whitespace)
+        self.column += len(whitespace)
+
+        if self._is_at_end():
+            return False
+
+        if comment:
+            self.current += len(comment)
+            self.column += len(comment)
+            if not self._is_at_end():
+                self._emit_newline()
+            return True
+
+        if self.source[self.current] == "\n":
+            self._emit_newline()
+            return True
+
+        self._indent_to(len(whitespace) + 3 * whitespace.count("\t"))
+        return False
 
     def _consume_line_prefix(self) -> bool:
         indent = 0
@@ -196,25 +542,27 @@ class Lexer:
                 self._emit_newline()
             return True
 
+        self._indent_to(indent)
+        return False
+
+    def _indent_to(self, indent: int) -> None:
         current_indent = self.indents[-1]
+        line_start = self.current - self.column + 1
         if indent > current_indent:
             self.indents.append(indent)
-            self.tokens.append(Token(INDENT, "", None, self.line, 1))
+            self.buffer.append(INDENT, line_start, line_start)
         elif indent < current_indent:
             while indent < self.indents[-1]:
                 self.indents.pop()
-                self.tokens.append(Token(OUTDENT, "", None, self.line, 1))
+                self.buffer.append(OUTDENT, line_start, line_start)
             if indent != self.indents[-1]:
                 raise self._error("Inconsistent indentation.")
 
         self.at_line_start = False
-        return False
 
     def _emit_newline(self) -> None:
-        line = self.line
-        column = self.column
+        self.buffer.append(NEWLINE, self.current, self.current + 1)
         self._advance()  # consume '\n'
-        self.tokens.append(Token(NEWLINE, "\n", None, line, column))
         self.at_line_start = True
 
     def _scan_token(self) -> None:
@@ -224,7 +572,7 @@ class Lexer:
             return
 
         if ch == "\n":
-            self.tokens.append(Token(NEWLINE, "\n", None, self.start_line, self.start_column))
+            self._add_token(NEWLINE)
             self.at_line_start = True
             return
 
@@ -363,6 +711,12 @@ class Lexer:
             self._string(ch)
             return
 
+        if ch == "\\" and self.interpolating and self._peek() in {'"', "'"}:
+            # "#{\"nested\"}": a string whose quotes are escaped for the
+            # enclosing string.
+            self._string(self._advance(), escaped=True)
+            return
+
         if ch == "/":
             if self._peek() == "/" and self._peek_next() == "/":
                 self._advance()
@@ -386,64 +740,137 @@ class Lexer:
 
         raise self._error(f"Unexpected character '{ch}'.")
 
-    def _string(self, quote: str) -> None:
-        is_block = (self._peek() == quote and self._peek_next() == quote)
-        if is_block:
+    def _string(self, quote: str, escaped: bool = False) -> None:
+        block = not escaped and self._peek() == quote and self._peek_next() == quote
+        if block:
             self._advance()
             self._advance()
-            self._block_string(quote)
+
+        texts, interpolations = self._string_contents(quote, block, escaped)
+        if block:
+            texts = self._dedent_block_texts(texts)
+
+        if not interpolations:
+            self._add_token(STRING, texts[0])
             return
-        
+
+        # "a#{b}c" becomes STRING_START, STRING "a", INTERPOLATION_START, the
+        # tokens of b, INTERPOLATION_END, STRING "c", STRING_END; empty text
+        # parts are left out.
+        delimiter = quote * 3 if block else "\\" + quote if escaped else quote
+        start = self.start
+        self.buffer.append(STRING_START, start, start + len(delimiter))
+        for index, text in enumerate(texts):
+            if text:
+                self.buffer.append(STRING, start, start, text, lexeme=text)
+            if index < len(interpolations):
+                self.buffer.extend(interpolations[index])
+        self.buffer.append(STRING_END, self.current - len(delimiter), self.current)
+
+    def _string_contents(self, quote: str, block: bool, escaped: bool = False) -> tuple[list[str], list[TokenBuffer]]:
+        """Read a string body up to its closing quote, or up to a backslash
+        and quote when ``escaped``. Returns the text parts and, between each
+        pair of them, the tokens of one interpolation. Only double-quoted
+        strings interpolate."""
+        texts: list[str] = []
+        interpolations: list[TokenBuffer] = []
         chars: list[str] = []
+        text_run = _STRING_TEXT[quote].match if self.master_pattern else None
 
         while not self._is_at_end():
+            if text_run is not None:
+                run = text_run(self.source, self.current)
+                if run is not None:
+                    chars.append(run.group())
+                    self.column += run.end() - self.current
+                    self.current = run.end()
+                    continue
+
             ch = self._advance()
-            if ch == quote:
-                self._add_token(STRING, "".join(chars))
-                return
+
+            if ch == quote and (not block or (self._peek() == quote and self._peek_next() == quote)):
+                if block:
+                    self._advance()
+                    self._advance()
+                texts.append("".join(chars))
+                return texts, interpolations
 
             if ch == "\\":
+                if escaped and self._peek() == quote:
+                    self._advance()
+                    texts.append("".join(chars))
+                    return texts, interpolations
                 chars.append(self._read_escape())
                 continue
 
-            if ch == "\n":
+            if ch == "\n" and not block:
                 raise self._error("Unterminated string literal.")
 
-            chars.append(ch)
+            if ch == "#" and quote == '"' and self._peek() == "{":
+                texts.append("".join(chars))
+                chars = []
+                interpolations.append(self._interpolation())
+                continue
 
-        raise self._error("Unterminated string literal.")
+            chars.append(ch)
 
-    def _block_string(self, quote: str) -> None:
-        chars: list[str] = []
-        lines: list[str] = []
-        current_line: list[str] = []
-        
-        while not self._is_at_end():
-            ch = self._advance()
-            
-            if ch == quote and self._peek() == quote and self._peek_next() == quote:
+        raise self._error("Unterminated block string." if block else "Unterminated string literal.")
+
+    def _interpolation(self) -> TokenBuffer:
+        """Tokenize the expression of a ``#{...}`` whose ``#`` was just read,
+        including the ``INTERPOLATION_START``/``INTERPOLATION_END`` tokens.
+        Braces inside the expression nest and strings in it may interpolate
+        again."""
+        outer = self.buffer
+        start, start_line, start_column = self.start, self.start_line, self.start_column
+        line, column = self.line, self.column - 1
+        self.buffer = TokenBuffer(self.source)
+        self.buffer.append(INTERPOLATION_START, self.current - 1, self.current + 1)
+        self._advance()  # consume '{'
+        self.interpolating += 1
+        try:
+            if self.master_pattern:
+                closed = self._tokenize_master(interpolation=True)
+            else:
+                closed = self._scan_interpolation()
+            if not closed:
+                self.start_line, self.start_column = line, column
+                raise self._error("Unterminated string interpolation.")
+            return self.buffer
+        finally:
+            self.interpolating -= 1
+            self.buffer = outer
+            self.start, self.start_line, self.start_column = start, start_line, start_column
+
+    def _scan_interpolation(self) -> bool:
+        depth = 0
+        while True:
+            while self._peek() in {" ", "\t"}:
                 self._advance()
+            if self._is_at_end() or self._peek() == "\n":
+                return False
+            if self._peek() == "}" and depth == 0:
+                self.buffer.append(INTERPOLATION_END, self.current, self.current + 1)
                 self._advance()
-                
-                result = "".join(chars)
-                result = self._dedent_block_string(result)
-                self._add_token(STRING, result)
-                return
-
-            if ch == "\\":
-                escaped = self._read_escape()
-                chars.append(escaped)
-                current_line.append(escaped)
-                continue
-
-            chars.append(ch)
-            current_line.append(ch)
-            
-            if ch == "\n":
-                lines.append("".join(current_line))
-                current_line = []
+                return True
+            if self._peek() == "{":
+                depth += 1
+            elif self._peek() == "}":
+                depth -= 1
+            self.start = self.current
+            self.start_line = self.line
+            self.start_column = self.column
+            self._scan_token()
 
-        raise self._error("Unterminated block string.")
+    def _dedent_block_texts(self, texts: list[str]) -> list[str]:
+        if len(texts) == 1:
+            return [self._dedent_block_string(texts[0])]
+        # Dedent the text parts together, with a marker standing in for each
+        # interpolation so that lines holding one count as content.
+        marker = "\ue000"
+        while any(marker in text for text in texts):
+            marker = chr(ord(marker) + 1)
+        return self._dedent_block_string(marker.join(texts)).split(marker)
 
     def _dedent_block_string(self, text: str) -> str:
         lines = text.split("\n")
@@ -633,12 +1060,14 @@ class Lexer:
             self._advance()
 
         text = self.source[self.start : self.current]
-        kind = KEYWORDS.get(text, IDENT)
-        self._add_token(kind)
+        kind = KEYWORDS.get(text)
+        if kind is None:
+            self._add_token(IDENT, sys.intern(text))
+        else:
+            self._add_token(kind)
 
     def _add_token(self, kind: str, literal: object = None) -> None:
-        lexeme = self.source[self.start : self.current]
-        self.tokens.append(Token(kind, lexeme, literal, self.start_line, self.start_column))
+        self.buffer.append(kind, self.start, self.current, literal)
 
     def _match(self, expected: str) -> bool:
         if self._is_at_end() or self.source[self.current] != expected:
@@ -652,7 +1081,7 @@ class Lexer:
         return self.source[self.current]
 
     def _peek_next(self) -> str:
-        if self.current + 1 >= len(self.source):
+        if self.current + 1 >= len(self.source) and not self._refill():
             return "\0"
         return self.source[self.current + 1]
 
@@ -667,7 +1096,7 @@ class Lexer:
         return ch
 
     def _is_at_end(self) -> bool:
-        return self.current >= len(self.source)
+        return self.current >= len(self.source) and not self._refill()
 
     @staticmethod
     def _is_identifier_start(ch: str) -> bool:
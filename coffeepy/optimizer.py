@@ -0,0 +1,277 @@
+"""
+CoffeePy - AST Optimizer
+========================
+
+An optional pass between ``Parser.parse`` and execution that rewrites a
+``Program`` into an equivalent, cheaper one:
+
+* ``Binary``, ``Unary``, ``ChainedComparison`` and ``InterpolatedString``
+  nodes whose operands are all constants are folded into a single
+  ``Literal`` (``60 * 60 * 24`` becomes ``86400``). An operation that would
+  fail at runtime is left alone so the error still happens where it did.
+* the container of an ``in`` test that is an array or range of constants is
+  hoisted into a ``frozenset`` literal, built once instead of on every test.
+* statements following ``return``, ``throw``, ``break`` or ``continue`` in a
+  block are dropped.
+* an ``if`` with a constant condition is replaced by the branch it takes.
+
+Code that contains ``yield`` is never removed, since that would change
+whether the enclosing function is a generator. The tree is immutable, so the
+pass returns new nodes and leaves the original ``Program`` untouched.
+"""
+
+from __future__ import annotations
+
+import operator
+from dataclasses import fields, replace
+
+from . import runtime
+from .ast_nodes import (
+    ArrayLiteral,
+    Binary,
+    BlockExpr,
+    BreakStmt,
+    ChainedComparison,
+    ContinueStmt,
+    Expression,
+    ExprStmt,
+    IfExpr,
+    InExpr,
+    InterpolatedString,
+    Literal,
+    Program,
+    RangeLiteral,
+    ReturnStmt,
+    Statement,
+    ThrowStmt,
+    Unary,
+    YieldExpr,
+    iter_child_nodes,
+)
+from .errors import CoffeeRuntimeError
+from .tokens import (
+    AND,
+    EQEQ,
+    GT,
+    GTE,
+    LT,
+    LTE,
+    MINUS,
+    NEQ,
+    NOT,
+    OR,
+    PERCENT,
+    PLUS,
+    SLASH,
+    STAR,
+    STARSTAR,
+)
+
+# Folded strings and hoisted sets larger than this stay in the source form,
+# so a tiny expression cannot turn into a huge constant.
+MAX_CONSTANT_SIZE = 4096
+
+_BINARY_OPERATORS = {
+    PLUS: operator.add,
+    MINUS: operator.sub,
+    STAR: operator.mul,
+    SLASH: operator.truediv,
+    PERCENT: operator.mod,
+    STARSTAR: operator.pow,
+    EQEQ: operator.eq,
+    NEQ: operator.ne,
+    LT: operator.lt,
+    LTE: operator.le,
+    GT: operator.gt,
+    GTE: operator.ge,
+}
+
+_TERMINATORS = (ReturnStmt, ThrowStmt, BreakStmt, ContinueStmt)
+
+
+def optimize(program: Program) -> Program:
+    """Return an optimized copy of ``program``."""
+    return Program(_Optimizer().statements(program.statements))
+
+
+def is_constant(node) -> bool:
+    """Whether ``node`` is a literal whose value is a plain immutable constant."""
+    return isinstance(node, Literal)
+
+
+def _contains_yield(node) -> bool:
+    if isinstance(node, YieldExpr):
+        return True
+    return any(_contains_yield(child) for child in iter_child_nodes(node))
+
+
+def _too_large(operator_name: str, left, right) -> bool:
+    """Guard the operations whose result can grow without bound."""
+    if operator_name == STARSTAR and isinstance(left, int) and isinstance(right, int):
+        return right > 0 and abs(left) > 1 and right * abs(left).bit_length() > MAX_CONSTANT_SIZE
+    if operator_name == STAR:
+        if isinstance(left, str) and isinstance(right, int):
+            return len(left) * right > MAX_CONSTANT_SIZE
+        if isinstance(left, int) and isinstance(right, str):
+            return left * len(right) > MAX_CONSTANT_SIZE
+    return False
+
+
+class _Optimizer:
+    def statements(self, statements: list) -> list:
+        result = []
+        for index, statement in enumerate(statements):
+            statement = self.visit(statement)
+            if isinstance(statement, ExprStmt) and isinstance(statement.expression, BlockExpr) and statement.expression.statements:
+                # A block has no scope of its own, so a branch chosen by a
+                # constant ``if`` can run inline.
+                result.extend(statement.expression.statements)
+            else:
+                result.append(statement)
+            if isinstance(result[-1], _TERMINATORS) and not any(_contains_yield(node) for node in statements[index + 1:]):
+                break
+        return result
+
+    def visit(self, node):
+        node = self._visit_children(node)
+
+        if isinstance(node, Binary):
+            return self._binary(node)
+
+        if isinstance(node, Unary):
+            return self._unary(node)
+
+        if isinstance(node, ChainedComparison):
+            return self._chained_comparison(node)
+
+        if isinstance(node, InterpolatedString):
+            if all(is_constant(part) for part in node.parts):
+                return Literal("".join(runtime.to_str(part.value) for part in node.parts))
+            return node
+
+        if isinstance(node, InExpr):
+            return self._membership(node)
+
+        if isinstance(node, IfExpr):
+            return self._if(node)
+
+        return node
+
+    # ============ Traversal ============
+
+    def _visit_children(self, node):
+        if isinstance(node, BlockExpr):
+            statements = self.statements(node.statements)
+            if len(statements) == len(node.statements) and all(new is old for new, old in zip(statements, node.statements)):
+                return node
+            return BlockExpr(statements)
+
+        changes = {}
+        for node_field in fields(node):
+            if not node_field.init:
+                continue
+            value = getattr(node, node_field.name)
+            new_value = self._visit_value(value)
+            if new_value is not value:
+                changes[node_field.name] = new_value
+        return replace(node, **changes) if changes else node
+
+    def _visit_value(self, value):
+        if isinstance(value, (Expression, Statement)):
+            return self.visit(value)
+        if isinstance(value, (list, tuple)):
+            items = [self._visit_value(item) for item in value]
+            if all(new is old for new, old in zip(items, value)):
+                return value
+            return items if isinstance(value, list) else tuple(items)
+        if isinstance(value, dict):
+            items = {key: self._visit_value(item) for key, item in value.items()}
+            if all(items[key] is item for key, item in value.items()):
+                return value
+            return items
+        return value
+
+    # ============ Folding ============
+
+    def _binary(self, node: Binary):
+        if node.operator in (AND, OR) and is_constant(node.left):
+            if (node.operator == AND) == bool(node.left.value):
+                return node.right
+            if _contains_yield(node.right):
+                return node
+            return node.left
+
+        if not (is_constant(node.left) and is_constant(node.right)):
+            return node
+        fn = _BINARY_OPERATORS.get(node.operator)
+        left, right = node.left.value, node.right.value
+        if fn is None or _too_large(node.operator, left, right):
+            return node
+        try:
+            value = fn(left, right)
+        except Exception:
+            return node
+        if isinstance(value, str) and len(value) > MAX_CONSTANT_SIZE:
+            return node
+        return Literal(value)
+
+    def _unary(self, node: Unary):
+        if not is_constant(node.right):
+            return node
+        value = node.right.value
+        if node.operator == NOT:
+            return Literal(not value)
+        if value is None or node.operator not in (MINUS, PLUS):
+            return node
+        try:
+            return Literal(-value if node.operator == MINUS else +value)
+        except Exception:
+            return node
+
+    def _chained_comparison(self, node: ChainedComparison):
+        if not all(is_constant(operand) for operand in node.operands):
+            return node
+        try:
+            for index, operator_name in enumerate(node.operators):
+                left, right = node.operands[index].value, node.operands[index + 1].value
+                if not _BINARY_OPERATORS[operator_name](left, right):
+                    return Literal(False)
+        except Exception:
+            return node
+        return Literal(True)
+
+    def _membership(self, node: InExpr):
+        container = node.container
+        if isinstance(container, ArrayLiteral) and all(is_constant(item) for item in container.items):
+            values = [item.value for item in container.items]
+        elif isinstance(container, RangeLiteral) and self._constant_range(container):
+            step = container.step.value if container.step else None
+            try:
+                values = runtime.make_range(container.start.value, container.end.value, container.exclusive, step)
+            except (CoffeeRuntimeError, ValueError, TypeError):
+                return node
+        else:
+            return node
+        if len(values) > MAX_CONSTANT_SIZE:
+            return node
+        return replace(node, container=Literal(frozenset(values)))
+
+    def _constant_range(self, node: RangeLiteral) -> bool:
+        bounds = (node.start, node.end) + ((node.step,) if node.step else ())
+        if not all(is_constant(bound) for bound in bounds):
+            return False
+        start, end = node.start.value, node.end.value
+        if not isinstance(start, (int, float)) or not isinstance(end, (int, float)):
+            return False
+        step = node.step.value if node.step else 1
+        if not isinstance(step, (int, float)) or int(step) == 0:
+            return False
+        return abs(int(end) - int(start)) // abs(int(step)) < MAX_CONSTANT_SIZE
+
+    def _if(self, node: IfExpr):
+        if not is_constant(node.condition):
+            return node
+        taken, skipped = (node.then_branch, node.else_branch) if node.condition.value else (node.else_branch, node.then_branch)
+        if skipped is not None and _contains_yield(skipped):
+            return node
+        return taken if taken is not None else Literal(None)
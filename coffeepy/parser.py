@@ -1,5 +1,9 @@
 from __future__ import annotations
 
+import sys
+from itertools import islice
+from typing import Iterable
+
 from .ast_nodes import (
     ArrayDestructuring,
     ArrayLiteral,
@@ -44,6 +48,7 @@ from .ast_nodes import (
     Program,
     ProtoAccessExpr,
     RangeLiteral,
+    RegexLiteral,
     ReturnStmt,
     SafeAccessExpr,
     SetterDecl,
@@ -99,8 +104,12 @@ from .tokens import (
     IMPORT,
     IN,
     INDENT,
+    INTERPOLATION_END,
+    INTERPOLATION_START,
     IS,
     ISNT,
+    KIND_CODES,
+    KINDS,
     LBRACE,
     LBRACKET,
     LPAREN,
@@ -141,6 +150,8 @@ from .tokens import (
     STARSTAR,
     STAR_EQ,
     STRING,
+    STRING_END,
+    STRING_START,
     SUPER,
     SWITCH,
     THEN,
@@ -149,6 +160,7 @@ from .tokens import (
     TRUE,
     TRY,
     Token,
+    TokenBuffer,
     UNDEFINED,
     UNTIL,
     UNLESS,
@@ -158,13 +170,129 @@ from .tokens import (
 )
 
 
+# Tokens taken from a token stream at a time.
+STREAM_BATCH = 256
+
+_EOF_CODE = KIND_CODES[EOF]
+
+# Binding powers of the infix operators, loosest first (see Parser._binary).
+OR_POWER = 1
+EXISTENTIAL_POWER = 2
+AND_POWER = 3
+EQUALITY_POWER = 4
+COMPARISON_POWER = 5
+RANGE_POWER = 6
+ADDITIVE_POWER = 7
+MULTIPLICATIVE_POWER = 8
+EXPONENT_POWER = 9
+
+_UNARY_OPERATORS = frozenset((NOT, MINUS, PLUS))
+
+# Tokens that start the first argument of a call without parentheses.
+_IMPLICIT_CALL_STARTS = frozenset(
+    (NUMBER, STRING, STRING_START, IDENT, TRUE, FALSE, NULL, UNDEFINED, LPAREN, LBRACKET, LBRACE, NOT, IF, UNLESS, ARROW)
+)
+
+
+class _TokenWindow:
+    """Tokens laid out like a ``TokenBuffer`` -- kind codes and values in
+    parallel lists -- so that the parser reads them the same way. Tokens are
+    added as they are read from a list or stream, either as Token objects or
+    as the ``TokenBuffer`` of a chunk, and dropped once ``release``d."""
+
+    def __init__(self) -> None:
+        # The Token, or the TokenBuffer holding it at ``self.indices``.
+        self.sources: list[Token | TokenBuffer] = []
+        self.indices: list[int] = []
+        self.kinds: list[int] = []
+        self.values: list[object] = []
+
+    def __len__(self) -> int:
+        return len(self.sources)
+
+    def extend(self, tokens: list[Token]) -> None:
+        self.sources += tokens
+        self.indices += [0] * len(tokens)
+        for token in tokens:
+            self.kinds.append(KIND_CODES[token.kind])
+            self.values.append(sys.intern(token.lexeme) if token.kind == IDENT else token.literal)
+
+    def extend_buffer(self, buffer: TokenBuffer) -> None:
+        """Add the tokens of ``buffer`` without building Token objects."""
+        self.sources += [buffer] * len(buffer)
+        self.indices += range(len(buffer))
+        self.kinds += buffer.kinds
+        self.values += buffer.values
+
+    def release(self, count: int) -> None:
+        del self.sources[:count]
+        del self.indices[:count]
+        del self.kinds[:count]
+        del self.values[:count]
+
+    def position(self, index: int) -> tuple[int, int]:
+        source = self.sources[index]
+        if isinstance(source, TokenBuffer):
+            return source.position(self.indices[index])
+        return source.line, source.column
+
+    def token(self, index: int) -> Token:
+        source = self.sources[index]
+        if isinstance(source, TokenBuffer):
+            return source.token(self.indices[index])
+        return source
+
+
 class Parser:
-    def __init__(self, tokens: list[Token]):
-        self.tokens = tokens
+    """Builds the AST from the ``TokenBuffer`` of ``Lexer.token_buffer()``,
+    a list of tokens, a token stream such as ``Lexer.stream()`` or a stream
+    of ``TokenBuffer`` batches such as ``Lexer.batches()``.
+
+    The parser works on token indices: ``self.kinds`` and ``self.values``
+    are the kind codes and values of the buffer, and a Token object is only
+    built to report an error. Lists and streams are put in the same form by
+    a ``_TokenWindow``; batches are copied into it without building Token
+    objects.
+
+    Backtracking only moves ``self.current`` back within the statement
+    being parsed, so from a stream the parser keeps just the tokens of the
+    current top-level statement and the ones it has read ahead.
+    """
+
+    def __init__(self, tokens: TokenBuffer | list[Token] | Iterable[Token] | Iterable[TokenBuffer]):
+        self._stream = None
         self.current = 0
+        if isinstance(tokens, TokenBuffer):
+            self.tokens = tokens
+        else:
+            self.tokens = _TokenWindow()
+            if isinstance(tokens, list):
+                self.tokens.extend(tokens)
+            else:
+                self._stream = iter(tokens)
+                self._read_ahead()
+        self.kinds = self.tokens.kinds
+        self.values = self.tokens.values
+
+    def _read_ahead(self) -> None:
+        """Take the next batch of tokens from the stream, keeping at least
+        one token after the current one for ``_check_next``."""
+        while self.current + 1 >= len(self.tokens):
+            first = next(self._stream, None)
+            if first is None:
+                self._stream = None
+                return
+            if isinstance(first, TokenBuffer):
+                self.tokens.extend_buffer(first)
+            else:
+                self.tokens.extend([first, *islice(self._stream, STREAM_BATCH - 1)])
 
-    def _loc_from_token(self, token: Token) -> SourceLocation:
-        return SourceLocation(token.line, token.column)
+    def _release(self) -> None:
+        """Forget the tokens of the statements parsed so far, apart from the
+        last one, which ``_previous`` may still return."""
+        if self.current > 1:
+            self.tokens.release(self.current - 1)
+            self.current = 1
 
     def parse(self) -> Program:
         statements: list[Statement] = []
@@ -173,6 +301,8 @@ class Parser:
         while not self._is_at_end():
             statements.append(self._statement())
             self._consume_statement_breaks()
+            if self._stream is not None:
+                self._release()
 
         return Program(statements)
 
@@ -207,8 +337,8 @@ class Parser:
             return self._try_statement()
 
         if self._match(WHILE, UNTIL):
-            is_until = self._previous().kind == UNTIL
-            condition = self._logical_or()
+            is_until = self._kind(self._previous()) == UNTIL
+            condition = self._binary()
             if is_until:
                 condition = Unary(NOT, condition)
             body = self._parse_clause_body()
@@ -230,7 +360,7 @@ class Parser:
         checkpoint = self.current
 
         if self._match(PLUSPLUS, MINUSMINUS):
-            operator = self._previous().kind
+            operator = self._kind(self._previous())
             target = self._parse_assignment_target()
             if target is None:
                 raise self._error(self._peek(), "Expected assignment target after update operator.")
@@ -264,7 +394,7 @@ class Parser:
             return ExistentialAssignStmt(target, value)
 
         if self._match(PLUS_EQ, MINUS_EQ, STAR_EQ, SLASH_EQ, PERCENT_EQ):
-            operator = self._previous().kind
+            operator = self._kind(self._previous())
             value = self._expression()
             return AugAssignStmt(target, operator, value)
 
@@ -277,7 +407,7 @@ class Parser:
             return LogicalAssignStmt(target, ANDAND, value)
 
         if self._match(PLUSPLUS, MINUSMINUS):
-            operator = self._previous().kind
+            operator = self._kind(self._previous())
             return UpdateStmt(target, operator, prefix=False)
 
         self.current = checkpoint
@@ -303,17 +433,18 @@ class Parser:
             return result
 
         if self._match(AT):
-            prop_name = self._consume(IDENT, "Expected property name after '@'.").lexeme
+            prop_name = self._value(self._consume(IDENT, "Expected property name after '@'."))
             target: Expression = GetAttr(ThisExpr(), prop_name)
             while True:
                 if self._match(DOT):
-                    name = self._consume(IDENT, "Expected property name after '.'.").lexeme
+                    name = self._value(self._consume(IDENT, "Expected property name after '.'."))
                     target = GetAttr(target, name)
                     continue
                 if self._match(LBRACKET):
+                    location = self._location(self._previous())
                     index = self._expression()
                     self._consume(RBRACKET, "Expected ']' after index expression.")
-                    target = IndexExpr(target, index)
+                    target = IndexExpr(target, index, location)
                     continue
                 break
             return target
@@ -321,17 +452,18 @@ class Parser:
         if self._match(THIS):
             if not self._match(DOT):
                 return None
-            prop_name = self._consume(IDENT, "Expected property name after 'this.'.").lexeme
+            prop_name = self._value(self._consume(IDENT, "Expected property name after 'this.'."))
             target = GetAttr(ThisExpr(), prop_name)
             while True:
                 if self._match(DOT):
-                    name = self._consume(IDENT, "Expected property name after '.'.").lexeme
+                    name = self._value(self._consume(IDENT, "Expected property name after '.'."))
                     target = GetAttr(target, name)
                     continue
                 if self._match(LBRACKET):
+                    location = self._location(self._previous())
                     index = self._expression()
                     self._consume(RBRACKET, "Expected ']' after index expression.")
-                    target = IndexExpr(target, index)
+                    target = IndexExpr(target, index, location)
                     continue
                 break
             return target
@@ -340,23 +472,28 @@ class Parser:
             return None
 
         token = self._previous()
-        target = Identifier(token.lexeme, self._loc_from_token(token))
+        target = Identifier(self._value(token), self._location(token))
 
         while True:
             if self._match(DOT):
-                name = self._consume(IDENT, "Expected property name after '.'.").lexeme
+                name = self._value(self._consume(IDENT, "Expected property name after '.'."))
                 target = GetAttr(target, name)
                 continue
 
+            if self._match(PROTO):
+                name = self._value(self._consume(IDENT, "Expected property name after '::'."))
+                target = ProtoAccessExpr(target, name)
+                continue
+
             if self._match(LBRACKET):
-                target = self._parse_index_or_slice_for_target(target)
+                target = self._parse_index_or_slice_for_target(target, self._location(self._previous()))
                 continue
 
             break
 
         return target
 
-    def _parse_index_or_slice_for_target(self, target: Expression) -> Expression:
+    def _parse_index_or_slice_for_target(self, target: Expression, location: SourceLocation | None = None) -> Expression:
         if self._check(DOTDOT, DOTDOTDOT):
             start = None
             if self._match(DOTDOT):
@@ -365,17 +502,17 @@ class Parser:
                 self._advance()
                 exclusive = True
             if not self._check(RBRACKET):
-                end = self._additive()
+                end = self._binary(ADDITIVE_POWER)
             else:
                 end = None
             self._consume(RBRACKET, "Expected ']' after slice.")
             return SliceExpr(target, None, end, exclusive)
         
-        index = self._additive()
+        index = self._binary(ADDITIVE_POWER)
         
         if self._match(DOTDOT):
             if not self._check(RBRACKET):
-                end = self._additive()
+                end = self._binary(ADDITIVE_POWER)
             else:
                 end = None
             self._consume(RBRACKET, "Expected ']' after slice.")
@@ -383,7 +520,7 @@ class Parser:
         
         if self._match(DOTDOTDOT):
             if not self._check(RBRACKET):
-                end = self._additive()
+                end = self._binary(ADDITIVE_POWER)
             else:
                 end = None
             self._consume(RBRACKET, "Expected ']' after slice.")
@@ -391,10 +528,10 @@ class Parser:
         
         if self._match(COMMA):
             self._consume(RBRACKET, "Expected ']' after index.")
-            return IndexExpr(target, index)
+            return IndexExpr(target, index, location)
         
         self._consume(RBRACKET, "Expected ']' after index expression.")
-        return IndexExpr(target, index)
+        return IndexExpr(target, index, location)
 
     def _try_parse_array_destructuring_target(self) -> ArrayDestructuring | None:
         elements: list[Expression] = []
@@ -445,7 +582,7 @@ class Parser:
 
         if self._match(IDENT):
             token = self._previous()
-            ident = Identifier(token.lexeme, self._loc_from_token(token))
+            ident = Identifier(self._value(token), self._location(token))
             if self._match(DOTDOTDOT):
                 return ident, True
             return ident, False
@@ -495,14 +632,14 @@ class Parser:
 
         if self._match(IDENT):
             token = self._previous()
-            return Identifier(token.lexeme, self._loc_from_token(token))
+            return Identifier(self._value(token), self._location(token))
 
         return None
 
     def _try_parse_object_destructuring_property(self) -> tuple[str, Expression | None, Expression | None] | None:
         if not self._match(IDENT):
             return None
-        key = self._previous().lexeme
+        key = self._value(self._previous())
         alias: Expression | None = None
         default: Expression | None = None
         
@@ -510,19 +647,19 @@ class Parser:
             if not self._match(IDENT):
                 return None
             token = self._previous()
-            alias = Identifier(token.lexeme, self._loc_from_token(token))
+            alias = Identifier(self._value(token), self._location(token))
         
         if self._match(EQ):
-            default = self._logical_or()
+            default = self._binary()
         
         return key, alias, default
 
     def _for_in_statement(self) -> Statement:
-        first_var = self._consume(IDENT, "Expected loop variable after 'for'.").lexeme
+        first_var = self._value(self._consume(IDENT, "Expected loop variable after 'for'."))
 
         second_var: str | None = None
         if self._match(COMMA):
-            second_var = self._consume(IDENT, "Expected variable after ','.").lexeme
+            second_var = self._value(self._consume(IDENT, "Expected variable after ','."))
 
         if self._match(IN):
             iterable = self._expression()
@@ -538,7 +675,7 @@ class Parser:
 
     def _class_declaration(self) -> ClassDecl:
         name_token = self._consume(IDENT, "Expected class name.")
-        name = name_token.lexeme
+        name = self._value(name_token)
 
         parent: Expression | None = None
         if self._match(EXTENDS):
@@ -551,7 +688,7 @@ class Parser:
             if self._match(INDENT):
                 while not self._check(OUTDENT, EOF):
                     method_name_token = self._consume(IDENT, "Expected method name.")
-                    method_name = method_name_token.lexeme
+                    method_name = self._value(method_name_token)
                     self._consume(COLON, "Expected ':' after method name.")
                     method_value = self._expression()
                     body.append((method_name, method_value))
@@ -567,7 +704,7 @@ class Parser:
         catch_block: Expression | None = None
         if self._match(CATCH):
             if self._match(IDENT):
-                catch_var = self._previous().lexeme
+                catch_var = self._value(self._previous())
             catch_block = self._parse_clause_body()
 
         finally_block: Expression | None = None
@@ -586,7 +723,7 @@ class Parser:
         module = self._module_path()
         alias: str | None = None
         if self._match(AS):
-            alias = self._consume(IDENT, "Expected identifier after 'as'.").lexeme
+            alias = self._value(self._consume(IDENT, "Expected identifier after 'as'."))
         return ImportItem(module, alias)
 
     def _from_import_statement(self) -> FromImportStmt:
@@ -596,7 +733,7 @@ class Parser:
         if self._match(STAR):
             alias: str | None = None
             if self._match(AS):
-                alias = self._consume(IDENT, "Expected identifier after 'as'.").lexeme
+                alias = self._value(self._consume(IDENT, "Expected identifier after 'as'."))
             return FromImportStmt(module, [ImportName("*", alias)])
 
         names = [self._import_name()]
@@ -606,56 +743,56 @@ class Parser:
         return FromImportStmt(module, names)
 
     def _import_name(self) -> ImportName:
-        name = self._consume(IDENT, "Expected imported name.").lexeme
+        name = self._value(self._consume(IDENT, "Expected imported name."))
         alias: str | None = None
         if self._match(AS):
-            alias = self._consume(IDENT, "Expected alias name after 'as'.").lexeme
+            alias = self._value(self._consume(IDENT, "Expected alias name after 'as'."))
         return ImportName(name, alias)
 
     def _module_path(self) -> str:
         token = self._consume(IDENT, "Expected module path.")
-        module = token.lexeme
+        module = self._value(token)
         while self._match(DOT):
-            part = self._consume(IDENT, "Expected module segment after '.'.").lexeme
+            part = self._value(self._consume(IDENT, "Expected module segment after '.'."))
             module += f".{part}"
         return module
 
     def _expression(self) -> Expression:
-        return self._switch_expression()
+        if self._check(SWITCH):
+            return self._switch_expression()
+        return self._if_expression()
 
     def _switch_expression(self) -> Expression:
-        if self._match(SWITCH):
-            value: Expression | None = None
-            if not self._check(NEWLINE, INDENT):
-                value = self._expression()
-            cases: list[tuple[list[Expression], Expression]] = []
-            default: Expression | None = None
+        self._advance()
+        value: Expression | None = None
+        if not self._check(NEWLINE, INDENT):
+            value = self._expression()
+        cases: list[tuple[list[Expression], Expression]] = []
+        default: Expression | None = None
+
+        self._consume_statement_breaks()
+        self._consume(INDENT, "Expected indented block after switch.")
 
+        while not self._check(OUTDENT, EOF):
+            if self._match(WHEN):
+                conditions = [self._expression()]
+                while self._match(COMMA):
+                    conditions.append(self._expression())
+                body = self._parse_clause_body()
+                cases.append((conditions, body))
+            elif self._match(ELSE):
+                default = self._parse_clause_body()
+            else:
+                raise self._error(self._peek(), "Expected 'when' or 'else' in switch.")
             self._consume_statement_breaks()
-            self._consume(INDENT, "Expected indented block after switch.")
-
-            while not self._check(OUTDENT, EOF):
-                if self._match(WHEN):
-                    conditions = [self._expression()]
-                    while self._match(COMMA):
-                        conditions.append(self._expression())
-                    body = self._parse_clause_body()
-                    cases.append((conditions, body))
-                elif self._match(ELSE):
-                    default = self._parse_clause_body()
-                else:
-                    raise self._error(self._peek(), "Expected 'when' or 'else' in switch.")
-                self._consume_statement_breaks()
-
-            self._consume(OUTDENT, "Expected end of switch block.")
-            return SwitchExpr(value, cases, default)
 
-        return self._if_expression()
+        self._consume(OUTDENT, "Expected end of switch block.")
+        return SwitchExpr(value, cases, default)
 
     def _if_expression(self) -> Expression:
         if self._match(IF, UNLESS):
-            is_unless = self._previous().kind == UNLESS
-            condition = self._logical_or()
+            is_unless = self._kind(self._previous()) == UNLESS
+            condition = self._binary()
             if is_unless:
                 condition = Unary(NOT, condition)
 
@@ -667,10 +804,10 @@ class Parser:
 
             return IfExpr(condition, then_branch, else_branch)
 
-        expr = self._logical_or()
+        expr = self._binary()
         if self._can_take_postfix_if():
-            is_unless = self._advance().kind == UNLESS
-            condition = self._logical_or()
+            is_unless = self._kind(self._advance()) == UNLESS
+            condition = self._binary()
             if is_unless:
                 condition = Unary(NOT, condition)
             return IfExpr(condition, expr, Literal(None))
@@ -713,168 +850,156 @@ class Parser:
         self.current = checkpoint
         return False
 
-    def _logical_or(self) -> Expression:
-        expr = self._existential()
-        while self._match(OR):
-            op_token = self._previous()
-            operator = op_token.kind
-            right = self._existential()
-            expr = Binary(expr, operator, right, self._loc_from_token(op_token))
-        return expr
-
-    def _existential(self) -> Expression:
-        expr = self._logical_and()
-        while self._match(QUESTION):
-            right = self._logical_and()
-            expr = ExistentialExpr(expr, right)
-        return expr
-
-    def _logical_and(self) -> Expression:
-        expr = self._equality()
-        while self._match(AND):
-            op_token = self._previous()
-            operator = op_token.kind
-            right = self._equality()
-            expr = Binary(expr, operator, right, self._loc_from_token(op_token))
-        return expr
+    def _binary(self, min_power: int = OR_POWER) -> Expression:
+        """Parse a unary expression and the infix operations after it whose
+        operators bind at least as tightly as ``min_power``.
+
+        This is a Pratt parser: ``_INFIX`` gives each operator's binding
+        power, whether it chains and the method that parses the operation
+        from the expression on its left. Once a comparison or a range is
+        parsed, only operators binding more loosely may follow it.
+        """
+        kinds = self.kinds
+        if KINDS[kinds[self.current]] in _UNARY_OPERATORS:
+            left = self._unary()
+        else:
+            left = self._call()
 
-    def _equality(self) -> Expression:
-        expr = self._comparison()
-        while self._match(EQEQ, NEQ, IS, ISNT):
-            op_token = self._previous()
-            operator = op_token.kind
-            if operator == IS:
-                if self._match(NOT):
-                    operator = NEQ
-                else:
-                    operator = EQEQ
-            elif operator == ISNT:
+        ceiling = EXPONENT_POWER
+        while True:
+            rule = _INFIX.get(KINDS[kinds[self.current]])
+            if rule is None:
+                return left
+            power, chains, parse_operation = rule
+            if power < min_power or power > ceiling:
+                return left
+            expr = parse_operation(self, left, power)
+            if expr is None:
+                return left
+            left = expr
+            ceiling = power if chains else power - 1
+
+    def _left_operation(self, left: Expression, power: int) -> Expression:
+        op_token = self._advance()
+        right = self._binary(power + 1)
+        return Binary(left, self._kind(op_token), right, self._location(op_token))
+
+    def _right_operation(self, left: Expression, power: int) -> Expression:
+        op_token = self._advance()
+        right = self._binary(power)
+        return Binary(left, self._kind(op_token), right, self._location(op_token))
+
+    def _existential_operation(self, left: Expression, power: int) -> Expression:
+        self._advance()
+        return ExistentialExpr(left, self._binary(power + 1))
+
+    def _equality_operation(self, left: Expression, power: int) -> Expression:
+        op_token = self._advance()
+        operator = self._kind(op_token)
+        if operator == IS:
+            if self._match(NOT):
                 operator = NEQ
-            right = self._comparison()
-            expr = Binary(expr, operator, right, self._loc_from_token(op_token))
-        return expr
-
-    def _comparison(self) -> Expression:
-        operands = [self._range()]
+            else:
+                operator = EQEQ
+        elif operator == ISNT:
+            operator = NEQ
+        right = self._binary(power + 1)
+        return Binary(left, operator, right, self._location(op_token))
+
+    def _comparison_operation(self, left: Expression, power: int) -> Expression:
+        """A chain of ``<``, ``<=``, ``>`` and ``>=``, then at most one
+        ``in`` and one ``of``, all with range operands."""
+        operands = [left]
         operators = []
-        
+
         while self._match(LT, LTE, GT, GTE):
-            operator = self._previous().kind
-            operators.append(operator)
-            operands.append(self._range())
-        
+            operators.append(self._kind(self._previous()))
+            operands.append(self._binary(RANGE_POWER))
+
         if len(operators) == 0:
-            expr = operands[0]
+            expr = left
         elif len(operators) == 1:
             expr = Binary(operands[0], operators[0], operands[1])
         else:
             expr = ChainedComparison(operands, operators)
-        
-        if self._match(IN):
-            right = self._range()
-            expr = InExpr(expr, right)
-        
-        if self._match(OF):
-            right = self._range()
-            expr = OfExpr(expr, right)
-        
-        return expr
 
-    def _range(self) -> Expression:
-        expr = self._additive()
-        if self._match(DOTDOT):
-            end = self._additive()
-            step = None
-            if self._match(BY):
-                step = self._additive()
-            return RangeLiteral(expr, end, exclusive=False, step=step)
-        if self._check(DOTDOTDOT):
-            next_is_end = (self._check_next(RPAREN) or self._check_next(COMMA) or 
-                          self._check_next(NEWLINE) or self._check_next(OUTDENT) or 
-                          self._check_next(EOF))
-            if not next_is_end:
-                self._advance()
-                end = self._additive()
-                step = None
-                if self._match(BY):
-                    step = self._additive()
-                return RangeLiteral(expr, end, exclusive=True, step=step)
-        return expr
+        if self._match(IN):
+            expr = InExpr(expr, self._binary(RANGE_POWER))
 
-    def _additive(self) -> Expression:
-        expr = self._multiplicative()
-        while self._match(PLUS, MINUS):
-            op_token = self._previous()
-            operator = op_token.kind
-            right = self._multiplicative()
-            expr = Binary(expr, operator, right, self._loc_from_token(op_token))
-        return expr
+        if self._match(OF):
+            expr = OfExpr(expr, self._binary(RANGE_POWER))
 
-    def _multiplicative(self) -> Expression:
-        expr = self._power()
-        while self._match(STAR, SLASH, PERCENT):
-            op_token = self._previous()
-            operator = op_token.kind
-            right = self._power()
-            expr = Binary(expr, operator, right, self._loc_from_token(op_token))
         return expr
 
-    def _power(self) -> Expression:
-        expr = self._unary()
-        if self._match(STARSTAR):
-            op_token = self._previous()
-            operator = op_token.kind
-            right = self._power()
-            expr = Binary(expr, operator, right, self._loc_from_token(op_token))
-        return expr
+    def _range_operation(self, left: Expression, power: int) -> Expression | None:
+        if self._match(DOTDOT):
+            exclusive = False
+        elif (self._check_next(RPAREN) or self._check_next(COMMA) or
+              self._check_next(NEWLINE) or self._check_next(OUTDENT) or
+              self._check_next(EOF)):
+            # A ``...`` that ends the expression is a splat, not a range.
+            return None
+        else:
+            self._advance()
+            exclusive = True
+        end = self._binary(ADDITIVE_POWER)
+        step = None
+        if self._match(BY):
+            step = self._binary(ADDITIVE_POWER)
+        return RangeLiteral(left, end, exclusive=exclusive, step=step)
 
     def _unary(self) -> Expression:
         if self._match(NOT, MINUS, PLUS):
-            operator = self._previous().kind
+            operator = self._kind(self._previous())
             right = self._unary()
             return Unary(operator, right)
         return self._call()
 
     def _call(self) -> Expression:
-        expr = self._primary()
+        """A primary expression, parsed by its method in ``_PRIMARY``, and the
+        accesses, indexing and calls after it, parsed by theirs in
+        ``_POSTFIX``."""
+        kinds = self.kinds
+        parse_primary = _PRIMARY.get(KINDS[kinds[self.current]])
+        if parse_primary is None:
+            raise self._error(self._peek(), "Expected expression.")
+        expr = parse_primary(self)
 
         while True:
-            if self._match(DOT):
-                dot_token = self._previous()
-                name = self._consume(IDENT, "Expected property name after '.'.").lexeme
-                expr = GetAttr(expr, name, self._loc_from_token(dot_token))
-                continue
-
-            if self._match(PROTO):
-                name = self._consume(IDENT, "Expected property name after '::'.").lexeme
-                expr = ProtoAccessExpr(expr, name)
-                continue
-
-            if self._match(QUESTIONDOT):
-                name = self._consume(IDENT, "Expected property name after '?.'.").lexeme
-                expr = SafeAccessExpr(expr, name)
-                continue
-
-            if self._match(LBRACKET):
-                expr = self._parse_index_or_slice(expr)
-                continue
-
-            if self._match(LPAREN):
-                paren_token = self._previous()
-                args, kwargs = self._argument_list()
-                expr = Call(expr, args, kwargs, implicit=False, location=self._loc_from_token(paren_token))
-                continue
-
-            if self._can_parse_implicit_call(expr):
+            parse_postfix = _POSTFIX.get(KINDS[kinds[self.current]])
+            if parse_postfix is not None:
+                expr = parse_postfix(self, expr)
+            elif self._can_parse_implicit_call(expr):
                 args = [self._if_expression()]
                 while self._match(COMMA):
                     args.append(self._if_expression())
                 expr = Call(expr, args, [], implicit=True)
-                continue
+            else:
+                return expr
 
-            break
+    def _attribute(self, expr: Expression) -> Expression:
+        dot_token = self._advance()
+        name = self._value(self._consume(IDENT, "Expected property name after '.'."))
+        return GetAttr(expr, name, self._location(dot_token))
 
-        return expr
+    def _proto_attribute(self, expr: Expression) -> Expression:
+        self._advance()
+        name = self._value(self._consume(IDENT, "Expected property name after '::'."))
+        return ProtoAccessExpr(expr, name)
+
+    def _safe_attribute(self, expr: Expression) -> Expression:
+        self._advance()
+        name = self._value(self._consume(IDENT, "Expected property name after '?.'."))
+        return SafeAccessExpr(expr, name)
+
+    def _index(self, expr: Expression) -> Expression:
+        bracket_token = self._advance()
+        return self._parse_index_or_slice(expr, self._location(bracket_token))
+
+    def _explicit_call(self, expr: Expression) -> Expression:
+        paren_token = self._advance()
+        args, kwargs = self._argument_list()
+        return Call(expr, args, kwargs, implicit=False, location=self._location(paren_token))
 
     def _argument_list(self) -> tuple[list[Expression], list[tuple[str, Expression]]]:
         args: list[Expression] = []
@@ -902,7 +1027,7 @@ class Parser:
 
     def _parse_call_argument(self) -> tuple[str | None, Expression]:
         if self._check(IDENT) and self._check_next(EQ):
-            name = self._advance().lexeme
+            name = self._value(self._advance())
             self._consume(EQ, "Expected '=' after keyword argument name.")
             return name, self._if_expression()
         
@@ -913,7 +1038,7 @@ class Parser:
         
         return None, expr
 
-    def _parse_index_or_slice(self, target: Expression) -> Expression:
+    def _parse_index_or_slice(self, target: Expression, location: SourceLocation | None = None) -> Expression:
         start: Expression | None = None
         end: Expression | None = None
         exclusive = False
@@ -921,121 +1046,112 @@ class Parser:
         if self._check(DOTDOT):
             self._advance()
             if not self._check(RBRACKET):
-                end = self._additive()
+                end = self._binary(ADDITIVE_POWER)
             self._consume(RBRACKET, "Expected ']' after slice.")
             return SliceExpr(target, None, end, exclusive=False)
         
         if self._check(DOTDOTDOT):
             self._advance()
             if not self._check(RBRACKET):
-                end = self._additive()
+                end = self._binary(ADDITIVE_POWER)
             self._consume(RBRACKET, "Expected ']' after slice.")
             return SliceExpr(target, None, end, exclusive=True)
         
-        start = self._additive()
+        start = self._binary(ADDITIVE_POWER)
         
         if self._match(DOTDOT):
             if not self._check(RBRACKET):
-                end = self._additive()
+                end = self._binary(ADDITIVE_POWER)
             self._consume(RBRACKET, "Expected ']' after slice.")
             return SliceExpr(target, start, end, exclusive=False)
         
         if self._match(DOTDOTDOT):
             if not self._check(RBRACKET):
-                end = self._additive()
+                end = self._binary(ADDITIVE_POWER)
             self._consume(RBRACKET, "Expected ']' after slice.")
             return SliceExpr(target, start, end, exclusive=True)
         
         self._consume(RBRACKET, "Expected ']' after index expression.")
-        return IndexExpr(target, start)
-
-    def _primary(self) -> Expression:
-        if self._check(IDENT) and self._check_next(ARROW):
-            name = self._advance().lexeme
-            self._consume(ARROW, "Expected '->' in function literal.")
-            body = self._parse_function_body()
-            return FunctionLiteral([name], body, bound=False)
-
-        if self._check(IDENT) and self._check_next(FAT_ARROW):
-            name = self._advance().lexeme
-            self._consume(FAT_ARROW, "Expected '=>' in fat arrow function.")
-            body = self._parse_function_body()
-            return FunctionLiteral([name], body, bound=True)
+        return IndexExpr(target, start, location)
 
-        if self._match(ARROW):
+    def _identifier(self) -> Expression:
+        if self._check_next(ARROW) or self._check_next(FAT_ARROW):
+            name = self._value(self._advance())
+            bound = self._kind(self._advance()) == FAT_ARROW
             body = self._parse_function_body()
-            return FunctionLiteral([], body, bound=False)
+            return FunctionLiteral([name], body, bound=bound)
+        token = self._advance()
+        return Identifier(self._value(token), self._location(token))
 
-        if self._match(FAT_ARROW):
-            body = self._parse_function_body()
-            return FunctionLiteral([], body, bound=True)
+    def _arrow_function(self) -> Expression:
+        bound = self._kind(self._advance()) == FAT_ARROW
+        body = self._parse_function_body()
+        return FunctionLiteral([], body, bound=bound)
 
-        if self._match(DO):
-            return DoExpr(self._expression())
+    def _do_expression(self) -> Expression:
+        self._advance()
+        return DoExpr(self._expression())
 
-        if self._match(YIELD):
-            if self._check(NEWLINE, SEMICOLON, OUTDENT, EOF, RPAREN, RBRACKET, RBRACE, COMMA):
-                return YieldExpr(None)
-            return YieldExpr(self._expression())
+    def _yield_expression(self) -> Expression:
+        self._advance()
+        if self._check(NEWLINE, SEMICOLON, OUTDENT, EOF, RPAREN, RBRACKET, RBRACE, COMMA):
+            return YieldExpr(None)
+        return YieldExpr(self._expression())
 
-        if self._match(AT):
-            prop_name = self._consume(IDENT, "Expected property name after '@'.").lexeme
-            return GetAttr(ThisExpr(), prop_name)
+    def _this_attribute(self) -> Expression:
+        self._advance()
+        prop_name = self._value(self._consume(IDENT, "Expected property name after '@'."))
+        return GetAttr(ThisExpr(), prop_name)
 
-        if self._match(PROTO):
-            name = self._consume(IDENT, "Expected property name after '::'.").lexeme
-            return ProtoAccessExpr(None, name)
+    def _proto_access(self) -> Expression:
+        self._advance()
+        name = self._value(self._consume(IDENT, "Expected property name after '::'."))
+        return ProtoAccessExpr(None, name)
 
-        if self._match(NUMBER):
-            return Literal(self._previous().literal)
+    def _number(self) -> Expression:
+        return Literal(self._value(self._advance()))
 
-        if self._match(STRING):
-            return self._parse_string_literal(self._previous().literal)
+    def _string(self) -> Expression:
+        return self._parse_string_literal(self._value(self._advance()))
 
-        if self._match(TRUE):
+    def _constant(self) -> Expression:
+        kind = self._kind(self._advance())
+        if kind == TRUE:
             return Literal(True)
-
-        if self._match(FALSE):
+        if kind == FALSE:
             return Literal(False)
+        return Literal(None)
 
-        if self._match(NULL, UNDEFINED):
-            return Literal(None)
-
-        if self._match(THIS):
-            return ThisExpr()
-
-        if self._match(SUPER):
-            return SuperExpr()
-
-        if self._match(NEW):
-            class_expr = self._call()
-            if isinstance(class_expr, Call):
-                return NewExpr(class_expr.callee, class_expr.args, class_expr.kwargs)
-            return NewExpr(class_expr, [], [])
-
-        if self._match(IDENT):
-            token = self._previous()
-            return Identifier(token.lexeme, self._loc_from_token(token))
+    def _this(self) -> Expression:
+        self._advance()
+        return ThisExpr()
 
-        if self._match(LBRACKET):
-            return self._array_literal()
+    def _super(self) -> Expression:
+        self._advance()
+        return SuperExpr()
 
-        if self._match(LBRACE):
-            return self._object_literal()
+    def _new_expression(self) -> Expression:
+        self._advance()
+        class_expr = self._call()
+        if isinstance(class_expr, Call):
+            return NewExpr(class_expr.callee, class_expr.args, class_expr.kwargs)
+        return NewExpr(class_expr, [], [])
 
-        if self._match(LPAREN):
-            checkpoint = self.current
-            fn_literal = self._try_parse_parenthesized_function_literal()
-            if fn_literal is not None:
-                return fn_literal
+    def _parenthesized(self) -> Expression:
+        self._advance()
+        checkpoint = self.current
+        fn_literal = self._try_parse_parenthesized_function_literal()
+        if fn_literal is not None:
+            return fn_literal
 
-            self.current = checkpoint
-            expr = self._expression()
-            self._consume(RPAREN, "Expected ')' after expression.")
+        self.current = checkpoint
+        expr = self._expression()
+        if self._match(FOR):
+            expr = self._comprehension(expr, lazy=True)
+            self._consume(RPAREN, "Expected ')' after comprehension.")
             return expr
-
-        token = self._peek()
-        raise self._error(token, "Expected expression.")
+        self._consume(RPAREN, "Expected ')' after expression.")
+        return expr
 
     def _parse_function_body(self) -> Expression:
         if self._match(NEWLINE):
@@ -1105,15 +1221,35 @@ class Parser:
         if not self._check(IDENT):
             return None
         
-        param_name = self._advance().lexeme
+        param_name = self._value(self._advance())
         default_value: Expression | None = None
         
         if self._match(EQ):
-            default_value = self._logical_or()
+            default_value = self._binary()
         
         return param_name, is_this_param, default_value
 
+    def _comprehension(self, body: Expression, lazy: bool) -> ComprehensionExpr:
+        """Parse the rest of a comprehension after ``body for``."""
+        var_name_token = self._consume(IDENT, "Expected variable name after 'for'.")
+        var_name = self._value(var_name_token)
+
+        if self._match(IN):
+            iterable = self._expression()
+        elif self._match(OF):
+            iterable = self._expression()
+        else:
+            raise self._error(self._peek(), "Expected 'in' or 'of' in comprehension.")
+
+        filter_condition: Expression | None = None
+        if self._check(WHEN):
+            self._advance()
+            filter_condition = self._expression()
+
+        return ComprehensionExpr(var_name, iterable, body, filter_condition, lazy)
+
     def _array_literal(self) -> Expression:
+        self._advance()
         items: list[Expression] = []
         if self._match(RBRACKET):
             return ArrayLiteral(items)
@@ -1121,23 +1257,9 @@ class Parser:
         first_expr = self._expression()
         
         if self._match(FOR):
-            var_name_token = self._consume(IDENT, "Expected variable name after 'for'.")
-            var_name = var_name_token.lexeme
-            
-            if self._match(IN):
-                iterable = self._expression()
-            elif self._match(OF):
-                iterable = self._expression()
-            else:
-                raise self._error(self._peek(), "Expected 'in' or 'of' in comprehension.")
-            
-            filter_condition: Expression | None = None
-            if self._check(WHEN):
-                self._advance()
-                filter_condition = self._expression()
-            
+            comprehension = self._comprehension(first_expr, lazy=False)
             self._consume(RBRACKET, "Expected ']' after comprehension.")
-            return ComprehensionExpr(var_name, iterable, first_expr, filter_condition)
+            return comprehension
         
         if isinstance(first_expr, RangeLiteral) and self._check(RBRACKET):
             self._advance()
@@ -1153,6 +1275,7 @@ class Parser:
         return ArrayLiteral(items)
 
     def _object_literal(self) -> Expression:
+        self._advance()
         if self._check(RBRACE):
             self._advance()
             return ObjectLiteral([])
@@ -1195,13 +1318,13 @@ class Parser:
         
         if not self._match(IDENT):
             raise self._error(self._peek(), "Expected variable after 'for' in object comprehension.")
-        var1 = self._previous().lexeme
+        var1 = self._value(self._previous())
         
         var2: str | None = None
         if self._match(COMMA):
             if not self._match(IDENT):
                 raise self._error(self._peek(), "Expected second variable after ',' in object comprehension.")
-            var2 = self._previous().lexeme
+            var2 = self._value(self._previous())
         
         if self._match(IN):
             iterable = self._expression()
@@ -1221,9 +1344,9 @@ class Parser:
 
     def _object_key(self) -> str:
         if self._match(IDENT):
-            return self._previous().lexeme
+            return self._value(self._previous())
         if self._match(STRING):
-            literal = self._previous().literal
+            literal = self._value(self._previous())
             if not isinstance(literal, str):
                 raise self._error(self._previous(), "Object key must be a string.")
             return literal
@@ -1232,83 +1355,25 @@ class Parser:
     def _can_parse_implicit_call(self, expr: Expression) -> bool:
         if not isinstance(expr, (Identifier, GetAttr, IndexExpr, Call)):
             return False
-
-        if self._check(
-            NEWLINE,
-            EOF,
-            RPAREN,
-            RBRACKET,
-            RBRACE,
-            COMMA,
-            SEMICOLON,
-            THEN,
-            ELSE,
-            OUTDENT,
-            EQ,
-            EQEQ,
-            NEQ,
-            LT,
-            LTE,
-            GT,
-            GTE,
-            COLON,
-        ):
-            return False
-
-        return self._check(
-            NUMBER,
-            STRING,
-            IDENT,
-            TRUE,
-            FALSE,
-            NULL,
-            UNDEFINED,
-            LPAREN,
-            LBRACKET,
-            LBRACE,
-            NOT,
-            IF,
-            UNLESS,
-            ARROW,
-        )
+        return KINDS[self.kinds[self.current]] in _IMPLICIT_CALL_STARTS
 
     def _parse_string_literal(self, value) -> Expression:
-        if value is None:
-            return Literal("")
-        
-        import re
-        from .lexer import Lexer
-        
-        if "#{" not in str(value):
-            return Literal(value)
-        
-        str_value = str(value)
+        if isinstance(value, tuple):
+            # ``("regex", pattern, flags)`` from ``Lexer._regex``.
+            return RegexLiteral(value[1], value[2])
+        return Literal(value)
+
+    def _interpolated_string(self) -> Expression:
+        self._advance()
         parts: list[Expression] = []
-        pattern = re.compile(r'#\{([^}]+)\}')
-        last_end = 0
-        
-        for match in pattern.finditer(str_value):
-            if match.start() > last_end:
-                parts.append(Literal(str_value[last_end:match.start()]))
-            
-            expr_str = match.group(1)
-            sub_lexer = Lexer(expr_str)
-            sub_tokens = sub_lexer.tokenize()
-            sub_parser = Parser(sub_tokens)
-            try:
-                expr = sub_parser._expression()
-                parts.append(expr)
-            except Exception:
-                parts.append(Literal(expr_str))
-            
-            last_end = match.end()
-        
-        if last_end < len(str_value):
-            parts.append(Literal(str_value[last_end:]))
-        
-        if len(parts) == 1:
-            return parts[0]
-        
+        while not self._match(STRING_END):
+            if self._match(STRING):
+                parts.append(Literal(self._value(self._previous())))
+                continue
+            self._consume(INTERPOLATION_START, "Expected string interpolation.")
+            if not self._check(INTERPOLATION_END):
+                parts.append(self._expression())
+            self._consume(INTERPOLATION_END, "Expected '}' after string interpolation.")
         return InterpolatedString(parts)
 
     def _consume_statement_breaks(self) -> None:
@@ -1319,45 +1384,116 @@ class Parser:
         if not self._check(IF, UNLESS):
             return False
 
-        token = self._peek()
-        return token.column > 1
+        return self.tokens.position(self.current)[1] > 1
 
     def _match(self, *kinds: str) -> bool:
-        for kind in kinds:
-            if self._check(kind):
-                self._advance()
-                return True
+        if self._check(*kinds):
+            self._advance()
+            return True
         return False
 
-    def _consume(self, kind: str, message: str) -> Token:
+    def _consume(self, kind: str, message: str) -> int:
         if self._check(kind):
             return self._advance()
         raise self._error(self._peek(), message)
 
     def _check(self, *kinds: str) -> bool:
-        if self._is_at_end():
-            return EOF in kinds
-        return self._peek().kind in kinds
+        return KINDS[self.kinds[self.current]] in kinds
 
     def _check_next(self, kind: str) -> bool:
-        if self.current + 1 >= len(self.tokens):
+        if self.current + 1 >= len(self.kinds):
             return False
-        return self.tokens[self.current + 1].kind == kind
+        return KINDS[self.kinds[self.current + 1]] == kind
 
-    def _advance(self) -> Token:
-        if not self._is_at_end():
+    def _advance(self) -> int:
+        """Move past the current token, unless it is EOF, and return the
+        index of the token moved past."""
+        if self.kinds[self.current] != _EOF_CODE:
             self.current += 1
-        return self.tokens[self.current - 1]
+            if self._stream is not None and self.current + 1 >= len(self.kinds):
+                self._read_ahead()
+        return self.current - 1
 
     def _is_at_end(self) -> bool:
-        return self._peek().kind == EOF
+        return self.kinds[self.current] == _EOF_CODE
+
+    def _peek(self) -> int:
+        return self.current
 
-    def _peek(self) -> Token:
-        return self.tokens[self.current]
+    def _previous(self) -> int:
+        return self.current - 1
 
-    def _previous(self) -> Token:
-        return self.tokens[self.current - 1]
+    def _kind(self, index: int) -> str:
+        return KINDS[self.kinds[index]]
 
-    @staticmethod
-    def _error(token: Token, message: str) -> CoffeeParseError:
+    def _value(self, index: int) -> object:
+        """The name of an IDENT token or the literal of a NUMBER or STRING."""
+        return self.values[index]
+
+    def _location(self, index: int) -> SourceLocation:
+        return SourceLocation(*self.tokens.position(index))
+
+    def _error(self, index: int, message: str) -> CoffeeParseError:
+        token = self.tokens.token(index)
         return CoffeeParseError(f"{message} (line {token.line}, column {token.column})")
+
+
+# ``_binary``'s operator table: binding power, whether the operator chains
+# (``a + b + c``) and the method that parses the operation.
+_INFIX = {
+    OR: (OR_POWER, True, Parser._left_operation),
+    QUESTION: (EXISTENTIAL_POWER, True, Parser._existential_operation),
+    AND: (AND_POWER, True, Parser._left_operation),
+    EQEQ: (EQUALITY_POWER, True, Parser._equality_operation),
+    NEQ: (EQUALITY_POWER, True, Parser._equality_operation),
+    IS: (EQUALITY_POWER, True, Parser._equality_operation),
+    ISNT: (EQUALITY_POWER, True, Parser._equality_operation),
+    LT: (COMPARISON_POWER, False, Parser._comparison_operation),
+    LTE: (COMPARISON_POWER, False, Parser._comparison_operation),
+    GT: (COMPARISON_POWER, False, Parser._comparison_operation),
+    GTE: (COMPARISON_POWER, False, Parser._comparison_operation),
+    IN: (COMPARISON_POWER, False, Parser._comparison_operation),
+    OF: (COMPARISON_POWER, False, Parser._comparison_operation),
+    DOTDOT: (RANGE_POWER, False, Parser._range_operation),
+    DOTDOTDOT: (RANGE_POWER, False, Parser._range_operation),
+    PLUS: (ADDITIVE_POWER, True, Parser._left_operation),
+    MINUS: (ADDITIVE_POWER, True, Parser._left_operation),
+    STAR: (MULTIPLICATIVE_POWER, True, Parser._left_operation),
+    SLASH: (MULTIPLICATIVE_POWER, True, Parser._left_operation),
+    PERCENT: (MULTIPLICATIVE_POWER, True, Parser._left_operation),
+    STARSTAR: (EXPONENT_POWER, True, Parser._right_operation),
+}
+
+# ``_call``'s tables: the method that parses the primary expression a token
+# starts, and the one that parses the access, index or call it begins after
+# an expression.
+_PRIMARY = {
+    IDENT: Parser._identifier,
+    ARROW: Parser._arrow_function,
+    FAT_ARROW: Parser._arrow_function,
+    DO: Parser._do_expression,
+    YIELD: Parser._yield_expression,
+    AT: Parser._this_attribute,
+    PROTO: Parser._proto_access,
+    NUMBER: Parser._number,
+    STRING: Parser._string,
+    STRING_START: Parser._interpolated_string,
+    TRUE: Parser._constant,
+    FALSE: Parser._constant,
+    NULL: Parser._constant,
+    UNDEFINED: Parser._constant,
+    THIS: Parser._this,
+    SUPER: Parser._super,
+    NEW: Parser._new_expression,
+    LBRACKET: Parser._array_literal,
+    LBRACE: Parser._object_literal,
+    LPAREN: Parser._parenthesized,
+}
+
+_POSTFIX = {
+    DOT: Parser._attribute,
+    PROTO: Parser._proto_attribute,
+    QUESTIONDOT: Parser._safe_attribute,
+    LBRACKET: Parser._index,
+    LPAREN: Parser._explicit_call,
+}
@@ -0,0 +1,1386 @@
+"""
+CoffeePy - Python AST Backend
+=============================
+
+Lowers a CoffeePy ``Program`` into a Python ``ast.Module``, compiles it with
+``compile()`` and runs the resulting code object. Names, loops, calls and
+arithmetic become plain Python bytecode; behaviour without a direct Python
+equivalent goes through the helpers in ``coffeepy.runtime``.
+
+CoffeePy is expression oriented: every statement has a value and a function
+returns the value of its last statement. The compiler therefore lowers each
+statement in a *mode*: its value is discarded, stored into a temporary, or
+returned from the enclosing function. Expressions that need statements of
+their own (blocks, ``switch``, comprehensions, function literals) emit those
+statements ahead of the expression that uses them, spilling earlier operands
+into temporaries so evaluation order is preserved.
+
+A function's ``for``, ``catch``, comprehension, import and class names are
+Python locals, but the tree walker only binds them when that code runs and
+reads the enclosing binding before. Reads of such a name outside the code
+that binds it therefore check for ``_cp_missing``, the local's initial
+value, and fall back to an accessor the enclosing function defines.
+
+Programs that use a construct this backend does not lower raise
+``CoffeeCompileError``; ``Interpreter`` then falls back to the tree walker.
+"""
+
+from __future__ import annotations
+
+import ast
+import re
+from types import CodeType
+
+from . import runtime
+from .ast_nodes import (
+    ArrayDestructuring,
+    ArrayLiteral,
+    AssignStmt,
+    AugAssignStmt,
+    Binary,
+    BlockExpr,
+    BreakStmt,
+    Call,
+    ChainedComparison,
+    ClassDecl,
+    ComprehensionExpr,
+    ContinueStmt,
+    DoExpr,
+    ExistentialAssignStmt,
+    ExistentialExpr,
+    ExprStmt,
+    ForInStmt,
+    ForOfStmt,
+    FromImportStmt,
+    FunctionLiteral,
+    GetAttr,
+    Identifier,
+    IfExpr,
+    ImportStmt,
+    InExpr,
+    IndexExpr,
+    InterpolatedString,
+    Literal,
+    LogicalAssignStmt,
+    MultiAssignStmt,
+    NewExpr,
+    ObjectComprehensionExpr,
+    ObjectDestructuring,
+    ObjectLiteral,
+    OfExpr,
+    Program,
+    ProtoAccessExpr,
+    RangeLiteral,
+    RegexLiteral,
+    ReturnStmt,
+    SafeAccessExpr,
+    SliceExpr,
+    SourceLocation,
+    SplatExpr,
+    SpreadExpr,
+    SwitchExpr,
+    ThisExpr,
+    ThrowStmt,
+    TryStmt,
+    Unary,
+    UpdateStmt,
+    WhileStmt,
+    YieldExpr,
+)
+from .analysis import function_info
+from .errors import CoffeeAttributeError, CoffeeCompileError, CoffeeError, CoffeeRuntimeError
+from .flat_ast import FlatAST, as_program
+from .inline_cache import AttributeCache
+from .interpreter import _ThrowSignal, comprehension_stages
+from .scopes import Scope, analyze_scopes
+from .tokens import (
+    AND,
+    ANDAND,
+    EQEQ,
+    GT,
+    GTE,
+    LT,
+    LTE,
+    MINUS,
+    MINUSMINUS,
+    MINUS_EQ,
+    NEQ,
+    NOT,
+    OR,
+    OROR,
+    PERCENT,
+    PERCENT_EQ,
+    PLUS,
+    PLUSPLUS,
+    PLUS_EQ,
+    SLASH,
+    SLASH_EQ,
+    STAR,
+    STARSTAR,
+    STAR_EQ,
+)
+
+FILENAME = "<coffeepy>"
+
+_FACTORY = "_cp_module"
+_MAIN = "_cp_main"
+
+# Helpers are handed to the generated module as parameters of its factory
+# function, so compiled code reaches them through closure cells instead of
+# polluting the CoffeePy global namespace.
+_HELPERS = {
+    "_cp_get_attr": runtime.get_attr,
+    "_cp_attribute_cache": AttributeCache,
+    "_cp_set_attr": runtime.set_attr,
+    "_cp_safe_attr": runtime.safe_attr,
+    "_cp_proto": runtime.proto,
+    "_cp_set_proto": runtime.set_proto,
+    "_cp_set_this_params": runtime.set_this_params,
+    "_cp_make_class": runtime.make_class,
+    "_cp_method": runtime.CompiledMethod,
+    "_cp_method_function": runtime.method_function,
+    "_cp_new": runtime.new,
+    "_cp_make_range": runtime.make_range,
+    "_cp_make_lazy_range": runtime.make_lazy_range,
+    "_cp_range_numbers": runtime.range_numbers,
+    "_cp_make_slice": runtime.make_slice,
+    "_cp_spread": runtime.spread,
+    "_cp_contains": runtime.contains,
+    "_cp_of_items": runtime.of_items,
+    "_cp_indexed_items": runtime.indexed_items,
+    "_cp_unpack_array": runtime.unpack_array,
+    "_cp_check_object": runtime.check_object,
+    "_cp_missing_property": runtime.missing_property,
+    "_cp_do": runtime.do,
+    "_cp_to_str": runtime.to_str,
+    "_cp_regex": runtime.regex,
+    "_cp_import_module": runtime.import_module,
+    "_cp_import_module_as": runtime.import_module_as,
+    "_cp_from_import": runtime.from_import,
+    "_cp_error": runtime.error,
+    "_cp_operation_failed": runtime.operation_failed,
+    "_cp_call_failed": runtime.call_failed,
+    "_cp_undefined": runtime.undefined,
+    "_cp_locate": runtime.locate,
+    "_cp_no_this": runtime.no_this,
+    "_cp_throw": _ThrowSignal,
+    "_cp_missing": runtime.MISSING,
+}
+_INTERPRETER = "_cp_interpreter"
+
+_BINARY_OPS = {
+    PLUS: ast.Add,
+    MINUS: ast.Sub,
+    STAR: ast.Mult,
+    SLASH: ast.Div,
+    PERCENT: ast.Mod,
+    STARSTAR: ast.Pow,
+}
+
+_COMPARE_OPS = {
+    EQEQ: ast.Eq,
+    NEQ: ast.NotEq,
+    LT: ast.Lt,
+    LTE: ast.LtE,
+    GT: ast.Gt,
+    GTE: ast.GtE,
+}
+
+_AUGMENTED_OPS = {
+    PLUS_EQ: ast.Add,
+    MINUS_EQ: ast.Sub,
+    STAR_EQ: ast.Mult,
+    SLASH_EQ: ast.Div,
+    PERCENT_EQ: ast.Mod,
+}
+
+_RETURN = "return"
+
+
+class _Store:
+    """Lowering mode that stores a statement's value into a temporary."""
+
+    def __init__(self, name: str):
+        self.name = name
+
+
+class _FunctionContext:
+    def __init__(self, scope: Scope, parent: "_FunctionContext | None", is_main: bool = False):
+        self.scope = scope
+        self.parent = parent
+        self.is_main = is_main
+        self.is_generator = scope.has_yield and not is_main
+        self.has_this = scope.enclosing_method() is not None
+        self.loop_depth = 0
+        self.stored: set[str] = set()
+        # Names this function defines that are not parameters, the ones of
+        # them known to be bound where lowering is, and the accessors of the
+        # enclosing binding for those read elsewhere.
+        self.late = set() if is_main else scope.declared.difference(scope.node.params)
+        self.bound: set[str] = set()
+        self.outer: dict[str, tuple[str, Identifier]] = {}
+        # Late names assigned inside a lazy comprehension's generator, which
+        # the function must bind for ``nonlocal`` to reach them.
+        self.shared: set[str] = set()
+        self.lazy_depth = 0
+
+
+def _name(identifier: str, store: bool = False) -> ast.Name:
+    return ast.Name(id=identifier, ctx=ast.Store() if store else ast.Load())
+
+
+def _const(value) -> ast.Constant:
+    return ast.Constant(value=value)
+
+
+def _call(function: str, args: list, keywords: list | None = None) -> ast.Call:
+    return ast.Call(func=_name(function), args=args, keywords=keywords or [])
+
+
+def _assign(target: ast.expr, value: ast.expr) -> ast.Assign:
+    return ast.Assign(targets=[target], value=value)
+
+
+def _call_location(node: Call) -> SourceLocation | None:
+    """Where a call is reported: its parenthesis, or for an implicit call
+    such as ``print x`` its callee."""
+    return node.location or getattr(node.callee, "location", None)
+
+
+def _is_pure(expr: ast.expr) -> bool:
+    """True for expressions that later statements cannot change."""
+    if isinstance(expr, ast.Constant):
+        return True
+    return isinstance(expr, ast.Name) and expr.id.startswith("_cp_")
+
+
+def _has_effects(statements: list) -> bool:
+    return any(not isinstance(statement, ast.FunctionDef) for statement in statements)
+
+
+class PythonCompiler:
+    """Compile a CoffeePy ``Program`` into a Python code object."""
+
+    def __init__(self):
+        self._out: list[ast.stmt] = []
+        self._ctx: _FunctionContext | None = None
+        self._counter = 0
+        # Bindings of the per-site attribute caches, made once by the factory.
+        self._attribute_caches: list[ast.stmt] = []
+
+    def compile(self, program: Program | FlatAST) -> CodeType:
+        program = as_program(program)
+        scopes = analyze_scopes(program)
+        self._scopes = scopes
+        main = self._function_def(_MAIN, scopes.root, [], program.statements, is_main=True)
+        factory = ast.FunctionDef(
+            name=_FACTORY,
+            args=self._arguments(list(_HELPERS) + [_INTERPRETER]),
+            body=[*self._attribute_caches, main, ast.Return(value=_name(_MAIN))],
+            decorator_list=[],
+            returns=None,
+        )
+        module = ast.Module(body=[factory], type_ignores=[])
+        ast.fix_missing_locations(module)
+        try:
+            return compile(module, FILENAME, "exec")
+        except (SyntaxError, ValueError, TypeError) as exc:
+            raise CoffeeCompileError(f"Generated code was rejected: {exc}") from exc
+
+    # ============ Functions ============
+
+    def _function_def(self, name: str, scope: Scope, params: list[str], statements, is_main: bool = False,
+                      node: FunctionLiteral | None = None, is_method: bool = False) -> ast.FunctionDef:
+        saved_out, saved_ctx = self._out, self._ctx
+        ctx = _FunctionContext(scope, saved_ctx, is_main)
+        self._out = []
+        self._ctx = ctx
+        try:
+            if node is not None:
+                if function_info(node).is_generator != scope.has_yield:
+                    raise CoffeeCompileError("'yield' inside a nested function is not supported.")
+                self._parameter_prologue(node, is_method)
+            if ctx.is_generator:
+                self._block(statements, None)
+            else:
+                self._block(statements, _RETURN)
+            body = self._out or [ast.Pass()]
+        finally:
+            self._out, self._ctx = saved_out, saved_ctx
+
+        declarations = self._declarations(ctx)
+        for late_name, (accessor, first_read) in ctx.outer.items():
+            declarations.append(_assign(_name(late_name, store=True), _name("_cp_missing")))
+            read_body, value = self._capture(self._identifier, first_read)
+            self._out.append(ast.FunctionDef(
+                name=accessor,
+                args=self._arguments([]),
+                body=read_body + [ast.Return(value=value)],
+                decorator_list=[],
+                returns=None,
+            ))
+        for late_name in sorted(ctx.shared.difference(ctx.outer)):
+            declarations.append(_assign(_name(late_name, store=True), _name("_cp_missing")))
+        return ast.FunctionDef(
+            name=name,
+            args=self._function_arguments(node, is_method),
+            body=declarations + body,
+            decorator_list=[],
+            returns=None,
+        )
+
+    def _declarations(self, ctx: _FunctionContext, nested: set[str] | None = None) -> list[ast.stmt]:
+        """Declare the names ``ctx``'s function stores that belong elsewhere.
+
+        With ``nested``, declare instead the names a generator nested in the
+        function stores; there the function's own names are nonlocal too.
+        """
+        global_names: list[str] = []
+        nonlocal_names: list[str] = []
+        for name in sorted(ctx.stored if nested is None else nested):
+            if ctx.is_main:
+                global_names.append(name)
+                continue
+            if name in ctx.scope.declared:
+                if nested is not None:
+                    nonlocal_names.append(name)
+                continue
+            owner = ctx.scope.lookup(name)
+            if owner.is_global:
+                global_names.append(name)
+            else:
+                nonlocal_names.append(name)
+
+        declarations: list[ast.stmt] = []
+        if global_names:
+            declarations.append(ast.Global(names=global_names))
+        if nonlocal_names:
+            declarations.append(ast.Nonlocal(names=nonlocal_names))
+        return declarations
+
+    @staticmethod
+    def _arguments(names: list[str], defaults: list | None = None, vararg: str | None = None,
+                   kwarg: str | None = None) -> ast.arguments:
+        return ast.arguments(
+            posonlyargs=[],
+            args=[ast.arg(arg=name) for name in names],
+            vararg=ast.arg(arg=vararg) if vararg else None,
+            kwonlyargs=[],
+            kw_defaults=[],
+            kwarg=ast.arg(arg=kwarg) if kwarg else None,
+            defaults=defaults or [],
+        )
+
+    def _function_arguments(self, node: FunctionLiteral | None, is_method: bool) -> ast.arguments:
+        if node is None:
+            return self._arguments([])
+
+        defaults = dict(node.defaults) if node.defaults else {}
+        params = list(node.params[:-1] if node.splat_param and node.params else node.params)
+        names = (["this"] if is_method else []) + params
+        default_values = [_name("_cp_missing") if name in defaults else _const(None) for name in params]
+        return self._arguments(names, default_values, vararg="_cp_rest", kwarg="_cp_kwargs")
+
+    def _parameter_prologue(self, node: FunctionLiteral, is_method: bool) -> None:
+        defaults = dict(node.defaults) if node.defaults else {}
+        params = node.params[:-1] if node.splat_param and node.params else node.params
+
+        for name in params:
+            if name not in defaults:
+                continue
+            saved_out = self._out
+            self._out = []
+            value = self._expr(defaults[name])
+            default_body = self._out + [_assign(_name(name, store=True), value)]
+            self._out = saved_out
+            self._out.append(ast.If(
+                test=ast.Compare(left=_name(name), ops=[ast.Is()], comparators=[_name("_cp_missing")]),
+                body=default_body,
+                orelse=[],
+            ))
+
+        if node.splat_param and node.params:
+            self._out.append(_assign(_name(node.params[-1], store=True), _call("list", [_name("_cp_rest")])))
+
+        if node.this_params and (is_method or self._ctx.has_this):
+            self._out.append(ast.Expr(value=_call("_cp_set_this_params", [
+                _name("this"),
+                ast.Tuple(elts=[_const(name) for name in node.this_params], ctx=ast.Load()),
+                ast.Tuple(elts=[_name(name) for name in node.this_params], ctx=ast.Load()),
+            ])))
+
+    def _function_literal(self, node: FunctionLiteral, is_method: bool = False) -> ast.Name:
+        name = self._fresh("_cp_fn")
+        scope = self._scopes.scope_for(node)
+        body = node.body.statements if isinstance(node.body, BlockExpr) else [ExprStmt(node.body)]
+        self._out.append(self._function_def(name, scope, node.params, body, node=node, is_method=is_method))
+        return _name(name)
+
+    # ============ Statements ============
+
+    def _block(self, statements, mode) -> None:
+        if not statements:
+            self._finish(_const(None), mode)
+            return
+        for statement in statements[:-1]:
+            self._stmt(statement, None)
+        self._stmt(statements[-1], mode)
+
+    def _finish(self, value: ast.expr, mode) -> None:
+        if mode is None:
+            if not isinstance(value, ast.Constant):
+                self._out.append(ast.Expr(value=value))
+        elif mode == _RETURN:
+            self._out.append(ast.Return(value=value))
+        else:
+            self._out.append(_assign(_name(mode.name, store=True), value))
+
+    def _loop_mode(self, mode):
+        """Return the mode for a loop body and emit the result's initial value."""
+        if mode is None:
+            return None
+        target = mode if isinstance(mode, _Store) else _Store(self._fresh("_cp_t"))
+        self._out.append(_assign(_name(target.name, store=True), _const(None)))
+        return target
+
+    def _finish_loop(self, target, mode) -> None:
+        if mode == _RETURN:
+            self._out.append(ast.Return(value=_name(target.name)))
+
+    def _stmt(self, statement, mode) -> None:
+        if isinstance(statement, ExprStmt):
+            self._expr_in_mode(statement.expression, mode)
+            return
+
+        if isinstance(statement, AssignStmt):
+            value = self._expr(statement.value)
+            if isinstance(statement.target, Identifier) and mode is None:
+                self._assign_target(statement.target, value)
+                return
+            value = self._spill(value)
+            self._assign_target(statement.target, value)
+            self._finish(value, mode)
+            return
+
+        if isinstance(statement, MultiAssignStmt):
+            value = self._spill(self._expr(statement.value))
+            for target in statement.targets:
+                self._assign_target(target, value)
+            self._finish(value, mode)
+            return
+
+        if isinstance(statement, AugAssignStmt):
+            op = _AUGMENTED_OPS.get(statement.operator)
+            if op is None:
+                raise CoffeeCompileError("Unsupported augmented assignment operator.")
+            read, write = self._target_accessors(statement.target)
+            current = read()
+            right = self._expr(statement.value)
+            current, right = self._stable(current), self._stable(right)
+            result = self._failing(ast.BinOp(left=current, op=op(), right=right), None, "Augmented assignment failed")
+            write(result)
+            self._finish(result, mode)
+            return
+
+        if isinstance(statement, UpdateStmt):
+            op = ast.Add if statement.operator == PLUSPLUS else ast.Sub
+            if statement.operator not in (PLUSPLUS, MINUSMINUS):
+                raise CoffeeCompileError("Unsupported update operator.")
+            read, write = self._target_accessors(statement.target)
+            current = self._spill(read())
+            result = self._failing(ast.BinOp(left=current, op=op(), right=_const(1)), None, "Update operator failed")
+            write(result)
+            self._finish(result if statement.prefix else current, mode)
+            return
+
+        if isinstance(statement, ExistentialAssignStmt):
+            read, write = self._target_accessors(statement.target)
+            current = self._fresh("_cp_t")
+            read_body, value = self._capture(read)
+            read_body.append(_assign(_name(current, store=True), value))
+            self._out.append(ast.Try(
+                body=read_body,
+                handlers=[ast.ExceptHandler(
+                    type=_name("Exception"), name=None,
+                    body=[_assign(_name(current, store=True), _const(None))],
+                )],
+                orelse=[],
+                finalbody=[],
+            ))
+            test = ast.Compare(left=_name(current), ops=[ast.Is()], comparators=[_const(None)])
+            self._conditional_update(test, current, statement.value, write)
+            self._finish(_name(current), mode)
+            return
+
+        if isinstance(statement, LogicalAssignStmt):
+            if statement.operator not in (OROR, ANDAND):
+                raise CoffeeCompileError(f"Unknown logical assignment operator: {statement.operator}")
+            read, write = self._target_accessors(statement.target)
+            current = self._spill(read())
+            test: ast.expr = _name(current.id)
+            if statement.operator == OROR:
+                test = ast.UnaryOp(op=ast.Not(), operand=test)
+            self._conditional_update(test, current.id, statement.value, write)
+            self._finish(current, mode)
+            return
+
+        if isinstance(statement, WhileStmt):
+            target = self._loop_mode(mode)
+            condition_stmts, condition = self._capture(self._expr, statement.condition)
+            body = self._loop_body(statement.body, target)
+            if condition_stmts:
+                exit_test = ast.If(test=ast.UnaryOp(op=ast.Not(), operand=condition), body=[ast.Break()], orelse=[])
+                loop = ast.While(test=_const(True), body=condition_stmts + [exit_test] + body, orelse=[])
+            else:
+                loop = ast.While(test=condition, body=body, orelse=[])
+            self._out.append(loop)
+            self._finish_loop(target, mode)
+            return
+
+        if isinstance(statement, ForInStmt):
+            target = self._loop_mode(mode)
+            iterable = self._iterable(statement.iterable)
+            loop_var = self._store_name(statement.var_name)
+            bound = self._bind([statement.var_name])
+            body = self._loop_body(statement.body, target)
+            self._ctx.bound.difference_update(bound)
+            self._out.append(ast.For(target=loop_var, iter=iterable, body=body, orelse=[]))
+            self._finish_loop(target, mode)
+            return
+
+        if isinstance(statement, ForOfStmt):
+            target = self._loop_mode(mode)
+            iterable = _call("_cp_of_items", [self._expr(statement.iterable)])
+            key = self._store_name(statement.key_var)
+            if statement.value_var:
+                value = self._store_name(statement.value_var)
+            else:
+                value = _name(self._fresh("_cp_t"), store=True)
+            bound = self._bind([statement.key_var, statement.value_var])
+            body = self._loop_body(statement.body, target)
+            self._ctx.bound.difference_update(bound)
+            pair = ast.Tuple(elts=[key, value], ctx=ast.Store())
+            self._out.append(ast.For(target=pair, iter=iterable, body=body, orelse=[]))
+            self._finish_loop(target, mode)
+            return
+
+        if isinstance(statement, BreakStmt):
+            self._loop_exit(ast.Break(), "break")
+            return
+
+        if isinstance(statement, ContinueStmt):
+            self._loop_exit(ast.Continue(), "continue")
+            return
+
+        if isinstance(statement, ReturnStmt):
+            value = self._expr(statement.value) if statement.value is not None else _const(None)
+            if self._ctx.is_main:
+                self._finish(value, None)
+                self._out.append(ast.Expr(value=_call("_cp_error", [_const("'return' used outside function.")])))
+                return
+            self._out.append(ast.Return(value=value))
+            return
+
+        if isinstance(statement, ThrowStmt):
+            value = self._expr(statement.value)
+            self._out.append(ast.Raise(exc=_call("_cp_throw", [value]), cause=None))
+            return
+
+        if isinstance(statement, TryStmt):
+            self._try_statement(statement, mode)
+            return
+
+        if isinstance(statement, ClassDecl):
+            self._class_declaration(statement, mode)
+            return
+
+        if isinstance(statement, ImportStmt):
+            for item in statement.items:
+                if item.alias is not None:
+                    value = _call("_cp_import_module_as", [_const(item.module)])
+                    self._out.append(_assign(self._store_name(item.alias), value))
+                elif "." in item.module:
+                    value = _call("_cp_import_module", [_const(item.module)])
+                    self._out.append(_assign(self._store_name(item.module.split(".", 1)[0]), value))
+                else:
+                    value = _call("_cp_import_module_as", [_const(item.module)])
+                    self._out.append(_assign(self._store_name(item.module), value))
+            self._finish(_const(None), mode)
+            return
+
+        if isinstance(statement, FromImportStmt):
+            for imported in statement.names:
+                if imported.name == "*":
+                    alias = imported.alias if imported.alias is not None else statement.module.split(".")[-1]
+                    value = _call("_cp_import_module_as", [_const(statement.module)])
+                    self._out.append(_assign(self._store_name(alias), value))
+                    continue
+                bind_name = imported.alias if imported.alias is not None else imported.name
+                value = _call("_cp_from_import", [_const(statement.module), _const(imported.name)])
+                self._out.append(_assign(self._store_name(bind_name), value))
+            self._finish(_const(None), mode)
+            return
+
+        raise CoffeeCompileError(f"Unsupported statement '{type(statement).__name__}'.")
+
+    def _loop_body(self, body, target) -> list[ast.stmt]:
+        self._ctx.loop_depth += 1
+        try:
+            statements, _ = self._capture(self._expr_in_mode, body, target)
+        finally:
+            self._ctx.loop_depth -= 1
+        return statements or [ast.Pass()]
+
+    def _loop_exit(self, node: ast.stmt, keyword: str) -> None:
+        if self._ctx.loop_depth > 0:
+            self._out.append(node)
+        elif self._ctx.is_main:
+            self._out.append(ast.Expr(value=_call("_cp_error", [_const(f"'{keyword}' used outside loop.")])))
+        else:
+            raise CoffeeCompileError(f"'{keyword}' outside a loop inside a function is not supported.")
+
+    def _conditional_update(self, test: ast.expr, current: str, value_node, write) -> None:
+        saved_out = self._out
+        self._out = []
+        value = self._expr(value_node)
+        self._out.append(_assign(_name(current, store=True), value))
+        write(_name(current))
+        body = self._out
+        self._out = saved_out
+        self._out.append(ast.If(test=test, body=body, orelse=[]))
+
+    def _try_statement(self, statement: TryStmt, mode) -> None:
+        target = self._loop_mode(mode)
+        body, _ = self._capture(self._expr_in_mode, statement.try_block, target)
+        handlers = []
+        if statement.catch_block is not None:
+            error_name = self._fresh("_cp_e")
+            saved_out = self._out
+            self._out = []
+            if statement.catch_var:
+                value = ast.Attribute(value=_name(error_name), attr="value", ctx=ast.Load())
+                self._out.append(_assign(self._store_name(statement.catch_var), value))
+            bound = self._bind([statement.catch_var])
+            self._expr_in_mode(statement.catch_block, target)
+            self._ctx.bound.difference_update(bound)
+            handler_body = self._out or [ast.Pass()]
+            self._out = saved_out
+            handlers.append(ast.ExceptHandler(type=_name("_cp_throw"), name=error_name, body=handler_body))
+        final_body = []
+        if statement.finally_block is not None:
+            final_body, _ = self._capture(self._expr_in_mode, statement.finally_block, None)
+            final_body = final_body or [ast.Pass()]
+        if handlers or final_body:
+            self._out.append(ast.Try(body=body or [ast.Pass()], handlers=handlers, orelse=[], finalbody=final_body))
+        else:
+            self._out.extend(body)
+        self._finish_loop(target, mode)
+
+    def _class_declaration(self, statement: ClassDecl, mode) -> None:
+        parent = self._spill(self._expr(statement.parent)) if statement.parent else _const(None)
+        keys = []
+        values = []
+        for method_name, member in statement.body:
+            keys.append(_const(method_name))
+            if isinstance(member, FunctionLiteral):
+                values.append(_call("_cp_method", [self._function_literal(member, is_method=True)]))
+            else:
+                values.append(self._spill(self._expr(member)))
+        methods = ast.Dict(keys=keys, values=values)
+        klass = _call("_cp_make_class", [_const(statement.name), parent, methods, _name(_INTERPRETER)])
+        self._out.append(_assign(self._store_name(statement.name), klass))
+        self._finish(_name(statement.name), mode)
+
+    # ============ Assignment targets ============
+
+    def _store_name(self, name: str) -> ast.Name:
+        self._ctx.stored.add(name)
+        return _name(name, store=True)
+
+    def _assign_target(self, target, value: ast.expr) -> None:
+        if isinstance(target, Identifier):
+            self._out.append(_assign(self._store_name(target.name), value))
+            return
+
+        if isinstance(target, GetAttr):
+            container = self._expr(target.target)
+            self._out.append(ast.Expr(value=_call("_cp_set_attr", [container, _const(target.name), value])))
+            return
+
+        if isinstance(target, ProtoAccessExpr):
+            klass = self._expr(target.target)
+            self._out.append(ast.Expr(value=_call("_cp_set_proto", [klass, _const(target.name), value])))
+            return
+
+        if isinstance(target, IndexExpr):
+            container, index = self._exprs([target.target, target.index])
+            container, index = self._stable(container), self._stable(index)
+            subscript = ast.Subscript(value=container, slice=index, ctx=ast.Store())
+            store = self._located(_assign(subscript, self._stable(value)), target.location)
+            self._guard([store], target.location, "_cp_operation_failed", _const("Index assignment failed"))
+            return
+
+        if isinstance(target, ArrayDestructuring):
+            values = self._spill(_call("_cp_unpack_array", [
+                value, _const(len(target.elements)), _const(target.splat_index),
+            ]))
+            for index, element in enumerate(target.elements):
+                item = self._spill(ast.Subscript(value=values, slice=_const(index), ctx=ast.Load()))
+                self._assign_target(element, item)
+            return
+
+        if isinstance(target, ObjectDestructuring):
+            source = self._spill(_call("_cp_check_object", [value]))
+            for key, alias, default in target.properties:
+                present = ast.Compare(left=_const(key), ops=[ast.In()], comparators=[source])
+                lookup = ast.Subscript(value=source, slice=_const(key), ctx=ast.Load())
+                item = self._fresh("_cp_t")
+                if default is None:
+                    fallback_stmts, fallback = [], _call("_cp_missing_property", [_const(key)])
+                else:
+                    fallback_stmts, fallback = self._capture(self._expr, default)
+                self._out.append(ast.If(
+                    test=present,
+                    body=[_assign(_name(item, store=True), lookup)],
+                    orelse=fallback_stmts + [_assign(_name(item, store=True), fallback)],
+                ))
+                if alias is not None:
+                    self._assign_target(alias, _name(item))
+                else:
+                    self._out.append(_assign(self._store_name(key), _name(item)))
+            return
+
+        raise CoffeeCompileError("Invalid assignment target.")
+
+    def _target_accessors(self, target):
+        """Return ``(read, write)`` callables for a read-modify-write target.
+
+        The target's container and index are evaluated once, before either
+        callable runs.
+        """
+        if isinstance(target, Identifier):
+            def read_identifier():
+                return self._identifier(target)
+
+            def write_identifier(value):
+                self._out.append(_assign(self._store_name(target.name), value))
+
+            return read_identifier, write_identifier
+
+        if isinstance(target, GetAttr):
+            container = self._spill(self._expr(target.target))
+            name = _const(target.name)
+
+            def read_attr():
+                return _call("_cp_get_attr", [container, name])
+
+            def write_attr(value):
+                self._out.append(ast.Expr(value=_call("_cp_set_attr", [container, name, value])))
+
+            return read_attr, write_attr
+
+        if isinstance(target, IndexExpr):
+            container, index = self._exprs([target.target, target.index])
+            container = self._spill(container)
+            index = self._spill(index)
+
+            def read_index():
+                return ast.Subscript(value=container, slice=index, ctx=ast.Load())
+
+            def write_index(value):
+                self._out.append(_assign(ast.Subscript(value=container, slice=index, ctx=ast.Store()), value))
+
+            return read_index, write_index
+
+        raise CoffeeCompileError("Invalid assignment target.")
+
+    # ============ Expressions ============
+
+    def _expr_in_mode(self, node, mode) -> None:
+        if isinstance(node, BlockExpr):
+            self._block(node.statements, mode)
+            return
+
+        if isinstance(node, IfExpr):
+            test = self._expr(node.condition)
+            then_body, _ = self._capture(self._expr_in_mode, node.then_branch, mode)
+            if mode is None and isinstance(node.else_branch, Literal) and node.else_branch.value is None:
+                else_body = []
+            else:
+                else_body, _ = self._capture(self._expr_in_mode, node.else_branch, mode)
+            self._out.append(ast.If(test=test, body=then_body or [ast.Pass()], orelse=else_body))
+            return
+
+        if isinstance(node, SwitchExpr):
+            self._switch(node, mode)
+            return
+
+        self._finish(self._expr(node), mode)
+
+    def _switch(self, node: SwitchExpr, mode) -> None:
+        subject = self._spill(self._expr(node.value)) if node.value is not None else None
+        branches = []
+        for conditions, body in node.cases:
+            tests = []
+            for condition in conditions:
+                condition_stmts, value = self._capture(self._expr, condition)
+                if _has_effects(condition_stmts):
+                    raise CoffeeCompileError("Statements inside 'when' conditions are not supported.")
+                self._out.extend(condition_stmts)
+                if subject is not None:
+                    value = ast.Compare(left=subject, ops=[ast.Eq()], comparators=[value])
+                tests.append(value)
+            test = tests[0] if len(tests) == 1 else ast.BoolOp(op=ast.Or(), values=tests)
+            body_stmts, _ = self._capture(self._expr_in_mode, body, mode)
+            branches.append((test, body_stmts or [ast.Pass()]))
+
+        if node.default is not None:
+            orelse, _ = self._capture(self._expr_in_mode, node.default, mode)
+        elif mode is not None:
+            orelse, _ = self._capture(self._finish, _const(None), mode)
+        else:
+            orelse = []
+
+        for test, body_stmts in reversed(branches):
+            orelse = [ast.If(test=test, body=body_stmts, orelse=orelse)]
+        self._out.extend(orelse)
+
+    def _expr(self, node) -> ast.expr:
+        if isinstance(node, Literal):
+            return _const(node.value)
+
+        if isinstance(node, RegexLiteral):
+            return _call("_cp_regex", [_const(node.pattern), _const(node.flags)])
+
+        if isinstance(node, Identifier):
+            return self._identifier(node)
+
+        if isinstance(node, Unary):
+            operand = self._expr(node.right)
+            if node.operator == MINUS:
+                return ast.UnaryOp(op=ast.USub(), operand=operand)
+            if node.operator == PLUS:
+                return ast.UnaryOp(op=ast.UAdd(), operand=operand)
+            if node.operator == NOT:
+                return ast.UnaryOp(op=ast.Not(), operand=operand)
+            raise CoffeeCompileError("Unsupported unary operator.")
+
+        if isinstance(node, Binary):
+            if node.operator in (AND, OR):
+                return self._short_circuit(node)
+            left, right = self._exprs([node.left, node.right])
+            if node.operator in _COMPARE_OPS:
+                compare = ast.Compare(left=left, ops=[_COMPARE_OPS[node.operator]()], comparators=[right])
+                return self._located(compare, node.location)
+            op = _BINARY_OPS.get(node.operator)
+            if op is None:
+                raise CoffeeCompileError("Unsupported binary operator.")
+            left, right = self._stable(left), self._stable(right)
+            return self._failing(ast.BinOp(left=left, op=op(), right=right), node.location, "Binary operation failed")
+
+        if isinstance(node, ChainedComparison):
+            operands = self._exprs(node.operands)
+            ops = [_COMPARE_OPS[operator]() for operator in node.operators]
+            return ast.Compare(left=operands[0], ops=ops, comparators=operands[1:])
+
+        if isinstance(node, IfExpr):
+            test = self._expr(node.condition)
+            then_stmts, then_value = self._capture(self._expr, node.then_branch)
+            else_stmts, else_value = self._capture(self._expr, node.else_branch)
+            if not then_stmts and not else_stmts:
+                return ast.IfExp(test=test, body=then_value, orelse=else_value)
+            result = self._fresh("_cp_t")
+            self._out.append(ast.If(
+                test=test,
+                body=then_stmts + [_assign(_name(result, store=True), then_value)],
+                orelse=else_stmts + [_assign(_name(result, store=True), else_value)],
+            ))
+            return _name(result)
+
+        if isinstance(node, (BlockExpr, SwitchExpr)):
+            result = _Store(self._fresh("_cp_t"))
+            self._expr_in_mode(node, result)
+            return _name(result.name)
+
+        if isinstance(node, FunctionLiteral):
+            return self._function_literal(node)
+
+        if isinstance(node, ArrayLiteral):
+            return ast.List(elts=self._exprs(node.items), ctx=ast.Load())
+
+        if isinstance(node, ObjectLiteral):
+            values = self._exprs([value for _key, value in node.items])
+            return ast.Dict(keys=[_const(key) for key, _value in node.items], values=values)
+
+        if isinstance(node, RangeLiteral):
+            return self._range(node, "_cp_make_range")
+
+        if isinstance(node, GetAttr):
+            target = self._stable(self._operand(node.target))
+            return self._guarded(_call(self._attribute_cache(node.name), [target]), node.location, "_cp_locate")
+
+        if isinstance(node, IndexExpr):
+            target, index = self._exprs([node.target, node.index], in_place=0)
+            target, index = self._stable(target), self._stable(index)
+            subscript = ast.Subscript(value=target, slice=index, ctx=ast.Load())
+            return self._failing(subscript, node.location, "Index operation failed")
+
+        if isinstance(node, SliceExpr):
+            parts = [node.target] + [part for part in (node.start, node.end) if part is not None]
+            values = self._exprs(parts, in_place=0)
+            start = values[1] if node.start is not None else _const(None)
+            end = values[-1] if node.end is not None else _const(None)
+            return _call("_cp_make_slice", [values[0], start, end, _const(node.exclusive)])
+
+        if isinstance(node, Call):
+            return self._call_expr(node)
+
+        if isinstance(node, NewExpr):
+            values = self._exprs([node.class_expr] + list(node.args) + [value for _name_, value in node.kwargs])
+            positional = values[:1 + len(node.args)]
+            keywords = [
+                ast.keyword(arg=name, value=value)
+                for (name, _expr_), value in zip(node.kwargs, values[1 + len(node.args):])
+            ]
+            return _call("_cp_new", positional, keywords)
+
+        if isinstance(node, ThisExpr):
+            if self._ctx.has_this:
+                return _name("this")
+            if not self._ctx.is_main:
+                # A plain function can still become a method through '::'.
+                raise CoffeeCompileError("'this' inside a function that is not a method is not supported.")
+            return _call("_cp_no_this", [])
+
+        if isinstance(node, ExistentialExpr):
+            left = self._expr(node.left)
+            right_stmts, right = self._capture(self._expr, node.right)
+            result = self._fresh("_cp_t")
+            if not right_stmts:
+                test = ast.Compare(
+                    left=ast.NamedExpr(target=_name(result, store=True), value=left),
+                    ops=[ast.IsNot()], comparators=[_const(None)],
+                )
+                return ast.IfExp(test=test, body=_name(result), orelse=right)
+            self._out.append(_assign(_name(result, store=True), left))
+            self._out.append(ast.If(
+                test=ast.Compare(left=_name(result), ops=[ast.Is()], comparators=[_const(None)]),
+                body=right_stmts + [_assign(_name(result, store=True), right)],
+                orelse=[],
+            ))
+            return _name(result)
+
+        if isinstance(node, SafeAccessExpr):
+            return _call("_cp_safe_attr", [self._operand(node.target), _const(node.name)])
+
+        if isinstance(node, ProtoAccessExpr):
+            if node.target is None:
+                message = "Prototype access '::' requires a target (e.g., Array::map)."
+                return _call("_cp_error", [_const(message)])
+            return _call("_cp_proto", [self._expr(node.target), _const(node.name)])
+
+        if isinstance(node, (SplatExpr, SpreadExpr)):
+            return self._expr(node.value)
+
+        if isinstance(node, InterpolatedString):
+            values = self._exprs(node.parts)
+            parts: list[ast.expr] = []
+            for part, value in zip(node.parts, values):
+                if isinstance(part, Literal) and isinstance(part.value, str):
+                    parts.append(_const(part.value))
+                else:
+                    parts.append(ast.FormattedValue(value=_call("_cp_to_str", [value]), conversion=-1, format_spec=None))
+            return ast.JoinedStr(values=parts)
+
+        if isinstance(node, InExpr):
+            value, container = self._exprs([node.value, node.container], in_place=1)
+            return _call("_cp_contains", [value, container])
+
+        if isinstance(node, OfExpr):
+            key, container = self._exprs([node.key, node.container])
+            return _call("_cp_contains", [key, container])
+
+        if isinstance(node, ComprehensionExpr):
+            return self._comprehension(node)
+
+        if isinstance(node, ObjectComprehensionExpr):
+            return self._object_comprehension(node)
+
+        if isinstance(node, DoExpr):
+            return _call("_cp_do", [self._expr(node.body)])
+
+        if isinstance(node, YieldExpr):
+            if self._ctx.lazy_depth:
+                raise CoffeeCompileError("'yield' inside a lazy comprehension is not supported by the Python compiler.")
+            if not self._ctx.is_generator:
+                raise CoffeeCompileError("'yield' used outside generator function.")
+            value = self._expr(node.value) if node.value is not None else _const(None)
+            return ast.Yield(value=value)
+
+        raise CoffeeCompileError(f"Unsupported expression '{type(node).__name__}'.")
+
+    def _identifier(self, node: Identifier) -> ast.expr:
+        value = self._load(node)
+        if isinstance(value, ast.Name) and self._ctx.scope.lookup(node.name).is_global:
+            # A global may not be defined yet.
+            return self._guarded(value, node.location, "_cp_undefined", _const(node.name), caught="NameError")
+        return self._located(value, node.location, len(node.name))
+
+    def _load(self, node: Identifier) -> ast.expr:
+        """Read ``node``; a late name of its function may still be unbound."""
+        name = node.name
+        owner = self._ctx.scope.lookup(name)
+        if owner.is_global:
+            return _name(name)
+        ctx = self._ctx
+        while ctx.scope is not owner:
+            ctx = ctx.parent
+        if name not in ctx.late or name in ctx.bound:
+            return _name(name)
+        if name not in ctx.outer:
+            ctx.outer[name] = (self._fresh("_cp_outer"), node)
+        accessor = ctx.outer[name][0]
+        return ast.IfExp(
+            test=ast.Compare(left=_name(name), ops=[ast.IsNot()], comparators=[_name("_cp_missing")]),
+            body=_name(name),
+            orelse=_call(accessor, []),
+        )
+
+    def _bind(self, names) -> list[str]:
+        """Mark the late ``names`` bound while their loop or block is lowered;
+        return the ones to unmark afterwards."""
+        added = [name for name in names if name and name not in self._ctx.bound]
+        self._ctx.bound.update(added)
+        return added
+
+    @staticmethod
+    def _located(expr, location: SourceLocation | None, width: int = 1):
+        if location is not None:
+            expr.lineno = expr.end_lineno = location.line
+            expr.col_offset = location.column - 1
+            expr.end_col_offset = location.column - 1 + width
+        return expr
+
+    def _short_circuit(self, node: Binary) -> ast.expr:
+        left = self._expr(node.left)
+        right_stmts, right = self._capture(self._expr, node.right)
+        op = ast.And() if node.operator == AND else ast.Or()
+        if not right_stmts:
+            return ast.BoolOp(op=op, values=[left, right])
+        result = self._fresh("_cp_t")
+        self._out.append(_assign(_name(result, store=True), left))
+        test: ast.expr = _name(result)
+        if node.operator == OR:
+            test = ast.UnaryOp(op=ast.Not(), operand=test)
+        self._out.append(ast.If(test=test, body=right_stmts + [_assign(_name(result, store=True), right)], orelse=[]))
+        return _name(result)
+
+    def _call_expr(self, node: Call) -> ast.expr:
+        if isinstance(node.callee, GetAttr):
+            return self._method_call(node)
+        parts = [node.callee] + [arg.value if isinstance(arg, SpreadExpr) else arg for arg in node.args]
+        parts += [value for _name_, value in node.kwargs]
+        values = [self._stable(value) for value in self._exprs(parts)]
+        callee = values[0]
+        args: list[ast.expr] = []
+        for arg, value in zip(node.args, values[1:]):
+            if isinstance(arg, SpreadExpr):
+                args.append(ast.Starred(value=_call("_cp_spread", [value]), ctx=ast.Load()))
+            else:
+                args.append(value)
+        keywords = [
+            ast.keyword(arg=name, value=value)
+            for (name, _expr_), value in zip(node.kwargs, values[1 + len(node.args):])
+        ]
+        call = ast.Call(func=callee, args=args, keywords=keywords)
+        return self._guarded(call, _call_location(node), "_cp_call_failed", callee)
+
+    def _method_call(self, node: Call) -> ast.expr:
+        """Compile ``obj.name(args)`` so a class method runs without binding.
+
+        The site looks the method up with ``f = find(r)`` for the receiver
+        ``r`` and, when that finds none, reads the attribute as usual into
+        ``a``. The call is then ``f(r, args) if f is not None else a(args)``.
+        """
+        callee = node.callee
+        find, load = self._method_cache(callee.name)
+        receiver = self._spill(self._operand(callee.target))
+        function = self._fresh("_cp_f")
+        attribute = self._fresh("_cp_a")
+        self._out.append(_assign(_name(function, store=True), _call(find, [receiver])))
+        def missing():
+            return ast.Compare(left=_name(function), ops=[ast.Is()], comparators=[_const(None)])
+
+        loaded = _assign(_name(attribute, store=True), self._located(_call(load, [receiver]), callee.location))
+        load_body, _ = self._capture(self._guard, [loaded], callee.location, "_cp_locate")
+        self._out.append(ast.If(test=missing(), body=load_body, orelse=[]))
+
+        arg_nodes = [arg.value if isinstance(arg, SpreadExpr) else arg for arg in node.args]
+        arg_nodes += [value for _name_, value in node.kwargs]
+        values = [self._stable(value) for value in self._exprs(arg_nodes)]
+        args: list[ast.expr] = []
+        for arg, value in zip(node.args, values):
+            if isinstance(arg, SpreadExpr):
+                args.append(ast.Starred(value=_call("_cp_spread", [value]), ctx=ast.Load()))
+            else:
+                args.append(value)
+        keywords = [
+            ast.keyword(arg=name, value=value)
+            for (name, _expr_), value in zip(node.kwargs, values[len(node.args):])
+        ]
+        direct = ast.Call(func=_name(function), args=[receiver] + args, keywords=keywords)
+        bound = ast.Call(func=_name(attribute), args=list(args), keywords=list(keywords))
+        call = ast.IfExp(test=missing(), body=bound, orelse=direct)
+        target = ast.IfExp(test=missing(), body=_name(attribute), orelse=_name(function))
+        return self._guarded(call, _call_location(node), "_cp_call_failed", target)
+
+    def _range(self, node: RangeLiteral, helper: str) -> ast.expr:
+        parts = [node.start, node.end] + ([node.step] if node.step is not None else [])
+        values = self._exprs(parts)
+        step = values[2] if node.step is not None else _const(None)
+        return _call(helper, [values[0], values[1], _const(node.exclusive), step])
+
+    def _iterable(self, node) -> ast.expr:
+        """Lower what a loop iterates over; a range literal gives its numbers."""
+        if isinstance(node, RangeLiteral):
+            return self._range(node, "_cp_range_numbers")
+        return self._expr(node)
+
+    def _operand(self, node) -> ast.expr:
+        """Lower an operand that is read in place (see ``CoffeeRange``); a
+        range literal there stays lazy."""
+        if isinstance(node, RangeLiteral):
+            return self._range(node, "_cp_make_lazy_range")
+        return self._expr(node)
+
+    def _comprehension(self, node: ComprehensionExpr) -> ast.expr:
+        source, stages = comprehension_stages(node)
+        if node.lazy:
+            return self._lazy_comprehension(source, stages)
+        result = self._fresh("_cp_t")
+        self._out.append(_assign(_name(result, store=True), ast.List(elts=[], ctx=ast.Load())))
+        append = ast.Attribute(value=_name(result), attr="append", ctx=ast.Load())
+        loop = self._comprehension_loop(self._iterable(source), stages, lambda value: ast.Call(
+            func=append, args=[value], keywords=[],
+        ))
+        self._out.append(loop)
+        return _name(result)
+
+    def _lazy_comprehension(self, source, stages) -> ast.Call:
+        """Lower a lazy comprehension to a nested generator function.
+
+        The source is evaluated right away and the stages run as items are
+        pulled. The loop variables stay names of the enclosing scope, as in
+        the tree walker, so the generator declares what it stores nonlocal.
+        """
+        iterable = self._iterable(source)
+        items = self._fresh("_cp_t")
+        ctx = self._ctx
+        saved = (ctx.stored, ctx.loop_depth)
+        ctx.stored, ctx.loop_depth = set(), 0
+        ctx.lazy_depth += 1
+        try:
+            loop = self._comprehension_loop(_name(items), stages, lambda value: ast.Yield(value=value))
+            stored = ctx.stored
+        finally:
+            ctx.lazy_depth -= 1
+            ctx.stored, ctx.loop_depth = saved
+        ctx.stored.update(stored)
+        ctx.shared.update(stored.intersection(ctx.late))
+        generator = self._fresh("_cp_lazy")
+        self._out.append(ast.FunctionDef(
+            name=generator,
+            args=self._arguments([items]),
+            body=self._declarations(ctx, stored) + [loop],
+            decorator_list=[],
+            returns=None,
+        ))
+        return _call(generator, [iterable])
+
+    def _comprehension_loop(self, iterable: ast.expr, stages, collect) -> ast.For:
+        """Loop over ``iterable`` running every stage on each item and
+        passing the last stage's value to ``collect``."""
+        loop_var = self._store_name(stages[0].var_name)
+        bound = self._bind([stage.var_name for stage in stages])
+        saved_out = self._out
+        self._out = []
+        value = self._expr(stages[-1].body)
+        self._out.append(ast.Expr(value=collect(value)))
+        body = self._filtered(stages[-1].filter_condition, self._out)
+        for inner, stage in zip(reversed(stages[:-1]), reversed(stages[1:])):
+            self._out = []
+            item = self._expr(inner.body)
+            self._out.append(_assign(self._store_name(stage.var_name), item))
+            body = self._filtered(inner.filter_condition, self._out + body)
+        self._out = saved_out
+        self._ctx.bound.difference_update(bound)
+        return ast.For(target=loop_var, iter=iterable, body=body, orelse=[])
+
+    def _object_comprehension(self, node: ObjectComprehensionExpr) -> ast.Name:
+        result = self._fresh("_cp_t")
+        self._out.append(_assign(_name(result, store=True), ast.Dict(keys=[], values=[])))
+        iterable = _call("_cp_indexed_items", [self._expr(node.iterable)])
+        key_var = self._store_name(node.key_var)
+        if node.value_var:
+            value_var = self._store_name(node.value_var)
+        else:
+            value_var = _name(self._fresh("_cp_t"), store=True)
+        bound = self._bind([node.key_var, node.value_var])
+        saved_out = self._out
+        self._out = []
+        key = self._spill(self._expr(node.key_expr))
+        value = self._expr(node.value_expr)
+        self._out.append(_assign(ast.Subscript(value=_name(result), slice=key, ctx=ast.Store()), value))
+        body = self._filtered(node.filter_condition, self._out)
+        self._out = saved_out
+        self._ctx.bound.difference_update(bound)
+        pair = ast.Tuple(elts=[key_var, value_var], ctx=ast.Store())
+        self._out.append(ast.For(target=pair, iter=iterable, body=body, orelse=[]))
+        return _name(result)
+
+    def _filtered(self, condition, body: list[ast.stmt]) -> list[ast.stmt]:
+        if condition is None:
+            return body
+        condition_stmts, test = self._capture(self._expr, condition)
+        skip = ast.If(test=ast.UnaryOp(op=ast.Not(), operand=test), body=[ast.Continue()], orelse=[])
+        return condition_stmts + [skip] + body
+
+    # ============ Helpers ============
+
+    def _exprs(self, nodes, in_place: int | None = None) -> list[ast.expr]:
+        """Compile several operands, keeping left-to-right evaluation order.
+        The one at position ``in_place`` is compiled with ``_operand``."""
+        results: list[ast.expr] = []
+        for position, node in enumerate(nodes):
+            statements, value = self._capture(self._operand if position == in_place else self._expr, node)
+            if _has_effects(statements):
+                for index, previous in enumerate(results):
+                    results[index] = self._spill(previous)
+            self._out.extend(statements)
+            results.append(value)
+        return results
+
+    def _capture(self, compile_fn, *args):
+        saved_out = self._out
+        self._out = []
+        try:
+            result = compile_fn(*args)
+            return self._out, result
+        finally:
+            self._out = saved_out
+
+    def _spill(self, value: ast.expr) -> ast.expr:
+        """Evaluate ``value`` into a temporary unless it is already stable."""
+        if _is_pure(value):
+            return value
+        name = self._fresh("_cp_t")
+        self._out.append(_assign(_name(name, store=True), value))
+        return _name(name)
+
+    def _stable(self, value: ast.expr) -> ast.expr:
+        """Spill ``value`` unless it is a name or a constant, so the guard
+        of the operation using it covers that operation alone."""
+        if isinstance(value, (ast.Name, ast.Constant)):
+            return value
+        return self._spill(value)
+
+    def _guard(self, body: list[ast.stmt], location: SourceLocation | None, handler: str, *args: ast.expr,
+               caught: str = "Exception") -> None:
+        """Run ``body`` so that an exception it raises goes to the runtime
+        helper ``handler``, with ``args``, the exception and the source
+        position, which raises the error the other engines give."""
+        error = self._fresh("_cp_e")
+        line, column = (location.line, location.column) if location is not None else (None, None)
+        report = _call(handler, [*args, _name(error), _const(line), _const(column)])
+        self._out.append(self._located(ast.Try(
+            body=body,
+            handlers=[ast.ExceptHandler(type=_name(caught), name=error, body=[ast.Expr(value=report)])],
+            orelse=[],
+            finalbody=[],
+        ), location))
+
+    def _guarded(self, value: ast.expr, location: SourceLocation | None, handler: str, *args: ast.expr,
+                 caught: str = "Exception") -> ast.Name:
+        """Evaluate ``value`` into a temporary under ``_guard``."""
+        name = self._fresh("_cp_t")
+        self._guard([_assign(_name(name, store=True), self._located(value, location))], location, handler, *args, caught=caught)
+        return _name(name)
+
+    def _failing(self, value: ast.expr, location: SourceLocation | None, message: str) -> ast.Name:
+        """Evaluate ``value``; an exception it raises reads ``message: ...``."""
+        return self._guarded(value, location, "_cp_operation_failed", _const(message))
+
+    def _attribute_cache(self, name: str) -> str:
+        """Name of a new attribute access site's ``AttributeCache.load``."""
+        site = self._fresh("_cp_ic")
+        cache = _call("_cp_attribute_cache", [_const(name)])
+        self._attribute_caches.append(_assign(_name(site, store=True), ast.Attribute(value=cache, attr="load", ctx=ast.Load())))
+        return site
+
+    def _method_cache(self, name: str) -> tuple[str, str]:
+        """Names of a new method call site's ``method_function`` lookup and
+        ``AttributeCache.load``, both backed by one cache."""
+        cache = self._fresh("_cp_mc")
+        find = self._fresh("_cp_mf")
+        load = self._fresh("_cp_ic")
+        self._attribute_caches.append(_assign(_name(cache, store=True), _call("_cp_attribute_cache", [_const(name)])))
+        self._attribute_caches.append(_assign(_name(find, store=True), _call("_cp_method_function", [_name(cache)])))
+        self._attribute_caches.append(_assign(_name(load, store=True), ast.Attribute(value=_name(cache), attr="load", ctx=ast.Load())))
+        return find, load
+
+    def _fresh(self, prefix: str) -> str:
+        self._counter += 1
+        return f"{prefix}{self._counter}"
+
+
+def _traceback_location(exc: BaseException) -> SourceLocation | None:
+    """The line of the innermost compiled frame of ``exc``.
+
+    Lowered nodes carry the line of their CoffeePy node. Column offsets in
+    tracebacks differ between Python versions, so operations that report a
+    column pass it to their runtime helper instead (see ``_guard``).
+    """
+    location = None
+    tb = exc.__traceback__
+    while tb is not None:
+        if tb.tb_frame.f_code.co_filename == FILENAME:
+            location = SourceLocation(tb.tb_lineno, 1)
+        tb = tb.tb_next
+    return location
+
+
+def _undefined_name(exc: NameError) -> str:
+    """The identifier of a ``NameError``; ``UnboundLocalError`` leaves
+    ``name`` unset, so it is read from the message then."""
+    if exc.name is not None:
+        return exc.name
+    match = re.search(r"'(\w+)'", str(exc))
+    return match.group(1) if match else "?"
+
+
+def run_compiled(code: CodeType, interpreter):
+    """Execute a compiled program in ``interpreter``'s global environment."""
+    namespace = interpreter.environment.values
+    exec(code, namespace)
+    factory = namespace.pop(_FACTORY)
+    main = factory(*_HELPERS.values(), interpreter)
+    try:
+        return main()
+    except CoffeeAttributeError as exc:
+        # The other engines report a missing attribute as a plain runtime error.
+        location = exc.location or _traceback_location(exc)
+        raise CoffeeRuntimeError(exc.message, location, interpreter.source) from None
+    except CoffeeRuntimeError as exc:
+        if exc.location is None:
+            exc.location = _traceback_location(exc)
+        if exc.source is None:
+            exc.source = interpreter.source
+        raise
+    except (CoffeeError, _ThrowSignal):
+        raise
+    except NameError as exc:
+        location = _traceback_location(exc)
+        raise CoffeeRuntimeError(f"Undefined identifier '{_undefined_name(exc)}'.", location, interpreter.source) from None
+    except Exception as exc:
+        location = _traceback_location(exc)
+        raise CoffeeRuntimeError(f"{type(exc).__name__}: {exc}", location, interpreter.source) from exc
@@ -0,0 +1,199 @@
+"""
+CoffeePy - Quickening
+=====================
+
+The tree walker evaluates ``Binary`` and ``Call`` nodes through code that
+works for any operand: it picks the operation from the operator, wraps it to
+report failures and, for calls, matches the arguments against defaults,
+keywords and splats. A node usually sees the same kinds of values every time
+it runs, so, like CPython 3.11's specializing interpreter, each node owns a
+*site* that watches them and rewrites the node once it is hot:
+
+* ``BinarySite``: after ``QUICKEN_THRESHOLD`` evaluations in a row with the
+  same operand types, such as int + int, float * float or str + str, the
+  site runs the bare operation behind a guard on those types. Only
+  combinations that cannot fail are specialized, so the bare operation
+  never needs the error wrapping.
+* ``CallSite``: after ``QUICKEN_THRESHOLD`` calls in a row of functions made
+  by the same function literal, with one positional argument per parameter,
+  the site binds the arguments directly (``CoffeeFunction.call_exact``). The
+  guard checks the callee's literal and the number of arguments.
+
+When a guard fails the site deoptimizes: it returns to the generic path and
+waits twice as long before specializing again, so sites that keep seeing
+different values settle on the generic path. ``stats()`` adds up the sites'
+guard hits and deoptimizations, including those of finished programs.
+"""
+
+from __future__ import annotations
+
+import operator
+import weakref
+
+from .errors import CoffeeRuntimeError
+from .interpreter import CoffeeFunction
+from .tokens import EQEQ, GT, GTE, LT, LTE, MINUS, NEQ, PERCENT, PLUS, SLASH, STAR, STARSTAR
+
+QUICKEN_THRESHOLD = 8
+
+_COMPARISONS = {
+    EQEQ: operator.eq,
+    NEQ: operator.ne,
+    LT: operator.lt,
+    LTE: operator.le,
+    GT: operator.gt,
+    GTE: operator.ge,
+}
+
+_ARITHMETIC = {
+    PLUS: operator.add,
+    MINUS: operator.sub,
+    STAR: operator.mul,
+    SLASH: operator.truediv,
+    PERCENT: operator.mod,
+    STARSTAR: operator.pow,
+}
+
+BINARY_OPERATORS = frozenset(_COMPARISONS) | frozenset(_ARITHMETIC)
+
+_sites: "weakref.WeakSet[BinarySite | CallSite]" = weakref.WeakSet()
+# Counters of sites that have been garbage collected.
+_retired = {"hits": 0, "deopts": 0}
+
+
+def stats() -> dict[str, int]:
+    """Return the number of live and specialized sites and the guard hits
+    and deoptimizations of all sites."""
+    sites = list(_sites)
+    return {
+        "sites": len(sites),
+        "specialized": sum(site.is_specialized for site in sites),
+        "hits": _retired["hits"] + sum(site.hits for site in sites),
+        "deopts": _retired["deopts"] + sum(site.deopts for site in sites),
+    }
+
+
+def reset_stats() -> None:
+    _retired["hits"] = _retired["deopts"] = 0
+    for site in list(_sites):
+        site.hits = 0
+        site.deopts = 0
+
+
+def _fast_operation(op: str, left_type: type, right_type: type):
+    """Return the bare operation for these operand types, or None when it
+    could fail and must keep the generic error reporting."""
+    numbers = (int, float)
+    if op in _COMPARISONS:
+        if (left_type in numbers and right_type in numbers) or left_type is right_type is str:
+            return _COMPARISONS[op]
+        return None
+    if op in (PLUS, MINUS, STAR) and left_type is right_type and left_type in numbers:
+        return _ARITHMETIC[op]
+    if op == PLUS and left_type is right_type is str:
+        return operator.add
+    return None
+
+
+class _Site:
+    __slots__ = ("seen", "count", "threshold", "hits", "deopts", "__weakref__")
+
+    def __init__(self):
+        self.seen = None
+        self.count = 0
+        self.threshold = QUICKEN_THRESHOLD
+        self.hits = 0
+        self.deopts = 0
+        _sites.add(self)
+
+    def __del__(self):
+        _retired["hits"] += self.hits
+        _retired["deopts"] += self.deopts
+
+    def _observe(self, key) -> bool:
+        """Count one generic run that saw ``key``; True once the site is hot."""
+        if key != self.seen:
+            self.seen = key
+            self.count = 0
+        self.count += 1
+        return self.count >= self.threshold
+
+    def _back_off(self) -> None:
+        self.deopts += 1
+        self.seen = None
+        self.count = 0
+        self.threshold *= 2
+
+
+class BinarySite(_Site):
+    """Adaptive evaluation of one arithmetic or comparison node."""
+
+    __slots__ = ("operator", "generic", "left_type", "right_type", "fast")
+
+    def __init__(self, op: str):
+        super().__init__()
+        self.operator = op
+        if op in _COMPARISONS:
+            self.generic = _COMPARISONS[op]
+        else:
+            self.generic = _wrap_arithmetic(_ARITHMETIC[op])
+        self.left_type = self.right_type = self.fast = None
+
+    @property
+    def is_specialized(self) -> bool:
+        return self.fast is not None
+
+    def evaluate(self, left, right):
+        if type(left) is self.left_type and type(right) is self.right_type:
+            self.hits += 1
+            return self.fast(left, right)
+        if self.fast is not None:
+            self.left_type = self.right_type = self.fast = None
+            self._back_off()
+        value = self.generic(left, right)
+        key = (type(left), type(right))
+        if self._observe(key):
+            fast = _fast_operation(self.operator, *key)
+            if fast is not None:
+                self.left_type, self.right_type = key
+                self.fast = fast
+        return value
+
+
+class CallSite(_Site):
+    """Adaptive calls from one call node with positional arguments only."""
+
+    __slots__ = ("body", "arity")
+
+    def __init__(self):
+        super().__init__()
+        self.body = None
+        self.arity = -1
+
+    @property
+    def is_specialized(self) -> bool:
+        return self.body is not None
+
+    def call(self, callee, args: list):
+        if type(callee) is CoffeeFunction and callee.body is self.body and len(args) == self.arity:
+            self.hits += 1
+            return callee.call_exact(args)
+        if self.body is not None:
+            self.body = None
+            self.arity = -1
+            self._back_off()
+        if type(callee) is CoffeeFunction and self._observe((id(callee.body), len(args))):
+            if not callee.splat_param and not callee.this_params and len(callee.params) == len(args):
+                self.body = callee.body
+                self.arity = len(args)
+        return callee(*args)
+
+
+def _wrap_arithmetic(fn):
+    def generic(left, right):
+        try:
+            return fn(left, right)
+        except Exception as exc:
+            raise CoffeeRuntimeError(f"Binary operation failed: {exc}") from exc
+
+    return generic
@@ -0,0 +1,88 @@
+"""
+CoffeePy - Static Name Resolution
+=================================
+
+Runs after ``Parser.parse`` and gives every local variable a fixed slot in
+its function's frame, so engines can store frames as plain lists instead of
+chains of dictionaries.
+
+Ownership follows ``coffeepy.scopes``: a name belongs to the closest
+enclosing function that declares it (parameters, loop and ``catch``
+variables, imports, classes) and otherwise to the global scope. The pass
+annotates
+
+* every ``FunctionLiteral`` with ``frame_layout``, the names of its slots,
+* every ``Identifier`` (reads and assignment targets) and every
+  ``ForInStmt`` loop variable with a ``(depth, slot)`` coordinate, where
+  ``depth`` counts the function frames to walk outwards. Global names keep
+  the coordinate ``None`` and are looked up by name.
+
+A frame is a list holding the enclosing frame, ``this`` and the layout
+before the slots themselves, so the first variable lives at ``FIRST_SLOT``.
+
+The bytecode VM stores its frames that way. The closure engine keeps its
+``Environment`` frames, which it shares with the tree walker and with
+functions called from Python, but reads and writes a name in the frame
+``depth`` levels out instead of searching the chain for it.
+"""
+
+from __future__ import annotations
+
+from .ast_nodes import ForInStmt, FunctionLiteral, Identifier, Program, iter_child_nodes
+from .scopes import Scope, ScopeTable, analyze_scopes
+
+PARENT_SLOT = 0
+THIS_SLOT = 1
+LAYOUT_SLOT = 2
+FIRST_SLOT = 3
+
+
+def frame_layout(scope: Scope) -> tuple[str, ...]:
+    """Slot names of a function: parameters first, then other locals."""
+    params = tuple(dict.fromkeys(scope.node.params))
+    return params + tuple(sorted(scope.declared - set(params)))
+
+
+def lookup(layouts: list[dict[str, int]], name: str) -> tuple[int, int] | None:
+    """Return the coordinate of ``name`` seen from the innermost layout."""
+    for depth, layout in enumerate(reversed(layouts)):
+        slot = layout.get(name)
+        if slot is not None:
+            return depth, slot
+    return None
+
+
+def slot_map(layout: tuple[str, ...]) -> dict[str, int]:
+    return {name: index + FIRST_SLOT for index, name in enumerate(layout)}
+
+
+def resolve(program: Program) -> ScopeTable:
+    """Annotate ``program`` in place and return its scope table."""
+    table = analyze_scopes(program)
+    _Resolver(table).visit_all(program.statements, [])
+    return table
+
+
+class _Resolver:
+    def __init__(self, table: ScopeTable):
+        self.table = table
+
+    def visit_all(self, nodes, layouts: list[dict[str, int]]) -> None:
+        for node in nodes:
+            self.visit(node, layouts)
+
+    def visit(self, node, layouts: list[dict[str, int]]) -> None:
+        if isinstance(node, FunctionLiteral):
+            layout = frame_layout(self.table.scope_for(node))
+            object.__setattr__(node, "frame_layout", layout)
+            self.visit_all(iter_child_nodes(node), layouts + [slot_map(layout)])
+            return
+
+        if isinstance(node, Identifier):
+            object.__setattr__(node, "coordinate", lookup(layouts, node.name))
+            return
+
+        if isinstance(node, ForInStmt):
+            object.__setattr__(node, "var_coordinate", lookup(layouts, node.var_name))
+
+        self.visit_all(iter_child_nodes(node), layouts)
@@ -0,0 +1,275 @@
+"""
+CoffeePy - Runtime Helpers for Compiled Code
+============================================
+
+Code produced by ``coffeepy.pycompiler`` runs as ordinary Python bytecode.
+Whenever a CoffeePy operation has no exact Python counterpart (attribute
+access that also reads dict keys, inclusive ranges, ``?.``, classes, ...) the
+generated code calls one of the helpers below. Each helper mirrors the
+behaviour of the corresponding branch in ``Interpreter._evaluate`` so both
+backends agree on the result.
+"""
+
+from __future__ import annotations
+
+import importlib
+
+from .ast_nodes import SourceLocation
+from .errors import CoffeeError, CoffeeRuntimeError
+from .interpreter import CoffeeClass, CoffeeInstance, CoffeeRange, _ThrowSignal, compile_regex, range_numbers
+
+ThrowSignal = _ThrowSignal
+regex = compile_regex
+
+
+class _Missing:
+    def __repr__(self) -> str:
+        return "<missing>"
+
+
+MISSING = _Missing()
+
+
+class CompiledMethod:
+    """A class method compiled to a Python function taking ``this`` first."""
+
+    def __init__(self, function):
+        self.function = function
+
+    def call_with_this(self, instance, args: tuple, kwargs: dict):
+        return self.function(instance, *args, **kwargs)
+
+    def __call__(self, *args, **kwargs):
+        return self.function(None, *args, **kwargs)
+
+    def __repr__(self) -> str:
+        return f"<CompiledMethod {self.function.__name__}>"
+
+
+def method_function(cache):
+    """Return the lookup behind an ``obj.name(args)`` site of compiled code.
+
+    The lookup gives the Python function of the ``CompiledMethod`` that
+    ``receiver.name`` would bind, so the site calls it with the receiver as
+    ``this`` instead of allocating a ``BoundMethod``. For anything else it
+    returns ``None`` and the site reads the attribute as usual.
+    """
+    find_method = cache.find_method
+
+    def find(receiver):
+        if type(receiver) is CoffeeInstance:
+            method = find_method(receiver)
+            if type(method) is CompiledMethod:
+                return method.function
+        return None
+
+    return find
+
+
+def error(message: str):
+    raise CoffeeRuntimeError(message)
+
+
+def _location(line: int | None, column: int | None) -> SourceLocation | None:
+    return SourceLocation(line, column) if line is not None else None
+
+
+def operation_failed(message: str, exc: Exception, line: int | None = None, column: int | None = None):
+    """Report ``exc``, raised by the compiled operation at ``line`` and
+    ``column``, as the other engines do. CoffeePy errors and throws from
+    code the operation ran are raised unchanged."""
+    if isinstance(exc, (CoffeeError, ThrowSignal)):
+        raise exc
+    raise CoffeeRuntimeError(f"{message}: {exc}", _location(line, column)) from exc
+
+
+def call_failed(function, exc: Exception, line: int | None = None, column: int | None = None):
+    if not callable(function):
+        raise CoffeeRuntimeError("Target is not callable.", _location(line, column)) from None
+    operation_failed("Call failed", exc, line, column)
+
+
+def undefined(name: str, exc: NameError, line: int | None = None, column: int | None = None):
+    raise CoffeeRuntimeError(f"Undefined identifier '{name}'.", _location(line, column)) from None
+
+
+def locate(exc: Exception, line: int | None = None, column: int | None = None):
+    """Raise ``exc`` again; a CoffeePy error without a position gets the
+    one of the compiled operation that raised it."""
+    if isinstance(exc, CoffeeRuntimeError) and exc.location is None:
+        exc.location = _location(line, column)
+    raise exc
+
+
+def no_this():
+    raise CoffeeRuntimeError("'this' used outside of class method.")
+
+
+def get_attr(container, name: str):
+    if isinstance(container, CoffeeInstance):
+        return container.get(name)
+    if isinstance(container, dict) and name in container:
+        return container[name]
+    try:
+        return getattr(container, name)
+    except AttributeError:
+        raise CoffeeRuntimeError(f"Attribute '{name}' not found.") from None
+
+
+def set_attr(container, name: str, value) -> None:
+    if isinstance(container, CoffeeInstance):
+        container.set(name, value)
+        return
+    if isinstance(container, dict):
+        container[name] = value
+        return
+    try:
+        setattr(container, name, value)
+    except Exception as exc:
+        raise CoffeeRuntimeError(f"Attribute assignment failed: {exc}") from exc
+
+
+def safe_attr(container, name: str):
+    if container is None:
+        return None
+    try:
+        return get_attr(container, name)
+    except CoffeeRuntimeError:
+        return None
+
+
+def proto(target, name: str):
+    if hasattr(target, "_find_method"):
+        method = target._find_method(name)
+        if method:
+            return method
+    if hasattr(target, "methods") and name in target.methods:
+        return target.methods[name]
+    return get_attr(target.__class__, name)
+
+
+def set_proto(target, name: str, value) -> None:
+    if not isinstance(target, CoffeeClass):
+        raise CoffeeRuntimeError("Prototype assignment '::' requires a class.")
+    target.methods[name] = value
+
+
+def set_this_params(this, names: tuple, values: tuple) -> None:
+    if isinstance(this, CoffeeInstance):
+        for name, value in zip(names, values):
+            this.set(name, value)
+
+
+def make_class(name: str, parent, methods: dict, interpreter) -> CoffeeClass:
+    return CoffeeClass(name, parent, methods, interpreter)
+
+
+def new(klass, *args, **kwargs):
+    if not isinstance(klass, CoffeeClass):
+        raise CoffeeRuntimeError("Can only instantiate classes.")
+    return klass(*args, **kwargs)
+
+
+def make_range(start, end, exclusive: bool, step=None) -> list:
+    return list(range_numbers(start, end, exclusive, step))
+
+
+def make_lazy_range(start, end, exclusive: bool, step=None) -> CoffeeRange:
+    """A range literal that is read in place (see ``CoffeeRange``)."""
+    return CoffeeRange(range_numbers(start, end, exclusive, step))
+
+
+def make_slice(target, start, end, exclusive: bool):
+    if start is not None:
+        start = int(start)
+    if end is not None:
+        end = int(end) if exclusive else int(end) + 1
+    try:
+        return target[start:end]
+    except Exception as exc:
+        raise CoffeeRuntimeError(f"Slice operation failed: {exc}") from exc
+
+
+def spread(value):
+    if value is None:
+        return ()
+    try:
+        iter(value)
+    except TypeError:
+        return (value,)
+    return value
+
+
+def contains(value, container) -> bool:
+    try:
+        return value in container
+    except Exception:
+        return False
+
+
+def of_items(iterable):
+    if isinstance(iterable, dict):
+        return iterable.items()
+    return iterable
+
+
+def indexed_items(iterable):
+    if isinstance(iterable, dict):
+        return iterable.items()
+    return enumerate(iterable)
+
+
+def unpack_array(value, count: int, splat_index: int) -> list:
+    """Return the values bound to each element of an array pattern."""
+    if not hasattr(value, "__iter__"):
+        raise CoffeeRuntimeError("Cannot destructure non-iterable value.")
+    values = list(value)
+
+    if splat_index < 0:
+        return [values[i] if i < len(values) else None for i in range(count)]
+
+    num_after = count - splat_index - 1
+    result = [values[i] if i < len(values) else None for i in range(splat_index)]
+    splat_end = max(len(values) - num_after, splat_index)
+    result.append(values[splat_index:splat_end])
+    for j in range(num_after):
+        value_index = len(values) - num_after + j
+        result.append(values[value_index] if value_index >= splat_end else None)
+    return result
+
+
+def check_object(value) -> dict:
+    if not isinstance(value, dict):
+        raise CoffeeRuntimeError("Cannot object-destructure non-object value.")
+    return value
+
+
+def missing_property(key: str):
+    raise CoffeeRuntimeError(f"Property '{key}' not found in object.")
+
+
+def do(func):
+    if not callable(func):
+        raise CoffeeRuntimeError("'do' requires a callable expression.")
+    return func()
+
+
+def to_str(value) -> str:
+    return "" if value is None else str(value)
+
+
+def import_module(module: str):
+    """Return the object bound by ``import module`` (the root package)."""
+    importlib.import_module(module)
+    return importlib.import_module(module.split(".", 1)[0])
+
+
+def import_module_as(module: str):
+    return importlib.import_module(module)
+
+
+def from_import(module: str, name: str):
+    module_obj = importlib.import_module(module)
+    if not hasattr(module_obj, name):
+        raise CoffeeRuntimeError(f"Module '{module}' has no attribute '{name}'.")
+    return getattr(module_obj, name)
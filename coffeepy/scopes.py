@@ -0,0 +1,202 @@
+"""
+CoffeePy - Static Scope Analysis
+================================
+
+The tree-walking interpreter resolves names at runtime: ``Environment.define``
+binds a name in the current call frame, while ``Environment.assign`` rebinds
+the nearest frame that already holds the name and otherwise falls back to the
+global frame. Compiling backends need the same answer ahead of time, so this
+module records, for every function, which names it defines itself and which
+names it merely assigns to.
+
+A function defines its parameters, ``for`` and comprehension variables,
+``catch`` variables, imports and class declarations. Everything else that is
+assigned inside a function belongs to the closest enclosing function that
+defines it, or to the global scope.
+"""
+
+from __future__ import annotations
+
+from .ast_nodes import (
+    ArrayDestructuring,
+    AssignStmt,
+    AugAssignStmt,
+    ClassDecl,
+    ComprehensionExpr,
+    ExistentialAssignStmt,
+    ForInStmt,
+    ForOfStmt,
+    FromImportStmt,
+    FunctionLiteral,
+    Identifier,
+    ImportStmt,
+    LogicalAssignStmt,
+    MultiAssignStmt,
+    ObjectComprehensionExpr,
+    ObjectDestructuring,
+    Program,
+    SuperExpr,
+    ThisExpr,
+    TryStmt,
+    UpdateStmt,
+    YieldExpr,
+    iter_child_nodes,
+)
+
+
+class Scope:
+    """Names defined and assigned by one function (or by the program)."""
+
+    def __init__(self, node, parent: "Scope | None" = None, is_method: bool = False):
+        self.node = node
+        self.parent = parent
+        self.is_method = is_method
+        self.declared: set[str] = set()
+        self.assigned: set[str] = set()
+        self.children: list[Scope] = []
+        self.uses_this = False
+        self.uses_super = False
+        self.has_yield = False
+        if parent is not None:
+            parent.children.append(self)
+
+    @property
+    def is_global(self) -> bool:
+        return self.parent is None
+
+    def lookup(self, name: str) -> "Scope":
+        """Return the scope that owns ``name`` when it is used from here."""
+        scope = self
+        while scope.parent is not None:
+            if name in scope.declared:
+                return scope
+            scope = scope.parent
+        return scope
+
+    def enclosing_method(self) -> "Scope | None":
+        scope: Scope | None = self
+        while scope is not None and scope.parent is not None:
+            if scope.is_method:
+                return scope
+            scope = scope.parent
+        return None
+
+    def __repr__(self) -> str:
+        kind = "global" if self.is_global else "method" if self.is_method else "function"
+        return f"<Scope {kind} declared={sorted(self.declared)}>"
+
+
+class ScopeTable:
+    """Scopes for every function of a program, keyed by the function node."""
+
+    def __init__(self, root: Scope):
+        self.root = root
+        self._scopes: dict[int, Scope] = {}
+
+    def add(self, scope: Scope) -> None:
+        self._scopes[id(scope.node)] = scope
+
+    def scope_for(self, node) -> Scope:
+        return self._scopes[id(node)]
+
+
+def analyze_scopes(program: Program) -> ScopeTable:
+    root = Scope(program)
+    table = ScopeTable(root)
+    table.add(root)
+    _ScopeVisitor(table).visit_all(program.statements, root)
+    return table
+
+
+def assigned_identifiers(target) -> list[str]:
+    """Return the plain names written by an assignment target."""
+    if isinstance(target, Identifier):
+        return [target.name]
+    if isinstance(target, ArrayDestructuring):
+        names: list[str] = []
+        for element in target.elements:
+            names.extend(assigned_identifiers(element))
+        return names
+    if isinstance(target, ObjectDestructuring):
+        names = []
+        for key, alias, _default in target.properties:
+            if alias is None:
+                names.append(key)
+            else:
+                names.extend(assigned_identifiers(alias))
+        return names
+    return []
+
+
+class _ScopeVisitor:
+    def __init__(self, table: ScopeTable):
+        self.table = table
+
+    def visit_all(self, nodes, scope: Scope) -> None:
+        for node in nodes:
+            self.visit(node, scope)
+
+    def visit(self, node, scope: Scope) -> None:
+        if isinstance(node, FunctionLiteral):
+            self._visit_function(node, scope, is_method=False)
+            return
+
+        if isinstance(node, ClassDecl):
+            scope.declared.add(node.name)
+            if node.parent is not None:
+                self.visit(node.parent, scope)
+            for _name, member in node.body:
+                if isinstance(member, FunctionLiteral):
+                    self._visit_function(member, scope, is_method=True)
+                else:
+                    self.visit(member, scope)
+            return
+
+        if isinstance(node, ForInStmt):
+            scope.declared.add(node.var_name)
+        elif isinstance(node, ForOfStmt):
+            scope.declared.add(node.key_var)
+            if node.value_var:
+                scope.declared.add(node.value_var)
+        elif isinstance(node, ComprehensionExpr):
+            scope.declared.add(node.var_name)
+        elif isinstance(node, ObjectComprehensionExpr):
+            scope.declared.add(node.key_var)
+            if node.value_var:
+                scope.declared.add(node.value_var)
+        elif isinstance(node, TryStmt):
+            if node.catch_var:
+                scope.declared.add(node.catch_var)
+        elif isinstance(node, ImportStmt):
+            for item in node.items:
+                if item.alias is not None:
+                    scope.declared.add(item.alias)
+                else:
+                    scope.declared.add(item.module.split(".", 1)[0])
+        elif isinstance(node, FromImportStmt):
+            for imported in node.names:
+                if imported.alias is not None:
+                    scope.declared.add(imported.alias)
+                elif imported.name == "*":
+                    scope.declared.add(node.module.split(".")[-1])
+                else:
+                    scope.declared.add(imported.name)
+        elif isinstance(node, (AssignStmt, AugAssignStmt, UpdateStmt, ExistentialAssignStmt, LogicalAssignStmt)):
+            scope.assigned.update(assigned_identifiers(node.target))
+        elif isinstance(node, MultiAssignStmt):
+            for target in node.targets:
+                scope.assigned.update(assigned_identifiers(target))
+        elif isinstance(node, ThisExpr):
+            scope.uses_this = True
+        elif isinstance(node, SuperExpr):
+            scope.uses_super = True
+        elif isinstance(node, YieldExpr):
+            scope.has_yield = True
+
+        self.visit_all(iter_child_nodes(node), scope)
+
+    def _visit_function(self, node: FunctionLiteral, scope: Scope, is_method: bool) -> None:
+        function_scope = Scope(node, scope, is_method)
+        function_scope.declared.update(node.params)
+        self.table.add(function_scope)
+        self.visit_all(iter_child_nodes(node), function_scope)
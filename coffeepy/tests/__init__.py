@@ -1 +1,9 @@
 """CoffeePy test package."""
+
+from coffeepy.lexer import Lexer
+from coffeepy.parser import Parser
+
+
+def parse(source: str):
+    """Parse ``source`` the way ``Interpreter.interpret`` does."""
+    return Parser(Lexer(source).token_buffer()).parse()
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import unittest
+from unittest import mock
+
+from coffeepy import analysis
+from coffeepy import interpreter as interpreter_module
+from coffeepy.analysis import analyze, function_info
+from coffeepy.interpreter import BACKENDS, Interpreter
+from coffeepy.scopes import analyze_scopes
+from coffeepy.tests import parse
+
+
+class FunctionAnalysisTests(unittest.TestCase):
+    SOURCE = (
+        "limit = 10\n"
+        "outer = (a, b = 2) ->\n"
+        "  for item in [a, b]\n"
+        "    total = item\n"
+        "  inner = => @scale + limit\n"
+        "  inner()\n"
+        "gen = ->\n  yield 1\n"
+        "class Dog extends Animal\n  speak: -> super()\n"
+    )
+
+    def setUp(self):
+        self.program = parse(self.SOURCE)
+        analyze(self.program)
+        outer = self.program.statements[1].value
+        self.outer = outer.info
+        self.inner = outer.body.statements[1].value.info
+        self.gen = self.program.statements[2].value.info
+        self.speak = self.program.statements[3].body[0][1].info
+
+    def test_locals_and_free_variables(self):
+        self.assertEqual(self.outer.local_count, 3)
+        self.assertEqual(self.outer.free_variables, {"inner", "limit", "total"})
+        self.assertEqual(self.inner.free_variables, {"limit"})
+        self.assertEqual(self.inner.local_count, 0)
+
+    def test_defaults(self):
+        self.assertEqual(list(self.outer.defaults), ["b"])
+        self.assertEqual(self.inner.defaults, {})
+
+    def test_this_super_and_generators(self):
+        self.assertTrue(self.inner.uses_this)
+        self.assertTrue(self.outer.uses_this)
+        self.assertFalse(self.outer.uses_super)
+        self.assertTrue(self.speak.uses_super)
+        self.assertTrue(self.gen.is_generator)
+        self.assertFalse(self.outer.is_generator)
+
+    def test_scope_facts_are_reused(self):
+        program = parse("f = ->\n  g = -> @x")
+        outer = program.statements[0].value
+        table = analyze_scopes(program)
+        table.scope_for(outer.body.statements[0].value).has_yield = True
+        with mock.patch.object(analysis, "analyze_scopes", return_value=table):
+            analyze(program)
+        self.assertTrue(outer.info.is_generator)
+        self.assertTrue(outer.info.uses_this)
+
+    def test_leaf_functions(self):
+        self.assertTrue(self.inner.is_leaf)
+        self.assertTrue(self.gen.is_leaf)
+        self.assertFalse(self.outer.is_leaf)
+        self.assertFalse(self.speak.is_leaf)
+
+    def test_function_info_analyzes_unannotated_functions(self):
+        literal = parse("f = (x, y = 1) -> @x + y").statements[0].value
+        self.assertIsNone(literal.info)
+        self.assertTrue(function_info(literal).uses_this)
+        self.assertEqual(list(function_info(literal).defaults), ["y"])
+        self.assertEqual(function_info(literal).local_count, 2)
+        self.assertEqual(function_info(parse("f = (x) -> x + y").statements[0].value).free_variables, {"y"})
+        self.assertIs(function_info(literal), literal.info)
+
+    def test_engines_do_not_rescan_for_yield(self):
+        source = "gen = ->\n  yield 1\nmake = -> (x) -> x\nresult = [list(gen()), make()(2)]"
+        for backend in BACKENDS:
+            with self.subTest(backend=backend):
+                with mock.patch.object(interpreter_module, "contains_yield", side_effect=AssertionError):
+                    self.assertEqual(Interpreter(backend=backend).interpret(source), [[1], 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
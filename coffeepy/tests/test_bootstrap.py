@@ -4,7 +4,7 @@ import io
 import unittest
 
 from coffeepy.errors import CoffeeRuntimeError
-from coffeepy.interpreter import Interpreter
+from coffeepy.interpreter import CoffeeRange, Interpreter, compile_regex, range_numbers
 
 
 class BootstrapRuntimeTests(unittest.TestCase):
@@ -277,6 +277,13 @@ evens
         with self.assertRaises(CoffeeRuntimeError):
             self.run_code("continue")
 
+    def test_missing_attribute_raises_runtime_error(self):
+        for source in ("x = {a: 1}\nx.close()", "x = 5\ny = x.nope", "class A\na = new A()\na.nope()"):
+            with self.subTest(source=source):
+                with self.assertRaises(CoffeeRuntimeError) as ctx:
+                    self.run_code(source)
+                self.assertIs(type(ctx.exception), CoffeeRuntimeError)
+
     def test_for_in_loop_with_array(self):
         source = """total = 0
 for x in [1, 2, 3, 4, 5]
@@ -525,6 +532,16 @@ p = new Point(10, 20)
 """
         self.assertEqual(self.run_code(source), [10, 20])
 
+    def test_method_parameters_take_defaults_and_splats(self):
+        source = """class Logger
+  constructor: (@debug = false, @tags...) ->
+  pick: (x, y = 5, rest...) -> [x, y, rest]
+a = new Logger()
+b = new Logger(true, 'x', 'y')
+[a.debug, a.tags, b.debug, b.tags, a.pick(1), a.pick(1, 2, 3, 4)]
+"""
+        self.assertEqual(self.run_code(source), [False, [], True, ["x", "y"], [1, 5, []], [1, 2, [3, 4]]])
+
     def test_try_catch_basic(self):
         source = """result = "no error"
 try
@@ -703,6 +720,29 @@ b = "B"
 """
         self.assertEqual(self.run_code(source), "A and B")
 
+    def test_string_interpolation_nests_braces_and_strings(self):
+        source = """user = {name: "Ada", tags: ["x", "y"]}
+"#{ {n: user.name}.n } has #{"#{len(user.tags)} tags: #{", ".join(user.tags)}"}"
+"""
+        self.assertEqual(self.run_code(source), "Ada has 2 tags: x, y")
+
+    def test_string_interpolation_always_builds_a_string(self):
+        source = """["#{1 + 1}", "#{null}|#{true}", "#{}"]
+"""
+        self.assertEqual(self.run_code(source), ["2", "|True", ""])
+
+    def test_string_interpolation_needs_double_quotes(self):
+        source = """x = 1
+['#{x}', '''#{x}''', "\\#{x}", "{#{x}}"]
+"""
+        self.assertEqual(self.run_code(source), ["#{x}", "#{x}", "#{x}", "{1}"])
+
+    def test_string_interpolation_accepts_escaped_quotes(self):
+        source = """x = 1
+["#{\\"nested\\"}", "a#{\\"<#{x}>\\"}b", "#{\\'single\\'}"]
+"""
+        self.assertEqual(self.run_code(source), ["nested", "a<1>b", "single"])
+
     def test_in_operator_array(self):
         source = """arr = [1, 2, 3]
 2 in arr
@@ -804,6 +844,20 @@ combine("Admin")
 """
         self.assertEqual(self.run_code(source), "Admin: User")
 
+    def test_default_parameter_sees_earlier_parameters(self):
+        source = """f = (a, b = a * 2) -> [a, b]
+[f(3), f(3, 1)]
+"""
+        self.assertEqual(self.run_code(source), [[3, 6], [3, 1]])
+
+    def test_method_default_sees_earlier_parameters(self):
+        source = """a = 100
+class Box
+  size: (a, b = a + 1) -> b
+(new Box).size(1)
+"""
+        self.assertEqual(self.run_code(source), 2)
+
     def test_at_param_shorthand(self):
         source = """class User
   constructor: (@name, @email) ->
@@ -1015,6 +1069,128 @@ start..end by step
 """
         self.assertEqual(self.run_code(source), [0, 5, 10])
 
+    def test_huge_range_read_in_place_is_lazy(self):
+        source = """n = 10000000000
+[[1..n][0], [1..n][-3..], 5000000000 in [1..n], [1..n].index(42), [1..n]?.length]
+"""
+        self.assertEqual(self.run_code(source), [1, [9999999998, 9999999999, 10000000000], True, 41, None])
+
+    def test_huge_range_in_for_loop_is_lazy(self):
+        source = """seen = []
+for x in [1..10000000000]
+  if x > 3
+    break
+  seen.append(x)
+seen
+"""
+        self.assertEqual(self.run_code(source), [1, 2, 3])
+
+    def test_stored_range_is_unhashable_like_a_list(self):
+        with self.assertRaisesRegex(CoffeeRuntimeError, "unhashable type: 'list'"):
+            self.run_code("r = [1..3]\nhash(r)")
+
+    def test_range_values_are_lists(self):
+        source = """import json
+r = [1..3]
+[isinstance(r, list), isinstance([1...3], list), json.dumps(r), json.dumps({a: [1..2], b: [0, [3..4]]}), [1..5][1..2]]
+"""
+        self.assertEqual(self.run_code(source), [True, True, "[1, 2, 3]", '{"a": [1, 2], "b": [0, [3, 4]]}', [2, 3]])
+
+    def test_range_errors_read_like_list_errors(self):
+        for source, message in (("[1..3][10]", "list index out of range"), ("[1..3].index(9)", "9 is not in list")):
+            with self.subTest(source=source), self.assertRaisesRegex(CoffeeRuntimeError, message):
+                self.run_code(source)
+
+    def test_range_becomes_list_when_changed(self):
+        source = """xs = [1..3]
+xs.append(4)
+xs[0] = 0
+[xs, xs == [0, 2, 3, 4], str(xs), [1..2] + [3]]
+"""
+        self.assertEqual(self.run_code(source), [[0, 2, 3, 4], True, "[0, 2, 3, 4]", [1, 2, 3]])
+
+    def test_name_read_before_local_binding_uses_enclosing_one(self):
+        source = """x = 'outer'
+f = ->
+  seen = [x]
+  for x in [1, 2]
+    null
+  try
+    throw 'e'
+  catch err
+    null
+  seen.append(x)
+  seen
+g = ->
+  y = x
+  try
+    throw 'inner'
+  catch x
+    null
+  [y, x]
+result = [f(), g(), x]
+"""
+        self.assertEqual(self.run_code(source), [["outer", 2], ["outer", "inner"], "outer"])
+
+    def test_throw_from_called_function_is_catchable(self):
+        source = """class Box
+  open: ->
+    throw 'locked'
+fail = ->
+  throw 'boom'
+box = new Box()
+caught = []
+try
+  fail()
+catch err
+  caught.append(err)
+try
+  box.open()
+catch err
+  caught.append(err)
+caught
+"""
+        self.assertEqual(self.run_code(source), ["boom", "locked"])
+
+    def test_yield_in_short_circuit_operand(self):
+        source = """gen = ->
+  a = false and (yield 1)
+  b = true or (yield 2)
+  c = 5 ? (yield 3)
+  d = null ? (yield 4)
+  e = (yield 5)?.real
+  yield [a, b, c, d, e]
+g = gen()
+[next(g), g.send(10), g.send(7)]
+"""
+        self.assertEqual(self.run_code(source), [4, 5, [False, True, 5, 10, 7]])
+
+    def test_yield_in_call_argument_and_object_comprehension(self):
+        source = """log = []
+note = (x) ->
+  log.append(x)
+  x
+pair = (a, b) -> [a, b]
+gen = ->
+  result = pair(note(1), (yield log.copy()))
+  values = {k: (yield v) + 1 for k, v of {a: 1, b: 2}}
+  yield [result, values]
+g = gen()
+[next(g), g.send(2), g.send(10), g.send(20)]
+"""
+        self.assertEqual(self.run_code(source), [[1], 1, 2, [[1, 2], {"a": 11, "b": 21}]])
+
+    def test_range_loops_do_not_build_the_range(self):
+        source = """total = 0
+for i in [1..10000000000]
+  total += i
+  if i == 1000
+    break
+evens = [x for x in [1..10] when x % 2 == 0]
+[total, evens]
+"""
+        self.assertEqual(self.run_code(source), [500500, [2, 4, 6, 8, 10]])
+
     def test_object_destructuring_with_default(self):
         source = """obj = {a: 1}
 {a, b = 10} = obj
@@ -1158,6 +1334,19 @@ match isnt null
 """
         self.assertTrue(self.run_code(source))
 
+    def test_regex_literal_in_loop_compiles_once(self):
+        source = """count = 0
+for line in ["foo1", "bar", "FOO22", "foo"]
+  if /foo\\d+/i.match(line)
+    count += 1
+count
+"""
+        compile_regex.cache_clear()
+        self.assertEqual(self.run_code(source), 2)
+        self.assertEqual(self.run_code(source), 2)
+        info = compile_regex.cache_info()
+        self.assertEqual((info.misses, info.hits), (1, 7))
+
     def test_proto_access_class(self):
         source = """class Animal
   speak: -> "sound"
@@ -1242,5 +1431,22 @@ switch
         self.assertEqual(self.run_code(source), "large")
 
 
+class CoffeeRangeTests(unittest.TestCase):
+    def test_repr_shows_bounds_until_materialized(self):
+        numbers = CoffeeRange(range_numbers(1, 10000000000, False))
+        self.assertEqual(repr(numbers), "[1...10000000001]")
+        self.assertEqual(repr(CoffeeRange(range_numbers(10, 1, False, -3))), "[10...0 by -3]")
+        small = CoffeeRange(range_numbers(1, 3, False))
+        small.append(4)
+        self.assertEqual(repr(small), "[1, 2, 3, 4]")
+
+
+class TreeWalkerRuntimeTests(BootstrapRuntimeTests):
+    """Run the bootstrap suite on the tree-walking engine."""
+
+    def run_code(self, source: str, stdout=None):
+        return Interpreter(stdout=stdout, backend="tree").interpret(source)
+
+
 if __name__ == "__main__":
     unittest.main()
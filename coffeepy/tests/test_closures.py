@@ -0,0 +1,258 @@
+from __future__ import annotations
+
+import io
+import sys
+import unittest
+from unittest import mock
+
+from coffeepy import closures
+from coffeepy.closures import ClosureCompiler, CompiledFunction
+from coffeepy.environment import Environment
+from coffeepy.errors import CoffeeRuntimeError
+from coffeepy.interpreter import Interpreter, _BreakSignal, _ContinueSignal, _ReturnSignal
+from coffeepy.resolver import FIRST_SLOT
+from coffeepy.tests import parse
+
+
+class ClosureEngineTests(unittest.TestCase):
+    def run_code(self, source: str, stdout=None):
+        return Interpreter(stdout=stdout, backend="closure").interpret(source)
+
+    def test_closure_is_default_backend(self):
+        self.assertEqual(Interpreter().backend, "closure")
+
+    def test_program_compiles_without_fallback(self):
+        source = "class A\n  constructor: (@x) ->\n  double: -> @x * 2\n(new A(4)).double()"
+        interpreter = Interpreter()
+        program = parse(source)
+        code = ClosureCompiler(interpreter).compile_program(program)
+        self.assertEqual(code(interpreter.environment), 8)
+
+    def test_functions_are_compiled_coffee_functions(self):
+        result = self.run_code("f = (a, b = 2) -> a * b\nf")
+        self.assertIsInstance(result, CompiledFunction)
+        self.assertEqual(result(5), 10)
+        self.assertEqual(repr(result), "<CoffeeFunction (a, b)>")
+
+    def test_recursion(self):
+        source = "fib = (n) ->\n  if n < 2 then n else fib(n - 1) + fib(n - 2)\nfib 15"
+        self.assertEqual(self.run_code(source), 610)
+
+    def test_throw_inside_function_is_catchable(self):
+        source = "f = ->\n  throw 'boom'\ntry\n  f()\ncatch err\n  'caught ' + err"
+        self.assertEqual(self.run_code(source), "caught boom")
+
+    def test_return_inside_generator_stops_iteration(self):
+        source = "gen = ->\n  yield 1\n  return\n  yield 2\nlist(gen())"
+        self.assertEqual(self.run_code(source), [1])
+
+    def test_break_inside_generator_loop(self):
+        source = "gen = ->\n  for i in [1..5]\n    if i == 3\n      break\n    yield i\nlist(gen())"
+        self.assertEqual(self.run_code(source), [1, 2])
+
+    def test_yield_in_operands_compiles_without_fallback(self):
+        source = (
+            "note = (x) -> x\n"
+            "gen = ->\n"
+            "  a = false and (yield 1)\n"
+            "  b = 1 + (yield 2)\n"
+            "  c = null ? (yield 3)\n"
+            "  d = (yield 4)?.real\n"
+            "  e = [(yield 5), note((yield 6), [7]...)]\n"
+            "  f = {k: (yield v) for k, v of {z: 8}}\n"
+            "  yield [a, b, c, d, e, f]\n"
+            "g = gen()\n"
+            "[next(g), g.send(10), g.send(20), g.send(30), g.send(40), g.send(50), g.send(60)]"
+        )
+        interpreter = Interpreter()
+        program = parse(source)
+        code = ClosureCompiler(interpreter).compile_program(program)
+        self.assertEqual(
+            code(interpreter.environment),
+            [2, 3, 4, 5, 6, 8, [False, 11, 20, 30, [40, 50], {"z": 60}]],
+        )
+
+    def test_identifiers_are_resolved_at_compile_time(self):
+        program = parse("total = 0\nmake = (step) ->\n  -> total + step")
+        ClosureCompiler(Interpreter()).compile_program(program)
+        inner = program.statements[1].value.body.statements[0].expression.body
+        self.assertIsNone(inner.left.coordinate)
+        self.assertEqual(inner.right.coordinate, (1, FIRST_SLOT))
+
+    def test_resolved_names_use_their_frames(self):
+        source = (
+            "total = 0\nx = 'global'\n"
+            "make = (step) ->\n  count = 0\n  ->\n    count += step\n    total += step\n    [count, x]\n"
+            "late = ->\n  seen = x\n  for x in [1, 2]\n    null\n  [seen, x]\n"
+            "tick = make(5)\ntick()\nresult = [tick(), total, late(), x]"
+        )
+        with mock.patch.object(Environment, "get", side_effect=AssertionError("searched the chain")):
+            self.assertEqual(self.run_code(source), [[10, "global"], 10, ["global", 2], "global"])
+
+    def test_generator_elsewhere_keeps_throw_catchable(self):
+        source = "f = ->\n  throw 'boom'\ng = ->\n  x = 1 + (yield 1)\ntry\n  f()\ncatch e\n  'caught ' + e"
+        with mock.patch.object(Interpreter, "execute_program", side_effect=AssertionError("fell back")):
+            self.assertEqual(self.run_code(source), "caught boom")
+
+    def test_undefined_identifier_has_location(self):
+        with self.assertRaises(CoffeeRuntimeError) as ctx:
+            self.run_code("x = 1\ny = x + missing")
+        self.assertEqual(ctx.exception.message, "Undefined identifier 'missing'.")
+        self.assertEqual(ctx.exception.location.line, 2)
+
+    def test_break_outside_loop_is_error(self):
+        with self.assertRaises(CoffeeRuntimeError):
+            self.run_code("break")
+
+    def test_state_persists_between_interpret_calls(self):
+        stdout = io.StringIO()
+        interpreter = Interpreter(stdout=stdout)
+        interpreter.interpret("counter = 0\ninc = ->\n  counter += 1")
+        interpreter.interpret("inc()\ninc()")
+        self.assertEqual(interpreter.interpret("counter"), 2)
+
+
+class CompletionTests(unittest.TestCase):
+    """``break``, ``continue`` and ``return`` in flow position raise nothing."""
+
+    def run_without_signals(self, source: str):
+        raised = []
+
+        def record(signal, *args):
+            raised.append(type(signal).__name__)
+            Exception.__init__(signal, *args)
+
+        with mock.patch.object(_ReturnSignal, "__init__", record), \
+                mock.patch.object(_BreakSignal, "__init__", record), \
+                mock.patch.object(_ContinueSignal, "__init__", record):
+            result = Interpreter().interpret(source)
+        self.assertEqual(raised, [])
+        return result
+
+    def test_early_return(self):
+        source = "sign = (x) ->\n  if x < 0\n    return -1\n  1\nresult = [sign(-5), sign(5)]"
+        self.assertEqual(self.run_without_signals(source), [-1, 1])
+
+    def test_loop_break_and_continue(self):
+        source = (
+            "total = 0\nfor i in [1..10]\n  if i % 2\n    continue\n  if i > 6\n    break\n  total += i\n"
+            "n = 0\nwhile true\n  n += 1\n  if n == 3\n    break\n[total, n]"
+        )
+        self.assertEqual(self.run_without_signals(source), [12, 3])
+
+    def test_return_from_nested_loops(self):
+        source = (
+            "find = (rows) ->\n  for row in rows\n    for key, value of row\n      if value == 2\n        return key\n  null\n"
+            "result = [find([{a: 1}, {b: 2}]), find([])]"
+        )
+        self.assertEqual(self.run_without_signals(source), ["b", None])
+
+    def test_return_inside_try_runs_finally(self):
+        stdout = io.StringIO()
+        source = "f = ->\n  try\n    return 'body'\n  finally\n    print 'finally'\nf()"
+        self.assertEqual(Interpreter(stdout=stdout).interpret(source), "body")
+        self.assertEqual(stdout.getvalue(), "finally\n")
+
+    def test_break_inside_called_function_still_exits_loop(self):
+        source = "r = []\nfor i in [1..5]\n  do ->\n    if i == 3\n      break\n  r.append(i)\nr"
+        self.assertEqual(Interpreter().interpret(source), [1, 2])
+
+
+class TailCallTests(unittest.TestCase):
+    def setUp(self):
+        closures.reset_stats()
+
+    def test_self_recursion_does_not_grow_the_stack(self):
+        depth = sys.getrecursionlimit() * 10
+        source = f"count = (n, acc = 0) ->\n  if n == 0\n    return acc\n  count(n - 1, acc + 1)\ncount({depth})"
+        self.assertEqual(Interpreter().interpret(source), depth)
+        self.assertEqual(closures.stats()["tail_calls"], depth)
+
+    def test_tail_return_inside_loop(self):
+        source = "walk = (n) ->\n  while true\n    if n == 0\n      return 'done'\n    return walk(n - 1)\nwalk(5000)"
+        self.assertEqual(Interpreter().interpret(source), "done")
+        self.assertEqual(closures.stats()["tail_calls"], 5000)
+
+    def test_tail_call_in_switch_branch(self):
+        source = (
+            "walk = (n) ->\n  switch n\n    when 0 then 'done'\n    else walk(n - 1)\n"
+            "jump = (n) ->\n  switch\n    when n == 0\n      return 'done'\n    else\n      return jump(n - 1)\n"
+            "result = [walk(20000), jump(20000)]"
+        )
+        self.assertEqual(Interpreter().interpret(source), ["done", "done"])
+        self.assertEqual(closures.stats()["tail_calls"], 40000)
+
+    def test_method_self_recursion_does_not_grow_the_stack(self):
+        source = (
+            "class Counter\n  constructor: ->\n    @steps = 0\n"
+            "  down: (n) ->\n    @steps += 1\n    if n == 0 then @steps else @down(n - 1)\n"
+            "  up: (n) ->\n    if n == 0\n      return 'up'\n    this.up(n - 1)\n"
+            "c = new Counter()\nresult = [c.down(20000), c.up(20000)]"
+        )
+        self.assertEqual(Interpreter().interpret(source), [20001, "up"])
+        self.assertEqual(closures.stats()["tail_calls"], 40000)
+
+    def test_method_calling_itself_on_another_instance(self):
+        source = (
+            "class Node\n  constructor: (@name, @next) ->\n"
+            "  last: -> if @next == null then @name else @next.last()\n"
+            "chain = new Node('end', null)\nfor i in [1..20000]\n  chain = new Node(i, chain)\nchain.last()"
+        )
+        self.assertEqual(Interpreter().interpret(source), "end")
+
+    def test_other_calls_are_not_eliminated(self):
+        source = (
+            "fact = (n) -> if n <= 1 then 1 else n * fact(n - 1)\n"
+            "even = (n) -> if n == 0 then true else odd(n - 1)\n"
+            "odd = (n) -> if n == 0 then false else even(n - 1)\n"
+            "guarded = (n) ->\n  try\n    return (if n == 0 then 'ok' else guarded(n - 1))\n  finally\n    n\n"
+            "result = [fact(10), even(10), guarded(3)]"
+        )
+        self.assertEqual(Interpreter().interpret(source), [3628800, True, "ok"])
+        self.assertEqual(closures.stats()["tail_calls"], 0)
+
+    def test_returned_call_to_another_function_completes_the_body(self):
+        source = (
+            "h = -> 'h'\n"
+            "f = (n) ->\n  if n == 0\n    return h()\n  'fell through'\n"
+            "even = (n) ->\n  if n == 0\n    return true\n  return odd(n - 1)\n"
+            "odd = (n) ->\n  if n == 0\n    return false\n  return even(n - 1)\n"
+            "result = [f(0), even(10)]"
+        )
+        for backend in ("closure", "tree", "python", "vm"):
+            with self.subTest(backend=backend):
+                self.assertEqual(Interpreter(backend=backend).interpret(source), ["h", True])
+
+    def test_only_calls_run_in_place_are_counted(self):
+        # ``run`` calls ``walk`` plainly, so the first call nests; the rest
+        # run in place in ``walk``.
+        source = (
+            "walk = (n) -> if n == 0 then 'done' else walk(n - 1)\n"
+            "class A\n  run: walk\n(new A()).run(3)"
+        )
+        self.assertEqual(Interpreter().interpret(source), "done")
+        self.assertEqual(closures.stats()["tail_calls"], 2)
+
+    def test_returned_method_call_completes_the_body(self):
+        source = (
+            "class A\n  other: -> 'other'\n"
+            "  run: (n) ->\n    if n == 0\n      return @other()\n    'fell through'\n"
+            "o = {k: -> 'k'}\n"
+            "g = (n) ->\n  if n == 0\n    return o.k()\n  'fell through'\n"
+            "result = [(new A()).run(0), g(0)]"
+        )
+        for backend in ("closure", "tree", "python", "vm"):
+            with self.subTest(backend=backend):
+                self.assertEqual(Interpreter(backend=backend).interpret(source), ["other", "k"])
+
+    def test_each_closure_keeps_its_own_environment(self):
+        source = (
+            "make = (step) ->\n  go = (n, acc) -> if n == 0 then acc else go(n - 1, acc + step)\n"
+            "result = [make(1)(3, 0), make(10)(3, 0)]"
+        )
+        self.assertEqual(Interpreter().interpret(source), [3, 30])
+        self.assertEqual(closures.stats()["tail_calls"], 6)
+
+
+if __name__ == "__main__":
+    unittest.main()
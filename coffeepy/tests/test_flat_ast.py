@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import pickle
+import unittest
+from pathlib import Path
+
+from coffeepy.ast_nodes import Binary, ExprStmt, FunctionLiteral, Identifier, Literal, Program, SourceLocation
+from coffeepy.bytecode import BytecodeCompiler
+from coffeepy.flat_ast import LIST, NODE_TYPES, FlatAST, NodeView, flatten
+from coffeepy.interpreter import Interpreter
+from coffeepy.tests import parse, test_bootstrap
+from coffeepy.tokens import PLUS
+
+
+class FlatRuntimeTests(test_bootstrap.BootstrapRuntimeTests):
+    """Run the bootstrap suite on programs that went through a pickled
+    FlatAST."""
+
+    def run_code(self, source: str, stdout=None):
+        interpreter = Interpreter(stdout=stdout)
+        interpreter.source = source
+        flat = pickle.loads(pickle.dumps(flatten(parse(source))))
+        return interpreter.run(flat)
+
+
+class FlatASTTests(unittest.TestCase):
+    def test_examples_round_trip(self):
+        root = Path(__file__).resolve().parents[2]
+        for path in sorted((root / "examples").rglob("*.coffee")):
+            with self.subTest(path=path.name):
+                program = parse(path.read_text(encoding="utf-8"))
+                flat = flatten(program)
+                self.assertEqual(flat.to_nodes(), program)
+                self.assertEqual(len(flat.offsets), len(flat) + 1)
+
+    def test_layout(self):
+        flat = flatten(parse("total = total + 1\n"))
+        assignment = flat.view().statements[0]
+        value = assignment.value
+        self.assertIs(value.type, Binary)
+        self.assertEqual(value.operator, PLUS)
+        self.assertEqual(value.location, SourceLocation(1, 15))
+        self.assertEqual(value.left.name, "total")
+        self.assertEqual(value.right.value, 1)
+        self.assertEqual(list(value.children()), [value.left, value.right])
+        self.assertEqual(NODE_TYPES[flat.kinds[flat.root]], Program)
+        self.assertEqual(flat.kinds[flat.operands[flat.offsets[flat.root]]], LIST)
+        # The name is one constant, and only Identifier and Binary have locations.
+        self.assertEqual(flat.constants.count("total"), 1)
+        self.assertEqual(sum(1 for line in flat.lines if line), 3)
+        self.assertEqual(value.to_node(), assignment.to_node().value)
+        with self.assertRaises(AttributeError):
+            value.name
+
+    def test_shared_nodes_are_stored_once(self):
+        shared = Identifier("x", SourceLocation(1, 1))
+        program = Program([ExprStmt(Binary(shared, PLUS, shared)), ExprStmt(Literal(-0.0)), ExprStmt(Literal(0.0))])
+        flat = flatten(program)
+        rebuilt = flat.to_nodes()
+        self.assertEqual(rebuilt, program)
+        binary = rebuilt.statements[0].expression
+        self.assertIs(binary.left, binary.right)
+        self.assertEqual([str(statement.expression.value) for statement in rebuilt.statements[1:]], ["-0.0", "0.0"])
+
+    def test_deep_trees_need_no_recursion(self):
+        expression = Literal(0)
+        for index in range(20000):
+            expression = Binary(expression, PLUS, Literal(index))
+        flat = flatten(Program([ExprStmt(expression)]))
+        rebuilt = flat.to_nodes().statements[0].expression
+        depth = 0
+        while isinstance(rebuilt, Binary):
+            rebuilt = rebuilt.left
+            depth += 1
+        self.assertEqual(depth, 20000)
+
+    def test_engines_accept_flat_programs(self):
+        source = "square = (x) -> x * x\nsquare 7\n"
+        flat = flatten(parse(source))
+        self.assertIsInstance(flat, FlatAST)
+        self.assertIsInstance(flat.view(), NodeView)
+        for backend in ("closure", "tree", "python", "vm"):
+            with self.subTest(backend=backend):
+                self.assertEqual(Interpreter(backend=backend).run(flat), 49)
+        self.assertEqual(BytecodeCompiler().compile_program(flat).name, "<program>")
+
+    def test_cache_fields_are_not_stored(self):
+        program = parse("f = (a) -> a\n")
+        Interpreter().run(program)
+        function = program.statements[0].value
+        self.assertIsNotNone(function.info)
+        rebuilt = flatten(program).to_nodes().statements[0].value
+        self.assertIsInstance(rebuilt, FunctionLiteral)
+        self.assertIsNone(rebuilt.info)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,300 @@
+from __future__ import annotations
+
+import math
+import unittest
+from unittest import mock
+
+from coffeepy import inline_cache
+from coffeepy.errors import CoffeeAttributeError, CoffeeRuntimeError
+from coffeepy.inline_cache import POLYMORPHIC_LIMIT, AttributeCache
+from coffeepy.interpreter import BACKENDS, MAX_SHAPE_FIELDS, BoundMethod, CoffeeInstance, Interpreter
+
+
+class AttributeCacheTests(unittest.TestCase):
+    def make_instance(self, source: str, name: str):
+        interpreter = Interpreter()
+        interpreter.interpret(source)
+        return interpreter.environment.get(name)
+
+    def test_repeated_access_hits(self):
+        cache = AttributeCache("sqrt")
+        for _ in range(3):
+            self.assertIs(cache.load(math), math.sqrt)
+        self.assertEqual((cache.hits, cache.misses), (2, 1))
+
+    def test_dict_keys_win_over_attributes(self):
+        cache = AttributeCache("keys")
+        self.assertEqual(cache.load({"keys": 1}), 1)
+        self.assertEqual(cache.load({"a": 2}).__name__, "keys")
+
+    def test_instance_fields_and_methods(self):
+        point = self.make_instance(
+            "class Point\n  constructor: (@x) ->\n  norm: -> @x\np = new Point(3)", "p"
+        )
+        self.assertEqual(AttributeCache("x").load(point), 3)
+        method = AttributeCache("norm").load(point)
+        self.assertIsInstance(method, BoundMethod)
+        self.assertEqual(method(), 3)
+        with self.assertRaises(CoffeeRuntimeError) as ctx:
+            AttributeCache("missing").load(point)
+        self.assertEqual(ctx.exception.message, "Undefined property 'missing'.")
+
+    def test_instances_are_keyed_on_their_shape(self):
+        source = (
+            "class A\n  name: -> 'a'\n"
+            "class B\n  name: -> 'b'\n"
+            "items = [new A(), new B()]"
+        )
+        items = self.make_instance(source, "items")
+        cache = AttributeCache("name")
+        self.assertEqual([cache.load(item)() for item in items * 2], ["a", "b", "a", "b"])
+        self.assertEqual((cache.hits, cache.misses), (2, 2))
+        self.assertEqual(set(cache.entries), {item.shape for item in items})
+
+    def test_new_field_misses_once(self):
+        point = self.make_instance(
+            "class Point\n  constructor: (@x) ->\n  x2: -> @x * 2\np = new Point(3)", "p"
+        )
+        cache = AttributeCache("y")
+        with self.assertRaises(CoffeeRuntimeError):
+            cache.load(point)
+        point.set("y", 4)
+        self.assertEqual(cache.load(point), 4)
+        self.assertEqual(cache.load(point), 4)
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+    def test_missing_attribute_raises(self):
+        with self.assertRaises(CoffeeAttributeError):
+            AttributeCache("nope").load(42)
+
+    def test_megamorphic_site_stops_caching(self):
+        cache = AttributeCache("real")
+        receivers = [1, 2.0, True, 3j, 5]
+        self.assertGreater(len(set(map(type, receivers))), POLYMORPHIC_LIMIT - 1)
+        for receiver in receivers:
+            self.assertEqual(cache.load(receiver), receiver.real)
+        self.assertEqual(len(cache.entries), POLYMORPHIC_LIMIT)
+        self.assertTrue(cache.is_megamorphic)
+
+    def test_stats_cover_engine_sites(self):
+        source = "import math\ntotal = 0\nfor i in [1..50]\n  total += math.sqrt(i)\ntotal"
+        for backend in BACKENDS:
+            with self.subTest(backend=backend):
+                inline_cache.reset_stats()
+                before = inline_cache.stats()
+                Interpreter(backend=backend).interpret(source)
+                after = inline_cache.stats()
+                self.assertGreaterEqual(after["hits"] - before["hits"], 49)
+
+
+class MethodTableTests(unittest.TestCase):
+    HIERARCHY = (
+        "class Animal\n  constructor: (@name) ->\n  speak: -> @name + ' makes a sound'\n  kind: -> 'animal'\n"
+        "class Dog extends Animal\n  kind: -> 'dog'\n"
+        "class Puppy extends Dog\n"
+        "pet = new Puppy('rex')\n"
+    )
+
+    def test_vtable_is_flattened(self):
+        interpreter = Interpreter()
+        interpreter.interpret(self.HIERARCHY)
+        puppy = interpreter.environment.get("Puppy")
+        dog = interpreter.environment.get("Dog")
+        self.assertEqual(set(puppy.vtable), {"constructor", "speak", "kind"})
+        self.assertIs(puppy.vtable["kind"], dog.methods["kind"])
+        self.assertEqual(dict(puppy.methods), {})
+
+    def test_prototype_assignment_reaches_subclasses(self):
+        source = self.HIERARCHY + (
+            "before = pet.speak()\n"
+            "Animal::speak = -> @name + ' speaks'\n"
+            "after = pet.speak()\n"
+            "Dog::kind = -> 'hound'\n"
+            "cat = new Animal('cat')\n"
+            "[before, after, pet.kind(), cat.kind()]"
+        )
+        expected = ["rex makes a sound", "rex speaks", "hound", "animal"]
+        for backend in BACKENDS:
+            with self.subTest(backend=backend):
+                self.assertEqual(Interpreter(backend=backend).interpret(source), expected)
+
+    def test_cached_site_sees_new_methods(self):
+        interpreter = Interpreter()
+        interpreter.interpret(self.HIERARCHY)
+        pet = interpreter.environment.get("pet")
+        cache = AttributeCache("kind")
+        self.assertEqual(cache.load(pet)(), "dog")
+        del interpreter.environment.get("Dog").methods["kind"]
+        self.assertEqual(cache.load(pet)(), "animal")
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_python_callable_as_method(self):
+        source = "class Box\nBox::size = len\nbox = new Box()\nbox.size([1, 2, 3])"
+        for backend in BACKENDS:
+            with self.subTest(backend=backend):
+                self.assertEqual(Interpreter(backend=backend).interpret(source), 3)
+
+    def test_prototype_assignment_requires_class(self):
+        for backend in BACKENDS:
+            with self.subTest(backend=backend):
+                with self.assertRaises(CoffeeRuntimeError) as ctx:
+                    Interpreter(backend=backend).interpret("x = 1\nx::y = 2")
+                self.assertIn("requires a class", ctx.exception.message)
+
+
+class MethodCallTests(unittest.TestCase):
+    SOURCE = (
+        "class Counter\n  constructor: (@n) ->\n  add: (k) ->\n    @n += k\n    this\n  get: -> @n\n"
+        "c = new Counter(0)\n"
+        "for i in [1..5]\n  c.add(i)\n"
+    )
+
+    def count_bound_methods(self, source: str, backend: str):
+        created = []
+        original = BoundMethod.__init__
+
+        def counting_init(bound, instance, method):
+            created.append(method)
+            original(bound, instance, method)
+
+        with mock.patch.object(BoundMethod, "__init__", counting_init):
+            result = Interpreter(backend=backend).interpret(source)
+        return result, len(created)
+
+    def test_calls_do_not_bind_methods(self):
+        for backend in BACKENDS:
+            with self.subTest(backend=backend):
+                self.assertEqual(self.count_bound_methods(self.SOURCE + "c.add(1).get()", backend), (16, 0))
+
+    def test_escaping_method_is_bound(self):
+        for backend in BACKENDS:
+            with self.subTest(backend=backend):
+                self.assertEqual(self.count_bound_methods(self.SOURCE + "get = c.get\nget()", backend), (15, 1))
+
+    def test_fields_shadow_methods(self):
+        source = self.SOURCE + "c.get = -> 'field'\nc.get()"
+        for backend in BACKENDS:
+            with self.subTest(backend=backend):
+                self.assertEqual(Interpreter(backend=backend).interpret(source), "field")
+
+    def test_find_method(self):
+        interpreter = Interpreter()
+        interpreter.interpret(self.SOURCE + "c.n2 = 1")
+        counter = interpreter.environment.get("c")
+        self.assertIs(AttributeCache("add").find_method(counter), counter.klass.vtable["add"])
+        self.assertIsNone(AttributeCache("n").find_method(counter))
+        self.assertIsNone(AttributeCache("missing").find_method(counter))
+        self.assertIsNone(AttributeCache("append").find_method([]))
+
+    def test_find_method_counts_misses(self):
+        interpreter = Interpreter()
+        interpreter.interpret(self.SOURCE + "d = new Counter()\nd.add = 1")
+        counter, shadowed = interpreter.environment.get("c"), interpreter.environment.get("d")
+        cache = AttributeCache("add")
+        for _ in range(3):
+            self.assertIs(cache.find_method(counter), counter.klass.vtable["add"])
+            self.assertIsNone(cache.find_method(shadowed))
+        self.assertEqual((cache.hits, cache.misses), (4, 2))
+        self.assertEqual(cache.methods, {counter.shape: counter.klass.vtable, shadowed.shape: None})
+
+
+class ShapeTests(unittest.TestCase):
+    SOURCE = (
+        "class Point\n  constructor: (@x, @y) ->\n"
+        "a = new Point(1, 2)\n"
+        "b = new Point(3, 4)\n"
+        "c = new Point(5, 6)\n"
+        "c.z = 7\n"
+    )
+
+    def setUp(self):
+        self.interpreter = Interpreter()
+        self.interpreter.interpret(self.SOURCE)
+
+    def get(self, name: str):
+        return self.interpreter.environment.get(name)
+
+    def test_same_construction_shares_shape(self):
+        a, b = self.get("a"), self.get("b")
+        self.assertIs(a.shape, b.shape)
+        self.assertEqual(a.shape.slots, {"x": 0, "y": 1})
+        self.assertEqual(b.values, [3, 4])
+
+    def test_new_field_transitions(self):
+        a, c = self.get("a"), self.get("c")
+        self.assertIsNot(c.shape, a.shape)
+        self.assertIs(c.shape, a.shape.transitions["z"])
+        self.assertEqual(c.fields, {"x": 5, "y": 6, "z": 7})
+        self.assertEqual(a.fields, {"x": 1, "y": 2})
+
+    def test_updating_field_keeps_shape(self):
+        a = self.get("a")
+        shape = a.shape
+        a.set("x", 10)
+        self.assertIs(a.shape, shape)
+        self.assertEqual(a.get("x"), 10)
+
+    def test_field_order_matters(self):
+        point = self.get("Point")
+        first, second = CoffeeInstance(point), CoffeeInstance(point)
+        first.set("x", 1)
+        first.set("y", 2)
+        second.set("y", 2)
+        second.set("x", 1)
+        self.assertIsNot(first.shape, second.shape)
+        self.assertEqual(first.fields, second.fields)
+
+    def test_instances_have_no_dict(self):
+        self.assertFalse(hasattr(self.get("a"), "__dict__"))
+
+    def test_python_attribute_access_uses_fields(self):
+        a = self.get("a")
+        setattr(a, "x", 10)
+        a.label = "first"
+        self.assertEqual(getattr(a, "x"), 10)
+        self.assertEqual(a.fields, {"x": 10, "y": 2, "label": "first"})
+        self.assertEqual(self.interpreter.interpret("a.label"), "first")
+        with self.assertRaises(AttributeError):
+            a.missing
+
+    def test_transition_chain_shares_its_table(self):
+        a, c = self.get("a"), self.get("c")
+        self.assertIs(c.shape.table, a.shape.table)
+        self.assertEqual(a.shape.slots, {"x": 0, "y": 1})
+        self.assertIsNone(a.shape.index("z"))
+        other = CoffeeInstance(self.get("Point"))
+        other.set("x", 1)
+        other.set("y", 2)
+        other.set("w", 3)
+        self.assertIsNot(other.shape.table, a.shape.table)
+        self.assertEqual(other.shape.slots, {"x": 0, "y": 1, "w": 2})
+        self.assertEqual(c.fields, {"x": 5, "y": 6, "z": 7})
+
+    def test_many_fields_move_to_dictionary_mode(self):
+        a = self.get("a")
+        count = MAX_SHAPE_FIELDS * 50
+        for index in range(count):
+            setattr(a, f"f{index}", index)
+        self.assertTrue(a.shape.is_dictionary)
+        self.assertIs(a.shape, self.get("Point").dictionary_shape)
+        self.assertEqual(len(a.fields), count + 2)
+        self.assertEqual((a.get("x"), a.get("f0"), a.get(f"f{count - 1}")), (1, 0, count - 1))
+        a.set("x", 10)
+        self.assertEqual(self.interpreter.interpret("[a.x, a.f7, a.constructor != null]"), [10, 7, True])
+
+    def test_dictionary_mode_is_cached_by_field_name(self):
+        interpreter = Interpreter()
+        interpreter.interpret("class Bag\n  size: -> 'method'\nbig = new Bag()\nsmall = new Bag()")
+        big = interpreter.environment.get("big")
+        for index in range(MAX_SHAPE_FIELDS + 1):
+            big.set(f"f{index}", index)
+        big.set("size", "field")
+        source = "result = []\nfor item in [small, small, big, big]\n  result.append(if item == big then item.f3 else item.size())\nresult"
+        self.assertEqual(interpreter.interpret(source), ["method", "method", 3, 3])
+        self.assertEqual(interpreter.interpret("sizes = []\nfor item in [big, big]\n  sizes.append(item.size)\nsizes"), ["field", "field"])
+        with self.assertRaisesRegex(CoffeeRuntimeError, "not callable"):
+            interpreter.interpret("big.size()")
+
+
+if __name__ == "__main__":
+    unittest.main()
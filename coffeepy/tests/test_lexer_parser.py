@@ -1,25 +1,52 @@
 from __future__ import annotations
 
+import mmap
+import tempfile
 import unittest
+from pathlib import Path
 from typing import cast
+from unittest import mock
 
 from coffeepy.ast_nodes import (
     AssignStmt,
     AugAssignStmt,
+    Binary,
     Call,
+    ChainedComparison,
+    ExistentialExpr,
     ExprStmt,
     FunctionLiteral,
     GetAttr,
     Identifier,
     IfExpr,
+    InExpr,
     IndexExpr,
+    InterpolatedString,
+    Literal,
+    RangeLiteral,
+    RegexLiteral,
+    Unary,
     UpdateStmt,
     WhileStmt,
 )
 from coffeepy.errors import CoffeeLexerError, CoffeeParseError
-from coffeepy.lexer import Lexer
+from coffeepy.interpreter import Interpreter
+from coffeepy.lexer import Lexer, read_chunks
 from coffeepy.parser import Parser
-from coffeepy.tokens import INDENT, OUTDENT
+from coffeepy.tokens import (
+    EOF,
+    IDENT,
+    INDENT,
+    INTERPOLATION_END,
+    INTERPOLATION_START,
+    LBRACE,
+    OUTDENT,
+    RBRACE,
+    STRING,
+    STRING_END,
+    STRING_START,
+    TokenBuffer,
+)
 
 
 class LexerParserTests(unittest.TestCase):
@@ -48,6 +75,172 @@ double 4
         self.assertEqual(target.name, "double")
         self.assertIsInstance(assign_stmt.value, FunctionLiteral)
 
+    def test_parser_builds_regex_literals(self):
+        program = Parser(Lexer("a = /ab+c/i\nb = ///\n  x y\n///").tokenize()).parse()
+        self.assertEqual(program.statements[0].value, RegexLiteral("ab+c", "i"))
+        self.assertEqual(program.statements[1].value, Literal("xy"))
+
+    def test_lexer_emits_interpolation_tokens(self):
+        tokens = Lexer('"a#{ {b} }#{"c#{d}"}"').tokenize()
+        self.assertEqual(
+            [token.kind for token in tokens],
+            [
+                STRING_START, STRING,
+                INTERPOLATION_START, LBRACE, IDENT, RBRACE, INTERPOLATION_END,
+                INTERPOLATION_START, STRING_START, STRING, INTERPOLATION_START, IDENT, INTERPOLATION_END, STRING_END,
+                INTERPOLATION_END,
+                STRING_END, EOF,
+            ],
+        )
+        self.assertEqual(Lexer("'a#{b}'").tokenize()[0].literal, "a#{b}")
+
+    def test_master_pattern_matches_character_scanner(self):
+        root = Path(__file__).resolve().parents[2]
+        sources = [path.read_text(encoding="utf-8") for path in sorted((root / "examples").rglob("*.coffee"))]
+        sources += [
+            "x = 12.5..y\n  # note\n\tz =>  a?.b ?= c // d /= 2 / e\n",
+            "s = 'plain' + \"#fff\" + \"a#{ {k: [1, 2]}.k }\" + \"\"\"\n  x\n\"\"\"\n",
+            "r = /ab+c/g.test(\"x\\ty\") **= 3 ²\n",
+            "if a\n    b\n  c\n",
+            "t = \"#{\\\"<#{x}>\\\"} #{\\'y\\'}\"\n",
+        ]
+        for source in sources:
+            with self.subTest(source=source[:40]):
+                try:
+                    expected = Lexer(source).tokenize(master_pattern=False)
+                except (CoffeeLexerError, ValueError) as exc:
+                    with self.assertRaises(type(exc)) as caught:
+                        Lexer(source).tokenize()
+                    self.assertEqual(str(caught.exception), str(exc))
+                    continue
+                self.assertEqual(Lexer(source).tokenize(), expected)
+
+    def test_lexer_reads_files_and_mmaps(self):
+        source = 'greet = (name) ->\r\n  """\r\n  Hi #{name}\r\n  """\r\nprint greet "é"\r'
+        expected = Lexer(source.replace("\r\n", "\n").replace("\r", "\n")).tokenize()
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "script.coffee"
+            path.write_bytes(source.encode("utf-8"))
+            with open(path, encoding="utf-8", newline="") as text:
+                self.assertEqual(Lexer(text).tokenize(), expected)
+            with open(path, "rb") as binary:
+                self.assertEqual(Lexer(binary).tokenize(), expected)
+                with mmap.mmap(binary.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    self.assertEqual(list(Lexer(mapped).stream()), expected)
+        # A block string may run over several chunks.
+        self.assertEqual(Lexer(source.splitlines(keepends=True)).tokenize(), expected)
+
+    def test_read_chunks_end_at_line_ends(self):
+        chunks = list(read_chunks("ab\ncd\r\nef\rgh", size=2))
+        self.assertEqual(chunks, ["ab\n", "cd\n", "ef\ngh"])
+
+    def test_parser_reads_token_stream_lazily(self):
+        source = "".join(f"x{index} = [{index}, {index} + 1]\n" for index in range(2000))
+        expected = Parser(Lexer(source).tokenize()).parse()
+        pulled = []
+
+        def tokens():
+            for token in Lexer(source).stream():
+                pulled.append(token)
+                yield token
+
+        self.assertEqual(Parser(tokens())._statement(), expected.statements[0])
+        self.assertLess(len(pulled), 1000)
+        parser = Parser(Lexer(source).stream())
+        self.assertEqual(parser.parse(), expected)
+        self.assertLess(len(parser.tokens), 1000)
+
+    def test_parser_reads_token_batches(self):
+        source = "".join(f"x{index} = [{index}, {index} + 1]\n" for index in range(2000)) + "y = (\n"
+        lines = source.splitlines(keepends=True)
+        parser = Parser(Lexer(lines[:-1]).batches())
+        self.assertEqual(parser.parse(), Parser(Lexer(lines[:-1]).token_buffer()).parse())
+        self.assertLess(len(parser.tokens), 1000)
+        with self.assertRaisesRegex(CoffeeParseError, r"line 2001, column 6"):
+            Parser(Lexer(lines).batches()).parse()
+        with mock.patch.object(Lexer, "token_buffer", side_effect=AssertionError):
+            self.assertEqual(Interpreter().interpret("".join(lines[:-1]) + "x3"), [3, 4])
+
+    def test_token_buffer_holds_the_tokens_by_column(self):
+        source = 'total = total + "#{count} items"\nif total\n  print total\n'
+        buffer = Lexer(source).token_buffer()
+        self.assertIsInstance(buffer, TokenBuffer)
+        self.assertEqual(list(buffer), list(Lexer(source).stream()))
+        self.assertEqual(buffer.kinds.itemsize, 1)
+        names = [value for index, value in enumerate(buffer.values) if buffer.kind(index) == IDENT]
+        self.assertEqual(names, ["total", "total", "count", "total", "print", "total"])
+        self.assertIs(names[0], names[3])
+        self.assertEqual(buffer.token(3).line, 1)
+        self.assertEqual(buffer.position(len(buffer) - 1), (4, 1))
+        self.assertEqual(Parser(buffer).parse(), Parser(Lexer(source).tokenize()).parse())
+
+        with self.assertRaisesRegex(CoffeeParseError, r"line 2, column 6"):
+            Parser(Lexer("x = 1\nx =  )").token_buffer()).parse()
+
+    def test_parser_applies_operator_precedence(self):
+        def shape(node) -> str:
+            if isinstance(node, Identifier):
+                return node.name
+            if isinstance(node, Binary):
+                return f"({shape(node.left)} {node.operator} {shape(node.right)})"
+            if isinstance(node, Unary):
+                return f"({node.operator} {shape(node.right)})"
+            if isinstance(node, ExistentialExpr):
+                return f"({shape(node.left)} ? {shape(node.right)})"
+            if isinstance(node, RangeLiteral):
+                return f"[{shape(node.start)} {'...' if node.exclusive else '..'} {shape(node.end)}]"
+            if isinstance(node, InExpr):
+                return f"({shape(node.value)} in {shape(node.container)})"
+            if isinstance(node, ChainedComparison):
+                rest = " ".join(f"{operator} {shape(operand)}" for operator, operand in zip(node.operators, node.operands[1:]))
+                return f"({shape(node.operands[0])} {rest})"
+            raise AssertionError(node)
+
+        cases = {
+            "a or b ? c and d == e": "(a OR (b ? (c AND (d EQEQ e))))",
+            "a is not b < c <= d": "(a NEQ (b LT c LTE d))",
+            "-a ** b ** c * d + e": "((((MINUS a) STARSTAR (b STARSTAR c)) STAR d) PLUS e)",
+            "a + b .. c * d": "[(a PLUS b) .. (c STAR d)]",
+            "a < b in c .. d == e": "(((a LT b) in [c .. d]) EQEQ e)",
+        }
+        for source, expected in cases.items():
+            with self.subTest(source=source):
+                statement = cast(ExprStmt, Parser(Lexer(source).token_buffer()).parse().statements[0])
+                self.assertEqual(shape(statement.expression), expected)
+
+        # A comparison does not chain with ``in``, nor a range with a range.
+        for source in ("a in b < c", "a .. b .. c"):
+            with self.subTest(source=source), self.assertRaises(CoffeeParseError):
+                Parser(Lexer(source).token_buffer()).parse()
+
+        nested = "(" * 120 + "x" + ")" * 120
+        statement = cast(ExprStmt, Parser(Lexer(nested).token_buffer()).parse().statements[0])
+        self.assertEqual(shape(statement.expression), "x")
+
+    def test_parser_builds_interpolated_strings(self):
+        program = Parser(Lexer('"x = #{x}!"\n"#{y}"').tokenize()).parse()
+        first, second = (statement.expression for statement in program.statements)
+        self.assertIsInstance(first, InterpolatedString)
+        self.assertEqual(first.parts[0], Literal("x = "))
+        self.assertEqual(cast(Identifier, first.parts[1]).name, "x")
+        self.assertEqual(first.parts[2], Literal("!"))
+        self.assertIsInstance(second, InterpolatedString)
+        self.assertEqual([cast(Identifier, part).name for part in second.parts], ["y"])
+
+    def test_lexer_rejects_unterminated_interpolation(self):
+        with self.assertRaisesRegex(CoffeeLexerError, "Unterminated string interpolation"):
+            Lexer('"a#{b\n}"').tokenize()
+
+    def test_lexer_reads_escaped_quotes_only_inside_interpolation(self):
+        tokens = Lexer('"#{\\"a\\"}"').tokenize()
+        self.assertEqual(
+            [token.kind for token in tokens],
+            [STRING_START, INTERPOLATION_START, STRING, INTERPOLATION_END, STRING_END, EOF],
+        )
+        self.assertEqual(tokens[2].literal, "a")
+        with self.assertRaisesRegex(CoffeeLexerError, "Unexpected character"):
+            Lexer('x = \\"a\\"').tokenize()
+
     def test_parser_parses_prefix_if_block(self):
         source = """if true
   1
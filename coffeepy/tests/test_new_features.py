@@ -8,9 +8,8 @@ import unittest
 import sys
 import os
 
-from coffeepy.lexer import Lexer
-from coffeepy.parser import Parser
-from coffeepy.interpreter import Interpreter
+from coffeepy.interpreter import BACKENDS, Interpreter, yield_sites
+from coffeepy.tests import parse
 
 
 class TestSafeAccess(unittest.TestCase):
@@ -174,6 +173,118 @@ count
         result = self.run_code(source)
         self.assertEqual(result, 5)
 
+    def test_send_value_is_yield_result(self):
+        """Values passed to send() become the value of the yield"""
+        source = '''
+running = ->
+  total = 0
+  while true
+    received = yield total
+    total += received
+acc = ->
+  total = 0
+  while true
+    total += yield total
+echo = ->
+  reply = (yield 'ready') + '!'
+  yield [reply, yield reply]
+result = []
+for gen in [running(), acc()]
+  gen.send(null)
+  gen.send(5)
+  result.append(gen.send(7))
+e = echo()
+result.append(e.__next__())
+result.append(e.send('hi'))
+result.append(e.send('again'))
+result
+'''
+        for backend in BACKENDS:
+            with self.subTest(backend=backend):
+                result = Interpreter(backend=backend).interpret(source)
+                self.assertEqual(result, [12, 12, "ready", "hi!", ["hi!", "again"]])
+
+    def test_generator_keeps_its_environment_between_steps(self):
+        """Code between steps runs in the caller's scope"""
+        source = '''
+gen = ->
+  inner = 'inner'
+  yield inner
+  yield inner
+g = gen()
+first = g.__next__()
+outer = 'outer'
+[first, g.__next__(), outer]
+'''
+        for backend in BACKENDS:
+            with self.subTest(backend=backend):
+                self.assertEqual(Interpreter(backend=backend).interpret(source), ["inner", "inner", "outer"])
+
+    def test_yield_sites_skip_nested_functions(self):
+        """Only yields of the body itself are recorded"""
+        program = parse("f = ->\n  a = yield 1\n  g = -> yield 2\n  a")
+        body = program.statements[0].value.body
+        sites = yield_sites(body)
+        (outer,) = sites[id(body)]
+        self.assertEqual(outer.value.value, 1)
+        self.assertEqual(len(sites), 3)
+
+
+class TestLazyComprehensions(unittest.TestCase):
+    """Test generator comprehensions and comprehension fusion"""
+
+    def run_all(self, source):
+        return {backend: Interpreter(backend=backend).interpret(source) for backend in BACKENDS}
+
+    def test_generator_comprehension_is_lazy(self):
+        """Only the items asked for are computed"""
+        source = '''
+g = (x * 2 for x in [1..10000000000] when x % 3 == 0)
+[next(g), next(g), next(g)]
+'''
+        for backend, result in self.run_all(source).items():
+            with self.subTest(backend=backend):
+                self.assertEqual(result, [6, 12, 18])
+
+    def test_generator_comprehension_as_argument(self):
+        """A generator comprehension can feed any Python iterable consumer"""
+        source = '''
+xs = [3, 1, 2]
+[sum((x * x for x in xs)), list((x for x in xs when x > 1))]
+'''
+        for backend, result in self.run_all(source).items():
+            with self.subTest(backend=backend):
+                self.assertEqual(result, [14, [3, 2]])
+
+    def test_stacked_comprehensions_fuse(self):
+        """A comprehension over a generator comprehension runs as one loop"""
+        source = '''
+order = []
+tag = (name, value) ->
+  order.append("#{name}#{value}")
+  value
+result = [tag('b', y) for y in (tag('a', x * x) for x in [1..4] when x % 2 == 0) when y > 5]
+[result, order]
+'''
+        for backend, result in self.run_all(source).items():
+            with self.subTest(backend=backend):
+                self.assertEqual(result, [[16], ["a4", "a16", "b16"]])
+
+    def test_generator_comprehension_binds_enclosing_variables(self):
+        """Loop variables are set in the enclosing scope as items are pulled"""
+        source = '''
+x = 'outer'
+f = (k) ->
+  before = x
+  g = ([y * i for y in [1, 2]] for i in [1, 2] when i + k > 0)
+  first = next(g)
+  [before, first, i, list(g), i, x]
+f(0)
+'''
+        for backend, result in self.run_all(source).items():
+            with self.subTest(backend=backend):
+                self.assertEqual(result, ["outer", [1, 2], 1, [[2, 4]], 2, "outer"])
+
 
 class TestRangeInForLoop(unittest.TestCase):
     """Test range iteration in for loops"""
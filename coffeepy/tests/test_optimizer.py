@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import io
+import unittest
+
+from coffeepy.ast_nodes import BlockExpr, ExprStmt, FunctionLiteral, InExpr, Literal, ReturnStmt
+from coffeepy.errors import CoffeeRuntimeError
+from coffeepy.interpreter import Interpreter
+from coffeepy.optimizer import optimize
+from coffeepy.tests import parse, test_bootstrap
+
+
+def optimized_value(source: str):
+    statement = optimize(parse(source)).statements[-1]
+    return statement.expression
+
+
+class OptimizedRuntimeTests(test_bootstrap.BootstrapRuntimeTests):
+    """Run the bootstrap suite on optimized programs."""
+
+    def run_code(self, source: str, stdout=None):
+        return Interpreter(stdout=stdout, optimize=True).interpret(source)
+
+
+class OptimizedVirtualMachineRuntimeTests(test_bootstrap.BootstrapRuntimeTests):
+    """Run the bootstrap suite on optimized programs and the register VM."""
+
+    def run_code(self, source: str, stdout=None):
+        return Interpreter(stdout=stdout, backend="vm", optimize=True).interpret(source)
+
+
+class ConstantFoldingTests(unittest.TestCase):
+    def test_arithmetic_is_folded(self):
+        self.assertEqual(optimized_value("60 * 60 * 24"), Literal(86400))
+        self.assertEqual(optimized_value("'a' + 'b'"), Literal("ab"))
+        self.assertEqual(optimized_value("-(2 ** 3)"), Literal(-8))
+
+    def test_comparisons_are_folded(self):
+        self.assertEqual(optimized_value("1 < 2 < 3"), Literal(True))
+        self.assertEqual(optimized_value("3 == 4"), Literal(False))
+        self.assertEqual(optimized_value("not 0"), Literal(True))
+
+    def test_constant_interpolation_is_folded(self):
+        self.assertEqual(optimized_value('"total: #{2 * 21}"'), Literal("total: 42"))
+
+    def test_logical_operators_short_circuit_on_constants(self):
+        self.assertEqual(optimized_value("true and x").name, "x")
+        self.assertEqual(optimized_value("0 or 'default'"), Literal("default"))
+        self.assertEqual(optimized_value("null and x"), Literal(None))
+
+    def test_failing_operations_are_left_for_runtime(self):
+        self.assertNotIsInstance(optimized_value("1 / 0"), Literal)
+        self.assertNotIsInstance(optimized_value("'a' - 1"), Literal)
+        with self.assertRaises(CoffeeRuntimeError):
+            Interpreter(optimize=True).interpret("1 / 0")
+
+    def test_huge_results_are_not_folded(self):
+        self.assertNotIsInstance(optimized_value("10 ** 100000"), Literal)
+        self.assertNotIsInstance(optimized_value("'ab' * 100000"), Literal)
+
+    def test_original_program_is_untouched(self):
+        program = parse("x = 2 * 3")
+        optimize(program)
+        self.assertNotIsInstance(program.statements[0].value, Literal)
+
+    def test_rewritten_nodes_do_not_copy_caches(self):
+        program = parse("f = (x) -> x + 2 * 3\nf(1)")
+        function = program.statements[0].value
+        Interpreter().run(program)
+        self.assertIsNotNone(function.info)
+        rewritten = optimize(program).statements[0].value
+        self.assertIsNot(rewritten, function)
+        self.assertIsNone(rewritten.info)
+        self.assertIsNone(rewritten.frame_layout)
+
+
+class MembershipTests(unittest.TestCase):
+    def test_constant_array_becomes_frozenset(self):
+        node = optimized_value("x in [1, 2, 3]")
+        self.assertIsInstance(node, InExpr)
+        self.assertEqual(node.container, Literal(frozenset({1, 2, 3})))
+
+    def test_constant_range_becomes_frozenset(self):
+        node = optimized_value("x in [1..10]")
+        self.assertEqual(node.container, Literal(frozenset(range(1, 11))))
+
+    def test_non_constant_container_is_kept(self):
+        node = optimized_value("x in [1, y]")
+        self.assertNotIsInstance(node.container, Literal)
+
+    def test_membership_results_match(self):
+        source = "[2 in [1, 2, 3], 'b' in ['a'], [1] in [1, 2], 5 in [1..10 by 2], 2.0 in [1, 2]]"
+        expected = Interpreter().interpret(source)
+        for backend in ("closure", "tree", "python", "vm"):
+            with self.subTest(backend=backend):
+                self.assertEqual(Interpreter(backend=backend, optimize=True).interpret(source), expected)
+
+
+class DeadCodeTests(unittest.TestCase):
+    def test_statements_after_return_are_dropped(self):
+        program = optimize(parse("f = ->\n  return 1\n  print 'never'\n  2"))
+        body = program.statements[0].value.body
+        self.assertIsInstance(body, BlockExpr)
+        self.assertEqual(len(body.statements), 1)
+        self.assertIsInstance(body.statements[0], ReturnStmt)
+
+    def test_code_with_yield_is_kept(self):
+        program = optimize(parse("gen = ->\n  return\n  yield 1\nlist(gen())"))
+        literal = program.statements[0].value
+        self.assertIsInstance(literal, FunctionLiteral)
+        self.assertEqual(len(literal.body.statements), 2)
+        self.assertEqual(Interpreter(optimize=True).interpret("gen = ->\n  return\n  yield 1\nlist(gen())"), [])
+
+    def test_constant_if_keeps_taken_branch(self):
+        stdout = io.StringIO()
+        source = "if 1 + 1 == 2\n  print 'yes'\n  'then'\nelse\n  print 'no'"
+        program = optimize(parse(source))
+        self.assertIsInstance(program.statements[0], ExprStmt)
+        self.assertEqual(program.statements[-1].expression, Literal("then"))
+        self.assertEqual(Interpreter(stdout=stdout, optimize=True).interpret(source), "then")
+        self.assertEqual(stdout.getvalue(), "yes\n")
+
+    def test_constant_false_if_without_else_is_null(self):
+        self.assertEqual(optimized_value("if false then 1"), Literal(None))
+
+    def test_break_drops_rest_of_loop_body(self):
+        source = "result = []\nfor i in [1, 2]\n  break\n  result.append(i)\nresult"
+        loop = optimize(parse(source)).statements[1]
+        self.assertEqual(len(loop.body.statements), 1)
+        self.assertEqual(Interpreter(optimize=True).interpret(source), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
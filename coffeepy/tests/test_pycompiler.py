@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import io
+import unittest
+
+from coffeepy.errors import CoffeeCompileError, CoffeeRuntimeError
+from coffeepy.interpreter import BACKENDS, Interpreter
+from coffeepy.pycompiler import PythonCompiler
+from coffeepy.tests import parse, test_bootstrap
+
+
+def compile_source(source: str):
+    program = parse(source)
+    return PythonCompiler().compile(program)
+
+
+class PythonBackendRuntimeTests(test_bootstrap.BootstrapRuntimeTests):
+    """Run the bootstrap suite through the Python AST backend."""
+
+    def run_code(self, source: str, stdout=None):
+        return Interpreter(stdout=stdout, backend="python").interpret(source)
+
+
+class PythonCompilerTests(unittest.TestCase):
+    def run_code(self, source: str, stdout=None):
+        compile_source(source)
+        return Interpreter(stdout=stdout, backend="python").interpret(source)
+
+    def test_unknown_backend_is_rejected(self):
+        with self.assertRaises(ValueError):
+            Interpreter(backend="jit")
+
+    def test_function_result_is_last_statement(self):
+        source = "f = (n) ->\n  if n > 1\n    'big'\n  else\n    'small'\na = f(0)\nb = f(5)\n[a, b]"
+        self.assertEqual(self.run_code(source), ["small", "big"])
+
+    def test_closures_assign_enclosing_variables(self):
+        source = (
+            "makeCounter = ->\n"
+            "  count = 0\n"
+            "  ->\n"
+            "    count += 1\n"
+            "counter = makeCounter()\n"
+            "counter()\n"
+            "counter()"
+        )
+        self.assertEqual(self.run_code(source), 2)
+
+    def test_nested_function_assigns_global(self):
+        source = "total = 0\nadd = (n) ->\n  total = total + n\nadd(3)\nadd(4)\ntotal"
+        self.assertEqual(self.run_code(source), 7)
+
+    def test_loop_variable_leaks_like_tree_walker(self):
+        source = "squares = [x * x for x in [1, 2, 3]]\n[squares, x]"
+        self.assertEqual(self.run_code(source), [[1, 4, 9], 3])
+
+    def test_generator_function(self):
+        source = "gen = ->\n  yield 1\n  yield 2\nlist(gen())"
+        self.assertEqual(self.run_code(source), [1, 2])
+
+    def test_lazy_comprehension_is_a_nested_generator(self):
+        source = (
+            "scale = (items, k) ->\n"
+            "  adders = ((n) -> n * k + i for i in items when i > 1)\n"
+            "  fs = list(adders)\n"
+            "  [fs[0](10), fs[1](10), i]\n"
+            "scale([1, 2, 3], 2)"
+        )
+        self.assertEqual(self.run_code(source), [23, 23, 3])
+
+    def test_throw_and_catch(self):
+        source = "try\n  throw 'boom'\ncatch err\n  'caught ' + err"
+        self.assertEqual(self.run_code(source), "caught boom")
+
+    def test_class_with_this_params_and_inheritance(self):
+        source = (
+            "class Animal\n"
+            "  constructor: (@name) ->\n"
+            "  speak: -> @name + ' makes a sound'\n"
+            "class Dog extends Animal\n"
+            "  speak: -> @name + ' barks'\n"
+            "[(new Animal('cat')).speak(), (new Dog('rex')).speak()]"
+        )
+        self.assertEqual(self.run_code(source), ["cat makes a sound", "rex barks"])
+
+    def test_undefined_identifier_reports_location(self):
+        with self.assertRaises(CoffeeRuntimeError) as ctx:
+            self.run_code("x = 1\ny = x + missing")
+        self.assertEqual(ctx.exception.message, "Undefined identifier 'missing'.")
+        self.assertEqual(ctx.exception.location.line, 2)
+        self.assertEqual(ctx.exception.location.column, 9)
+
+    def test_runtime_errors_report_the_failing_expression(self):
+        cases = [
+            ("xs = [1, 2]\ny = 3\nxs[5]", "Index operation failed", (3, 3)),
+            ("xs = [1]\nxs[5] = 2", "Index assignment failed", (2, 3)),
+            ("f = (a) ->\n  b = 1\n  b + a\nf('x')", "Binary operation failed", (3, 5)),
+            ("f = ->\n  int('x')\nf()", "Call failed", (2, 6)),
+            ("o = {}\ny = 1\no.missing()", "Attribute 'missing' not found.", (3, 2)),
+        ]
+        for source, message, position in cases:
+            with self.subTest(source=source):
+                with self.assertRaises(CoffeeRuntimeError) as ctx:
+                    self.run_code(source)
+                self.assertTrue(ctx.exception.message.startswith(message), ctx.exception.message)
+                location = ctx.exception.location
+                self.assertEqual((location.line, location.column), position)
+
+    def test_unbound_loop_variable_reports_its_name(self):
+        with self.assertRaises(CoffeeRuntimeError) as ctx:
+            self.run_code("f = ->\n  y = missing\n  for missing in [1]\n    null\n  y\nf()")
+        self.assertEqual(ctx.exception.message, "Undefined identifier 'missing'.")
+        self.assertEqual((ctx.exception.location.line, ctx.exception.location.column), (2, 7))
+
+    def test_runtime_errors_match_other_backends(self):
+        sources = [
+            "1 / 0",
+            "1 + 'a'",
+            "[1, 2][5]",
+            "{a: 1}['b']",
+            "x = [1]\nx[5] = 2",
+            "int('x')",
+            "f = 5\nf()",
+            "x = 1\nx += 'a'",
+            "x = 'a'\nx++",
+            "f = -> 1 / 0\nf()",
+        ]
+        for source in sources:
+            messages = {}
+            for backend in BACKENDS:
+                with self.assertRaises(CoffeeRuntimeError) as ctx:
+                    Interpreter(backend=backend).interpret(source)
+                messages[backend] = ctx.exception.message
+            with self.subTest(source=source):
+                self.assertEqual(len(set(messages.values())), 1, messages)
+
+    def test_return_outside_function_is_error(self):
+        with self.assertRaises(CoffeeRuntimeError):
+            self.run_code("return 1")
+
+    def test_super_falls_back_to_tree_walker(self):
+        source = "class A\n  greet: ->\n    super\n1"
+        with self.assertRaises(CoffeeCompileError):
+            compile_source(source)
+        stdout = io.StringIO()
+        result = Interpreter(stdout=stdout, backend="python").interpret("print 'ok'\n" + source)
+        self.assertEqual(result, 1)
+        self.assertEqual(stdout.getvalue(), "ok\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
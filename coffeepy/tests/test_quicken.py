@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import unittest
+
+from coffeepy import quicken
+from coffeepy.errors import CoffeeRuntimeError
+from coffeepy.interpreter import Interpreter
+from coffeepy.quicken import QUICKEN_THRESHOLD, BinarySite
+from coffeepy.tests import parse
+from coffeepy.tokens import PLUS, SLASH
+
+
+class BinarySiteTests(unittest.TestCase):
+    def test_specializes_after_threshold(self):
+        site = BinarySite(PLUS)
+        for i in range(QUICKEN_THRESHOLD):
+            self.assertFalse(site.is_specialized)
+            self.assertEqual(site.evaluate(i, 1), i + 1)
+        self.assertTrue(site.is_specialized)
+        self.assertEqual((site.left_type, site.right_type), (int, int))
+        self.assertEqual(site.evaluate(2, 3), 5)
+        self.assertEqual(site.hits, 1)
+
+    def test_guard_failure_deoptimizes_and_backs_off(self):
+        site = BinarySite(PLUS)
+        for _ in range(QUICKEN_THRESHOLD):
+            site.evaluate(1, 2)
+        self.assertEqual(site.evaluate("a", "b"), "ab")
+        self.assertFalse(site.is_specialized)
+        self.assertEqual((site.deopts, site.threshold), (1, QUICKEN_THRESHOLD * 2))
+        for _ in range(QUICKEN_THRESHOLD * 2 - 1):
+            site.evaluate("a", "b")
+        self.assertEqual((site.left_type, site.right_type), (str, str))
+
+    def test_operations_that_can_fail_stay_generic(self):
+        site = BinarySite(SLASH)
+        for _ in range(QUICKEN_THRESHOLD * 2):
+            site.evaluate(1.0, 2.0)
+        self.assertFalse(site.is_specialized)
+        with self.assertRaises(CoffeeRuntimeError) as ctx:
+            site.evaluate(1.0, 0.0)
+        self.assertIn("Binary operation failed", ctx.exception.message)
+
+    def test_walker_nodes_quicken(self):
+        program = parse("total = 0\nfor i in [1..50]\n  total = total + i\ntotal")
+        interpreter = Interpreter(backend="tree")
+        self.assertEqual(interpreter.execute_program(program), 1275)
+        site = program.statements[1].body.statements[0].value.site
+        self.assertTrue(site.is_specialized)
+        self.assertEqual(site.hits, 50 - QUICKEN_THRESHOLD)
+
+
+class CallSiteTests(unittest.TestCase):
+    def run_tree(self, source: str):
+        program = parse(source)
+        return program, Interpreter(backend="tree").execute_program(program)
+
+    def test_fixed_arity_calls_quicken(self):
+        program, result = self.run_tree(
+            "fib = (n) ->\n  if n < 2 then n else fib(n - 1) + fib(n - 2)\nfib(15)"
+        )
+        self.assertEqual(result, 610)
+        recursive = program.statements[0].value.body.statements[0].expression.else_branch.left
+        self.assertTrue(recursive.site.is_specialized)
+        self.assertGreater(recursive.site.hits, 0)
+
+    def test_guard_checks_function_literal_and_arity(self):
+        source = (
+            "double = (x) -> x * 2\n"
+            "triple = (x) -> x * 3\n"
+            "scale = (x, k = 10) -> x * k\n"
+            "apply = (f, x) -> f(x)\n"
+            "a = [apply(double, i) for i in [1..10]]\n"
+            "b = apply(triple, 5)\n"
+            "c = [apply(scale, i) for i in [1..10]]\n"
+            "[a[9], b, c[9]]"
+        )
+        quicken.reset_stats()
+        program, result = self.run_tree(source)
+        self.assertEqual(result, [20, 15, 100])
+        site = program.statements[3].value.body.site
+        self.assertFalse(site.is_specialized)
+        self.assertGreaterEqual(site.deopts, 1)
+        self.assertGreater(quicken.stats()["hits"], 0)
+
+    def test_bound_functions_keep_this(self):
+        source = (
+            "class Counter\n"
+            "  constructor: ->\n"
+            "    @n = 0\n"
+            "  bumper: ->\n"
+            "    =>\n"
+            "      @n = @n + 1\n"
+            "c = new Counter()\n"
+            "bump = c.bumper()\n"
+            "for i in [1..20]\n  bump()\n"
+            "c.n"
+        )
+        self.assertEqual(self.run_tree(source)[1], 20)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import unittest
+from unittest import mock
+
+from coffeepy import vectorize
+from coffeepy.errors import CoffeeRuntimeError
+from coffeepy.interpreter import BACKENDS, Interpreter
+from coffeepy.tests import parse
+from coffeepy.vectorize import VECTOR_MIN_LENGTH, vector_plan
+
+
+def comprehension(source: str):
+    return parse(source).statements[0].expression
+
+
+SETUP = f"import math\nvalues = [i * 0.25 - 10.0 for i in [0...{VECTOR_MIN_LENGTH * 2}]]\noffset = 3\n"
+
+
+@unittest.skipIf(vectorize.numpy is None, "NumPy is not installed")
+class VectorPlanTests(unittest.TestCase):
+    def test_numeric_comprehensions_have_plans(self):
+        for source in (
+            "[x * 2 + offset for x in values when x > 0]",
+            "[math.sqrt(x) for x in values when x >= 0 and not (x > 5)]",
+            "[-x % 7 for x in values when 0 < x < 10]",
+        ):
+            with self.subTest(source=source):
+                self.assertIsNotNone(vector_plan(comprehension(source)))
+
+    def test_other_comprehensions_have_none(self):
+        for source in (
+            "[f(x, 2) for x in values]",
+            "[x and 1 for x in values]",
+            "[x + 'a' for x in values]",
+            "[x.real for x in values]",
+            "(x * 2 for x in values)",
+        ):
+            with self.subTest(source=source):
+                self.assertIsNone(vector_plan(comprehension(source)))
+
+    def test_plan_is_kept_on_the_node(self):
+        node = comprehension("[x * 2 for x in values]")
+        self.assertIs(vector_plan(node), vector_plan(node))
+        other = comprehension("[f(x, 2) for x in values]")
+        self.assertIsNone(vector_plan(other))
+        self.assertIs(other.vector, False)
+
+
+@unittest.skipIf(vectorize.numpy is None, "NumPy is not installed")
+class VectorizedComprehensionTests(unittest.TestCase):
+    def run_both(self, source: str, backend: str):
+        """Run ``source`` with and without NumPy."""
+        vectorized = Interpreter(backend=backend).interpret(SETUP + source)
+        with mock.patch.object(vectorize, "numpy", None):
+            scalar = Interpreter(backend=backend).interpret(SETUP + source)
+        return vectorized, scalar
+
+    def test_results_match_the_loop(self):
+        sources = (
+            "[x * 2 + offset for x in values when x > 0]",
+            "[math.sqrt(x) + abs(x) for x in values when x >= 0 and x < 50]",
+            "[-x % 7 for x in values when 0 < x < 10 or x == -1.5]",
+            "[x > offset for x in values]",
+            "[x ** 2 / offset for x in values when not x]",
+        )
+        for backend in ("closure", "tree"):
+            for source in sources:
+                with self.subTest(backend=backend, source=source):
+                    vectorized, scalar = self.run_both(f"r = {source}\n[r, x]", backend)
+                    self.assertEqual(vectorized, scalar)
+                    self.assertEqual(list(map(type, vectorized[0])), list(map(type, scalar[0])))
+
+    def test_only_long_lists_become_arrays(self):
+        interpreter = Interpreter()
+        interpreter.interpret(SETUP)
+        with mock.patch.object(vectorize.numpy, "array", side_effect=AssertionError):
+            self.assertEqual(interpreter.interpret("[x * 2 for x in [1.5, 2.5]]"), [3.0, 5.0])
+            with self.assertRaises(AssertionError):
+                interpreter.interpret("[x * 2 for x in values]")
+
+    def test_falls_back_when_types_do_not_fit(self):
+        for source, expected in (
+            ("values.append(1)\nr = [x * 2 for x in values]\nr[-1]", 2),
+            ("offset = 'a'\nr = [x > 0 for x in values when offset]\nr[-1]", True),
+            ("r = [x * 2 for x in values[0...10]]\nr[0]", -20.0),
+            ("f = (v) -> v + 1\nr = [f(x) for x in values]\nr[0]", -9.0),
+        ):
+            for backend in BACKENDS:
+                with self.subTest(source=source, backend=backend):
+                    self.assertEqual(Interpreter(backend=backend).interpret(SETUP + source), expected)
+
+    def test_errors_come_from_the_loop(self):
+        for source, message in (
+            ("[x / (x + 10) for x in values]", "division"),
+            ("[math.sqrt(x) for x in values]", "math domain error"),
+        ):
+            for backend in BACKENDS:
+                with self.subTest(source=source, backend=backend):
+                    with self.assertRaises(CoffeeRuntimeError) as ctx:
+                        Interpreter(backend=backend).interpret(SETUP + source)
+                    self.assertIn(message, ctx.exception.message)
+
+    def test_numpy_arrays_mode(self):
+        result = Interpreter(numpy_arrays=True).interpret(SETUP + "[x * 2 for x in values when x > 0]")
+        self.assertIsInstance(result, vectorize.numpy.ndarray)
+        self.assertEqual(result[0], 0.5)
+
+
+class WithoutNumpyTests(unittest.TestCase):
+    def test_comprehensions_run_as_loops(self):
+        with mock.patch.object(vectorize, "numpy", None):
+            self.assertIsNone(vector_plan(comprehension("[x * 2 for x in values]")))
+            for backend in BACKENDS:
+                with self.subTest(backend=backend):
+                    result = Interpreter(backend=backend).interpret(SETUP + "r = [x * 2 for x in values]\nr[0]")
+                    self.assertEqual(result, -20.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
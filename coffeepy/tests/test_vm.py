@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+import io
+import unittest
+from array import array
+
+from coffeepy.ast_nodes import AssignStmt
+from coffeepy.bytecode import LAZY_COMPREHENSION, RETURN, BytecodeCompiler, CodeObject, disassemble
+from coffeepy.errors import CoffeeRuntimeError
+from coffeepy.interpreter import Interpreter
+from coffeepy.resolver import FIRST_SLOT, resolve
+from coffeepy.tests import parse, test_bootstrap
+from coffeepy.vm import VMFunction
+
+
+class VirtualMachineRuntimeTests(test_bootstrap.BootstrapRuntimeTests):
+    """Run the bootstrap suite on the register virtual machine."""
+
+    def run_code(self, source: str, stdout=None):
+        return Interpreter(stdout=stdout, backend="vm").interpret(source)
+
+
+class BytecodeCompilerTests(unittest.TestCase):
+    def test_code_object_layout(self):
+        code = BytecodeCompiler().compile_program(parse("x = 'a'\ny = x + 'a'\ny"))
+        self.assertIsInstance(code.instructions, array)
+        self.assertEqual(len(code.instructions) % 4, 0)
+        self.assertEqual(code.instructions[-4], RETURN)
+        self.assertEqual(code.constants, ["a"])
+        self.assertEqual(code.names, ["x", "y"])
+
+    def test_function_code_is_cached_on_literal(self):
+        program = parse("f = (a, b = 2) -> a * b")
+        literal = program.statements[0].value
+        self.assertIsInstance(program.statements[0], AssignStmt)
+        first = BytecodeCompiler().compile_program(program)
+        function_code = literal.bytecode
+        self.assertIsInstance(function_code, CodeObject)
+        self.assertIn(function_code, first.constants)
+        BytecodeCompiler().compile_program(program)
+        self.assertIs(literal.bytecode, function_code)
+        self.assertEqual(function_code.params, ("a", "b"))
+        self.assertEqual(function_code.defaults, ("b",))
+
+    def test_frame_size_comes_from_local_count(self):
+        function = Interpreter(backend="vm").interpret("f = (a, b) ->\n  for c in b\n    a += c\nf")
+        self.assertEqual(function.code.local_count, 3)
+        self.assertEqual(len(function.blank_slots), 3)
+        self.assertEqual(function(1, [2, 3]), 6)
+
+    def test_disassemble_lists_nested_functions(self):
+        code = BytecodeCompiler().compile_program(parse("f = (n) -> n + 1"))
+        listing = disassemble(code)
+        self.assertIn("MAKE_FUNCTION", listing)
+        self.assertIn("<function>", listing)
+        self.assertIn("ADD", listing)
+
+    def test_lazy_comprehension_compiles_to_generator_code(self):
+        code = BytecodeCompiler().compile_program(parse("g = (x * 2 for x in [1, 2])\nlist(g)"))
+        listing = disassemble(code)
+        self.assertIn("MAKE_GENERATOR", listing)
+        self.assertIn(LAZY_COMPREHENSION, listing)
+        self.assertIn("YIELD", listing)
+
+
+class ResolverTests(unittest.TestCase):
+    def test_identifiers_get_frame_coordinates(self):
+        program = parse("g = 1\nouter = (a, b) ->\n  (c) -> a + b + c + g")
+        resolve(program)
+        outer = program.statements[1].value
+        self.assertEqual(outer.frame_layout, ("a", "b"))
+        inner = outer.body.statements[-1].expression
+        self.assertEqual(inner.frame_layout, ("c",))
+        a, b = inner.body.left.left.left, inner.body.left.left.right
+        c, g = inner.body.left.right, inner.body.right
+        self.assertEqual(a.coordinate, (1, FIRST_SLOT))
+        self.assertEqual(b.coordinate, (1, FIRST_SLOT + 1))
+        self.assertEqual(c.coordinate, (0, FIRST_SLOT))
+        self.assertIsNone(g.coordinate)
+
+    def test_loop_variable_gets_coordinate(self):
+        program = parse("f = ->\n  for item in [1, 2]\n    item")
+        resolve(program)
+        loop = program.statements[0].value.body.statements[0]
+        self.assertEqual(loop.var_coordinate, (0, FIRST_SLOT))
+
+
+class VirtualMachineTests(unittest.TestCase):
+    def run_code(self, source: str, stdout=None):
+        return Interpreter(stdout=stdout, backend="vm").interpret(source)
+
+    def test_functions_are_vm_functions(self):
+        result = self.run_code("f = (a, b = 2) -> a * b\nf")
+        self.assertIsInstance(result, VMFunction)
+        self.assertEqual(result(5), 10)
+        self.assertEqual(result(5, 3), 15)
+        self.assertEqual(repr(result), "<CoffeeFunction (a, b)>")
+
+    def test_recursion(self):
+        source = "fib = (n) ->\n  if n < 2 then n else fib(n - 1) + fib(n - 2)\nfib 15"
+        self.assertEqual(self.run_code(source), 610)
+
+    def test_closures_share_enclosing_variables(self):
+        source = (
+            "makeCounter = ->\n"
+            "  count = 0\n"
+            "  ->\n"
+            "    count += 1\n"
+            "counter = makeCounter()\n"
+            "counter()\n"
+            "counter()"
+        )
+        self.assertEqual(self.run_code(source), 2)
+
+    def test_deep_closure_reads_outer_slots(self):
+        source = (
+            "a = (x) ->\n"
+            "  b = (y) ->\n"
+            "    c = (z) -> x + y + z\n"
+            "    c(3)\n"
+            "  b(2)\n"
+            "a(1)"
+        )
+        self.assertEqual(self.run_code(source), 6)
+
+    def test_unbound_local_reads_global_of_same_name(self):
+        source = "item = 'global'\nf = ->\n  seen = item\n  for item in [1]\n    item\n  seen\nf()"
+        self.assertEqual(self.run_code(source), "global")
+
+    def test_loop_result_and_break(self):
+        source = "for i in [1..10]\n  if i == 4\n    break\n  i * 10"
+        self.assertEqual(self.run_code(source), 30)
+
+    def test_while_with_continue(self):
+        source = (
+            "i = 0\n"
+            "total = 0\n"
+            "while i < 6\n"
+            "  i += 1\n"
+            "  if i % 2 == 0\n"
+            "    continue\n"
+            "  total += i\n"
+            "total"
+        )
+        self.assertEqual(self.run_code(source), 9)
+
+    def test_throw_inside_function_is_catchable(self):
+        source = "f = ->\n  throw 'boom'\ntry\n  f()\ncatch err\n  'caught ' + err"
+        self.assertEqual(self.run_code(source), "caught boom")
+
+    def test_finally_runs_on_break_and_return(self):
+        stdout = io.StringIO()
+        source = (
+            "for i in [1, 2]\n"
+            "  try\n"
+            "    break\n"
+            "  finally\n"
+            "    print 'loop'\n"
+            "f = ->\n"
+            "  try\n"
+            "    return 'value'\n"
+            "  finally\n"
+            "    print 'function'\n"
+            "f()"
+        )
+        self.assertEqual(self.run_code(source, stdout), "value")
+        self.assertEqual(stdout.getvalue(), "loop\nfunction\n")
+
+    def test_finally_runs_when_exception_escapes(self):
+        stdout = io.StringIO()
+        source = (
+            "try\n"
+            "  try\n"
+            "    throw 'inner'\n"
+            "  finally\n"
+            "    print 'cleanup'\n"
+            "catch err\n"
+            "  err"
+        )
+        self.assertEqual(self.run_code(source, stdout), "inner")
+        self.assertEqual(stdout.getvalue(), "cleanup\n")
+
+    def test_class_inheritance_and_this_params(self):
+        source = (
+            "class Animal\n"
+            "  constructor: (@name) ->\n"
+            "  speak: -> @name + ' makes a sound'\n"
+            "class Dog extends Animal\n"
+            "  speak: -> @name + ' barks'\n"
+            "cat = new Animal('cat')\n"
+            "rex = new Dog('rex')\n"
+            "[cat.speak(), rex.speak()]"
+        )
+        self.assertEqual(self.run_code(source), ["cat makes a sound", "rex barks"])
+
+    def test_generator_send_and_close(self):
+        stdout = io.StringIO()
+        source = (
+            "gen = ->\n"
+            "  try\n"
+            "    received = yield 1\n"
+            "    yield received * 2\n"
+            "  finally\n"
+            "    print 'closed'\n"
+            "g = gen()\n"
+            "first = g.__next__()\n"
+            "second = g.send(21)\n"
+            "g.close()\n"
+            "[first, second]"
+        )
+        self.assertEqual(self.run_code(source, stdout), [1, 42])
+        self.assertEqual(stdout.getvalue(), "closed\n")
+
+    def test_lazy_comprehension_runs_on_enclosing_frame(self):
+        source = (
+            "f = ->\n"
+            "  total = 0\n"
+            "  add = (n) ->\n"
+            "    total += n\n"
+            "  g = (add(x) for x in [1..4] when x % 2 == 0)\n"
+            "  [next(g), x, total, list(g), x, total]\n"
+            "f()"
+        )
+        self.assertEqual(self.run_code(source), [2, 2, 2, [6], 4, 6])
+
+    def test_generator_return_stops_iteration(self):
+        source = "gen = ->\n  yield 1\n  return\n  yield 2\nlist(gen())"
+        self.assertEqual(self.run_code(source), [1])
+
+    def test_existential_assignment_of_undefined_name(self):
+        self.assertEqual(self.run_code("value ?= 3\nvalue"), 3)
+
+    def test_undefined_identifier_has_location(self):
+        with self.assertRaises(CoffeeRuntimeError) as ctx:
+            self.run_code("x = 1\ny = x + missing")
+        self.assertEqual(ctx.exception.message, "Undefined identifier 'missing'.")
+        self.assertEqual(ctx.exception.location.line, 2)
+
+    def test_control_flow_outside_context_is_error(self):
+        for source in ("break", "continue", "return 1", "yield 1"):
+            with self.subTest(source=source):
+                with self.assertRaises(CoffeeRuntimeError):
+                    self.run_code(source)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,10 +2,13 @@
 CoffeePy - Token Definitions
 ============================
 
-This module defines all token types and the Token dataclass used by the lexer.
+This module defines all token types, the Token dataclass and the TokenBuffer
+the lexer stores its tokens in.
 
 Token Types:
-    - Literals: NUMBER, STRING
+    - Literals: NUMBER, STRING; an interpolated string is STRING_START, its
+      STRING parts and INTERPOLATION_START ... INTERPOLATION_END groups, then
+      STRING_END
     - Identifiers: IDENT
     - Keywords: IF, THEN, ELSE, FOR, WHILE, CLASS, etc.
     - Operators: PLUS, MINUS, STAR, SLASH, etc.
@@ -15,6 +18,9 @@ Token Types:
 
 from __future__ import annotations
 
+import re
+from array import array
+from bisect import bisect_right
 from dataclasses import dataclass
 
 
@@ -29,6 +35,10 @@ OUTDENT = "OUTDENT"   # Indentation decrease
 IDENT = "IDENT"       # Identifier (variable/function names)
 NUMBER = "NUMBER"     # Numbers: 42, 3.14, 0xFF
 STRING = "STRING"     # Strings: "hello", 'world', """block"""
+STRING_START = "STRING_START"  # Opening quote of an interpolated string
+STRING_END = "STRING_END"      # Closing quote of an interpolated string
+INTERPOLATION_START = "INTERPOLATION_START"  # #{
+INTERPOLATION_END = "INTERPOLATION_END"      # } closing an interpolation
 
 # ============ Punctuation ============
 LPAREN = "LPAREN"     # (
@@ -142,3 +152,100 @@ class Token:
     literal: object
     line: int
     column: int
+
+
+# Every token kind; a TokenBuffer stores the kind of a token as its index here.
+KINDS = (
+    EOF, NEWLINE, SEMICOLON, INDENT, OUTDENT, IDENT, NUMBER, STRING, STRING_START,
+    STRING_END, INTERPOLATION_START, INTERPOLATION_END, LPAREN, RPAREN, COMMA, DOT,
+    COLON, LBRACKET, RBRACKET, LBRACE, RBRACE, EQ, EQEQ, NEQ, LT, LTE, GT, GTE, IS,
+    ISNT, PLUS, PLUSPLUS, PLUS_EQ, MINUS, MINUSMINUS, MINUS_EQ, STAR, STARSTAR,
+    STAR_EQ, SLASH, SLASH_EQ, PERCENT, PERCENT_EQ, AND, OR, NOT, ANDAND, OROR,
+    ANDAND_EQ, OROR_EQ, ARROW, FAT_ARROW, DOTDOT, DOTDOTDOT, ELLIPSIS, AT, PROTO,
+    QUESTION, QUESTIONDOT, QUESTIONEQ, DO, BY, YIELD, GET, SET, IMPORT, FROM, AS,
+    RETURN, IF, UNLESS, WHILE, UNTIL, THEN, ELSE, TRUE, FALSE, NULL, UNDEFINED,
+    BREAK, CONTINUE, FOR, IN, OF, CLASS, EXTENDS, SUPER, THIS, NEW, TRY, CATCH,
+    FINALLY, THROW, SWITCH, WHEN,
+)
+KIND_CODES = {kind: code for code, kind in enumerate(KINDS)}
+
+
+class TokenBuffer:
+    """The tokens of a source, stored column by column instead of as one
+    Token object each.
+
+    Attributes:
+        text: The source text the offsets point into
+        first_line: Line number of the start of ``text``
+        kinds: Index into ``KINDS`` of each token's kind
+        starts, ends: Offsets of each token's lexeme in ``text``
+        values: The literal of each NUMBER and STRING token, the interned
+            name of each IDENT token and None for the others
+        lexemes: Lexemes that are not a slice of ``text`` -- the text parts
+            of an interpolated string -- by token index
+
+    Line and column numbers are worked out from the offsets when asked for,
+    and Token objects are only built by ``token()`` and iteration.
+    """
+
+    __slots__ = ("text", "first_line", "kinds", "starts", "ends", "values", "lexemes", "_line_starts")
+
+    def __init__(self, text: str = "", first_line: int = 1):
+        self.text = text
+        self.first_line = first_line
+        self.kinds = array("B")
+        self.starts = array("I")
+        self.ends = array("I")
+        self.values: list[object] = []
+        self.lexemes: dict[int, str] = {}
+        self._line_starts: array | None = None
+
+    def append(self, kind: str, start: int, end: int, value: object = None, lexeme: str | None = None) -> None:
+        if lexeme is not None:
+            self.lexemes[len(self.values)] = lexeme
+        self.kinds.append(KIND_CODES[kind])
+        self.starts.append(start)
+        self.ends.append(end)
+        self.values.append(value)
+
+    def extend(self, other: TokenBuffer) -> None:
+        """Append the tokens of ``other``, whose offsets point into the same
+        text."""
+        offset = len(self.values)
+        for index, lexeme in other.lexemes.items():
+            self.lexemes[offset + index] = lexeme
+        self.kinds += other.kinds
+        self.starts += other.starts
+        self.ends += other.ends
+        self.values += other.values
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __iter__(self):
+        for index in range(len(self.values)):
+            yield self.token(index)
+
+    def kind(self, index: int) -> str:
+        return KINDS[self.kinds[index]]
+
+    def lexeme(self, index: int) -> str:
+        lexeme = self.lexemes.get(index)
+        if lexeme is None:
+            lexeme = self.text[self.starts[index] : self.ends[index]]
+        return lexeme
+
+    def position(self, index: int) -> tuple[int, int]:
+        """Line and column of the token at ``index``."""
+        if self._line_starts is None:
+            self._line_starts = array("I", [0])
+            self._line_starts.extend(found.end() for found in re.finditer("\n", self.text))
+        start = self.starts[index]
+        line = bisect_right(self._line_starts, start) - 1
+        return self.first_line + line, start - self._line_starts[line] + 1
+
+    def token(self, index: int) -> Token:
+        kind = KINDS[self.kinds[index]]
+        if kind == IDENT:
+            return Token(kind, self.values[index], None, *self.position(index))
+        return Token(kind, self.lexeme(index), self.values[index], *self.position(index))
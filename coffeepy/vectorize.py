@@ -0,0 +1,238 @@
+"""
+CoffeePy - Vectorized Comprehensions
+====================================
+
+A comprehension such as ``[x * 2 + offset for x in values when x > 0]``
+over a long list of floats spends its time evaluating the body and filter
+once per item. When NumPy is installed, ``vector_plan`` recognizes
+comprehensions whose body and ``when`` filter are built only from
+
+* the loop variable, number literals and other variables, which cannot
+  change during the loop,
+* arithmetic (``+ - * / % **``), comparisons and unary ``-``, ``+`` and
+  ``not``; ``and`` and ``or`` in the filter only, where just their truth
+  matters,
+* calls of ``math.sqrt``, ``math.fabs`` and ``abs``, whose NumPy versions
+  give exactly the same results,
+
+and ``VectorPlan.run`` evaluates them as a few array operations over the
+whole list. Parts of the expression that do not involve the loop variable
+are still computed with Python's own operators.
+
+A plan only runs when the list holds nothing but floats and is at least
+``VECTOR_MIN_LENGTH`` long, every variable holds a number and every called
+function is one of the above. It gives up whenever Python would not produce
+the same result: a division by zero, an overflow or an invalid operation
+such as the square root of a negative number. The engine then runs the
+ordinary loop, which gives the exact result or raises the usual error.
+"""
+
+from __future__ import annotations
+
+import math
+import operator
+
+from .ast_nodes import Binary, Call, ChainedComparison, ComprehensionExpr, GetAttr, Identifier, Literal, Unary
+from .errors import CoffeeError
+from .tokens import AND, EQEQ, GT, GTE, LT, LTE, MINUS, NEQ, NOT, OR, PERCENT, PLUS, SLASH, STAR, STARSTAR
+
+try:
+    import numpy
+except ImportError:  # NumPy is optional.
+    numpy = None
+
+VECTOR_MIN_LENGTH = 256
+
+_BINARY = {
+    PLUS: (operator.add, "add"),
+    MINUS: (operator.sub, "subtract"),
+    STAR: (operator.mul, "multiply"),
+    SLASH: (operator.truediv, "true_divide"),
+    PERCENT: (operator.mod, "remainder"),
+    STARSTAR: (operator.pow, "power"),
+    EQEQ: (operator.eq, "equal"),
+    NEQ: (operator.ne, "not_equal"),
+    LT: (operator.lt, "less"),
+    LTE: (operator.le, "less_equal"),
+    GT: (operator.gt, "greater"),
+    GTE: (operator.ge, "greater_equal"),
+}
+
+_UFUNCS = {math.sqrt: "sqrt", math.fabs: "fabs", abs: "absolute"}
+
+
+class _Unsupported(Exception):
+    """The values seen at run time do not fit the plan."""
+
+
+class VectorPlan:
+    """Array evaluation of one comprehension."""
+
+    __slots__ = ("operands", "body", "condition")
+
+    def __init__(self, operands: list, body, condition):
+        # Loop-invariant expressions; the engine evaluates them once per run.
+        self.operands = operands
+        self.body = body
+        self.condition = condition
+
+    def run(self, items, evaluate, arrays: bool = False):
+        """Return the comprehension's result over ``items``, or None when the
+        ordinary loop has to run. ``evaluate()`` returns the values of
+        ``operands``. With ``arrays`` the result is an ndarray, not a list."""
+        if type(items) is not list or len(items) < VECTOR_MIN_LENGTH:
+            return None
+        if set(map(type, items)) != {float}:
+            return None
+        x = numpy.array(items, dtype=numpy.float64)
+        try:
+            operands = evaluate()
+            with numpy.errstate(all="raise"):
+                if self.condition is not None:
+                    mask = self.condition(x, operands)
+                    if isinstance(mask, numpy.ndarray):
+                        x = x[mask.astype(bool)]
+                    elif not mask:
+                        x = x[:0]
+                result = self.body(x, operands)
+        except (_Unsupported, CoffeeError, ArithmeticError, TypeError, ValueError):
+            return None
+        if not isinstance(result, numpy.ndarray) or result.dtype.kind not in "fb":
+            return None
+        return result if arrays else result.tolist()
+
+
+def vector_plan(node: ComprehensionExpr) -> VectorPlan | None:
+    """Return the plan of a comprehension that can run vectorized, or None."""
+    if numpy is None or node.lazy:
+        return None
+    plan = node.vector
+    if plan is None:
+        try:
+            plan = _Planner(node.var_name).plan(node)
+        except _Unsupported:
+            plan = False
+        object.__setattr__(node, "vector", plan)
+    return plan or None
+
+
+class _Planner:
+    def __init__(self, var_name: str):
+        self.var_name = var_name
+        self.operands: list = []
+
+    def plan(self, node: ComprehensionExpr) -> VectorPlan:
+        condition = None
+        if node.filter_condition is not None:
+            condition = self.compile(node.filter_condition, truth=True)
+        return VectorPlan(self.operands, self.compile(node.body, truth=False), condition)
+
+    def operand(self, node):
+        index = len(self.operands)
+        self.operands.append(node)
+        return index
+
+    def compile(self, node, truth: bool):
+        """Compile ``node`` into a function of the items array and the operand
+        values. With ``truth`` only the truth of its value is used."""
+        if isinstance(node, Literal):
+            value = node.value
+            if type(value) not in (int, float, bool):
+                raise _Unsupported
+            return lambda x, values: value
+
+        if isinstance(node, Identifier):
+            if node.name == self.var_name:
+                return lambda x, values: x
+            index = self.operand(node)
+
+            def load(x, values):
+                value = values[index]
+                if type(value) not in (int, float, bool):
+                    raise _Unsupported
+                return value
+
+            return load
+
+        if isinstance(node, Unary):
+            right = self.compile(node.right, node.operator == NOT)
+            if node.operator == MINUS:
+                return _lift(right, operator.neg, numpy.negative)
+            if node.operator == PLUS:
+                return _lift(right, operator.pos, numpy.positive)
+            if node.operator == NOT:
+                return _lift(right, operator.not_, numpy.logical_not)
+            raise _Unsupported
+
+        if isinstance(node, Binary):
+            if node.operator in (AND, OR):
+                if not truth:
+                    raise _Unsupported
+                left, right = self.compile(node.left, True), self.compile(node.right, True)
+                if node.operator == AND:
+                    return _lift2(left, right, lambda a, b: a and b, numpy.logical_and)
+                return _lift2(left, right, lambda a, b: a or b, numpy.logical_or)
+            if node.operator not in _BINARY:
+                raise _Unsupported
+            return _binary(node.operator, self.compile(node.left, False), self.compile(node.right, False))
+
+        if isinstance(node, ChainedComparison):
+            operands = [self.compile(item, False) for item in node.operands]
+            tests = [_binary(op, left, right) for left, right, op in zip(operands, operands[1:], node.operators)]
+            chained = tests[0]
+            for test in tests[1:]:
+                chained = _lift2(chained, test, lambda a, b: a and b, numpy.logical_and)
+            return chained
+
+        if isinstance(node, Call):
+            callee = node.callee
+            if isinstance(callee, GetAttr):
+                callee = callee.target
+            if not isinstance(callee, Identifier) or callee.name == self.var_name:
+                raise _Unsupported
+            if len(node.args) != 1 or node.kwargs:
+                raise _Unsupported
+            index = self.operand(node.callee)
+            argument = self.compile(node.args[0], False)
+
+            def call(x, values):
+                function = values[index]
+                name = _UFUNCS.get(function)
+                if name is None:
+                    raise _Unsupported
+                value = argument(x, values)
+                if isinstance(value, numpy.ndarray):
+                    if value.dtype.kind != "f":
+                        raise _Unsupported
+                    return getattr(numpy, name)(value)
+                return function(value)
+
+            return call
+
+        raise _Unsupported
+
+
+def _lift(operand, scalar, ufunc):
+    def apply(x, values):
+        value = operand(x, values)
+        if isinstance(value, numpy.ndarray):
+            return ufunc(value)
+        return scalar(value)
+
+    return apply
+
+
+def _binary(op: str, left, right):
+    scalar, ufunc = _BINARY[op]
+    return _lift2(left, right, scalar, getattr(numpy, ufunc))
+
+
+def _lift2(left, right, scalar, ufunc):
+    def apply(x, values):
+        a = left(x, values)
+        b = right(x, values)
+        if isinstance(a, numpy.ndarray) or isinstance(b, numpy.ndarray):
+            return ufunc(a, b)
+        return scalar(a, b)
+
+    return apply
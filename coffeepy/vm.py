@@ -0,0 +1,727 @@
+"""
+CoffeePy - Register Virtual Machine
+===================================
+
+Executes the ``CodeObject`` instances produced by ``coffeepy.bytecode``.
+Each call gets a flat list of registers and runs a single dispatch loop over
+the four-integer instructions of its code object; no AST node is visited
+while a program runs.
+
+Local variables live in frames: fixed-size lists laid out by
+``coffeepy.resolver`` and linked to the frame of the defining function, so
+reading a captured variable is a few list indexings rather than a chain of
+dictionary probes. Globals stay in the interpreter's root ``Environment``.
+
+Functions, classes, instances and control-flow signals are the ones used by
+the tree walker, so values cross freely between the engines. Generator
+functions keep their registers and program counter in a ``GeneratorFrame``
+and are driven by a small Python generator that resumes the loop after every
+``yield``.
+"""
+
+from __future__ import annotations
+
+import builtins as py_builtins
+import operator
+
+from . import runtime
+from .bytecode import (
+    ADD,
+    BUILD_DICT,
+    BUILD_LIST,
+    BUILD_RANGE,
+    BUILD_SLICE,
+    BUILD_STRING,
+    CALL,
+    CALL_EX,
+    CATCH,
+    CHECK_OBJECT,
+    CONTAINS,
+    DICT_SET,
+    DIV,
+    DO,
+    EQUAL,
+    ERROR,
+    FINALLY,
+    FOR_ITER,
+    FROM_IMPORT,
+    GET_ITER,
+    GREATER,
+    GREATER_EQUAL,
+    IMPORT,
+    INDEXED_ITEMS,
+    INPLACE,
+    JUMP,
+    JUMP_IF_ARG,
+    JUMP_IF_FALSE,
+    JUMP_IF_FOUND,
+    JUMP_IF_NOT_NONE,
+    JUMP_IF_TRUE,
+    LESS,
+    LESS_EQUAL,
+    LIST_APPEND,
+    LOAD_ATTR,
+    LOAD_CHECKED,
+    LOAD_CONST,
+    LOAD_DEREF,
+    LOAD_GLOBAL,
+    LOAD_INDEX,
+    LOAD_LOCAL,
+    LOAD_NONE,
+    LOAD_SUPER,
+    LOAD_THIS,
+    MAKE_CLASS,
+    MAKE_FUNCTION,
+    MISSING_KEY,
+    MOD,
+    MOVE,
+    MUL,
+    NEGATE,
+    NEW,
+    NOT_EQUAL,
+    OBJECT_GET,
+    OF_ITEMS,
+    POSITIVE,
+    POW,
+    PROTO_ATTR,
+    READ_INDEX,
+    REGEX,
+    RERAISE,
+    RETURN,
+    SAFE_ATTR,
+    SET_THIS_PARAMS,
+    SIGNAL,
+    STORE_ATTR,
+    STORE_DEREF,
+    STORE_GLOBAL,
+    STORE_INDEX,
+    STORE_LOCAL,
+    STORE_PROTO,
+    LOAD_METHOD,
+    CALL_METHOD,
+    RANGE_ITER,
+    LAZY_RANGE,
+    MAKE_GENERATOR,
+    SUB,
+    THROW,
+    UNARY_NOT,
+    UNPACK_ARRAY,
+    UNPACK_PAIR,
+    YIELD,
+    CodeObject,
+)
+from .errors import CoffeeAttributeError, CoffeeRuntimeError
+from .interpreter import (
+    CoffeeClass,
+    CoffeeFunction,
+    CoffeeGeneratorFunction,
+    CoffeeInstance,
+    _BreakSignal,
+    _ContinueSignal,
+    _ThrowSignal,
+    call_method,
+)
+from .resolver import FIRST_SLOT, LAYOUT_SLOT, PARENT_SLOT, THIS_SLOT
+from .tokens import (
+    MINUSMINUS,
+    MINUS_EQ,
+    PERCENT_EQ,
+    PLUSPLUS,
+    PLUS_EQ,
+    SLASH_EQ,
+    STAR_EQ,
+)
+
+MISSING = runtime.MISSING
+
+_INPLACE_OPS = {
+    PLUS_EQ: operator.add,
+    MINUS_EQ: operator.sub,
+    STAR_EQ: operator.mul,
+    SLASH_EQ: operator.truediv,
+    PERCENT_EQ: operator.mod,
+    PLUSPLUS: operator.add,
+    MINUSMINUS: operator.sub,
+}
+
+_DONE = object()
+
+
+class _Unbound:
+    def __repr__(self) -> str:
+        return "<unbound>"
+
+
+UNBOUND = _Unbound()
+
+
+class GeneratorFrame:
+    """Suspended state of a generator call."""
+
+    __slots__ = ("code", "frame", "registers", "pc", "yield_register", "suspended")
+
+    def __init__(self, code: CodeObject, frame: list):
+        self.code = code
+        self.frame = frame
+        self.registers = [None] * code.register_count
+        self.pc = 0
+        self.yield_register = 0
+        self.suspended = False
+
+
+def _new_frame(function, this, args: tuple, kwargs: dict) -> list:
+    """Build the slot list of a call; defaulted parameters left unset get MISSING."""
+    code = function.code
+    frame = [function.closure, this, code.slot_names]
+    frame.extend(function.blank_slots)
+
+    params = code.params
+    slots = code.param_slots
+    named = len(params) - 1 if code.splat_param and params else len(params)
+    for index in range(named):
+        if index < len(args):
+            value = args[index]
+        else:
+            name = params[index]
+            if name in kwargs:
+                value = kwargs.pop(name)
+            elif name in code.defaults:
+                value = MISSING
+            else:
+                value = None
+        frame[slots[index]] = value
+
+    if named < len(params):
+        frame[slots[-1]] = list(args[named:])
+
+    for name, value in kwargs.items():
+        if name in code.slot_names:
+            frame[code.slot_names.index(name) + FIRST_SLOT] = value
+    return frame
+
+
+def _init_function(function, code: CodeObject, closure: list | None, vm: "VirtualMachine") -> None:
+    function.bound = code.bound
+    function.code = code
+    function.vm = vm
+    function.blank_slots = [UNBOUND] * code.local_count
+    # ``this`` is lexical: plain and bound calls see the defining frame's.
+    function.lexical_this = closure[THIS_SLOT] if closure is not None else UNBOUND
+    if function.bound and function.lexical_this is not UNBOUND:
+        function.bound_this = function.lexical_this
+
+
+class VMFunction(CoffeeFunction):
+    """A ``CoffeeFunction`` whose body runs on the virtual machine."""
+
+    def __init__(self, code: CodeObject, closure: list | None, vm: "VirtualMachine"):
+        this_params = tuple(name for name, _slot in code.this_params)
+        super().__init__(list(code.params), None, closure, vm.interpreter, code.splat_param, None, this_params)
+        _init_function(self, code, closure, vm)
+
+    def __call__(self, *args, **kwargs):
+        return self.vm.run(self.code, _new_frame(self, self.lexical_this, args, kwargs))
+
+    def call_with_this(self, instance, args: tuple, kwargs: dict):
+        return self.vm.run(self.code, _new_frame(self, instance, args, dict(kwargs)))
+
+
+class VMGeneratorFunction(CoffeeGeneratorFunction):
+    """A generator function whose body runs on the virtual machine."""
+
+    def __init__(self, code: CodeObject, closure: list | None, vm: "VirtualMachine"):
+        this_params = tuple(name for name, _slot in code.this_params)
+        super().__init__(list(code.params), None, closure, vm.interpreter, code.splat_param, None, this_params)
+        _init_function(self, code, closure, vm)
+
+    def __call__(self, *args, **kwargs):
+        frame = _new_frame(self, self.lexical_this, args, kwargs)
+        return self.vm.generate(GeneratorFrame(self.code, frame))
+
+    def call_with_this(self, instance, args: tuple, kwargs: dict):
+        frame = _new_frame(self, instance, args, dict(kwargs))
+        return self.vm.generate(GeneratorFrame(self.code, frame))
+
+
+class VirtualMachine:
+    """Run bytecode compiled by ``BytecodeCompiler``."""
+
+    def __init__(self, interpreter):
+        self.interpreter = interpreter
+        self.globals = interpreter.environment.values
+
+    def _error(self, message: str, code: CodeObject, offset: int) -> CoffeeRuntimeError:
+        return CoffeeRuntimeError(message, code.locations.get(offset), self.interpreter.source)
+
+    def run(self, code: CodeObject, frame: list | None):
+        """Execute ``code`` from the start and return its result."""
+        return self._execute(code, frame, [None] * code.register_count, 0, None, None)
+
+    def _load_unbound(self, frame: list, slot: int, builtins: bool, code: CodeObject, offset: int):
+        """Resolve a slot read before its variable was bound.
+
+        The tree walker keeps looking outwards by name in that case, so do
+        the same: enclosing frames, then globals, then builtins.
+        """
+        name = frame[LAYOUT_SLOT][slot - FIRST_SLOT]
+        outer = frame[PARENT_SLOT]
+        while outer is not None:
+            layout = outer[LAYOUT_SLOT]
+            if name in layout:
+                value = outer[layout.index(name) + FIRST_SLOT]
+                if value is not UNBOUND:
+                    return value
+            outer = outer[PARENT_SLOT]
+        return self._load_global(name, builtins, code, offset)
+
+    def _load_global(self, name: str, builtins: bool, code: CodeObject, offset: int):
+        if name in self.globals:
+            return self.globals[name]
+        if builtins and hasattr(py_builtins, name):
+            return getattr(py_builtins, name)
+        raise self._error(f"Undefined identifier '{name}'.", code, offset)
+
+    def generate(self, state: GeneratorFrame):
+        """Drive a generator call, resuming it after every ``yield``."""
+        pending = None
+        while True:
+            value = self._execute(state.code, state.frame, state.registers, state.pc, state, pending)
+            if not state.suspended:
+                return
+            state.suspended = False
+            pending = None
+            try:
+                sent = yield value
+            except BaseException as exc:
+                pending = exc
+                continue
+            state.registers[state.yield_register] = sent
+
+    @staticmethod
+    def _find_handler(code: CodeObject, offset: int, exc: BaseException):
+        for start, end, handler, kind, register in code.exception_table:
+            if not start <= offset < end:
+                continue
+            if kind == CATCH:
+                if isinstance(exc, _ThrowSignal):
+                    return handler, register, exc.value
+            elif kind == FINALLY:
+                return handler, register, exc
+            elif isinstance(exc, CoffeeRuntimeError):
+                return handler, register, exc
+        return None
+
+    def _execute(self, code: CodeObject, frame: list | None, registers: list, pc: int, state, pending):
+        instructions = code.instructions
+        constants = code.constants
+        names = code.names
+        attribute_caches = code.attribute_caches
+        interpreter = self.interpreter
+        globals_ = self.globals
+
+        while True:
+            try:
+                if pending is not None:
+                    # Resuming a generator with ``throw``: raise at the yield.
+                    exc, pending = pending, None
+                    raise exc
+
+                while True:
+                    op = instructions[pc]
+                    a = instructions[pc + 1]
+                    b = instructions[pc + 2]
+                    c = instructions[pc + 3]
+                    pc += 4
+
+                    if op == LOAD_LOCAL:
+                        value = frame[b]
+                        if value is UNBOUND:
+                            value = self._load_unbound(frame, b, True, code, pc - 4)
+                        registers[a] = value
+
+                    elif op == LOAD_CONST:
+                        registers[a] = constants[b]
+
+                    elif op == STORE_LOCAL:
+                        frame[a] = registers[b]
+
+                    elif op == LOAD_GLOBAL:
+                        name = names[b]
+                        if name in globals_:
+                            registers[a] = globals_[name]
+                        else:
+                            registers[a] = self._load_global(name, True, code, pc - 4)
+
+                    elif op == STORE_GLOBAL:
+                        globals_[names[a]] = registers[b]
+
+                    elif op == LOAD_DEREF:
+                        scope = frame
+                        for _ in range(b):
+                            scope = scope[PARENT_SLOT]
+                        value = scope[c]
+                        if value is UNBOUND:
+                            value = self._load_unbound(scope, c, True, code, pc - 4)
+                        registers[a] = value
+
+                    elif op == STORE_DEREF:
+                        scope = frame
+                        for _ in range(a):
+                            scope = scope[PARENT_SLOT]
+                        scope[b] = registers[c]
+
+                    elif op == JUMP_IF_FALSE:
+                        if not registers[a]:
+                            pc = b
+
+                    elif op == JUMP:
+                        pc = a
+
+                    elif op == MOVE:
+                        registers[a] = registers[b]
+
+                    elif op == LESS:
+                        registers[a] = registers[b] < registers[c]
+
+                    elif op == ADD:
+                        try:
+                            registers[a] = registers[b] + registers[c]
+                        except Exception as exc:
+                            raise CoffeeRuntimeError(f"Binary operation failed: {exc}") from exc
+
+                    elif op == SUB:
+                        try:
+                            registers[a] = registers[b] - registers[c]
+                        except Exception as exc:
+                            raise CoffeeRuntimeError(f"Binary operation failed: {exc}") from exc
+
+                    elif op == CALL:
+                        callee = registers[b]
+                        if not callable(callee):
+                            raise CoffeeRuntimeError("Target is not callable.")
+                        try:
+                            registers[a] = callee(*registers[b + 1:b + 1 + c])
+                        except (CoffeeRuntimeError, _ThrowSignal, _BreakSignal, _ContinueSignal):
+                            raise
+                        except Exception as exc:
+                            raise CoffeeRuntimeError(f"Call failed: {exc}") from exc
+
+                    elif op == RETURN:
+                        return registers[a]
+
+                    elif op == LOAD_ATTR:
+                        cache = attribute_caches[c]
+                        try:
+                            registers[a] = cache.load(registers[b])
+                        except CoffeeAttributeError:
+                            raise self._error(f"Attribute '{cache.name}' not found.", code, pc - 4) from None
+
+                    elif op == LOAD_METHOD:
+                        cache = attribute_caches[c]
+                        receiver = registers[b]
+                        method = cache.find_method(receiver) if type(receiver) is CoffeeInstance else None
+                        if method is None:
+                            try:
+                                method = cache.load(receiver)
+                            except CoffeeAttributeError:
+                                raise self._error(f"Attribute '{cache.name}' not found.", code, pc - 4) from None
+                            receiver = None
+                        registers[a] = receiver
+                        registers[a + 1] = method
+
+                    elif op == CALL_METHOD:
+                        receiver = registers[b]
+                        callee = registers[b + 1]
+                        try:
+                            if receiver is not None:
+                                registers[a] = call_method(receiver, callee, registers[b + 2:b + 2 + c], {})
+                            elif not callable(callee):
+                                raise CoffeeRuntimeError("Target is not callable.")
+                            else:
+                                registers[a] = callee(*registers[b + 2:b + 2 + c])
+                        except (CoffeeRuntimeError, _ThrowSignal, _BreakSignal, _ContinueSignal):
+                            raise
+                        except Exception as exc:
+                            raise CoffeeRuntimeError(f"Call failed: {exc}") from exc
+
+                    elif op == FOR_ITER:
+                        value = next(registers[a], _DONE)
+                        if value is _DONE:
+                            pc = c
+                        else:
+                            registers[b] = value
+
+                    elif op == INPLACE:
+                        operator_name = constants[c]
+                        try:
+                            registers[a] = _INPLACE_OPS[operator_name](registers[a], registers[b])
+                        except Exception as exc:
+                            if operator_name in (PLUSPLUS, MINUSMINUS):
+                                raise CoffeeRuntimeError(f"Update operator failed: {exc}") from exc
+                            raise CoffeeRuntimeError(f"Augmented assignment failed: {exc}") from exc
+
+                    elif op == LOAD_CHECKED:
+                        depth, slot, name = constants[b]
+                        if depth < 0:
+                            registers[a] = self._load_global(name, False, code, pc - 4)
+                        else:
+                            scope = frame
+                            for _ in range(depth):
+                                scope = scope[PARENT_SLOT]
+                            value = scope[slot]
+                            if value is UNBOUND:
+                                value = self._load_unbound(scope, slot, False, code, pc - 4)
+                            registers[a] = value
+
+                    elif op == EQUAL:
+                        registers[a] = registers[b] == registers[c]
+
+                    elif op == MUL or op == DIV or op == MOD or op == POW:
+                        left = registers[b]
+                        right = registers[c]
+                        try:
+                            if op == MUL:
+                                registers[a] = left * right
+                            elif op == DIV:
+                                registers[a] = left / right
+                            elif op == MOD:
+                                registers[a] = left % right
+                            else:
+                                registers[a] = left ** right
+                        except Exception as exc:
+                            raise CoffeeRuntimeError(f"Binary operation failed: {exc}") from exc
+
+                    elif op == LOAD_NONE:
+                        registers[a] = None
+
+                    elif op == JUMP_IF_TRUE:
+                        if registers[a]:
+                            pc = b
+
+                    elif op == LOAD_INDEX:
+                        try:
+                            registers[a] = registers[b][registers[c]]
+                        except Exception as exc:
+                            raise CoffeeRuntimeError(f"Index operation failed: {exc}") from exc
+
+                    elif op == NOT_EQUAL:
+                        registers[a] = registers[b] != registers[c]
+
+                    elif op == LESS_EQUAL:
+                        registers[a] = registers[b] <= registers[c]
+
+                    elif op == GREATER:
+                        registers[a] = registers[b] > registers[c]
+
+                    elif op == GREATER_EQUAL:
+                        registers[a] = registers[b] >= registers[c]
+
+                    elif op == STORE_ATTR:
+                        runtime.set_attr(registers[a], names[b], registers[c])
+
+                    elif op == STORE_PROTO:
+                        runtime.set_proto(registers[a], names[b], registers[c])
+
+                    elif op == STORE_INDEX:
+                        container = registers[a]
+                        if not hasattr(container, "__setitem__"):
+                            raise CoffeeRuntimeError("Target does not support index assignment.")
+                        try:
+                            container[registers[b]] = registers[c]
+                        except Exception as exc:
+                            raise CoffeeRuntimeError(f"Index assignment failed: {exc}") from exc
+
+                    elif op == READ_INDEX:
+                        try:
+                            registers[a] = registers[b][registers[c]]
+                        except Exception as exc:
+                            raise CoffeeRuntimeError(f"Index read failed: {exc}") from exc
+
+                    elif op == UNARY_NOT:
+                        registers[a] = not registers[b]
+
+                    elif op == NEGATE or op == POSITIVE:
+                        value = registers[b]
+                        if value is None:
+                            raise CoffeeRuntimeError(
+                                f"Unary '{'-' if op == NEGATE else '+'}' not supported for None."
+                            )
+                        registers[a] = -value if op == NEGATE else +value
+
+                    elif op == CONTAINS:
+                        registers[a] = runtime.contains(registers[b], registers[c])
+
+                    elif op == JUMP_IF_NOT_NONE:
+                        if registers[a] is not None:
+                            pc = b
+
+                    elif op == BUILD_LIST:
+                        registers[a] = registers[b:b + c]
+
+                    elif op == BUILD_DICT:
+                        keys = constants[c]
+                        registers[a] = dict(zip(keys, registers[b:b + len(keys)]))
+
+                    elif op == BUILD_STRING:
+                        registers[a] = "".join(
+                            str(value) if value is not None else "" for value in registers[b:b + c]
+                        )
+
+                    elif op == LIST_APPEND:
+                        registers[a].append(registers[b])
+
+                    elif op == DICT_SET:
+                        registers[a][registers[b]] = registers[c]
+
+                    elif op == GET_ITER:
+                        registers[a] = iter(registers[b])
+
+                    elif op == OF_ITEMS:
+                        registers[a] = runtime.of_items(registers[b])
+
+                    elif op == INDEXED_ITEMS:
+                        registers[a] = runtime.indexed_items(registers[b])
+
+                    elif op == UNPACK_PAIR:
+                        registers[a], registers[a + 1] = registers[b]
+
+                    elif op == MAKE_FUNCTION:
+                        function_code = constants[b]
+                        if function_code.is_generator:
+                            registers[a] = VMGeneratorFunction(function_code, frame, self)
+                        else:
+                            registers[a] = VMFunction(function_code, frame, self)
+
+                    elif op == MAKE_GENERATOR:
+                        generator = GeneratorFrame(constants[b], frame)
+                        generator.registers[0] = registers[c]
+                        registers[a] = self.generate(generator)
+
+                    elif op == JUMP_IF_ARG:
+                        if frame[a] is not MISSING:
+                            pc = b
+
+                    elif op == SET_THIS_PARAMS:
+                        this_value = frame[THIS_SLOT]
+                        if isinstance(this_value, CoffeeInstance):
+                            for param_name, slot in constants[a]:
+                                this_value.set(param_name, frame[slot])
+
+                    elif op == LOAD_THIS:
+                        this_value = frame[THIS_SLOT] if frame is not None else UNBOUND
+                        if this_value is UNBOUND:
+                            raise CoffeeRuntimeError("'this' used outside of class method.")
+                        registers[a] = this_value
+
+                    elif op == LOAD_SUPER:
+                        # Nothing binds ``super``, matching the tree walker.
+                        raise CoffeeRuntimeError("'super' used outside of class method.")
+
+                    elif op == CALL_EX or op == NEW:
+                        argc, spreads, keywords = constants[c]
+                        callee = registers[b]
+                        if spreads:
+                            args = []
+                            for index in range(argc):
+                                if index in spreads:
+                                    args.extend(runtime.spread(registers[b + 1 + index]))
+                                else:
+                                    args.append(registers[b + 1 + index])
+                        else:
+                            args = registers[b + 1:b + 1 + argc]
+                        start = b + 1 + argc
+                        kwargs = dict(zip(keywords, registers[start:start + len(keywords)]))
+                        if op == NEW:
+                            if not isinstance(callee, CoffeeClass):
+                                raise CoffeeRuntimeError("Can only instantiate classes.")
+                            registers[a] = callee(*args, **kwargs)
+                            continue
+                        if not callable(callee):
+                            raise CoffeeRuntimeError("Target is not callable.")
+                        try:
+                            registers[a] = callee(*args, **kwargs)
+                        except (CoffeeRuntimeError, _ThrowSignal, _BreakSignal, _ContinueSignal):
+                            raise
+                        except Exception as exc:
+                            raise CoffeeRuntimeError(f"Call failed: {exc}") from exc
+
+                    elif op == MAKE_CLASS:
+                        registers[a] = CoffeeClass(constants[c], registers[b], registers[b + 1], interpreter)
+
+                    elif op == SAFE_ATTR:
+                        registers[a] = runtime.safe_attr(registers[b], names[c])
+
+                    elif op == PROTO_ATTR:
+                        registers[a] = runtime.proto(registers[b], names[c])
+
+                    elif op == BUILD_RANGE:
+                        registers[a] = runtime.make_range(registers[b], registers[b + 1], c, registers[b + 2])
+
+                    elif op == RANGE_ITER:
+                        registers[a] = iter(runtime.range_numbers(registers[b], registers[b + 1], c, registers[b + 2]))
+
+                    elif op == LAZY_RANGE:
+                        registers[a] = runtime.make_lazy_range(registers[b], registers[b + 1], c, registers[b + 2])
+
+                    elif op == BUILD_SLICE:
+                        registers[a] = runtime.make_slice(registers[b], registers[b + 1], registers[b + 2], c)
+
+                    elif op == UNPACK_ARRAY:
+                        count, splat_index = constants[c]
+                        registers[a:a + count] = runtime.unpack_array(registers[b], count, splat_index)
+
+                    elif op == CHECK_OBJECT:
+                        runtime.check_object(registers[a])
+
+                    elif op == OBJECT_GET:
+                        registers[a] = registers[b].get(constants[c], MISSING)
+
+                    elif op == JUMP_IF_FOUND:
+                        if registers[a] is not MISSING:
+                            pc = b
+
+                    elif op == MISSING_KEY:
+                        runtime.missing_property(constants[a])
+
+                    elif op == DO:
+                        registers[a] = runtime.do(registers[b])
+
+                    elif op == REGEX:
+                        registers[a] = runtime.regex(*constants[b])
+
+                    elif op == IMPORT:
+                        if c:
+                            registers[a] = runtime.import_module(constants[b])
+                        else:
+                            registers[a] = runtime.import_module_as(constants[b])
+
+                    elif op == FROM_IMPORT:
+                        registers[a] = runtime.from_import(constants[b], constants[c])
+
+                    elif op == THROW:
+                        raise _ThrowSignal(registers[a])
+
+                    elif op == RERAISE:
+                        raise registers[a]
+
+                    elif op == YIELD:
+                        state.pc = pc
+                        state.yield_register = a
+                        state.suspended = True
+                        return registers[b]
+
+                    elif op == SIGNAL:
+                        raise _BreakSignal() if a == 0 else _ContinueSignal()
+
+                    elif op == ERROR:
+                        raise interpreter._error(constants[a])
+
+                    else:
+                        raise CoffeeRuntimeError(f"Unknown opcode {op}.")
+
+            except BaseException as exc:
+                handler = self._find_handler(code, pc - 4, exc)
+                if handler is None:
+                    raise
+                pc, register, value = handler
+                registers[register] = value